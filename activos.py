@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+
+from flask import request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Sin brotli solo se generan las versiones .gz
+    brotli = None
+
+# ---------------------- ACTIVOS ESTÁTICOS VERSIONADOS ----------------------
+#
+# `flask construir-activos` copia los JS/CSS de `static/` a `static/dist/` con el hash de su
+# contenido en el nombre (`js/dashboard.3f2a1b9c0d4e.js`) y escribe al lado sus versiones
+# precomprimidas `.gz` y `.br`. El manifiesto `static/dist/manifest.json` relaciona cada ruta
+# original con la versionada. Las plantillas siguen usando `url_for('static', filename=...)`: si el
+# archivo está en el manifiesto se emite la URL versionada, que se sirve con caché inmutable de un
+# año y la codificación que acepte el navegador. Sin manifiesto (desarrollo) nada cambia.
+
+CARPETAS_ACTIVOS = ('css', 'js', 'vendor')
+EXTENSIONES_ACTIVOS = {'.css', '.js'}
+CARPETA_SALIDA = 'dist'
+MANIFIESTO = 'manifest.json'
+LARGO_HASH = 12
+UN_ANIO = 365 * 24 * 3600
+
+# Codificaciones precomprimidas en orden de preferencia: (Content-Encoding, extensión)
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+manifiesto = {}
+
+def nombre_versionado(ruta, contenido):
+    """
+    Inserta el hash del contenido antes de la extensión: `js/app.js` -> `js/app.<hash>.js`.
+    """
+    base, extension = os.path.splitext(ruta)
+    return f"{base}.{hashlib.sha256(contenido).hexdigest()[:LARGO_HASH]}{extension}"
+
+def _escribir(ruta, contenido):
+    """
+    Escribe el archivo de forma atómica (temporal + rename).
+    """
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix='.activo-')
+    try:
+        with os.fdopen(descriptor, 'wb') as salida:
+            salida.write(contenido)
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, ruta)
+    except Exception:
+        os.remove(temporal)
+        raise
+
+def _comprimidos(contenido):
+    """
+    Devuelve {extension: bytes} con las versiones comprimidas que resulten más pequeñas que el original.
+    """
+    versiones = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versiones['.br'] = brotli.compress(contenido, quality=11)
+    return {extension: datos for extension, datos in versiones.items() if len(datos) < len(contenido)}
+
+def construir_activos(carpeta_static):
+    """
+    Genera en `<carpeta_static>/dist` las copias versionadas y precomprimidas de los activos y el
+    manifiesto. Los archivos de compilaciones anteriores se conservan para las páginas ya servidas.
+    Devuelve el manifiesto {ruta_original: ruta_versionada}.
+    """
+    salida = os.path.join(carpeta_static, CARPETA_SALIDA)
+    nuevo = {}
+    for carpeta in CARPETAS_ACTIVOS:
+        for directorio, _, nombres in os.walk(os.path.join(carpeta_static, carpeta)):
+            for nombre in sorted(nombres):
+                if os.path.splitext(nombre)[1] not in EXTENSIONES_ACTIVOS:
+                    continue
+                origen = os.path.join(directorio, nombre)
+                relativa = os.path.relpath(origen, carpeta_static).replace(os.sep, '/')
+                with open(origen, 'rb') as archivo:
+                    contenido = archivo.read()
+                versionada = nombre_versionado(relativa, contenido)
+                destino = os.path.join(salida, *versionada.split('/'))
+                if not os.path.exists(destino):
+                    for extension, datos in _comprimidos(contenido).items():
+                        _escribir(destino + extension, datos)
+                    _escribir(destino, contenido)
+                nuevo[relativa] = versionada
+    _escribir(os.path.join(salida, MANIFIESTO), json.dumps(nuevo, indent=2, sort_keys=True).encode())
+    manifiesto.clear()
+    manifiesto.update(nuevo)
+    return nuevo
+
+def cargar_manifiesto(carpeta_static):
+    """
+    Carga el manifiesto de la última compilación. Si no existe, las URLs no se versionan.
+    """
+    ruta = os.path.join(carpeta_static, CARPETA_SALIDA, MANIFIESTO)
+    manifiesto.clear()
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            manifiesto.update(json.load(archivo))
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        print(f"Manifiesto de activos inválido ({ruta}): {e}")
+    return manifiesto
+
+def url_activo(endpoint, **valores):
+    """
+    Reemplazo de `url_for` para las plantillas: los archivos estáticos compilados apuntan a su
+    versión con hash; el resto de URLs se construyen igual que con `url_for`.
+    """
+    if endpoint == 'static':
+        versionada = manifiesto.get(valores.get('filename'))
+        if versionada:
+            valores.pop('filename')
+            return url_for('activos', archivo=versionada, **valores)
+    return url_for(endpoint, **valores)
+
+def registrar_activos(app):
+    """
+    Carga el manifiesto, registra la ruta `/activos/<archivo>` y hace que `url_for` en las
+    plantillas emita las URLs versionadas.
+    """
+    carpeta = os.path.join(app.static_folder, CARPETA_SALIDA)
+    cargar_manifiesto(app.static_folder)
+
+    @app.route('/activos/<path:archivo>', endpoint='activos')
+    def servir_activo(archivo):
+        tipo = mimetypes.guess_type(archivo)[0]
+        codificacion = None
+        for candidata, extension in CODIFICACIONES:
+            comprimido = safe_join(carpeta, archivo + extension)
+            if request.accept_encodings[candidata] and comprimido and os.path.isfile(comprimido):
+                codificacion, archivo = candidata, archivo + extension
+                break
+        respuesta = send_from_directory(carpeta, archivo, mimetype=tipo, max_age=UN_ANIO)
+        respuesta.cache_control.immutable = True
+        respuesta.vary.add('Accept-Encoding')
+        if codificacion:
+            respuesta.content_encoding = codificacion
+        return respuesta
+
+    app.jinja_env.globals['url_for'] = url_activo
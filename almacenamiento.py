@@ -0,0 +1,80 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+# ---------------------- ALMACENAMIENTO DE EVIDENCIAS ----------------------
+#
+# Las imágenes subidas se guardan por contenido: el nombre del archivo es el SHA-256 de sus bytes
+# y se reparte en subdirectorios por los primeros caracteres del hash (`ab/cd/abcd....jpg`), así
+# ningún directorio crece sin límite. Dos subidas con el mismo nombre original ya no se pisan y
+# una imagen repetida se guarda una sola vez: si el archivo del hash ya existe no se escribe nada.
+
+TAMANO_BLOQUE = 64 * 1024
+
+# La subida se mantiene en memoria mientras no supere este tamaño
+MAX_EN_MEMORIA = int(os.getenv('UPLOAD_MAX_EN_MEMORIA', str(1024 * 1024)))
+
+# Niveles de subdirectorios y caracteres del hash por nivel
+NIVELES = 2
+ANCHO_NIVEL = 2
+
+# Extensiones equivalentes se guardan con un único nombre
+EXTENSIONES_EQUIVALENTES = {'jpeg': 'jpg'}
+
+def extension_de(nombre):
+    """
+    Devuelve la extensión normalizada (minúsculas, sin punto) del nombre de archivo.
+    """
+    extension = nombre.rsplit('.', 1)[1].lower() if '.' in nombre else ''
+    return EXTENSIONES_EQUIVALENTES.get(extension, extension)
+
+def ruta_relativa(digest, extension):
+    """
+    Devuelve la ruta relativa (con '/') del archivo para el hash y la extensión dados.
+    """
+    niveles = [digest[i * ANCHO_NIVEL:(i + 1) * ANCHO_NIVEL] for i in range(NIVELES)]
+    nombre = f"{digest}.{extension}" if extension else digest
+    return '/'.join(niveles + [nombre])
+
+def guardar_archivo(archivo, carpeta, url_base):
+    """
+    Guarda el archivo subido (`FileStorage`) en `carpeta` bajo su hash SHA-256 y devuelve su URL
+    (`url_base` + ruta relativa). El contenido se lee en bloques mientras se calcula el hash; si el
+    archivo ya existe no se vuelve a escribir. La escritura es atómica (archivo temporal + rename).
+    """
+    sha = hashlib.sha256()
+    with tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA) as contenido:
+        while True:
+            bloque = archivo.stream.read(TAMANO_BLOQUE)
+            if not bloque:
+                break
+            sha.update(bloque)
+            contenido.write(bloque)
+
+        relativa = ruta_relativa(sha.hexdigest(), extension_de(archivo.filename))
+        destino = os.path.join(carpeta, *relativa.split('/'))
+        if not os.path.exists(destino):
+            directorio = os.path.dirname(destino)
+            os.makedirs(directorio, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix='.subida-')
+            try:
+                with os.fdopen(descriptor, 'wb') as salida:
+                    contenido.seek(0)
+                    shutil.copyfileobj(contenido, salida, TAMANO_BLOQUE)
+                # mkstemp crea el archivo con permisos 0600; se publica como estático
+                os.chmod(temporal, 0o644)
+                os.replace(temporal, destino)
+            except Exception:
+                os.remove(temporal)
+                raise
+    return f"{url_base.rstrip('/')}/{relativa}"
+
+def ruta_local(url, carpeta, url_base):
+    """
+    Devuelve la ruta en disco de una URL devuelta por `guardar_archivo`, o None si no está bajo `url_base`.
+    """
+    prefijo = url_base.rstrip('/') + '/'
+    if not url or not url.startswith(prefijo):
+        return None
+    return os.path.join(carpeta, *url[len(prefijo):].split('/'))
@@ -1,35 +1,63 @@
-from datetime import timedelta
-import os
-from flask import Flask, jsonify, render_template, request, flash, redirect, url_for, session
-from werkzeug.utils import secure_filename
+import click
+from flask import Flask, Response, jsonify, render_template, request, flash, redirect, url_for, session, g
+from flask_socketio import join_room
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
 import traceback
+import datetime
+import io
+import uuid
+
+from db_pool import conexion_peticion, estadisticas_pool, registrar_conexion_peticion
+from metricas import ESTADOS, TIPO_INFRAESTRUCTURA, TIPOS_POR_NOMBRE, calcular_metricas, normalizar_estado
+from contadores import mover_contador, reconciliar_contadores
+from cache import cache, invalidar_incidentes, invalidar_usuarios
+from paginacion import LIMITE_DEFECTO, normalizar_limite, decodificar_cursor
+from migrador import aplicar_pendientes, verificar_migraciones
+from streaming import transmitir_archivo, transmitir_json
+from perfiles import PERFIL_ADMIN, datos_sesion, es_admin
+from limitador import limitador_login
+from almacenamiento import guardar_archivo, ruta_local
+from variantes import encolar_variantes, procesar_carpeta, urls_variantes
+from activos import construir_activos, registrar_activos
+from tiempo_real import SALA_ADMIN, emitir_incidente, registrar_tiempo_real, sala_institucion, socketio
+from versiones import respuesta_condicional
+from importacion import TIPOS_IMPORTACION, escribir_rechazados, generar_csv_prueba, importar_csv
+from exportacion import FORMATOS_EXPORTACION
+from medicion import borrar_datos_prueba, medir_actualizacion, preparar_incidente_prueba
+from cola_escritura import ESCRITURA_DIFERIDA, obtener_cola
+from replicas import conexion_lectura, estadisticas_replicas, forzar_primaria, obtener_replicas, registrar_replicas
+from instrumentacion import (
+    CONTENT_TYPE_PROMETHEUS, exportar_prometheus, metricas_autorizadas, registrar_instrumentacion
+)
 
 # Importa funciones auxiliares necesarias
 from utils import (
     obtener_registros_filtrados_por_institucion,
     actualizar_incidencia_por_nombre,
     obtener_incidencias_por_estado,
-    obtener_registros_academico,
-    obtener_registros_infraestructura,
     actualizar_incidencia_por_id,
     insertar_usuario,
     guardar_registro_academico,
     guardar_registro_infraestructura,
-    verificar_credenciales,
+    autenticar_usuario,
+    obtener_perfil_usuario,
     obtener_metricas_dashboard,
     obtener_ultima_incidencia,
-    obtener_datos_usuario,
-    obtener_todos_los_usuarios,
     eliminar_usuario_por_id,
     obtener_usuario_por_id,
     actualizar_usuario_por_id,
-    obtener_todas_las_evidencias_por_institucion,
+    consultas_evidencias_por_institucion,
     obtener_instituciones,
     obtener_incidente_por_nombre,
-    obtener_metricas_usuario
+    obtener_metricas_usuario,
+    obtener_incidentes_usuario,
+    obtener_pagina_infraestructura,
+    consulta_pagina_infraestructura,
+    actualizar_estados_en_lote,
+    buscar_incidentes,
+    MAX_CAMBIOS_LOTE
 )
 
 app = Flask(__name__)
@@ -39,63 +67,126 @@ load_dotenv()
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['UPLOAD_URL'] = '/' + UPLOAD_FOLDER
+
+# Latencia por ruta y por sentencia SQL, expuestas en /metrics
+registrar_instrumentacion(app)
+
+# Una conexión por petición, compartida por las rutas y `utils`
+registrar_conexion_peticion(app)
+
+# Lecturas en réplicas (`DB_REPLICAS`), con su propia conexión por petición
+registrar_replicas(app)
+
+# JS/CSS versionados y precomprimidos (`flask construir-activos`)
+registrar_activos(app)
+
+# Notificaciones de incidentes por Socket.IO
+registrar_tiempo_real(app)
+
+# Escribe los incidentes que quedaron en la cola de escrituras diferidas
+if ESCRITURA_DIFERIDA:
+    obtener_cola().iniciar()
 
 CLAVE_VALIDA = "priuge450"
-intentos_fallidos = 0
-MAX_INTENTOS = 3
-bloqueado = False
 
 def allowed_file(filename):
     """Verifica si el archivo tiene una extensión permitida."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_db_connection():
-    """Establece y devuelve una conexión a la base de datos MySQL."""
-    return mysql.connector.connect(
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        port=os.getenv('DB_PORT')
-    )
+def guardar_evidencia(archivo):
+    """Guarda la imagen subida por su contenido (SHA-256) y devuelve su URL, o None si no es válida."""
+    if not archivo or not allowed_file(archivo.filename):
+        return None
+    url = guardar_archivo(archivo, app.config['UPLOAD_FOLDER'], app.config['UPLOAD_URL'])
+    # Miniatura y versión media se generan en segundo plano
+    encolar_variantes(ruta_local(url, app.config['UPLOAD_FOLDER'], app.config['UPLOAD_URL']))
+    return url
+
+def agregar_variantes(fila):
+    """Añade a la fila las URLs de la miniatura y la versión media de su evidencia."""
+    for variante, url in urls_variantes(fila.get('evidencia'), app.config['UPLOAD_URL']).items():
+        fila[f'evidencia_{variante}'] = url
+    return fila
+
+@app.before_request
+def cargar_usuario_actual():
+    """
+    Carga el perfil del usuario en sesión (caché de perfiles) en `g.usuario`. Si el usuario ya no
+    existe o su versión cambió desde el inicio de sesión, la sesión se descarta.
+    """
+    g.usuario = None
+    datos = session.get('usuario')
+    if not datos or request.endpoint == 'static':
+        return
+    if es_admin(datos):
+        g.usuario = PERFIL_ADMIN
+        return
+    perfil = obtener_perfil_usuario(datos.get('id')) if 'v' in datos else None
+    if not perfil or perfil['version'] != datos['v']:
+        session.pop('usuario', None)
+        return
+    g.usuario = perfil
+
+@socketio.on('connect')
+def conectar_socket(auth=None):
+    """
+    Une la conexión Socket.IO a la sala de administradores o a la de la institución del usuario en
+    sesión. Las conexiones sin sesión válida se rechazan.
+    """
+    datos = session.get('usuario')
+    if es_admin(datos):
+        join_room(SALA_ADMIN)
+        return
+    perfil = obtener_perfil_usuario(datos.get('id')) if datos and 'v' in datos else None
+    if not perfil or perfil['version'] != datos['v']:
+        return False
+    if perfil['institucion_id'] is not None:
+        join_room(sala_institucion(perfil['institucion_id']))
+
+@app.context_processor
+def inyectar_usuario_actual():
+    """Expone el perfil del usuario en sesión a las plantillas como `usuario_actual`."""
+    return {'usuario_actual': g.get('usuario') or {}}
+
+def get_db_connection(lectura=False):
+    """
+    Devuelve la conexión de la petición en curso; se libera al terminar la petición. Con `lectura`
+    devuelve la de una réplica si corresponde (ver `replicas`).
+    """
+    return conexion_lectura() if lectura else conexion_peticion()
 
 @app.route('/', methods=['GET', 'POST'])
 def login():
     """Maneja la autenticación de usuarios y administradores."""
-    global intentos_fallidos, bloqueado
     usuario = request.form.get('usuario') if request.method == 'POST' else ""
 
     if request.method == 'POST':
         clave = request.form.get('clave')
-        if bloqueado:
+        ip = request.remote_addr
+        # Rechaza clientes y cuentas con demasiados fallos antes de consultar la base de datos
+        if limitador_login.verificar(ip, usuario):
             flash("Demasiados intentos fallidos. Intente más tarde.", "danger")
-            return render_template('login.html', bloqueado=True, usuario=usuario)
+            return render_template('login.html', bloqueado=True, usuario=usuario), 429
 
         if usuario == "admin@gmail.com" and clave == CLAVE_VALIDA:
-            intentos_fallidos = 0
-            session['usuario'] = {
-                'nombre': 'Administrador',
-                'apellido': 'Principal',
-                'correo': 'admin@gmail.com',
-                'id': 1
-            }
+            limitador_login.registrar_exito(ip, usuario)
+            session['usuario'] = datos_sesion(PERFIL_ADMIN)
             return redirect(url_for('dashboard'))
 
-        if verificar_credenciales(usuario, clave):
-            intentos_fallidos = 0
-            datos_usuario = obtener_datos_usuario(usuario)
-            if datos_usuario:
-                session['usuario'] = datos_usuario
-                return redirect(url_for('dashboard_colegios'))
+        # Autentica y obtiene el perfil en una sola consulta; la sesión guarda solo id y versión
+        perfil = autenticar_usuario(usuario, clave)
+        if perfil:
+            limitador_login.registrar_exito(ip, usuario)
+            session['usuario'] = datos_sesion(perfil)
+            return redirect(url_for('dashboard_colegios'))
 
-        intentos_fallidos += 1
-        if intentos_fallidos >= MAX_INTENTOS:
-            bloqueado = True
+        if limitador_login.registrar_fallo(ip, usuario):
             flash("Demasiados intentos fallidos.", "danger")
-        else:
-            flash("Credenciales incorrectas.", "danger")
+            return render_template('login.html', bloqueado=True, usuario=usuario)
+        flash("Credenciales incorrectas.", "danger")
 
-    return render_template('login.html', bloqueado=bloqueado, usuario=usuario)
+    return render_template('login.html', bloqueado=False, usuario=usuario)
 
 @app.route('/logout')
 def logout():
@@ -108,9 +199,19 @@ def dashboard():
     """Muestra el dashboard para administradores con incidentes y métricas."""
     if 'usuario' not in session:
         return redirect(url_for('login'))
-    incidentes = obtener_registros_infraestructura()
-    metricas = obtener_metricas_dashboard()
-    return render_template('dashboard.html', incidentes=incidentes, metricas=metricas)
+    metricas = cache.obtener_o_calcular('metricas:dashboard', obtener_metricas_dashboard)
+    incidentes, siguiente = [], None
+    try:
+        conn = get_db_connection()
+        try:
+            incidentes, siguiente = cache.obtener_o_calcular(
+                'incidentes:dashboard', lambda: obtener_pagina_infraestructura(conn, LIMITE_DEFECTO))
+        finally:
+            conn.close()
+    except Error as e:
+        print("Error al cargar incidentes del dashboard:", e)
+    return render_template('dashboard.html', incidentes=incidentes, siguiente_cursor=siguiente,
+                           metricas=metricas)
 
 @app.route('/dashboard_colegios')
 def dashboard_colegios():
@@ -121,36 +222,9 @@ def dashboard_colegios():
     usuario_id = session['usuario']['id']
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("""
-            SELECT 
-                r.id,
-                u.institucion,
-                r.descripcion_problema AS descripcion,
-                r.estado,
-                r.problema,
-                r.fecha_registro AS fecha,
-                u.correo_electronico AS correo,
-                u.telefono AS telefono,
-                r.comentarios,
-                'infraestructura' AS tipo
-            FROM registro_infraestructura r
-            JOIN usuarios u ON r.usuario_id = u.id
-            WHERE r.usuario_id = %s
-            ORDER BY r.fecha_registro DESC
-        """, (usuario_id,))
-        registros_infraestructura = cursor.fetchall()
-
-        registros_academicos = obtener_registros_academico(usuario_id)
-        for reg in registros_academicos:
-            reg['institucion'] = session['usuario']['institucion']
-            reg['correo'] = session['usuario']['correo_electronico']
-            reg['telefono'] = session['usuario']['telefono']
-            reg['tipo'] = 'academico'
-
-        incidentes = registros_infraestructura + registros_academicos
-        metricas = obtener_metricas_usuario(usuario_id, conn)
+        incidentes = obtener_incidentes_usuario(usuario_id, conn)
+        metricas = cache.obtener_o_calcular(f'metricas:usuario:{usuario_id}',
+                                            lambda: obtener_metricas_usuario(usuario_id, conn))
 
         return render_template('dashboard_colegios.html', incidentes=incidentes, metricas=metricas)
     except Exception as e:
@@ -160,47 +234,25 @@ def dashboard_colegios():
         conn.close()
 
 @app.route('/api/metricas')
+@respuesta_condicional('incidentes', 'usuarios')
 def api_metricas():
     """Devuelve métricas generales de incidentes en formato JSON."""
+    encontrado, datos = cache.obtener('metricas:global')
+    if encontrado:
+        return jsonify(datos)
+    marca = cache.marca('metricas:global')
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-
-        cursor.execute("SELECT COUNT(*) FROM registro_infraestructura")
-        infra_total = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM registro_academico")
-        academico_total = cursor.fetchone()[0]
-        total_incidentes = infra_total + academico_total
-
-        cursor.execute("SELECT COUNT(*) FROM registro_infraestructura WHERE estado = 'Resuelto'")
-        infra_resueltos = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM registro_academico WHERE estado = 'Resuelto'")
-        academico_resueltos = cursor.fetchone()[0]
-        resueltos = infra_resueltos + academico_resueltos
-
-        cursor.execute("SELECT COUNT(*) FROM registro_infraestructura WHERE estado = 'En Proceso'")
-        infra_en_proceso = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM registro_academico WHERE estado = 'En Proceso'")
-        academico_en_proceso = cursor.fetchone()[0]
-        en_proceso = infra_en_proceso + academico_en_proceso
-
-        cursor.execute("""
-            SELECT COUNT(DISTINCT u.institucion)
-            FROM usuarios u
-            JOIN registro_infraestructura ri ON u.id = ri.usuario_id
-            UNION
-            SELECT COUNT(DISTINCT u.institucion)
-            FROM usuarios u
-            JOIN registro_academico ra ON u.id = ra.usuario_id
-        """)
-        instituciones = sum(row[0] for row in cursor.fetchall())
-
-        return jsonify({
-            "total_incidentes": total_incidentes,
-            "resueltos": resueltos,
-            "en_proceso": en_proceso,
-            "instituciones": instituciones
-        })
+        metricas = calcular_metricas(cursor)
+        datos = {
+            "total_incidentes": metricas['total_incidentes'],
+            "resueltos": metricas['resueltos'],
+            "en_proceso": metricas['en_proceso'],
+            "instituciones": metricas['instituciones']
+        }
+        cache.guardar('metricas:global', datos, marca=marca)
+        return jsonify(datos)
     except Error as err:
         return jsonify({"error": str(err)}), 500
     finally:
@@ -213,15 +265,66 @@ def api_metricas_usuario():
     if 'usuario' not in session:
         return jsonify({"error": "No autenticado"}), 401
     usuario_id = session['usuario']['id']
+    encontrado, metricas = cache.obtener(f'metricas:usuario:{usuario_id}')
+    if encontrado:
+        return jsonify(metricas)
+    marca = cache.marca(f'metricas:usuario:{usuario_id}')
     try:
         conn = get_db_connection()
         metricas = obtener_metricas_usuario(usuario_id, conn)
+        cache.guardar(f'metricas:usuario:{usuario_id}', metricas, marca=marca)
         return jsonify(metricas)
     except Error as err:
         return jsonify({"error": str(err)}), 500
     finally:
         conn.close()
 
+@app.route('/api/pool')
+def api_pool():
+    """Devuelve las estadísticas del pool de conexiones en formato JSON (solo administrador)."""
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(estadisticas_pool())
+
+@app.route('/api/cache')
+def api_cache():
+    """Devuelve los contadores de aciertos y fallos de la caché en formato JSON (solo administrador)."""
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(cache.estadisticas())
+
+@app.route('/api/limitador')
+def api_limitador():
+    """Devuelve los contadores del limitador de intentos de login en formato JSON (solo administrador)."""
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(limitador_login.estadisticas())
+
+@app.route('/api/replicas')
+def api_replicas():
+    """Devuelve el estado de las réplicas de lectura en formato JSON (solo administrador)."""
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(estadisticas_replicas())
+
+@app.route('/api/cola-escrituras')
+def api_cola_escrituras():
+    """Devuelve las entradas pendientes y muertas de la cola de escrituras diferidas en formato JSON
+    (solo administrador)."""
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(obtener_cola().estadisticas())
+
+@app.route('/metrics')
+def metrics():
+    """
+    Devuelve las métricas de consultas SQL, conexiones y peticiones en formato Prometheus. Protegida
+    con `METRICAS_TOKEN` si está configurado; si no, debe restringirse a nivel de red.
+    """
+    if not metricas_autorizadas(request.headers.get('Authorization')):
+        return jsonify({'error': 'No autorizado'}), 403
+    return Response(exportar_prometheus(), content_type=CONTENT_TYPE_PROMETHEUS)
+
 @app.route('/registro_login_usuarios', methods=['GET', 'POST'])
 def registro_login_usuarios():
     """Registra un nuevo usuario o muestra el formulario de registro."""
@@ -240,6 +343,31 @@ def registro_login_usuarios():
         return redirect(url_for('registro_login_usuarios'))
     return render_template('registro_login_usuarios.html')
 
+@app.route('/api/importar/<tipo>', methods=['POST'])
+def importar(tipo):
+    """
+    Importa un CSV (campo `archivo`) de usuarios o incidentes históricos en lotes y devuelve el
+    informe con las filas insertadas, las rechazadas con su motivo y el rendimiento (filas/s).
+    """
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    if tipo not in TIPOS_IMPORTACION:
+        return jsonify({'error': f'Tipo de importación inválido: {tipo}'}), 404
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        return jsonify({'error': 'No se envió ningún archivo'}), 400
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'No se pudo conectar a la base de datos'}), 500
+    try:
+        texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+        return jsonify(importar_csv(conn, texto, tipo))
+    except (Error, UnicodeDecodeError) as e:
+        print(f"Error en /api/importar/{tipo}: {e}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
 @app.route('/estudiantes')
 def estudiante():
     """Muestra la página de gestión de estudiantes."""
@@ -253,19 +381,12 @@ def guardar_incidente():
     fecha = request.form.get('fecha')
     hora = request.form.get('hora')
     estado = request.form.get('estado')
-    evidencia_file = request.files.get('evidencia')
-    evidencia_url = None
-
-    if evidencia_file and allowed_file(evidencia_file.filename):
-        filename = secure_filename(evidencia_file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        evidencia_file.save(filepath)
-        evidencia_url = '/' + filepath.replace('\\', '/')
+    evidencia_url = guardar_evidencia(request.files.get('evidencia'))
 
     exito = guardar_registro_academico(nombre, motivo, fecha, hora, estado, evidencia_url)
     flash("Registro académico guardado exitosamente." if exito else "Error al guardar el registro académico.", "success" if exito else "danger")
 
-    if 'usuario' in session and session['usuario'].get('correo') != 'admin@gmail.com':
+    if 'usuario' in session and not es_admin(session['usuario']):
         return redirect(url_for('incidente_colegios'))
     return redirect(url_for('estudiante'))
 
@@ -296,14 +417,7 @@ def guardar_infraestructura():
         descripcion = request.form.get('descripcion_problema')
         estado = request.form.get('estado')
         alerta = request.form.get('alerta') == "on"
-        imagen_file = request.files.get('imagen_problema')
-        imagen_url = None
-
-        if imagen_file and allowed_file(imagen_file.filename):
-            filename = secure_filename(imagen_file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            imagen_file.save(filepath)
-            imagen_url = '/' + filepath.replace('\\', '/')
+        imagen_url = guardar_evidencia(request.files.get('imagen_problema'))
 
         exito = guardar_registro_infraestructura(problema, descripcion, imagen_url, estado, alerta)
         flash("Incidente de infraestructura registrado correctamente." if exito else "Error al registrar el incidente.", "success" if exito else "danger")
@@ -328,33 +442,86 @@ def contar_incidencias_nuevas():
         conn.close()
 
 @app.route("/api/incidentes")
+@respuesta_condicional('incidentes')
 def api_incidentes():
-    """Devuelve todos los incidentes de infraestructura en formato JSON."""
-    conn = None
-    cursor = None
+    """
+    Devuelve una página de incidentes de infraestructura en formato JSON.
+    Acepta `limit` y `after` (cursor devuelto en `siguiente` por la página anterior).
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, fecha_registro AS fecha, descripcion_problema AS descripcion, seguimiento AS institucion, estado FROM registro_infraestructura ORDER BY fecha_registro DESC")
-        incidentes = cursor.fetchall()
-        return jsonify(incidentes)
+        limite = normalizar_limite(request.args.get('limit'))
+        decodificar_cursor(request.args.get('after'))
+    except ValueError:
+        return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
+    try:
+        conn = get_db_connection(lectura=True)
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+    try:
+        consulta = consulta_pagina_infraestructura(limite, request.args.get('after'))
+        return transmitir_json(conn, [consulta], clave='incidentes', limite=limite,
+                               columnas_cursor=('fecha', 'id'))
+    except mysql.connector.Error as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/api/incidentes/buscar")
+def api_buscar_incidentes():
+    """
+    Busca incidentes de ambos tipos por texto (`q`) y devuelve una página ordenada por relevancia.
+    Acepta `limit`, `pagina` y los filtros `estado`, `institucion` y `tipo`.
+    """
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    texto = request.args.get('q', '').strip()
+    if not texto:
+        return jsonify({'error': 'Falta el texto a buscar'}), 400
+    try:
+        limite = normalizar_limite(request.args.get('limit'))
+        pagina = int(request.args.get('pagina') or 1)
+        if pagina < 1:
+            raise ValueError(pagina)
+    except ValueError:
+        return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
+    tipo = request.args.get('tipo')
+    if tipo and tipo.lower() not in TIPOS_POR_NOMBRE:
+        return jsonify({'error': f'Tipo inválido: {tipo}'}), 400
+
+    resultado = buscar_incidentes(
+        texto, pagina, limite,
+        estado=request.args.get('estado') or None,
+        institucion=request.args.get('institucion') or None,
+        tipos=(TIPOS_POR_NOMBRE[tipo.lower()],) if tipo else None,
+    )
+    if resultado is None:
+        return jsonify({'error': 'No se pudo realizar la búsqueda'}), 500
+    filas, hay_mas = resultado
+    return jsonify({'incidentes': filas, 'pagina': pagina, 'siguiente': pagina + 1 if hay_mas else None})
 
 @app.route("/api/incidentes/<int:id>/estado", methods=["POST"])
 def actualizar_estado(id):
     """Actualiza el estado de un incidente de infraestructura."""
-    nuevo_estado = request.json.get("estado")
+    nuevo_estado = normalizar_estado((request.get_json(silent=True) or {}).get("estado"))
+    if nuevo_estado not in ESTADOS:
+        return jsonify({'error': f'Estado inválido: {nuevo_estado}'}), 400
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        cursor.execute("SELECT usuario_id, estado, institucion_id FROM registro_infraestructura WHERE id = %s FOR UPDATE", (id,))
+        incidente = cursor.fetchone()
+        if not incidente:
+            return jsonify({"error": "Incidente no encontrado"}), 404
+        usuario_id, estado_anterior, institucion_id = incidente
         cursor.execute("UPDATE registro_infraestructura SET estado = %s WHERE id = %s", (nuevo_estado, id))
+        mover_contador(cursor, TIPO_INFRAESTRUCTURA, usuario_id, estado_anterior, usuario_id, nuevo_estado)
         conn.commit()
+        # Escritura fuera de una función `@escritura`: la sesión debe leer su cambio de la primaria
+        forzar_primaria()
+        invalidar_incidentes()
+        emitir_incidente('actualizado', {
+            'tipo': TIPO_INFRAESTRUCTURA, 'id': id, 'usuario_id': usuario_id, 'institucion_id': institucion_id,
+            'estado': nuevo_estado, 'estado_anterior': estado_anterior
+        }, [institucion_id])
         return jsonify({"success": True})
     except mysql.connector.Error as e:
         return jsonify({'error': str(e)}), 500
@@ -362,6 +529,25 @@ def actualizar_estado(id):
         cursor.close()
         conn.close()
 
+@app.route("/api/incidentes/estado", methods=["POST"])
+def actualizar_estados_lote():
+    """
+    Cambia el estado (y opcionalmente los comentarios) de varios incidentes en una transacción.
+    Recibe {"cambios": [{"id", "tipo", "estado", "comentarios"}, ...]} y devuelve un resultado por cambio.
+    """
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    data = request.get_json(silent=True) or {}
+    cambios = data.get('cambios')
+    if not isinstance(cambios, list) or not cambios:
+        return jsonify({'error': 'Se requiere una lista de cambios'}), 400
+    if len(cambios) > MAX_CAMBIOS_LOTE:
+        return jsonify({'error': f'Se admiten como máximo {MAX_CAMBIOS_LOTE} cambios por lote'}), 400
+    resultados = actualizar_estados_en_lote(cambios)
+    if resultados is None:
+        return jsonify({'error': 'No se pudo actualizar los incidentes'}), 500
+    return jsonify({'resultados': resultados, 'actualizados': sum(1 for r in resultados if r['ok'])})
+
 @app.route('/api/ultima_incidencia')
 def api_ultima_incidencia():
     """Devuelve la última incidencia y verifica si es nueva para el usuario."""
@@ -382,7 +568,7 @@ def filtrar_estado():
         if not data or 'estado' not in data:
             return jsonify({"error": "El campo 'estado' es obligatorio."}), 400
         estado = data['estado']
-        estados_validos = ["Pendiente", "En proceso", "Resuelto"]
+        estados_validos = list(ESTADOS)
         if estado not in estados_validos:
             return jsonify({"error": f"Estado inválido: '{estado}'. Los válidos son: {', '.join(estados_validos)}"}), 400
         datos = obtener_incidencias_por_estado(estado)
@@ -399,14 +585,7 @@ def guardar_incidencia_colegios():
     descripcion = request.form.get('descripcion_problema')
     estado = request.form.get('estado')
     alerta = request.form.get('alerta')
-    imagen_file = request.files.get('imagen_problema')
-    imagen_url = None
-
-    if imagen_file and allowed_file(imagen_file.filename):
-        filename = secure_filename(imagen_file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        imagen_file.save(filepath)
-        imagen_url = '/' + filepath.replace('\\', '/')
+    imagen_url = guardar_evidencia(request.files.get('imagen_problema'))
 
     exito = guardar_registro_infraestructura(problema, descripcion, imagen_url, estado, alerta)
     flash("Incidente registrado correctamente." if exito else "Error al registrar incidente.", "success" if exito else "danger")
@@ -418,12 +597,18 @@ def instituciones_principal():
     return render_template('instituciones_principal.html')
 
 @app.route("/api/usuarios")
+@respuesta_condicional('usuarios')
 def api_usuarios():
     """Devuelve la lista de todos los usuarios en formato JSON."""
     try:
-        usuarios = obtener_todos_los_usuarios()
-        return jsonify(usuarios)
+        conn = get_db_connection(lectura=True)
+    except Exception as e:
+        print("Error en /api/usuarios:", e)
+        return jsonify({"error": str(e)}), 500
+    try:
+        return transmitir_json(conn, [("SELECT * FROM usuarios", ())])
     except Exception as e:
+        conn.close()
         print("Error en /api/usuarios:", e)
         return jsonify({"error": str(e)}), 500
 
@@ -444,25 +629,73 @@ def modal_editar_usuario(id):
 @app.route('/evidencias')
 def evidencias():
     """Muestra la página de evidencias con las instituciones disponibles."""
-    instituciones = obtener_instituciones()
+    instituciones = cache.obtener_o_calcular('usuarios:instituciones', obtener_instituciones)
     return render_template('evidencias.html', instituciones=instituciones)
 
-@app.route('/api/evidencias', methods=['POST'])
+@app.route('/api/evidencias', methods=['GET', 'POST'])
+@respuesta_condicional('incidentes')
 def api_evidencias():
-    """Devuelve evidencias filtradas por institución en formato JSON."""
+    """
+    Devuelve evidencias filtradas por institución en formato JSON. Con GET la institución va en
+    `?institucion=` y admite peticiones condicionales; POST con JSON se mantiene por compatibilidad.
+    """
     try:
-        data = request.get_json()
-        institucion = data.get("institucion")
-        registros = obtener_todas_las_evidencias_por_institucion(institucion)
-        for r in registros:
-            for key, value in r.items():
-                if isinstance(value, timedelta):
-                    r[key] = str(value)
-        return jsonify(registros)
+        if request.method == 'GET':
+            institucion = request.args.get("institucion")
+        else:
+            data = request.get_json()
+            institucion = data.get("institucion")
+        conn = get_db_connection(lectura=True)
     except Exception as e:
         print("Error en /api/evidencias:")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
+    try:
+        return transmitir_json(conn, consultas_evidencias_por_institucion(institucion),
+                               transformar=agregar_variantes)
+    except Exception as e:
+        conn.close()
+        print("Error en /api/evidencias:")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/evidencias/exportar')
+def exportar_evidencias():
+    """
+    Descarga las evidencias e incidentes en CSV o XLSX (`?formato=`), filtrados por `institucion` y
+    por el rango de fechas de registro `desde`/`hasta` (AAAA-MM-DD, ambos inclusive). El archivo se
+    escribe mientras se leen las filas, sin cargar el resultado completo en memoria.
+    """
+    if not es_admin(session.get('usuario')):
+        return jsonify({'error': 'No autorizado'}), 403
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS_EXPORTACION:
+        return jsonify({'error': f'Formato inválido: {formato}'}), 400
+    try:
+        desde = request.args.get('desde') or None
+        hasta = request.args.get('hasta') or None
+        desde = datetime.date.fromisoformat(desde) if desde else None
+        hasta = datetime.date.fromisoformat(hasta) if hasta else None
+    except ValueError:
+        return jsonify({'error': 'Las fechas deben tener el formato AAAA-MM-DD'}), 400
+    if desde and hasta and desde > hasta:
+        return jsonify({'error': 'La fecha inicial es posterior a la final'}), 400
+
+    escribir, mimetype, extension = FORMATOS_EXPORTACION[formato]
+    institucion = request.args.get('institucion') or None
+    consultas = consultas_evidencias_por_institucion(
+        institucion, desde=desde, hasta=hasta + datetime.timedelta(days=1) if hasta else None
+    )
+    nombre = f"evidencias_{desde or 'inicio'}_{hasta or datetime.date.today()}.{extension}"
+    conn = get_db_connection(lectura=True)
+    if not conn:
+        return jsonify({'error': 'No se pudo conectar a la base de datos'}), 500
+    try:
+        return transmitir_archivo(conn, consultas, escribir, mimetype, nombre)
+    except Exception as e:
+        conn.close()
+        print(f"Error en /api/evidencias/exportar: {e}")
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/actualizar_usuario', methods=['POST'])
 def actualizar_usuario():
@@ -507,7 +740,7 @@ def actualizar_incidente_por_nombre_api(institucion):
         comentarios = datos.get("comentarios")
         if not all([tipo, estado, descripcion, correo, telefono]):
             return jsonify({"error": "Faltan datos para actualizar"}), 400
-        resultado = actualizar_incidencia_por_nombre(institucion, tipo, estado, descripcion, correo, telefono, comentarios)
+        resultado = actualizar_incidencia_por_nombre(institucion, tipo, estado, descripcion, correo, comentarios)
         if resultado:
             return jsonify({"mensaje": "Incidente actualizado correctamente"}), 200
         return jsonify({"error": "No se pudo actualizar el incidente"}), 400
@@ -620,6 +853,177 @@ def obtener_incidente_por_id(id, tipo):
         cursor.close()
         conn.close()
 
+@app.cli.command('reconciliar-contadores')
+@click.option('--solo-verificar', is_flag=True, help='Informa las diferencias sin corregirlas.')
+def reconciliar_contadores_cmd(solo_verificar):
+    """Recalcula contadores_incidentes desde las tablas de registro e informa las diferencias."""
+    conn = get_db_connection()
+    try:
+        diferencias = reconciliar_contadores(conn, corregir=not solo_verificar)
+    finally:
+        conn.close()
+    for d in diferencias:
+        click.echo(f"usuario {d['usuario_id']} / {d['tipo']} / {d['estado']}: "
+                   f"esperado {d['esperado']}, actual {d['actual']}")
+    if not diferencias:
+        click.echo("Contadores consistentes.")
+    elif solo_verificar:
+        raise SystemExit(1)
+    else:
+        click.echo(f"{len(diferencias)} contadores corregidos.")
+
+@app.cli.command('migrar')
+@click.option('--verificar', is_flag=True, help='Comprueba con EXPLAIN que las consultas usan los índices.')
+def migrar_cmd(verificar):
+    """Aplica las migraciones pendientes de la carpeta migraciones/."""
+    conn = get_db_connection()
+    try:
+        aplicadas = aplicar_pendientes(conn)
+        for version, nombre in aplicadas:
+            click.echo(f"Aplicada {version:04d}_{nombre}")
+        if not aplicadas:
+            click.echo("No hay migraciones pendientes.")
+        if verificar:
+            fallidas = 0
+            for r in verificar_migraciones(conn):
+                estado = "OK" if r['ok'] else "FALLA"
+                fallidas += not r['ok']
+                click.echo(f"[{estado}] {r['version']:04d} espera {r['indice']}, usa {r['usados'] or '-'}: {r['consulta']}")
+            if fallidas:
+                raise SystemExit(1)
+    finally:
+        conn.close()
+
+@app.cli.command('generar-variantes')
+@click.option('--forzar', is_flag=True, help='Regenera también las variantes existentes.')
+def generar_variantes_cmd(forzar):
+    """Genera miniaturas y versiones medias de las imágenes ya subidas."""
+    imagenes, generadas, errores = procesar_carpeta(app.config['UPLOAD_FOLDER'], forzar=forzar)
+    for ruta, mensaje in errores:
+        click.echo(f"Error en {ruta}: {mensaje}")
+    click.echo(f"{imagenes} imágenes revisadas, {generadas} variantes generadas, {len(errores)} errores.")
+    if errores:
+        raise SystemExit(1)
+
+@app.cli.command('importar')
+@click.argument('tipo', type=click.Choice(TIPOS_IMPORTACION))
+@click.argument('archivo', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--lote', default=None, type=int, help='Filas por INSERT y por commit.')
+@click.option('--rechazados', type=click.File('w', encoding='utf-8'), help='CSV donde escribir las filas rechazadas.')
+def importar_cmd(tipo, archivo, lote, rechazados):
+    """Importa un CSV de usuarios o de incidentes históricos en lotes."""
+    conn = get_db_connection()
+    try:
+        informe = importar_csv(conn, archivo, tipo, **({'tamano_lote': lote} if lote else {}))
+    finally:
+        conn.close()
+    for rechazo in informe['rechazadas'][:20]:
+        click.echo(f"Fila {rechazo['fila']}: {rechazo['motivo']}")
+    if len(informe['rechazadas']) > 20:
+        click.echo(f"... y {len(informe['rechazadas']) - 20} filas rechazadas más.")
+    if rechazados:
+        escribir_rechazados(informe['rechazadas'], rechazados)
+    click.echo(f"{informe['filas']} filas, {informe['insertadas']} insertadas, {len(informe['rechazadas'])} rechazadas "
+               f"en {informe['lotes']} lotes, {informe['segundos']} s ({informe['filas_por_segundo']} filas/s).")
+    if informe['rechazadas']:
+        raise SystemExit(1)
+
+@app.cli.command('medir-importacion')
+@click.option('--filas', default=5000, help='Usuarios (y otros tantos incidentes) a importar.')
+@click.option('--lote', default=1000, help='Filas por INSERT y por commit.')
+@click.option('--conservar', is_flag=True, help='No borra los datos de prueba al terminar.')
+def medir_importacion_cmd(filas, lote, conservar):
+    """Mide filas/s importando usuarios e incidentes generados en una base de datos local."""
+    etiqueta = f"imp{uuid.uuid4().hex[:8]}"
+    usuarios, incidentes = generar_csv_prueba(filas, etiqueta)
+    conn = get_db_connection()
+    try:
+        for informe in (importar_csv(conn, usuarios, 'usuarios', lote), importar_csv(conn, incidentes, 'incidentes', lote)):
+            click.echo(f"{informe['tipo']}: {informe['insertadas']}/{informe['filas']} filas en {informe['segundos']} s "
+                       f"({informe['filas_por_segundo']} filas/s, lotes de {lote}).")
+        if not conservar:
+            # ON DELETE CASCADE borra también sus incidentes y contadores
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM usuarios WHERE apellido = %s", (etiqueta,))
+            cursor.execute("DELETE FROM instituciones WHERE nombre LIKE %s", (f"Institución {etiqueta} %",))
+            conn.commit()
+            cursor.close()
+            invalidar_incidentes()
+            invalidar_usuarios()
+    finally:
+        conn.close()
+
+@app.cli.command('medir-actualizacion')
+@click.option('--repeticiones', default=200, help='Actualizaciones por variante.')
+def medir_actualizacion_cmd(repeticiones):
+    """Compara la latencia de la actualización de incidentes anterior y la actual (sentencias y ms)."""
+    etiqueta = f"act{uuid.uuid4().hex[:8]}"
+    conn = get_db_connection()
+    try:
+        incidente_id, correo = preparar_incidente_prueba(conn, etiqueta)
+        try:
+            resultados = medir_actualizacion(conn, incidente_id, correo, repeticiones)
+        finally:
+            borrar_datos_prueba(conn, etiqueta)
+            invalidar_incidentes()
+            invalidar_usuarios()
+        for variante, datos in resultados.items():
+            click.echo(f"{variante}: {datos['sentencias']} sentencias + commit, media {datos['media_ms']} ms, "
+                       f"p50 {datos['p50_ms']} ms, p95 {datos['p95_ms']} ms ({repeticiones} repeticiones).")
+    finally:
+        conn.close()
+
+@app.cli.command('cola-escrituras')
+@click.option('--vaciar', is_flag=True, help='Escribe ahora las entradas disponibles.')
+@click.option('--reintentar-muertas', is_flag=True, help='Devuelve las entradas muertas a la cola.')
+def cola_escrituras_cmd(vaciar, reintentar_muertas):
+    """Muestra el estado de la cola de escrituras diferidas y opcionalmente la vacía."""
+    cola = obtener_cola()
+    if reintentar_muertas:
+        click.echo(f"{cola.reintentar_muertas()} entradas devueltas a la cola.")
+    if vaciar:
+        click.echo(f"{cola.vaciar()} entradas procesadas.")
+    datos = cola.estadisticas()
+    click.echo(f"{datos['pendientes']} pendientes ({datos['reservadas']} reservadas), {datos['muertas']} muertas, "
+               f"la más antigua de hace {datos['antiguedad_s']} s.")
+    if datos['muertas']:
+        raise SystemExit(1)
+
+@app.cli.command('replicas')
+def replicas_cmd():
+    """Comprueba cada réplica de DB_REPLICAS: conexión, servidor, solo lectura y retraso."""
+    replicas = obtener_replicas()
+    if not replicas.pools:
+        click.echo("No hay réplicas configuradas (DB_REPLICAS); todas las lecturas van a la primaria.")
+        return
+    caidas = 0
+    for indice, pool in enumerate(replicas.pools):
+        try:
+            with pool.obtener_conexion() as conexion:
+                cursor = conexion.cursor(dictionary=True, buffered=True)
+                cursor.execute("SELECT @@server_id AS servidor, @@read_only AS solo_lectura")
+                datos = cursor.fetchone()
+                cursor.execute("SHOW REPLICA STATUS")
+                estado = cursor.fetchone()
+                cursor.close()
+        except Exception as e:
+            caidas += 1
+            click.echo(f"{replicas.nombre(indice)}: no disponible ({e})")
+            continue
+        retraso = estado.get('Seconds_Behind_Source') if estado else 'sin replicación'
+        click.echo(f"{replicas.nombre(indice)}: server_id {datos['servidor']}, read_only {datos['solo_lectura']}, "
+                   f"retraso {retraso}")
+    if caidas:
+        raise SystemExit(1)
+
+@app.cli.command('construir-activos')
+def construir_activos_cmd():
+    """Genera en static/dist los JS/CSS versionados por hash con sus versiones .gz y .br."""
+    generados = construir_activos(app.static_folder)
+    for original, versionado in sorted(generados.items()):
+        click.echo(f"{original} -> {versionado}")
+    click.echo(f"{len(generados)} activos en el manifiesto.")
+
 if __name__ == '__main__':
     # Solo para desarrollo
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    socketio.run(app, debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_request_context
+
+from versiones import secuencia_escrituras
+
+# ---------------------- CACHÉ EN MEMORIA ----------------------
+
+class CacheTTL:
+    """
+    Caché en memoria del proceso con expiración por clave (TTL), desalojo LRU cuando se
+    alcanza `max_entradas` e invalidación explícita por clave o por prefijo.
+
+    Cada entrada guarda la marca vigente al empezar a calcularla:
+    - la generación local de los prefijos de su clave, que avanza con cada invalidación. Un
+      resultado calculado antes de una invalidación del mismo proceso no se guarda.
+    - con `recursos` ({prefijo: (recurso, ...)}), la versión de esos recursos en la `secuencia`
+      de escrituras compartida. Una entrada cuya versión ya no es la vigente (otro worker escribió)
+      cuenta como fallo.
+    """
+
+    def __init__(self, max_entradas=256, ttl=30.0, secuencia=None, recursos=None):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.secuencia = secuencia
+        self.recursos = recursos or {}
+        self._datos = OrderedDict()
+        self._generaciones = {}
+        self._lock = threading.Lock()
+        self._aciertos = 0
+        self._fallos = 0
+        self._desalojos = 0
+        self._expiraciones = 0
+        self._invalidaciones = 0
+        self._obsoletas = 0
+        self._descartadas = 0
+
+    def marca(self, clave):
+        """
+        Devuelve la marca vigente de la clave: (generación local, versión compartida). Se toma antes
+        de calcular un valor y se pasa a `guardar`.
+        """
+        with self._lock:
+            generacion = self._generacion(clave)
+        return generacion, self._version(clave)
+
+    def obtener(self, clave):
+        """
+        Devuelve la tupla (encontrado, valor) para la clave, descartando entradas expiradas o
+        cuya versión compartida ya no es la vigente.
+        """
+        version = self._version(clave)
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, expira_en, marca = entrada
+                if expira_en <= time.monotonic():
+                    del self._datos[clave]
+                    self._expiraciones += 1
+                elif version is None or marca[1] != version:
+                    del self._datos[clave]
+                    self._obsoletas += 1
+                else:
+                    self._datos.move_to_end(clave)
+                    self._aciertos += 1
+                    return True, valor
+            self._fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor, ttl=None, marca=None):
+        """
+        Guarda un valor con su TTL (o el TTL por defecto), desalojando la entrada menos usada si hace falta.
+        Con `marca` (tomada con `marca()` antes de calcular el valor) no se guarda si la clave se
+        invalidó mientras tanto; sin ella se usa la marca actual.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.max_entradas <= 0:
+            return
+        if marca is None:
+            marca = self.marca(clave)
+        if self.recursos and marca[1] is None:
+            # Sin la versión compartida no hay forma de saber cuándo deja de ser vigente
+            return
+        with self._lock:
+            if marca[0] != self._generacion(clave):
+                self._descartadas += 1
+                return
+            self._datos[clave] = (valor, time.monotonic() + ttl, marca)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self._desalojos += 1
+
+    def obtener_o_calcular(self, clave, funcion, ttl=None):
+        """
+        Devuelve el valor en caché o lo calcula con `funcion()` y lo guarda.
+        Los resultados vacíos (por ejemplo, los devueltos tras un error) no se guardan.
+        """
+        encontrado, valor = self.obtener(clave)
+        if encontrado:
+            return valor
+        marca = self.marca(clave)
+        valor = funcion()
+        if valor:
+            self.guardar(clave, valor, ttl, marca)
+        return valor
+
+    def invalidar(self, clave):
+        """
+        Elimina una clave de la caché.
+        """
+        with self._lock:
+            self._generaciones[clave] = self._generaciones.get(clave, 0) + 1
+            if self._datos.pop(clave, None) is not None:
+                self._invalidaciones += 1
+
+    def invalidar_prefijo(self, prefijo):
+        """
+        Elimina todas las claves que comienzan con `prefijo`.
+        """
+        with self._lock:
+            self._generaciones[prefijo] = self._generaciones.get(prefijo, 0) + 1
+            claves = [c for c in self._datos if c.startswith(prefijo)]
+            for clave in claves:
+                del self._datos[clave]
+            self._invalidaciones += len(claves)
+
+    def limpiar(self):
+        """
+        Vacía la caché sin reiniciar los contadores.
+        """
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        """
+        Devuelve los contadores de aciertos, fallos, desalojos e invalidaciones.
+        """
+        with self._lock:
+            consultas = self._aciertos + self._fallos
+            return {
+                'entradas': len(self._datos),
+                'max_entradas': self.max_entradas,
+                'ttl': self.ttl,
+                'aciertos': self._aciertos,
+                'fallos': self._fallos,
+                'tasa_aciertos': round(self._aciertos / consultas, 4) if consultas else 0.0,
+                'desalojos': self._desalojos,
+                'expiraciones': self._expiraciones,
+                'invalidaciones': self._invalidaciones,
+                'obsoletas': self._obsoletas,
+                'descartadas': self._descartadas,
+            }
+
+    def _generacion(self, clave):
+        # Generaciones de los prefijos (o claves) invalidados que cubren la clave
+        return tuple((clave[:i], self._generaciones[clave[:i]])
+                     for i in range(len(clave) + 1) if clave[:i] in self._generaciones)
+
+    def _version(self, clave):
+        recursos = next((r for prefijo, r in self.recursos.items() if clave.startswith(prefijo)), None)
+        if recursos is None:
+            return 0
+        return version_compartida(self.secuencia or secuencia_escrituras, recursos)
+
+def version_compartida(secuencia, recursos):
+    """
+    Devuelve la versión vigente de `recursos` en la secuencia de escrituras, o None si no se pudo
+    leer. Dentro de una petición se lee una sola vez por combinación de recursos.
+    """
+    if not has_request_context():
+        return secuencia.validador(*recursos)[0]
+    versiones = g.setdefault('versiones_cache', {})
+    clave = (secuencia.ruta, recursos)
+    if clave not in versiones:
+        versiones[clave] = secuencia.validador(*recursos)[0]
+    return versiones[clave]
+
+def _olvidar_versiones():
+    # Tras una escritura, las lecturas siguientes de la misma petición leen la versión nueva
+    if has_request_context():
+        g.pop('versiones_cache', None)
+
+# ---------------------- CACHÉ COMPARTIDA ----------------------
+
+# Recursos de la secuencia de escrituras de los que depende cada prefijo de clave
+RECURSOS_POR_PREFIJO = {
+    'metricas:': ('incidentes', 'usuarios'),
+    'incidentes:': ('incidentes',),
+    'usuarios:': ('usuarios',),
+}
+
+cache = CacheTTL(
+    max_entradas=int(os.getenv('CACHE_MAX_ENTRADAS', '256')),
+    ttl=float(os.getenv('CACHE_TTL', '30')),
+    recursos=RECURSOS_POR_PREFIJO,
+)
+
+def invalidar_incidentes():
+    """
+    Invalida las lecturas que dependen de las tablas de incidentes y avanza su secuencia de
+    escrituras (ETag de las APIs). La llaman las funciones de escritura.
+    """
+    cache.invalidar_prefijo('metricas:')
+    cache.invalidar_prefijo('incidentes:')
+    secuencia_escrituras.avanzar('incidentes')
+    _olvidar_versiones()
+
+def invalidar_usuarios():
+    """
+    Invalida las lecturas que dependen de la tabla de usuarios (incluido el total de instituciones)
+    y avanza su secuencia de escrituras.
+    """
+    cache.invalidar_prefijo('metricas:')
+    cache.invalidar_prefijo('usuarios:')
+    secuencia_escrituras.avanzar('usuarios')
+    _olvidar_versiones()
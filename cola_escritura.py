@@ -0,0 +1,475 @@
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from cache import invalidar_incidentes
+from contadores import sumar_contadores
+from db_pool import obtener_conexion
+from incidentes import TABLAS_INCIDENTE
+from instituciones import SQL_ID_DE_USUARIO
+from metricas import ESTADOS, TIPO_ACADEMICO, TIPO_INFRAESTRUCTURA, normalizar_estado
+from sqlite_local import conectar_sqlite
+from tiempo_real import emitir_incidente
+
+# ---------------------- COLA DE ESCRITURAS DIFERIDAS ----------------------
+#
+# Con `ESCRITURA_DIFERIDA=1` el registro de incidentes no escribe en MySQL durante la petición:
+# guarda el incidente ya validado en una cola local (archivo SQLite en modo WAL con
+# `synchronous=FULL`, compartido por los workers, en un disco persistente: ver `ruta_cola`) y
+# responde de inmediato. Un hilo de cada worker
+# toma lotes de la cola y los escribe en una transacción: un INSERT de varias filas por tabla y
+# otro para los contadores. Cada entrada lleva una clave única que se guarda en `clave_cola`
+# (migración 0007): si el proceso cae entre el commit en MySQL y el borrado de la cola, al
+# reintentar el lote las entradas ya escritas se reconocen y se omiten. Si un lote falla se
+# reintenta entrada por entrada; las que fallan esperan un tiempo creciente y tras `max_intentos`
+# intentos pasan a la tabla de entradas muertas (`flask cola-escrituras --reintentar-muertas` las
+# devuelve a la cola). Al terminar el proceso se vacía la cola antes de salir; lo que no se pudo
+# escribir sigue en el archivo y lo escribe el siguiente worker que arranque.
+
+ESCRITURA_DIFERIDA = os.getenv('ESCRITURA_DIFERIDA', '0') not in ('0', 'false', 'False')
+
+SQL_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS escrituras_pendientes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clave TEXT NOT NULL UNIQUE,
+        tipo TEXT NOT NULL,
+        datos TEXT NOT NULL,
+        autor TEXT NOT NULL,
+        intentos INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        creada_en REAL NOT NULL,
+        disponible_en REAL NOT NULL,
+        reservada_hasta REAL NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_pendientes_disponible ON escrituras_pendientes (disponible_en);
+    CREATE TABLE IF NOT EXISTS escrituras_muertas (
+        id INTEGER PRIMARY KEY,
+        clave TEXT NOT NULL UNIQUE,
+        tipo TEXT NOT NULL,
+        datos TEXT NOT NULL,
+        autor TEXT NOT NULL,
+        intentos INTEGER NOT NULL,
+        error TEXT,
+        creada_en REAL NOT NULL,
+        muerta_en REAL NOT NULL
+    );
+"""
+
+# Columnas que guarda la cola para cada tipo de incidente (la institución se resuelve al escribir)
+COLUMNAS_COLA = {
+    TIPO_ACADEMICO: ('nombre_estudiante', 'motivo', 'fecha', 'hora', 'estado', 'evidencia', 'fecha_registro',
+                     'usuario_id'),
+    TIPO_INFRAESTRUCTURA: ('problema', 'descripcion_problema', 'imagen_problema', 'estado', 'fecha_registro',
+                           'usuario_id', 'tipo'),
+}
+
+# Longitud máxima de las columnas de texto acotadas; las obligatorias no admiten valores vacíos
+LONGITUDES = {
+    'nombre_estudiante': 200, 'problema': 200, 'evidencia': 255, 'imagen_problema': 255, 'tipo': 100,
+}
+OBLIGATORIAS = {
+    TIPO_ACADEMICO: ('nombre_estudiante', 'motivo', 'fecha', 'hora', 'usuario_id'),
+    TIPO_INFRAESTRUCTURA: ('problema', 'descripcion_problema', 'usuario_id'),
+}
+
+FORMATOS_VALIDOS = {'fecha': ('%Y-%m-%d',), 'hora': ('%H:%M:%S', '%H:%M')}
+
+def validar_incidente(tipo, datos):
+    """
+    Valida antes de encolar lo que MySQL rechazaría al escribir (la petición ya no podrá informar
+    el error) y devuelve los valores con el estado normalizado. Lanza ValueError con el motivo.
+    """
+    valores = {columna: datos.get(columna) for columna in COLUMNAS_COLA[tipo]}
+    for columna in OBLIGATORIAS[tipo]:
+        if valores[columna] in (None, ''):
+            raise ValueError(f"Falta {columna}")
+    for columna, maximo in LONGITUDES.items():
+        if valores.get(columna) and len(str(valores[columna])) > maximo:
+            raise ValueError(f"{columna} supera {maximo} caracteres")
+    for columna, formatos in FORMATOS_VALIDOS.items():
+        if columna in valores and not any(_coincide(valores[columna], formato) for formato in formatos):
+            raise ValueError(f"{columna} inválida: {valores[columna]}")
+    valores['estado'] = normalizar_estado(valores['estado'])
+    if valores['estado'] not in ESTADOS:
+        raise ValueError(f"Estado inválido: {datos.get('estado')}")
+    return valores
+
+def _coincide(valor, formato):
+    try:
+        datetime.strptime(str(valor), formato)
+        return True
+    except ValueError:
+        return False
+
+def campos_evento(tipo, datos):
+    """
+    Devuelve los campos del evento `nuevo` de un incidente, los mismos que emite la escritura directa.
+    """
+    if tipo == TIPO_ACADEMICO:
+        return {'nombre_estudiante': datos['nombre_estudiante'], 'descripcion': datos['motivo'],
+                'estado': datos['estado'], 'fecha': datos['fecha'], 'hora': datos['hora']}
+    return {'problema': datos['problema'], 'descripcion': datos['descripcion_problema'],
+            'estado': datos['estado'], 'fecha': datos['fecha_registro']}
+
+# ---------------------- ESCRITURA EN MYSQL ----------------------
+
+def _ids_por_clave(cursor, tabla, claves):
+    cursor.execute(
+        f"SELECT id, clave_cola FROM {tabla} WHERE clave_cola IN ({', '.join(['%s'] * len(claves))})",
+        claves
+    )
+    return {clave: incidente_id for incidente_id, clave in cursor.fetchall()}
+
+def escribir_lote(conexion, entradas):
+    """
+    Escribe un lote de entradas de la cola en una transacción: un INSERT de varias filas por tabla
+    (`executemany` agrupa las filas) y uno para los contadores. Las entradas cuya clave ya está en
+    la tabla se omiten. Devuelve [(entrada, incidente_id)] de las entradas escritas; si falla,
+    deshace la transacción y propaga el error.
+    """
+    cursor = conexion.cursor()
+    try:
+        escritas = []
+        deltas = {}
+        for tipo, columnas in COLUMNAS_COLA.items():
+            del_tipo = [entrada for entrada in entradas if entrada['tipo'] == tipo]
+            if not del_tipo:
+                continue
+            tabla, _ = TABLAS_INCIDENTE[tipo]
+            existentes = _ids_por_clave(cursor, tabla, [entrada['clave'] for entrada in del_tipo])
+            nuevas = [entrada for entrada in del_tipo if entrada['clave'] not in existentes]
+            if not nuevas:
+                continue
+            cursor.executemany(f"""
+                INSERT INTO {tabla} ({', '.join(columnas)}, clave_cola, institucion_id)
+                VALUES ({', '.join(['%s'] * (len(columnas) + 1))}, {SQL_ID_DE_USUARIO})
+            """, [tuple(entrada['datos'][columna] for columna in columnas)
+                  + (entrada['clave'], entrada['datos']['usuario_id']) for entrada in nuevas])
+            ids = _ids_por_clave(cursor, tabla, [entrada['clave'] for entrada in nuevas])
+            for entrada in nuevas:
+                escritas.append((entrada, ids[entrada['clave']]))
+                contador = (entrada['datos']['usuario_id'], tipo, entrada['datos']['estado'])
+                deltas[contador] = deltas.get(contador, 0) + 1
+        sumar_contadores(cursor, deltas)
+        conexion.commit()
+        return escritas
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# ---------------------- COLA ----------------------
+
+class ColaEscrituras:
+    """
+    Cola durable de incidentes por escribir en el archivo SQLite `ruta`, con el hilo que la vacía
+    en lotes de hasta `tamano_lote` entradas.
+    """
+
+    def __init__(self, ruta, tamano_lote=200, max_intentos=5, espera_reintento=2.0, espera_maxima=300.0,
+                 reserva=120.0, intervalo=1.0):
+        self.ruta = ruta
+        self.tamano_lote = tamano_lote
+        self.max_intentos = max_intentos
+        self.espera_reintento = espera_reintento
+        self.espera_maxima = espera_maxima
+        # Tiempo que una entrada tomada por un worker queda fuera del alcance de los demás
+        self.reserva = reserva
+        self.intervalo = intervalo
+        self._hilo = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._aviso = threading.Event()
+        self._detener = threading.Event()
+        self._atexit = False
+        with self._conectar() as conexion:
+            conexion.executescript(SQL_ESQUEMA)
+
+    def encolar(self, tipo, datos, autor=None):
+        """
+        Guarda un incidente (valores de `COLUMNAS_COLA[tipo]`) y los datos de su autor para el
+        evento. Devuelve la clave de la entrada, o None si no se pudo guardar.
+        """
+        clave = uuid.uuid4().hex
+        ahora = time.time()
+        try:
+            with self._conectar() as conexion:
+                conexion.execute("""
+                    INSERT INTO escrituras_pendientes (clave, tipo, datos, autor, creada_en, disponible_en)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (clave, tipo, json.dumps(datos, default=str), json.dumps(autor or {}, default=str), ahora, ahora))
+        except sqlite3.Error as e:
+            print(f"Error al encolar el incidente: {e}")
+            return None
+        self.iniciar()
+        self._aviso.set()
+        return clave
+
+    def tomar(self, limite):
+        """
+        Reserva hasta `limite` entradas disponibles (las más antiguas primero) y las devuelve como
+        dicts {'id', 'clave', 'tipo', 'datos', 'autor', 'intentos'}.
+        """
+        ahora = time.time()
+        with self._conectar() as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            filas = conexion.execute("""
+                SELECT id, clave, tipo, datos, autor, intentos FROM escrituras_pendientes
+                WHERE disponible_en <= ? AND reservada_hasta <= ?
+                ORDER BY id LIMIT ?
+            """, (ahora, ahora, limite)).fetchall()
+            conexion.executemany(
+                "UPDATE escrituras_pendientes SET reservada_hasta = ? WHERE id = ?",
+                [(ahora + self.reserva, fila[0]) for fila in filas]
+            )
+            conexion.execute("COMMIT")
+        return [{'id': id_, 'clave': clave, 'tipo': tipo, 'datos': json.loads(datos), 'autor': json.loads(autor),
+                 'intentos': intentos} for id_, clave, tipo, datos, autor, intentos in filas]
+
+    def confirmar(self, ids):
+        """
+        Quita de la cola las entradas ya escritas.
+        """
+        with self._conectar() as conexion:
+            conexion.executemany("DELETE FROM escrituras_pendientes WHERE id = ?", [(id_,) for id_ in ids])
+
+    def liberar(self, ids):
+        """
+        Devuelve a la cola entradas reservadas sin contar un intento (p. ej. sin conexión a MySQL).
+        """
+        disponible_en = time.time() + self.espera_reintento
+        with self._conectar() as conexion:
+            conexion.executemany(
+                "UPDATE escrituras_pendientes SET reservada_hasta = 0, disponible_en = ? WHERE id = ?",
+                [(disponible_en, id_) for id_ in ids]
+            )
+
+    def fallar(self, entrada, error):
+        """
+        Registra un intento fallido: la entrada espera `espera_reintento * 2^(intentos - 1)` segundos
+        (hasta `espera_maxima`) o, si alcanzó `max_intentos`, pasa a las entradas muertas.
+        Devuelve True si la entrada pasó a las muertas.
+        """
+        intentos = entrada['intentos'] + 1
+        ahora = time.time()
+        with self._conectar() as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            if intentos >= self.max_intentos:
+                conexion.execute("""
+                    INSERT INTO escrituras_muertas (id, clave, tipo, datos, autor, intentos, error, creada_en, muerta_en)
+                    SELECT id, clave, tipo, datos, autor, ?, ?, creada_en, ? FROM escrituras_pendientes WHERE id = ?
+                """, (intentos, error, ahora, entrada['id']))
+                conexion.execute("DELETE FROM escrituras_pendientes WHERE id = ?", (entrada['id'],))
+            else:
+                espera = min(self.espera_reintento * 2 ** (intentos - 1), self.espera_maxima)
+                conexion.execute("""
+                    UPDATE escrituras_pendientes
+                    SET intentos = ?, error = ?, disponible_en = ?, reservada_hasta = 0
+                    WHERE id = ?
+                """, (intentos, error, ahora + espera, entrada['id']))
+            conexion.execute("COMMIT")
+        return intentos >= self.max_intentos
+
+    def reintentar_muertas(self):
+        """
+        Devuelve las entradas muertas a la cola con los intentos en cero. Devuelve cuántas se movieron.
+        """
+        ahora = time.time()
+        with self._conectar() as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            movidas = conexion.execute("""
+                INSERT INTO escrituras_pendientes (id, clave, tipo, datos, autor, intentos, error, creada_en, disponible_en)
+                SELECT id, clave, tipo, datos, autor, 0, error, creada_en, ? FROM escrituras_muertas
+            """, (ahora,)).rowcount
+            conexion.execute("DELETE FROM escrituras_muertas")
+            conexion.execute("COMMIT")
+        if movidas:
+            self._aviso.set()
+        return movidas
+
+    def estadisticas(self):
+        """
+        Devuelve las entradas pendientes, reservadas y muertas y la antigüedad en segundos de la
+        pendiente más antigua.
+        """
+        ahora = time.time()
+        with self._conectar() as conexion:
+            pendientes, reservadas, creada_en = conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(reservada_hasta > ?), 0), MIN(creada_en) FROM escrituras_pendientes",
+                (ahora,)
+            ).fetchone()
+            muertas, = conexion.execute("SELECT COUNT(*) FROM escrituras_muertas").fetchone()
+        return {
+            'activa': ESCRITURA_DIFERIDA,
+            'pendientes': pendientes,
+            'reservadas': reservadas,
+            'muertas': muertas,
+            'antiguedad_s': round(ahora - creada_en, 3) if creada_en else 0.0,
+        }
+
+    # ---------------------- PROCESAMIENTO ----------------------
+
+    def procesar_lote(self):
+        """
+        Toma un lote de la cola y lo escribe en MySQL. Si el lote falla se reintenta entrada por
+        entrada para que solo las culpables cuenten un intento. Devuelve las entradas procesadas.
+        """
+        entradas = self.tomar(self.tamano_lote)
+        if not entradas:
+            return 0
+        try:
+            conexion = obtener_conexion()
+        except Exception as e:
+            print(f"Cola de escrituras sin conexión a la base de datos: {e}")
+            self.liberar([entrada['id'] for entrada in entradas])
+            return 0
+        escritas, fallidas = [], []
+        try:
+            try:
+                escritas = escribir_lote(conexion, entradas)
+            except Exception as e:
+                if not conexion.is_connected():
+                    print(f"Cola de escrituras sin conexión a la base de datos: {e}")
+                    self.liberar([entrada['id'] for entrada in entradas])
+                    return 0
+                for entrada in entradas:
+                    try:
+                        escritas += escribir_lote(conexion, [entrada])
+                    except Exception as e:
+                        fallidas.append((entrada, str(e)))
+        finally:
+            conexion.close()
+
+        ids_fallidos = {entrada['id'] for entrada, _ in fallidas}
+        self.confirmar([entrada['id'] for entrada in entradas if entrada['id'] not in ids_fallidos])
+        for entrada, error in fallidas:
+            print(f"Error al escribir el incidente encolado {entrada['clave']}: {error}")
+            self.fallar(entrada, error)
+        if escritas:
+            invalidar_incidentes()
+            for entrada, incidente_id in escritas:
+                autor = entrada['autor']
+                emitir_incidente('nuevo', {
+                    'tipo': entrada['tipo'],
+                    'id': incidente_id,
+                    'usuario_id': entrada['datos']['usuario_id'],
+                    **autor,
+                    **campos_evento(entrada['tipo'], entrada['datos'])
+                }, [autor.get('institucion_id')])
+        return len(entradas)
+
+    def vaciar(self, limite_segundos=None):
+        """
+        Procesa lotes hasta que no queden entradas disponibles (las que esperan un reintento se
+        quedan en la cola) o pasen `limite_segundos`. Devuelve las entradas procesadas.
+        """
+        fin = None if limite_segundos is None else time.monotonic() + limite_segundos
+        total = 0
+        while fin is None or time.monotonic() < fin:
+            procesadas = self.procesar_lote()
+            if not procesadas:
+                break
+            total += procesadas
+        return total
+
+    # ---------------------- HILO DE FONDO ----------------------
+
+    def iniciar(self):
+        """
+        Arranca el hilo que vacía la cola en el proceso actual si todavía no corre. Tras un fork
+        (workers de gunicorn) cada proceso arranca el suyo. Al salir del proceso se vacía la cola.
+        """
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid():
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._trabajar, name='cola-escrituras', daemon=True)
+            self._hilo.start()
+            self._pid = os.getpid()
+            if not self._atexit:
+                atexit.register(self.detener)
+                self._atexit = True
+
+    def detener(self, limite_segundos=30.0):
+        """
+        Detiene el hilo de fondo y escribe lo que quede disponible en la cola.
+        """
+        self._detener.set()
+        self._aviso.set()
+        if self._hilo is not None and self._pid == os.getpid():
+            self._hilo.join(limite_segundos)
+        try:
+            self.vaciar(limite_segundos)
+        except Exception as e:
+            print(f"Error al vaciar la cola de escrituras: {e}")
+
+    def _trabajar(self):
+        while not self._detener.is_set():
+            try:
+                procesadas = self.procesar_lote()
+            except Exception as e:
+                print(f"Error en la cola de escrituras: {e}")
+                procesadas = 0
+            if not procesadas:
+                self._aviso.wait(self.intervalo)
+                self._aviso.clear()
+
+    def _conectar(self):
+        # Cada entrada confirmada sobrevive a un corte de energía, no solo a la caída del proceso
+        return conectar_sqlite(self.ruta, sincrono='FULL')
+
+# ---------------------- COLA COMPARTIDA ----------------------
+
+CARPETA_INSTANCIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+
+def ruta_cola():
+    """
+    Devuelve el archivo de la cola: `COLA_ESCRITURAS_DB` o, por defecto, `cola_escrituras.sqlite3`
+    en la carpeta `instance` de la aplicación (la misma que `app.instance_path`). A diferencia de los
+    otros archivos compartidos, la cola guarda incidentes ya confirmados al usuario y no puede vivir
+    en el directorio temporal (tmpfs, borrado al reiniciar, `PrivateTmp` de systemd).
+    """
+    ruta = os.getenv('COLA_ESCRITURAS_DB')
+    if ruta:
+        return ruta
+    os.makedirs(CARPETA_INSTANCIA, exist_ok=True)
+    return os.path.join(CARPETA_INSTANCIA, 'cola_escrituras.sqlite3')
+
+def comprobar_ruta_duradera(ruta):
+    """
+    Lanza RuntimeError si el archivo de la cola está en el directorio temporal o en memoria compartida.
+    """
+    ruta = os.path.realpath(ruta)
+    for carpeta in (tempfile.gettempdir(), '/dev/shm'):
+        carpeta = os.path.realpath(carpeta)
+        if os.path.commonpath([ruta, carpeta]) == carpeta:
+            raise RuntimeError(f"La cola de escrituras diferidas no puede estar en {carpeta} ({ruta}): "
+                               f"configure COLA_ESCRITURAS_DB en un disco persistente")
+
+_cola = None
+_cola_lock = threading.Lock()
+
+def obtener_cola():
+    """
+    Devuelve la cola del proceso, creándola la primera vez que se usa (al arrancar con
+    `ESCRITURA_DIFERIDA`, o desde la ruta y el comando de administración). Importar el módulo no
+    crea la carpeta `instance` ni el archivo. Lanza RuntimeError si la ruta no es duradera.
+    """
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            ruta = ruta_cola()
+            comprobar_ruta_duradera(ruta)
+            _cola = ColaEscrituras(
+                ruta=ruta,
+                tamano_lote=int(os.getenv('COLA_ESCRITURAS_LOTE', '200')),
+                max_intentos=int(os.getenv('COLA_ESCRITURAS_MAX_INTENTOS', '5')),
+            )
+        return _cola
@@ -0,0 +1,113 @@
+from metricas import TIPO_ACADEMICO, TIPO_INFRAESTRUCTURA, normalizar_estado
+
+# ---------------------- CONTADORES DE INCIDENTES ----------------------
+#
+# `contadores_incidentes` guarda cuántos incidentes hay por (usuario_id, tipo, estado).
+# Cada ruta de escritura lo actualiza en su misma transacción, de modo que las métricas
+# del dashboard se leen por clave primaria en lugar de recorrer las tablas de registro.
+# Al eliminar un usuario, la FK con ON DELETE CASCADE borra sus contadores junto con
+# sus incidentes.
+
+SQL_CREAR_TABLA = """
+    CREATE TABLE IF NOT EXISTS contadores_incidentes (
+        usuario_id INT NOT NULL,
+        tipo ENUM('Infraestructura', 'Académico') NOT NULL,
+        estado ENUM('Resuelto', 'En proceso', 'Pendiente') NOT NULL,
+        total INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (usuario_id, tipo, estado),
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+SQL_CONTEO_BASE = f"""
+    SELECT usuario_id, tipo, estado, COUNT(*) AS total
+    FROM (
+        SELECT usuario_id, '{TIPO_INFRAESTRUCTURA}' AS tipo, estado FROM registro_infraestructura
+        UNION ALL
+        SELECT usuario_id, '{TIPO_ACADEMICO}' AS tipo, estado FROM registro_academico
+    ) t
+    GROUP BY usuario_id, tipo, estado
+"""
+
+def tipo_contador(tipo):
+    """
+    Traduce el tipo de incidente usado por las rutas ('infraestructura', 'academico', ...)
+    al valor almacenado en `contadores_incidentes`.
+    """
+    return TIPO_INFRAESTRUCTURA if tipo.lower() == 'infraestructura' else TIPO_ACADEMICO
+
+def sumar_contador(cursor, usuario_id, tipo, estado, delta=1):
+    """
+    Suma `delta` al contador de (usuario_id, tipo, estado) usando el cursor de la transacción en curso.
+    """
+    cursor.execute("""
+        INSERT INTO contadores_incidentes (usuario_id, tipo, estado, total)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE total = total + %s
+    """, (usuario_id, tipo, normalizar_estado(estado), delta, delta))
+
+def sumar_contadores(cursor, deltas):
+    """
+    Aplica varios ajustes {(usuario_id, tipo, estado): delta} con un único INSERT de varias filas
+    (`executemany` agrupa las filas en una sentencia). Los deltas en cero se omiten.
+    """
+    filas = [(usuario_id, tipo, normalizar_estado(estado), delta)
+             for (usuario_id, tipo, estado), delta in deltas.items() if delta]
+    if not filas:
+        return
+    cursor.executemany("""
+        INSERT INTO contadores_incidentes (usuario_id, tipo, estado, total)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+    """, filas)
+
+def mover_contador(cursor, tipo, usuario_anterior, estado_anterior, usuario_nuevo, estado_nuevo):
+    """
+    Traslada un incidente de un contador a otro cuando cambia su estado o su usuario, con una
+    sola sentencia para ambos contadores. No ejecuta nada si ambos contadores coinciden.
+    """
+    estado_anterior = normalizar_estado(estado_anterior)
+    estado_nuevo = normalizar_estado(estado_nuevo)
+    if (usuario_anterior, estado_anterior) == (usuario_nuevo, estado_nuevo):
+        return
+    sumar_contadores(cursor, {
+        (usuario_anterior, tipo, estado_anterior): -1,
+        (usuario_nuevo, tipo, estado_nuevo): 1,
+    })
+
+def reconciliar_contadores(conexion, corregir=True):
+    """
+    Recalcula los contadores desde las tablas de registro y devuelve las diferencias encontradas
+    como una lista de diccionarios. Si `corregir` es True, reconstruye la tabla en una transacción.
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(SQL_CREAR_TABLA)
+        cursor.execute(SQL_CONTEO_BASE)
+        esperados = {(u, t, e): n for u, t, e, n in cursor.fetchall()}
+        cursor.execute("SELECT usuario_id, tipo, estado, total FROM contadores_incidentes")
+        actuales = {(u, t, e): n for u, t, e, n in cursor.fetchall()}
+
+        diferencias = []
+        for clave in sorted(set(esperados) | set(actuales)):
+            esperado = esperados.get(clave, 0)
+            actual = actuales.get(clave, 0)
+            if esperado != actual:
+                usuario_id, tipo, estado = clave
+                diferencias.append({
+                    'usuario_id': usuario_id,
+                    'tipo': tipo,
+                    'estado': estado,
+                    'esperado': esperado,
+                    'actual': actual,
+                })
+
+        if corregir and diferencias:
+            cursor.execute("DELETE FROM contadores_incidentes")
+            cursor.execute(
+                "INSERT INTO contadores_incidentes (usuario_id, tipo, estado, total) " + SQL_CONTEO_BASE
+            )
+            conexion.commit()
+        return diferencias
+    finally:
+        cursor.close()
@@ -0,0 +1,336 @@
+import os
+import threading
+import time
+
+import mysql.connector
+from flask import g, has_request_context, request
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from dotenv import load_dotenv
+
+from instrumentacion import CursorInstrumentado, observar_obtencion_conexion
+
+load_dotenv()
+
+# ---------------------- POOL DE CONEXIONES ----------------------
+
+class ConexionPool:
+    """
+    Envoltorio de una conexión prestada por el pool. Delega todo en la conexión real,
+    salvo `close()`, que la devuelve al pool en lugar de cerrar el socket, y `cursor()`,
+    que entrega cursores instrumentados.
+    """
+
+    def __init__(self, pool, conexion, creada_en):
+        self._pool = pool
+        self._conexion = conexion
+        self._creada_en = creada_en
+
+    def __getattr__(self, nombre):
+        if self._conexion is None:
+            raise PoolError("La conexión ya fue devuelta al pool")
+        return getattr(self._conexion, nombre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def cursor(self, *args, **kwargs):
+        """
+        Abre un cursor de la conexión real envuelto en `CursorInstrumentado`.
+        """
+        return CursorInstrumentado(self.__getattr__('cursor')(*args, **kwargs))
+
+    def close(self):
+        """
+        Devuelve la conexión al pool. Llamadas repetidas no tienen efecto.
+        """
+        if self._conexion is not None:
+            conexion, self._conexion = self._conexion, None
+            self._pool.devolver(conexion, self._creada_en)
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones MySQL con tamaño máximo, verificación al préstamo (pre-ping),
+    edad máxima por conexión y tiempo de espera cuando todas están ocupadas.
+    """
+
+    def __init__(self, tamano=5, timeout=10.0, max_edad=1800.0, pre_ping=True, **config):
+        self.tamano = tamano
+        self.timeout = timeout
+        self.max_edad = max_edad
+        self.pre_ping = pre_ping
+        self.config = config
+        self._cond = threading.Condition()
+        self._libres = []
+        self._abiertas = 0
+        self._en_uso = 0
+        self._esperas = 0
+        self._timeouts = 0
+        self._tiempo_espera_total = 0.0
+        self._tiempo_espera_max = 0.0
+        self._descartadas = 0
+
+    def obtener_conexion(self):
+        """
+        Presta una conexión del pool, creando una nueva si hay cupo. Si el pool está lleno,
+        espera hasta `timeout` segundos y lanza `PoolError` si no se libera ninguna.
+        """
+        inicio = time.monotonic()
+        espero = False
+        with self._cond:
+            while True:
+                if self._libres:
+                    conexion, creada_en = self._libres.pop()
+                    break
+                if self._abiertas < self.tamano:
+                    self._abiertas += 1
+                    conexion, creada_en = None, None
+                    break
+                restante = self.timeout - (time.monotonic() - inicio)
+                if restante <= 0:
+                    self._registrar_espera(time.monotonic() - inicio)
+                    self._timeouts += 1
+                    raise PoolError(f"No hay conexiones libres tras esperar {self.timeout} s")
+                espero = True
+                self._cond.wait(restante)
+            if espero:
+                self._registrar_espera(time.monotonic() - inicio)
+            self._en_uso += 1
+
+        try:
+            if conexion is not None and not self._es_valida(conexion, creada_en):
+                self._cerrar(conexion)
+                conexion = None
+            if conexion is None:
+                conexion = mysql.connector.connect(**self.config)
+                creada_en = time.monotonic()
+        except Exception:
+            with self._cond:
+                self._en_uso -= 1
+                self._abiertas -= 1
+                self._cond.notify()
+            raise
+        observar_obtencion_conexion(time.monotonic() - inicio, self.nombre())
+        return ConexionPool(self, conexion, creada_en)
+
+    def devolver(self, conexion, creada_en):
+        """
+        Recibe una conexión prestada. Deshace transacciones sin confirmar y descarta
+        la conexión si quedó en mal estado o con resultados sin leer.
+        """
+        reutilizable = True
+        try:
+            if conexion.unread_result:
+                # Un streaming interrumpido deja filas pendientes en el socket
+                reutilizable = False
+            elif conexion.in_transaction:
+                conexion.rollback()
+        except Exception:
+            reutilizable = False
+        with self._cond:
+            self._en_uso -= 1
+            if reutilizable:
+                self._libres.append((conexion, creada_en))
+            else:
+                self._abiertas -= 1
+            self._cond.notify()
+        if not reutilizable:
+            self._cerrar(conexion)
+
+    def cerrar(self):
+        """
+        Cierra todas las conexiones libres. Las prestadas se cierran al devolverse.
+        """
+        with self._cond:
+            libres, self._libres = self._libres, []
+            self._abiertas -= len(libres)
+        for conexion, _ in libres:
+            self._cerrar(conexion)
+
+    def nombre(self):
+        """
+        Devuelve 'host:puerto' del servidor del pool.
+        """
+        return f"{self.config.get('host')}:{self.config.get('port') or 3306}"
+
+    def estadisticas(self):
+        """
+        Devuelve el estado actual del pool y los acumulados de espera.
+        """
+        with self._cond:
+            return {
+                'tamano': self.tamano,
+                'abiertas': self._abiertas,
+                'en_uso': self._en_uso,
+                'libres': len(self._libres),
+                'esperas': self._esperas,
+                'timeouts': self._timeouts,
+                'tiempo_espera_total': round(self._tiempo_espera_total, 6),
+                'tiempo_espera_max': round(self._tiempo_espera_max, 6),
+                'descartadas': self._descartadas,
+            }
+
+    def _es_valida(self, conexion, creada_en):
+        if self.max_edad and time.monotonic() - creada_en > self.max_edad:
+            return False
+        if self.pre_ping:
+            try:
+                return conexion.is_connected()
+            except Error:
+                return False
+        return True
+
+    def _registrar_espera(self, segundos):
+        self._esperas += 1
+        self._tiempo_espera_total += segundos
+        self._tiempo_espera_max = max(self._tiempo_espera_max, segundos)
+
+    def _cerrar(self, conexion):
+        with self._cond:
+            self._descartadas += 1
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+# ---------------------- POOL COMPARTIDO ----------------------
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def configuracion_desde_entorno():
+    """
+    Lee las credenciales y los parámetros del pool desde las variables de entorno.
+    """
+    return {
+        'tamano': int(os.getenv('DB_POOL_SIZE', '5')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        'max_edad': float(os.getenv('DB_POOL_MAX_AGE', '1800')),
+        'pre_ping': os.getenv('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'False'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'host': os.getenv('DB_HOST'),
+        'database': os.getenv('DB_NAME'),
+        'port': os.getenv('DB_PORT'),
+    }
+
+def obtener_pool():
+    """
+    Devuelve el pool compartido del proceso, creándolo la primera vez. Tras un fork
+    (workers de gunicorn) se crea un pool nuevo para no compartir sockets entre procesos.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = PoolConexiones(**configuracion_desde_entorno())
+            _pool_pid = os.getpid()
+        return _pool
+
+def obtener_conexion():
+    """
+    Presta una conexión del pool compartido. `close()` la devuelve al pool.
+    Dentro de una petición se cuenta en `g.conexiones_bd`.
+    """
+    conexion = obtener_pool().obtener_conexion()
+    if has_request_context():
+        g.conexiones_bd = g.get('conexiones_bd', 0) + 1
+    return conexion
+
+def estadisticas_pool():
+    """
+    Devuelve las estadísticas del pool compartido.
+    """
+    return obtener_pool().estadisticas()
+
+def cerrar_pool():
+    """
+    Cierra las conexiones libres y descarta el pool compartido.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+        _pool = None
+
+# ---------------------- CONEXIÓN POR PETICIÓN ----------------------
+#
+# Durante una petición todas las funciones comparten una única conexión, prestada del pool
+# la primera vez que se pide y guardada en `flask.g`. Su `close()` no la devuelve: solo deshace
+# lo que haya quedado sin confirmar. El pool la recupera en el teardown de la petición.
+
+class ConexionPeticion:
+    """
+    Envoltorio de la conexión compartida por la petición en curso.
+    """
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Termina el uso actual sin soltar la conexión: deshace una transacción pendiente.
+        """
+        try:
+            if self._conexion.in_transaction:
+                self._conexion.rollback()
+        except Exception:
+            pass
+
+    def liberar(self):
+        """
+        Devuelve la conexión al pool.
+        """
+        self._conexion.close()
+
+def conexion_peticion():
+    """
+    Devuelve la conexión de la petición en curso, prestándola del pool en el primer uso.
+    Fuera de una petición (CLI, hilos) presta una conexión normal del pool.
+    """
+    if not has_request_context():
+        return obtener_conexion()
+    conexion = g.get('_conexion_bd')
+    if conexion is None:
+        conexion = ConexionPeticion(obtener_conexion())
+        g._conexion_bd = conexion
+    g.usos_bd = g.get('usos_bd', 0) + 1
+    return conexion
+
+def liberar_conexion_peticion(error=None):
+    """
+    Devuelve al pool la conexión de la petición, si se llegó a pedir.
+    """
+    conexion = g.pop('_conexion_bd', None)
+    if conexion is not None:
+        conexion.liberar()
+
+def registrar_conexion_peticion(app):
+    """
+    Registra la liberación de la conexión al terminar cada petición. Con `app.debug` o
+    `DEBUG_CONEXIONES_BD` añade la cabecera `X-Conexiones-BD` con las conexiones abiertas
+    y los usos de la petición.
+    """
+    app.teardown_appcontext(liberar_conexion_peticion)
+
+    @app.after_request
+    def informar_conexiones(respuesta):
+        if app.debug or app.config.get('DEBUG_CONEXIONES_BD'):
+            abiertas = g.get('conexiones_bd', 0)
+            usos = g.get('usos_bd', 0)
+            respuesta.headers['X-Conexiones-BD'] = f"abiertas={abiertas}; usos={usos}"
+            app.logger.debug("Conexiones BD en %s: abiertas=%s usos=%s", request.path, abiertas, usos)
+        return respuesta
@@ -1,3 +1,9 @@
+-- Creating the `instituciones` table
+CREATE TABLE instituciones (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL UNIQUE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- Creating the `usuarios` table
 CREATE TABLE usuarios (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -7,39 +13,75 @@ CREATE TABLE usuarios (
     telefono VARCHAR(20),
     correo_electronico VARCHAR(100) NOT NULL UNIQUE,
     institucion VARCHAR(100),
-    clave VARCHAR(255) NOT NULL
+    institucion_id INT NULL,
+    clave VARCHAR(255) NOT NULL,
+    version INT NOT NULL DEFAULT 1,
+    CONSTRAINT fk_usuarios_institucion FOREIGN KEY (institucion_id) REFERENCES instituciones(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- Creating the `registro_academico` table
 CREATE TABLE registro_academico (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    nombre_estudiante VARCHAR(200) NOT NULL,
-    motivo TEXT NOT NULL,
+    nombre_estudiante VARCHAR(200) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+    motivo TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
     fecha DATE NOT NULL,
     hora TIME NOT NULL,
     estado ENUM('Resuelto', 'En proceso', 'Pendiente') NOT NULL,
     evidencia VARCHAR(255),
     usuario_id INT NOT NULL,
-    fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
-    comentarios TEXT,
+    fecha_registro DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    comentarios TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
+    institucion_id INT NULL,
+    clave_cola CHAR(32) NULL,
+    CONSTRAINT fk_ra_institucion FOREIGN KEY (institucion_id) REFERENCES instituciones(id) ON DELETE SET NULL,
     FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- Creating the `registro_infraestructura` table
 CREATE TABLE registro_infraestructura (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    problema VARCHAR(200) NOT NULL,
-    descripcion_problema TEXT NOT NULL,
+    problema VARCHAR(200) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+    descripcion_problema TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
     imagen_problema VARCHAR(255),
     seguimiento TEXT,
     estado ENUM('Resuelto', 'En proceso', 'Pendiente') NOT NULL,
-    fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
+    fecha_registro DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     usuario_id INT NOT NULL,
     tipo VARCHAR(100),
-    comentarios TEXT,
+    comentarios TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci,
+    institucion_id INT NULL,
+    clave_cola CHAR(32) NULL,
+    CONSTRAINT fk_ri_institucion FOREIGN KEY (institucion_id) REFERENCES instituciones(id) ON DELETE SET NULL,
     FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Creating the `contadores_incidentes` table (kept in sync by the write paths)
+CREATE TABLE contadores_incidentes (
+    usuario_id INT NOT NULL,
+    tipo ENUM('Infraestructura', 'Académico') NOT NULL,
+    estado ENUM('Resuelto', 'En proceso', 'Pendiente') NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (usuario_id, tipo, estado),
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Indexes used by the hot queries (also applied to existing databases by `flask migrar`)
+CREATE INDEX idx_ri_usuario_estado ON registro_infraestructura (usuario_id, estado);
+CREATE INDEX idx_ri_estado_fecha ON registro_infraestructura (estado, fecha_registro);
+CREATE INDEX idx_ri_fecha ON registro_infraestructura (fecha_registro);
+CREATE INDEX idx_ra_usuario_estado ON registro_academico (usuario_id, estado);
+CREATE INDEX idx_ra_estado_fecha ON registro_academico (estado, fecha_registro);
+CREATE INDEX idx_ra_fecha ON registro_academico (fecha_registro);
+CREATE INDEX idx_usuarios_institucion ON usuarios (institucion);
+CREATE INDEX idx_usuarios_institucion_id ON usuarios (institucion_id);
+CREATE INDEX idx_ra_institucion_fecha ON registro_academico (institucion_id, fecha_registro);
+CREATE INDEX idx_ri_institucion_fecha ON registro_infraestructura (institucion_id, fecha_registro);
+CREATE FULLTEXT INDEX ft_ra_texto ON registro_academico (motivo, nombre_estudiante, comentarios);
+CREATE FULLTEXT INDEX ft_ri_texto ON registro_infraestructura (problema, descripcion_problema, comentarios);
+CREATE UNIQUE INDEX uq_ra_clave_cola ON registro_academico (clave_cola);
+CREATE UNIQUE INDEX uq_ri_clave_cola ON registro_infraestructura (clave_cola);
+
 -- Inserting a default user
-INSERT INTO usuarios (nombre, apellido, dni, telefono, correo_electronico, institucion, clave)
-VALUES ('Admin', 'Default', '12345678', '987654321', 'admin@gmail.com', 'UGEL Admin', 'priuge450');
\ No newline at end of file
+INSERT INTO instituciones (nombre) VALUES ('UGEL Admin');
+INSERT INTO usuarios (nombre, apellido, dni, telefono, correo_electronico, institucion, institucion_id, clave)
+VALUES ('Admin', 'Default', '12345678', '987654321', 'admin@gmail.com', 'UGEL Admin', LAST_INSERT_ID(), 'priuge450');
\ No newline at end of file
@@ -0,0 +1,176 @@
+import csv
+import datetime
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# ---------------------- EXPORTACIÓN DE INCIDENTES ----------------------
+#
+# Las evidencias e incidentes se exportan en CSV o XLSX escribiendo el archivo a medida que llegan
+# las filas del cursor sin buffer (ver `streaming.transmitir_archivo`). Cada formato es un
+# generador que recibe las filas y entrega bloques de bytes de unos `TAMANO_BLOQUE`: nunca se arma
+# el archivo completo en memoria. El XLSX se escribe a mano (un ZIP con la hoja en XML y celdas de
+# texto en línea) porque los escritores habituales arman el libro en un archivo temporal y solo lo
+# entregan al final.
+
+TAMANO_BLOQUE = 64 * 1024
+
+# Columnas exportadas (claves de la fila) y su encabezado
+COLUMNAS_EXPORTACION = (
+    ('tipo', 'Tipo'),
+    ('institucion', 'Institución'),
+    ('nombre_estudiante', 'Estudiante'),
+    ('motivo', 'Descripción'),
+    ('estado', 'Estado'),
+    ('fecha', 'Fecha'),
+    ('hora', 'Hora'),
+    ('evidencia', 'Evidencia'),
+)
+
+# Prefijos que Excel interpreta como fórmula al abrir un CSV
+PREFIJOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+# Caracteres de control que XML 1.0 no admite
+CARACTERES_INVALIDOS_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _texto(valor):
+    """
+    Convierte un valor de la fila a texto: None queda vacío y las fechas/horas en formato ISO.
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    return str(valor)
+
+def generar_csv(filas, columnas=COLUMNAS_EXPORTACION):
+    """
+    Escribe las filas como CSV UTF-8 con BOM (para que Excel respete los acentos). Los textos que
+    empiezan como una fórmula se anteponen con un apóstrofo para que no se ejecuten al abrirlos.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow([encabezado for _, encabezado in columnas])
+    for fila in filas:
+        valores = []
+        for clave, _ in columnas:
+            valor = fila.get(clave)
+            texto = _texto(valor)
+            if isinstance(valor, str) and texto.startswith(PREFIJOS_FORMULA):
+                texto = "'" + texto
+            valores.append(texto)
+        escritor.writerow(valores)
+        if buffer.tell() >= TAMANO_BLOQUE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+# ---------------------- XLSX INCREMENTAL ----------------------
+
+XML_TIPOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+XML_RELACIONES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+XML_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+XML_RELACIONES_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+    '</Relationships>'
+)
+
+XML_INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+XML_FIN_HOJA = '</sheetData></worksheet>'
+
+class _Salida:
+    """
+    Destino de escritura del ZIP sin `seek` ni `tell`: zipfile escribe entonces cada entrada con
+    descriptor de datos al final y todo lo escrito se puede entregar de inmediato.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self.pendientes = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self.pendientes += len(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        self.pendientes = 0
+        return datos
+
+def _celda(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(CARACTERES_INVALIDOS_XML.sub('', _texto(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+def _fila_xml(valores):
+    return ('<row>' + ''.join(_celda(valor) for valor in valores) + '</row>').encode('utf-8')
+
+def generar_xlsx(filas, columnas=COLUMNAS_EXPORTACION, hoja='Incidentes'):
+    """
+    Escribe las filas como un libro XLSX de una hoja. Los números quedan como números y el resto
+    como texto. Excel abre como máximo 1.048.576 filas por hoja: para volúmenes mayores, usar CSV.
+    """
+    salida = _Salida()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', XML_TIPOS)
+        libro.writestr('_rels/.rels', XML_RELACIONES)
+        libro.writestr('xl/workbook.xml', XML_LIBRO.format(hoja=escape(hoja, {'"': '&quot;'})))
+        libro.writestr('xl/_rels/workbook.xml.rels', XML_RELACIONES_LIBRO)
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as xml:
+            xml.write(XML_INICIO_HOJA.encode('utf-8'))
+            xml.write(_fila_xml(encabezado for _, encabezado in columnas))
+            for fila in filas:
+                xml.write(_fila_xml(fila.get(clave) for clave, _ in columnas))
+                if salida.pendientes >= TAMANO_BLOQUE:
+                    yield salida.vaciar()
+            xml.write(XML_FIN_HOJA.encode('utf-8'))
+    yield salida.vaciar()
+
+# Formatos disponibles: (generador, mimetype, extensión)
+FORMATOS_EXPORTACION = {
+    'csv': (generar_csv, 'text/csv', 'csv'),
+    'xlsx': (generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
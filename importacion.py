@@ -0,0 +1,330 @@
+import csv
+import io
+import os
+import re
+import time
+from datetime import datetime
+
+from mysql.connector import Error
+
+from cache import invalidar_incidentes, invalidar_usuarios
+from contadores import sumar_contadores
+from instituciones import SQL_ID_POR_NOMBRE
+from metricas import ESTADOS, TIPO_ACADEMICO, TIPOS_POR_NOMBRE, normalizar_estado
+from replicas import forzar_primaria
+
+# ---------------------- IMPORTACIÓN MASIVA ----------------------
+#
+# Carga un CSV de usuarios o de incidentes históricos leyéndolo fila a fila (nunca entero en
+# memoria). Cada fila se valida en Python; las validaciones que dependen de la base de datos
+# (DNI/correo ya registrados, usuario dueño del incidente) se resuelven con una consulta por lote,
+# y cada lote se inserta con `executemany`, que el conector reescribe como un único INSERT de
+# varias filas, y se confirma con un commit. Si un lote falla en la base de datos se deshace y se
+# reintenta fila a fila para rechazar solo las culpables. Las filas rechazadas se informan con su
+# número de línea y el motivo.
+
+TAMANO_LOTE = int(os.getenv('IMPORTACION_LOTE', '1000'))
+
+TIPOS_IMPORTACION = ('usuarios', 'incidentes')
+
+# Nombres de columna alternativos aceptados en el encabezado
+ALIAS_COLUMNAS = {'correo_electronico': 'correo', 'descripcion_problema': 'descripcion', 'imagen_problema': 'evidencia'}
+
+# Columnas que nunca se devuelven en el informe de rechazos
+COLUMNAS_PRIVADAS = {'clave'}
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y')
+FORMATOS_HORA = ('%H:%M:%S', '%H:%M')
+
+PATRON_CORREO = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+def leer_csv(texto):
+    """
+    Recorre el CSV del archivo de texto `texto` y devuelve (numero_de_linea, fila) por cada fila.
+    El separador (',' o ';', como exporta Excel en español) se deduce del encabezado y los nombres
+    de columna se normalizan a minúsculas.
+    """
+    encabezado = texto.readline()
+    separador = ';' if encabezado.count(';') > encabezado.count(',') else ','
+    columnas = [c.strip().lower() for c in next(csv.reader([encabezado], delimiter=separador), [])]
+    columnas = [ALIAS_COLUMNAS.get(c, c) for c in columnas]
+    lector = csv.DictReader(texto, fieldnames=columnas, delimiter=separador)
+    for fila in lector:
+        if not any((valor or '').strip() for clave, valor in fila.items() if clave is not None):
+            continue
+        yield lector.line_num + 1, {clave: (valor or '').strip() for clave, valor in fila.items() if clave is not None}
+
+def _texto(fila, columna, maximo, obligatorio=True):
+    valor = fila.get(columna, '')
+    if not valor:
+        if obligatorio:
+            raise ValueError(f"Falta {columna}")
+        return None
+    if len(valor) > maximo:
+        raise ValueError(f"{columna} supera {maximo} caracteres")
+    return valor
+
+def _fecha_hora(valor, formatos, nombre):
+    for formato in formatos:
+        try:
+            return datetime.strptime(valor, formato)
+        except ValueError:
+            continue
+    raise ValueError(f"{nombre} inválida: {valor}")
+
+# ---------------------- USUARIOS ----------------------
+
+def validar_usuario(fila, vistos):
+    """
+    Valida una fila de usuario y devuelve sus valores normalizados. `vistos` acumula los DNI y
+    correos del archivo para rechazar los repetidos. Lanza ValueError con el motivo.
+    """
+    usuario = {
+        'nombre': _texto(fila, 'nombre', 100),
+        'apellido': _texto(fila, 'apellido', 100),
+        'dni': _texto(fila, 'dni', 20),
+        'telefono': _texto(fila, 'telefono', 20, obligatorio=False),
+        'correo': _texto(fila, 'correo', 100),
+        'institucion': _texto(fila, 'institucion', 100, obligatorio=False),
+        'clave': _texto(fila, 'clave', 255),
+    }
+    if not PATRON_CORREO.match(usuario['correo']):
+        raise ValueError(f"Correo inválido: {usuario['correo']}")
+    if ('dni', usuario['dni']) in vistos:
+        raise ValueError("DNI repetido en el archivo")
+    if ('correo', usuario['correo'].lower()) in vistos:
+        raise ValueError("Correo repetido en el archivo")
+    vistos.update({('dni', usuario['dni']), ('correo', usuario['correo'].lower())})
+    return usuario
+
+def insertar_usuarios(cursor, lote):
+    """
+    Inserta un lote [(numero, fila, usuario), ...] en la transacción del cursor: una consulta
+    descarta los DNI y correos ya registrados, se crean las instituciones nuevas y los usuarios
+    se insertan en un INSERT de varias filas. Devuelve (insertadas, rechazadas).
+    """
+    marcadores = ', '.join(['%s'] * len(lote))
+    cursor.execute(
+        f"SELECT dni, correo_electronico FROM usuarios WHERE dni IN ({marcadores}) OR correo_electronico IN ({marcadores})",
+        [u['dni'] for _, _, u in lote] + [u['correo'] for _, _, u in lote]
+    )
+    dnis, correos = set(), set()
+    for dni, correo in cursor.fetchall():
+        dnis.add(dni)
+        correos.add(correo.lower())
+
+    nuevos, rechazadas = [], []
+    for numero, fila, usuario in lote:
+        if usuario['dni'] in dnis:
+            rechazadas.append((numero, fila, "DNI ya registrado"))
+        elif usuario['correo'].lower() in correos:
+            rechazadas.append((numero, fila, "Correo ya registrado"))
+        else:
+            nuevos.append(usuario)
+    if not nuevos:
+        return 0, rechazadas
+
+    instituciones = sorted({u['institucion'] for u in nuevos if u['institucion']})
+    if instituciones:
+        cursor.executemany("INSERT IGNORE INTO instituciones (nombre) VALUES (%s)", [(i,) for i in instituciones])
+    cursor.executemany("""
+        INSERT INTO usuarios
+        (nombre, apellido, dni, telefono, correo_electronico, institucion, institucion_id, clave)
+        VALUES (%s, %s, %s, %s, %s, %s, """ + SQL_ID_POR_NOMBRE + """, %s)
+    """, [(u['nombre'], u['apellido'], u['dni'], u['telefono'], u['correo'], u['institucion'], u['institucion'],
+           u['clave']) for u in nuevos])
+    return len(nuevos), rechazadas
+
+# ---------------------- INCIDENTES HISTÓRICOS ----------------------
+
+def validar_incidente(fila, vistos):
+    """
+    Valida una fila de incidente histórico ('academico' o 'infraestructura') y devuelve sus valores
+    normalizados. La fecha y hora del CSV se guardan como `fecha_registro`, para que el histórico
+    conserve su orden. Lanza ValueError con el motivo.
+    """
+    tipo = TIPOS_POR_NOMBRE.get(fila.get('tipo', '').lower())
+    if not tipo:
+        raise ValueError(f"Tipo inválido: {fila.get('tipo', '')}")
+    estado = normalizar_estado(fila.get('estado'))
+    if estado not in ESTADOS:
+        raise ValueError(f"Estado inválido: {fila.get('estado', '')}")
+    fecha = _fecha_hora(_texto(fila, 'fecha', 10), FORMATOS_FECHA, 'Fecha').date()
+    hora = _fecha_hora(fila['hora'], FORMATOS_HORA, 'Hora').time() if fila.get('hora') else datetime.min.time()
+    incidente = {
+        'tipo': tipo,
+        'correo': _texto(fila, 'correo', 100).lower(),
+        'estado': estado,
+        'fecha': fecha,
+        'hora': hora,
+        'fecha_registro': datetime.combine(fecha, hora),
+        'comentarios': _texto(fila, 'comentarios', 65535, obligatorio=False),
+        'evidencia': _texto(fila, 'evidencia', 255, obligatorio=False),
+    }
+    if tipo == TIPO_ACADEMICO:
+        incidente['nombre_estudiante'] = _texto(fila, 'nombre_estudiante', 200)
+        incidente['descripcion'] = _texto(fila, 'motivo', 65535)
+    else:
+        incidente['problema'] = _texto(fila, 'problema', 200)
+        incidente['descripcion'] = _texto(fila, 'descripcion', 65535)
+    return incidente
+
+def insertar_incidentes(cursor, lote):
+    """
+    Inserta un lote [(numero, fila, incidente), ...] en la transacción del cursor: una consulta
+    resuelve los usuarios por correo (con su institución), cada tabla recibe un INSERT de varias
+    filas y los contadores se ajustan en un único INSERT. Devuelve (insertadas, rechazadas).
+    """
+    correos = sorted({i['correo'] for _, _, i in lote})
+    cursor.execute(
+        f"SELECT id, correo_electronico, institucion_id FROM usuarios "
+        f"WHERE correo_electronico IN ({', '.join(['%s'] * len(correos))})",
+        correos
+    )
+    usuarios = {correo.lower(): (usuario_id, institucion_id) for usuario_id, correo, institucion_id in cursor.fetchall()}
+
+    academicos, infraestructura, rechazadas = [], [], []
+    deltas = {}
+    for numero, fila, i in lote:
+        if i['correo'] not in usuarios:
+            rechazadas.append((numero, fila, "Usuario no encontrado"))
+            continue
+        usuario_id, institucion_id = usuarios[i['correo']]
+        if i['tipo'] == TIPO_ACADEMICO:
+            academicos.append((i['nombre_estudiante'], i['descripcion'], i['fecha'], i['hora'], i['estado'],
+                               i['evidencia'], usuario_id, i['fecha_registro'], i['comentarios'], institucion_id))
+        else:
+            infraestructura.append((i['problema'], i['descripcion'], i['evidencia'], i['estado'], i['fecha_registro'],
+                                    usuario_id, i['comentarios'], institucion_id))
+        clave = (usuario_id, i['tipo'], i['estado'])
+        deltas[clave] = deltas.get(clave, 0) + 1
+
+    if academicos:
+        cursor.executemany("""
+            INSERT INTO registro_academico
+            (nombre_estudiante, motivo, fecha, hora, estado, evidencia, usuario_id, fecha_registro, comentarios,
+             institucion_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, academicos)
+    if infraestructura:
+        cursor.executemany("""
+            INSERT INTO registro_infraestructura
+            (problema, descripcion_problema, imagen_problema, estado, fecha_registro, usuario_id, comentarios,
+             institucion_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, infraestructura)
+    sumar_contadores(cursor, deltas)
+    return len(academicos) + len(infraestructura), rechazadas
+
+# ---------------------- IMPORTACIÓN ----------------------
+
+IMPORTADORES = {
+    'usuarios': (validar_usuario, insertar_usuarios, invalidar_usuarios),
+    'incidentes': (validar_incidente, insertar_incidentes, invalidar_incidentes),
+}
+
+def _rechazo(numero, fila, motivo):
+    return {'fila': numero, 'motivo': motivo,
+            'datos': {clave: valor for clave, valor in fila.items() if clave not in COLUMNAS_PRIVADAS}}
+
+def _procesar_lote(conexion, cursor, insertar, lote, informe):
+    """
+    Inserta y confirma un lote. Si la base de datos lo rechaza, lo deshace y reintenta fila a fila.
+    """
+    informe['lotes'] += 1
+    try:
+        insertadas, rechazadas = insertar(cursor, lote)
+        conexion.commit()
+    except Error:
+        conexion.rollback()
+        insertadas, rechazadas = 0, []
+        for elemento in lote:
+            try:
+                n, r = insertar(cursor, [elemento])
+                conexion.commit()
+                insertadas += n
+                rechazadas += r
+            except Error as e:
+                conexion.rollback()
+                rechazadas.append((elemento[0], elemento[1], f"Error de base de datos: {e}"))
+    informe['insertadas'] += insertadas
+    informe['rechazadas'] += [_rechazo(*r) for r in rechazadas]
+
+def importar_csv(conexion, texto, tipo, tamano_lote=TAMANO_LOTE):
+    """
+    Importa el CSV del archivo de texto `texto` ('usuarios' o 'incidentes') en lotes de
+    `tamano_lote` filas, con un commit por lote. Devuelve el informe {'tipo', 'filas', 'insertadas',
+    'rechazadas': [{'fila', 'motivo', 'datos'}], 'lotes', 'segundos', 'filas_por_segundo'}.
+    Los incidentes históricos no emiten eventos en tiempo real: los dashboards los ven al recargar.
+    """
+    if tipo not in IMPORTADORES:
+        raise ValueError(f"Tipo de importación desconocido: {tipo}")
+    validar, insertar, invalidar = IMPORTADORES[tipo]
+    informe = {'tipo': tipo, 'filas': 0, 'insertadas': 0, 'rechazadas': [], 'lotes': 0,
+               'segundos': 0.0, 'filas_por_segundo': 0.0}
+    inicio = time.perf_counter()
+    vistos = set()
+    lote = []
+    cursor = conexion.cursor()
+    try:
+        for numero, fila in leer_csv(texto):
+            informe['filas'] += 1
+            try:
+                lote.append((numero, fila, validar(fila, vistos)))
+            except ValueError as e:
+                informe['rechazadas'].append(_rechazo(numero, fila, str(e)))
+                continue
+            if len(lote) >= tamano_lote:
+                _procesar_lote(conexion, cursor, insertar, lote, informe)
+                lote = []
+        if lote:
+            _procesar_lote(conexion, cursor, insertar, lote, informe)
+    finally:
+        cursor.close()
+        if informe['insertadas']:
+            # Como las funciones `@escritura`: la sesión lee lo importado de la primaria
+            forzar_primaria()
+            invalidar()
+    segundos = time.perf_counter() - inicio
+    informe['rechazadas'].sort(key=lambda r: r['fila'])
+    informe['segundos'] = round(segundos, 3)
+    informe['filas_por_segundo'] = round(informe['filas'] / segundos, 1) if segundos else 0.0
+    return informe
+
+def escribir_rechazados(rechazadas, salida):
+    """
+    Escribe el informe de filas rechazadas como CSV (fila, motivo y las columnas originales).
+    """
+    columnas = ['fila', 'motivo']
+    for rechazo in rechazadas:
+        columnas += [c for c in rechazo['datos'] if c not in columnas]
+    escritor = csv.DictWriter(salida, fieldnames=columnas)
+    escritor.writeheader()
+    for rechazo in rechazadas:
+        escritor.writerow({'fila': rechazo['fila'], 'motivo': rechazo['motivo'], **rechazo['datos']})
+
+# ---------------------- DATOS DE PRUEBA ----------------------
+
+def generar_csv_prueba(filas, etiqueta):
+    """
+    Genera en memoria un CSV de `filas` usuarios y otro de `filas` incidentes que los referencian,
+    marcados con `etiqueta` para poder borrarlos después. Se usa para medir el rendimiento.
+    """
+    usuarios, incidentes = io.StringIO(), io.StringIO()
+    escritor = csv.writer(usuarios)
+    escritor.writerow(['nombre', 'apellido', 'dni', 'telefono', 'correo', 'institucion', 'clave'])
+    for n in range(filas):
+        escritor.writerow([f'Usuario {n}', etiqueta, f'{etiqueta}{n}'[:20], '999999999',
+                           f'{etiqueta}.{n}@importacion.test', f'Institución {etiqueta} {n % 50}', 'clave'])
+    escritor = csv.writer(incidentes)
+    escritor.writerow(['tipo', 'correo', 'estado', 'fecha', 'hora', 'nombre_estudiante', 'motivo', 'problema',
+                       'descripcion'])
+    for n in range(filas):
+        academico = n % 2 == 0
+        escritor.writerow(['academico' if academico else 'infraestructura', f'{etiqueta}.{n}@importacion.test',
+                           ESTADOS[n % len(ESTADOS)], '2024-03-01', '08:30', f'Estudiante {n}' if academico else '',
+                           'Motivo de prueba' if academico else '', '' if academico else 'Techo',
+                           '' if academico else 'Descripción de prueba'])
+    usuarios.seek(0)
+    incidentes.seek(0)
+    return usuarios, incidentes
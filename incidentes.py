@@ -0,0 +1,180 @@
+import re
+
+from instituciones import SQL_ID_POR_NOMBRE
+from metricas import TIPO_ACADEMICO, TIPO_INFRAESTRUCTURA
+
+# ---------------------- MODELO UNIFICADO DE INCIDENTES ----------------------
+#
+# `registro_academico` y `registro_infraestructura` se leen como una sola relación con un
+# conjunto común de columnas y el discriminador `tipo`. Los filtros, los valores por defecto
+# (COALESCE), el orden y el LIMIT se resuelven en la base de datos en una sola consulta
+# UNION ALL, en lugar de concatenar y completar filas en Python.
+
+SIN_DATO = 'Desconocido'
+
+# Expresión de cada columna común en cada tabla (alias `r` para el registro, `u` para el usuario
+# y `n` para la institución)
+COLUMNAS_INCIDENTE = {
+    'id': ("r.id", "r.id"),
+    'usuario_id': ("r.usuario_id", "r.usuario_id"),
+    'institucion_id': ("r.institucion_id", "r.institucion_id"),
+    'institucion': (f"COALESCE(n.nombre, '{SIN_DATO}')",) * 2,
+    'registrado_por': (f"COALESCE(CONCAT(u.nombre, ' ', u.apellido), '{SIN_DATO}')",) * 2,
+    'correo': ("u.correo_electronico",) * 2,
+    'telefono': ("u.telefono",) * 2,
+    'nombre_estudiante': ("r.nombre_estudiante", "''"),
+    'problema': ("NULL", "r.problema"),
+    'descripcion': ("r.motivo", "r.descripcion_problema"),
+    'estado': ("r.estado", "r.estado"),
+    'comentarios': ("r.comentarios", "r.comentarios"),
+    'evidencia': ("r.evidencia", "r.imagen_problema"),
+    'fecha': ("r.fecha", "DATE(r.fecha_registro)"),
+    'hora': ("r.hora", "TIME(r.fecha_registro)"),
+    'fecha_registro': ("r.fecha_registro", "r.fecha_registro"),
+}
+
+# Columnas que obligan a unir cada tabla auxiliar
+COLUMNAS_USUARIO = {'registrado_por', 'correo', 'telefono'}
+COLUMNAS_INSTITUCION = {'institucion'}
+
+TABLAS_INCIDENTE = {
+    TIPO_ACADEMICO: ('registro_academico', 0),
+    TIPO_INFRAESTRUCTURA: ('registro_infraestructura', 1),
+}
+
+# ---------------------- BÚSQUEDA DE TEXTO ----------------------
+#
+# Cada tabla tiene un índice FULLTEXT (migración 0006) sobre sus columnas de texto, con una
+# intercalación insensible a acentos y mayúsculas: "filtracion" encuentra "Filtración" en el
+# índice, sin normalizar nada en Python. MATCH debe nombrar exactamente las columnas del índice.
+COLUMNAS_TEXTO = {
+    TIPO_ACADEMICO: ('motivo', 'nombre_estudiante', 'comentarios'),
+    TIPO_INFRAESTRUCTURA: ('problema', 'descripcion_problema', 'comentarios'),
+}
+
+# Operadores del modo booleano que no se aceptan del usuario
+OPERADORES_BUSQUEDA = re.compile(r'[+\-<>()~*"@]+')
+
+def preparar_busqueda(texto):
+    """
+    Convierte el texto libre en una expresión del modo booleano de FULLTEXT: cada palabra es
+    opcional y se busca como prefijo (`techo*` encuentra "techos"), así el orden por relevancia
+    premia los incidentes que contienen más términos. Devuelve None si no queda ningún término.
+    """
+    terminos = OPERADORES_BUSQUEDA.sub(' ', texto or '').split()
+    if not terminos:
+        return None
+    return ' '.join(f"{termino}*" for termino in terminos)
+
+def _normalizar_columnas(columnas):
+    """
+    Convierte la lista de columnas pedidas en pares (columna, alias). Cada elemento puede ser
+    el nombre de una columna común o una tupla (columna, alias). Lanza ValueError si no existe.
+    """
+    pares = []
+    for columna in columnas:
+        nombre, alias = columna if isinstance(columna, tuple) else (columna, columna)
+        if nombre not in COLUMNAS_INCIDENTE:
+            raise ValueError(f"Columna de incidente desconocida: {nombre}")
+        pares.append((nombre, alias))
+    return pares
+
+def consulta_incidentes(columnas=None, estado=None, usuario_id=None, institucion=None,
+                        institucion_id=None, tipos=None, limite=None, desde=None, hasta=None,
+                        busqueda=None, desplazamiento=0):
+    """
+    Construye la consulta unificada de incidentes y devuelve la tupla (sql, parametros).
+    Los filtros se aplican dentro de cada rama del UNION ALL para aprovechar los índices de cada
+    tabla; el resultado se ordena por (fecha_registro, id) descendente. `columnas` selecciona y
+    renombra columnas de COLUMNAS_INCIDENTE (por defecto todas) y `tipos` limita las tablas leídas.
+    La institución se filtra por `institucion_id` (o por nombre resuelto a id), sin unir con `usuarios`.
+    `desde` (inclusive) y `hasta` (exclusivo) acotan `fecha_registro`, que tiene índice propio y
+    compuesto con `institucion_id`.
+    Con `busqueda` (expresión de `preparar_busqueda`) solo se leen los incidentes que coinciden en el
+    índice FULLTEXT de cada tabla, se agrega la columna `relevancia` y el orden pasa a ser por
+    relevancia; `desplazamiento` salta ese número de filas del resultado combinado (requiere `limite`).
+    """
+    pares = _normalizar_columnas(columnas or COLUMNAS_INCIDENTE)
+    necesarias = {nombre for nombre, _ in pares} | {'fecha_registro', 'id'}
+
+    filtros = []
+    parametros_filtro = []
+    if estado:
+        filtros.append("r.estado = %s")
+        parametros_filtro.append(estado)
+    if usuario_id is not None:
+        filtros.append("r.usuario_id = %s")
+        parametros_filtro.append(usuario_id)
+    if institucion_id is not None:
+        filtros.append("r.institucion_id = %s")
+        parametros_filtro.append(institucion_id)
+    elif institucion:
+        filtros.append(f"r.institucion_id = {SQL_ID_POR_NOMBRE}")
+        parametros_filtro.append(institucion)
+    if desde is not None:
+        filtros.append("r.fecha_registro >= %s")
+        parametros_filtro.append(desde)
+    if hasta is not None:
+        filtros.append("r.fecha_registro < %s")
+        parametros_filtro.append(hasta)
+    uniones = ""
+    if necesarias & COLUMNAS_USUARIO:
+        uniones += "\n            LEFT JOIN usuarios u ON r.usuario_id = u.id"
+    if necesarias & COLUMNAS_INSTITUCION:
+        uniones += "\n            LEFT JOIN instituciones n ON r.institucion_id = n.id"
+
+    orden_rama = "r.fecha_registro DESC, r.id DESC"
+    orden = "i.fecha_registro DESC, i.id DESC"
+    if busqueda:
+        orden_rama = "relevancia DESC, " + orden_rama
+        orden = "i.relevancia DESC, " + orden
+
+    ramas = []
+    parametros = []
+    for tipo in (tipos or TABLAS_INCIDENTE):
+        tabla, posicion = TABLAS_INCIDENTE[tipo]
+        expresiones = [f"'{tipo}' AS tipo"] + [
+            f"{COLUMNAS_INCIDENTE[nombre][posicion]} AS {nombre}"
+            for nombre in COLUMNAS_INCIDENTE if nombre in necesarias
+        ]
+        filtros_rama = list(filtros)
+        if busqueda:
+            coincidencia = (f"MATCH({', '.join('r.' + c for c in COLUMNAS_TEXTO[tipo])}) "
+                            f"AGAINST (%s IN BOOLEAN MODE)")
+            expresiones.append(f"{coincidencia} AS relevancia")
+            filtros_rama.append(coincidencia)
+            parametros.append(busqueda)
+        where = f"WHERE {' AND '.join(filtros_rama)}" if filtros_rama else ""
+        rama = f"""
+            SELECT {', '.join(expresiones)}
+            FROM {tabla} r{uniones}
+            {where}"""
+        parametros += parametros_filtro + ([busqueda] if busqueda else [])
+        if limite is not None:
+            # Cada rama aporta como máximo las filas que pueden llegar a la página pedida, ya ordenadas
+            rama = f"({rama}\n            ORDER BY {orden_rama} LIMIT %s)"
+            parametros.append(limite + desplazamiento)
+        ramas.append(rama)
+
+    seleccion = ['i.tipo'] + [f"i.{nombre} AS {alias}" for nombre, alias in pares]
+    if busqueda:
+        seleccion.append('i.relevancia')
+    sql = f"""
+        SELECT {', '.join(seleccion)}
+        FROM ({' UNION ALL '.join(ramas)}
+        ) AS i
+        ORDER BY {orden}"""
+    if limite is not None:
+        sql += "\n        LIMIT %s"
+        parametros.append(limite)
+        if desplazamiento:
+            sql += " OFFSET %s"
+            parametros.append(desplazamiento)
+    return sql, tuple(parametros)
+
+def leer_incidentes(cursor, **filtros):
+    """
+    Ejecuta la consulta unificada con un cursor de diccionarios y devuelve todas las filas.
+    """
+    cursor.execute(*consulta_incidentes(**filtros))
+    return cursor.fetchall()
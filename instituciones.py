@@ -0,0 +1,88 @@
+# ---------------------- INSTITUCIONES ----------------------
+#
+# Las instituciones viven en su propia tabla con clave entera. `usuarios.institucion_id` apunta
+# a ella y ambas tablas de incidentes guardan una copia desnormalizada (`institucion_id`) del
+# valor de su usuario, de modo que los filtros por institución son búsquedas por índice entero
+# sin unir con `usuarios`. La columna de texto `usuarios.institucion` se conserva para las
+# vistas y la sesión.
+
+TABLAS_INCIDENTES = ('registro_academico', 'registro_infraestructura')
+
+SQL_CREAR_TABLA = """
+    CREATE TABLE IF NOT EXISTS instituciones (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL UNIQUE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+# Subconsulta que resuelve el nombre de una institución a su id (índice único sobre `nombre`)
+SQL_ID_POR_NOMBRE = "(SELECT id FROM instituciones WHERE nombre = %s)"
+
+# Subconsulta que copia la institución actual de un usuario al escribir un incidente
+SQL_ID_DE_USUARIO = "(SELECT institucion_id FROM usuarios WHERE id = %s)"
+
+def obtener_o_crear_institucion(cursor, nombre):
+    """
+    Devuelve el id de la institución `nombre`, creándola si no existe, en una sola sentencia.
+    Devuelve None si el nombre está vacío.
+    """
+    nombre = (nombre or '').strip()
+    if not nombre:
+        return None
+    cursor.execute("""
+        INSERT INTO instituciones (nombre) VALUES (%s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+    """, (nombre,))
+    return cursor.lastrowid
+
+def propagar_institucion(cursor, usuario_id, institucion_id):
+    """
+    Copia `institucion_id` a los incidentes del usuario para mantener la columna desnormalizada.
+    """
+    for tabla in TABLAS_INCIDENTES:
+        cursor.execute(
+            f"UPDATE {tabla} SET institucion_id = %s WHERE usuario_id = %s",
+            (institucion_id, usuario_id)
+        )
+
+def listar_instituciones(cursor):
+    """
+    Devuelve las instituciones con al menos un usuario, ordenadas por nombre.
+    """
+    cursor.execute("""
+        SELECT i.id, i.nombre AS institucion
+        FROM instituciones i
+        WHERE EXISTS (SELECT 1 FROM usuarios u WHERE u.institucion_id = i.id)
+        ORDER BY i.nombre
+    """)
+    return cursor.fetchall()
+
+def backfill_instituciones(conexion):
+    """
+    Crea las instituciones a partir de `usuarios.institucion` y rellena `institucion_id` en usuarios
+    e incidentes. Es idempotente y se confirma en una sola transacción.
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            INSERT IGNORE INTO instituciones (nombre)
+            SELECT DISTINCT TRIM(institucion) FROM usuarios
+            WHERE institucion IS NOT NULL AND TRIM(institucion) != ''
+        """)
+        cursor.execute("""
+            UPDATE usuarios u
+            LEFT JOIN instituciones i ON i.nombre = TRIM(u.institucion)
+            SET u.institucion_id = i.id
+        """)
+        for tabla in TABLAS_INCIDENTES:
+            cursor.execute(f"""
+                UPDATE {tabla} r
+                JOIN usuarios u ON r.usuario_id = u.id
+                SET r.institucion_id = u.institucion_id
+            """)
+        conexion.commit()
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,353 @@
+import atexit
+import hmac
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+from flask import g, has_request_context, request
+
+from sqlite_local import conectar_sqlite
+
+# ---------------------- INSTRUMENTACIÓN Y MÉTRICAS ----------------------
+#
+# Los cursores que entregan los pools (`db_pool.ConexionPool.cursor`) se envuelven en
+# `CursorInstrumentado`, que mide cada sentencia y cuenta las filas leídas bajo la huella de su SQL
+# (literales, marcadores y listas IN reemplazados por `?`), de modo que las decenas de consultas
+# escritas en línea se agrupan sin importar sus parámetros. Las sentencias que superan
+# `SQL_LENTA_MS` se registran en el logger `consultas_lentas` (sin sus parámetros). Por petición se
+# miden la latencia y el estado por ruta y la cantidad de sentencias; el pool informa el tiempo de
+# obtención de cada conexión. Cada proceso acumula en memoria y cada `METRICAS_INTERVALO` segundos
+# suma lo acumulado en un archivo SQLite compartido por los workers (todas las series son sumas,
+# incluidas las cubetas de los histogramas), así `/metrics` devuelve el total de todos los
+# procesos en el formato de texto de Prometheus.
+
+# Umbral del registro de consultas lentas (0 lo desactiva) y archivo opcional donde escribirlo
+SQL_LENTA_MS = float(os.getenv('SQL_LENTA_MS', '500'))
+SQL_LENTA_LOG = os.getenv('SQL_LENTA_LOG')
+
+CONTENT_TYPE_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Con `METRICAS_TOKEN`, /metrics exige `Authorization: Bearer <token>` (el scraper de Prometheus no
+# tiene sesión de administrador). Sin él la ruta queda abierta y debe restringirse en la red.
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN')
+
+# Cubetas (segundos o cantidades) de los histogramas
+CUBETAS_SQL = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CUBETAS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CUBETAS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# Familias exportadas: nombre -> (tipo, ayuda, cubetas)
+DEFINICIONES = {
+    'ugel_sql_duracion_segundos': ('histogram', 'Latencia de las sentencias SQL por huella.', CUBETAS_SQL),
+    'ugel_sql_filas_total': ('counter', 'Filas leídas de las sentencias SQL por huella.', None),
+    'ugel_sql_errores_total': ('counter', 'Sentencias SQL que fallaron por huella.', None),
+    'ugel_sql_lentas_total': ('counter', 'Sentencias SQL más lentas que SQL_LENTA_MS por huella.', None),
+    'ugel_sql_consultas_por_peticion': ('histogram', 'Sentencias SQL ejecutadas por petición HTTP.',
+                                        CUBETAS_CONSULTAS),
+    'ugel_bd_obtener_conexion_segundos': ('histogram', 'Tiempo para obtener una conexión del pool '
+                                          '(espera y conexión nueva).', CUBETAS_SQL),
+    'ugel_http_duracion_segundos': ('histogram', 'Latencia de las peticiones HTTP por ruta.', CUBETAS_HTTP),
+    'ugel_http_peticiones_total': ('counter', 'Peticiones HTTP por ruta, método y estado.', None),
+}
+
+SQL_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS metricas (
+        familia TEXT NOT NULL,
+        sufijo TEXT NOT NULL,
+        etiquetas TEXT NOT NULL,
+        valor REAL NOT NULL,
+        PRIMARY KEY (familia, sufijo, etiquetas)
+    );
+"""
+
+log_consultas_lentas = logging.getLogger('consultas_lentas')
+
+# ---------------------- HUELLA DE SQL ----------------------
+
+LARGO_HUELLA = 300
+
+PATRONES_HUELLA = [
+    (re.compile(r"'(?:[^'\\]|\\.|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|%s'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?+)'),
+    (re.compile(r'\(\?\+\)(?:\s*,\s*\(\?\+\))+'), '(?+)'),
+]
+
+@lru_cache(maxsize=1024)
+def huella_sql(sql):
+    """
+    Normaliza una sentencia SQL para agrupar sus ejecuciones: literales y marcadores pasan a `?`,
+    las listas de valores a `(?+)` y los espacios se colapsan.
+    """
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    for patron, reemplazo in PATRONES_HUELLA:
+        sql = patron.sub(reemplazo, sql)
+    return sql.strip()[:LARGO_HUELLA]
+
+# ---------------------- REGISTRO ----------------------
+
+class RegistroMetricas:
+    """
+    Contadores e histogramas acumulados en memoria y volcados cada `intervalo` segundos al archivo
+    SQLite `ruta`, donde se suman los de todos los procesos.
+    """
+
+    def __init__(self, ruta, intervalo=5.0):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._pendientes = {}
+        self._volcado_en = time.monotonic()
+        self._atexit = False
+        with self._conectar() as conexion:
+            conexion.executescript(SQL_ESQUEMA)
+
+    def incrementar(self, familia, etiquetas=(), valor=1):
+        """
+        Suma `valor` al contador `familia` con las `etiquetas` ((nombre, valor), ...).
+        """
+        with self._lock:
+            self._sumar(familia, '', tuple(etiquetas), valor)
+
+    def observar(self, familia, valor, etiquetas=()):
+        """
+        Registra una observación del histograma `familia`.
+        """
+        etiquetas = tuple(etiquetas)
+        cubetas = DEFINICIONES[familia][2]
+        with self._lock:
+            for limite in cubetas + (math.inf,):
+                self._sumar(familia, '_bucket', etiquetas + (('le', _numero(limite)),), 1 if valor <= limite else 0)
+            self._sumar(familia, '_sum', etiquetas, valor)
+            self._sumar(familia, '_count', etiquetas, 1)
+
+    def volcar_si_corresponde(self):
+        """
+        Vuelca lo acumulado si pasó el intervalo desde el último volcado.
+        """
+        if time.monotonic() - self._volcado_en >= self.intervalo:
+            self.volcar()
+
+    def volcar(self):
+        """
+        Suma lo acumulado por este proceso en el archivo compartido.
+        """
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+            self._volcado_en = time.monotonic()
+            if not self._atexit:
+                atexit.register(self.volcar)
+                self._atexit = True
+        if not pendientes:
+            return
+        try:
+            with self._conectar() as conexion:
+                conexion.executemany("""
+                    INSERT INTO metricas (familia, sufijo, etiquetas, valor) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(familia, sufijo, etiquetas) DO UPDATE SET valor = valor + excluded.valor
+                """, [(familia, sufijo, json.dumps(etiquetas), valor)
+                      for (familia, sufijo, etiquetas), valor in pendientes.items()])
+        except sqlite3.Error as e:
+            print(f"Error al volcar las métricas: {e}")
+
+    def exportar(self):
+        """
+        Devuelve todas las métricas en el formato de texto de Prometheus (versión 0.0.4).
+        """
+        self.volcar()
+        familias = {familia: [] for familia in DEFINICIONES}
+        with self._conectar() as conexion:
+            for familia, sufijo, etiquetas, valor in conexion.execute(
+                    "SELECT familia, sufijo, etiquetas, valor FROM metricas"):
+                if familia in familias:
+                    familias[familia].append((sufijo, [tuple(par) for par in json.loads(etiquetas)], valor))
+        lineas = []
+        for familia, muestras in familias.items():
+            tipo, ayuda, _ = DEFINICIONES[familia]
+            lineas.append(f"# HELP {familia} {ayuda}")
+            lineas.append(f"# TYPE {familia} {tipo}")
+            for sufijo, etiquetas, valor in sorted(muestras, key=_orden_muestra):
+                lineas.append(f"{familia}{sufijo}{_etiquetas(etiquetas)} {_numero(valor)}")
+        return '\n'.join(lineas) + '\n'
+
+    def reiniciar(self):
+        """
+        Borra las métricas acumuladas y las del archivo compartido.
+        """
+        with self._lock:
+            self._pendientes = {}
+        with self._conectar() as conexion:
+            conexion.execute("DELETE FROM metricas")
+
+    def _sumar(self, familia, sufijo, etiquetas, valor):
+        clave = (familia, sufijo, etiquetas)
+        self._pendientes[clave] = self._pendientes.get(clave, 0) + valor
+
+    def _conectar(self):
+        return conectar_sqlite(self.ruta)
+
+
+ORDEN_SUFIJOS = {'': 0, '_bucket': 0, '_sum': 1, '_count': 2}
+
+def _orden_muestra(muestra):
+    sufijo, etiquetas, _ = muestra
+    sin_le = [par for par in etiquetas if par[0] != 'le']
+    le = next((float(valor) for nombre, valor in etiquetas if nombre == 'le'), 0.0)
+    return sin_le, ORDEN_SUFIJOS[sufijo], le
+
+def _numero(valor):
+    if valor == math.inf:
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    texto = ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in etiquetas)
+    return '{' + texto + '}'
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# ---------------------- REGISTRO COMPARTIDO ----------------------
+
+registro_metricas = RegistroMetricas(
+    ruta=os.getenv('METRICAS_DB', os.path.join(tempfile.gettempdir(), 'ugel_metricas.sqlite3')),
+    intervalo=float(os.getenv('METRICAS_INTERVALO', '5')),
+)
+
+def exportar_prometheus():
+    """
+    Devuelve las métricas de todos los procesos en el formato de texto de Prometheus.
+    """
+    return registro_metricas.exportar()
+
+def metricas_autorizadas(cabecera):
+    """
+    Indica si la cabecera `Authorization` da acceso a /metrics.
+    """
+    if not METRICAS_TOKEN:
+        return True
+    return hmac.compare_digest((cabecera or '').encode(), f"Bearer {METRICAS_TOKEN}".encode())
+
+def observar_obtencion_conexion(segundos, servidor):
+    """
+    Registra el tiempo que tardó en obtenerse una conexión del pool de `servidor`.
+    """
+    registro_metricas.observar('ugel_bd_obtener_conexion_segundos', segundos, (('servidor', servidor),))
+
+# ---------------------- CURSOR INSTRUMENTADO ----------------------
+
+class CursorInstrumentado:
+    """
+    Envoltorio de un cursor que mide cada sentencia, cuenta las filas leídas bajo la huella de la
+    última sentencia y registra las lentas. Delega todo lo demás en el cursor real.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._huella = None
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        for fila in self._cursor:
+            self._contar_filas(1)
+            yield fila
+
+    def execute(self, operacion, *args, **kwargs):
+        return self._medir(self._cursor.execute, operacion, args, kwargs)
+
+    def executemany(self, operacion, *args, **kwargs):
+        return self._medir(self._cursor.executemany, operacion, args, kwargs)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            self._contar_filas(1)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._cursor.fetchmany(*args, **kwargs)
+        self._contar_filas(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._contar_filas(len(filas))
+        return filas
+
+    def _medir(self, metodo, operacion, args, kwargs):
+        self._huella = huella_sql(operacion)
+        etiquetas = (('consulta', self._huella),)
+        if has_request_context():
+            g.consultas_sql = g.get('consultas_sql', 0) + 1
+        inicio = time.perf_counter()
+        try:
+            return metodo(operacion, *args, **kwargs)
+        except Exception:
+            registro_metricas.incrementar('ugel_sql_errores_total', etiquetas)
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            registro_metricas.observar('ugel_sql_duracion_segundos', segundos, etiquetas)
+            if SQL_LENTA_MS and segundos * 1000 >= SQL_LENTA_MS:
+                registro_metricas.incrementar('ugel_sql_lentas_total', etiquetas)
+                log_consultas_lentas.warning(
+                    "%.1f ms en %s: %s", segundos * 1000,
+                    f"{request.method} {request.path}" if has_request_context() else "fuera de petición",
+                    self._huella
+                )
+
+    def _contar_filas(self, cantidad):
+        if cantidad and self._huella is not None:
+            registro_metricas.incrementar('ugel_sql_filas_total', (('consulta', self._huella),), cantidad)
+
+# ---------------------- MÉTRICAS HTTP ----------------------
+
+def registrar_instrumentacion(app):
+    """
+    Mide cada petición: latencia y estado por ruta (la regla de URL, no la ruta concreta, para
+    acotar las series) y sentencias SQL ejecutadas. La latencia se registra en el teardown para
+    incluir el envío de las respuestas en streaming. Con `SQL_LENTA_LOG` las consultas lentas se
+    escriben además en ese archivo.
+    """
+    if SQL_LENTA_LOG and not log_consultas_lentas.handlers:
+        manejador = logging.FileHandler(SQL_LENTA_LOG, encoding='utf-8')
+        manejador.setFormatter(logging.Formatter('%(asctime)s %(process)d %(message)s'))
+        log_consultas_lentas.addHandler(manejador)
+
+    @app.before_request
+    def iniciar_medicion():
+        g.inicio_peticion = time.perf_counter()
+
+    @app.after_request
+    def anotar_estado(respuesta):
+        g.estado_http = respuesta.status_code
+        return respuesta
+
+    @app.teardown_request
+    def registrar_peticion(error=None):
+        inicio = g.pop('inicio_peticion', None)
+        if inicio is None:
+            return
+        ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+        estado = 500 if error is not None else g.get('estado_http', 500)
+        etiquetas = (('ruta', ruta), ('metodo', request.method))
+        registro_metricas.observar('ugel_http_duracion_segundos', time.perf_counter() - inicio, etiquetas)
+        registro_metricas.incrementar('ugel_http_peticiones_total', etiquetas + (('estado', str(estado)),))
+        registro_metricas.observar('ugel_sql_consultas_por_peticion', g.get('consultas_sql', 0))
+        registro_metricas.volcar_si_corresponde()
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import time
+
+from sqlite_local import conectar_sqlite
+
+# ---------------------- LIMITADOR DE INTENTOS DE LOGIN ----------------------
+#
+# Ventana deslizante de intentos fallidos por IP de cliente y por cuenta. El estado vive en un
+# archivo SQLite local compartido por todos los workers del servidor (cada operación es una
+# transacción `BEGIN IMMEDIATE`), así un cliente bloqueado lo está en todos los procesos.
+# La comprobación se hace antes de tocar MySQL, de modo que el tráfico rechazado no genera
+# consultas. Los contadores de permitidos y rechazados también se guardan en SQLite para que
+# `estadisticas()` refleje la carga descartada por todos los workers.
+
+SQL_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS fallos_login (
+        clave TEXT NOT NULL,
+        momento REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_fallos_clave_momento ON fallos_login (clave, momento);
+    CREATE INDEX IF NOT EXISTS idx_fallos_momento ON fallos_login (momento);
+    CREATE TABLE IF NOT EXISTS contadores_login (
+        nombre TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL DEFAULT 0
+    );
+"""
+
+CONTADORES = ('permitidos', 'rechazados_ip', 'rechazados_cuenta', 'fallos', 'exitos')
+
+class LimitadorLogin:
+    """
+    Limita los intentos fallidos de login por IP (`max_fallos_ip`) y por cuenta
+    (`max_fallos_cuenta`) dentro de una ventana deslizante de `ventana` segundos.
+    """
+
+    def __init__(self, ruta, max_fallos_ip=20, max_fallos_cuenta=3, ventana=900.0):
+        self.ruta = ruta
+        self.max_fallos_ip = max_fallos_ip
+        self.max_fallos_cuenta = max_fallos_cuenta
+        self.ventana = ventana
+        with self._conectar() as conexion:
+            conexion.executescript(SQL_ESQUEMA)
+
+    def verificar(self, ip, cuenta):
+        """
+        Devuelve None si el intento puede continuar, o 'ip' / 'cuenta' si el cliente o la
+        cuenta superaron su límite de fallos en la ventana actual.
+        """
+        desde = time.time() - self.ventana
+        clave_cuenta = _clave_cuenta(cuenta)
+        with self._conectar() as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            motivo = None
+            if self._contar(conexion, f"ip:{ip}", desde) >= self.max_fallos_ip:
+                motivo = 'ip'
+            elif clave_cuenta and self._contar(conexion, clave_cuenta, desde) >= self.max_fallos_cuenta:
+                motivo = 'cuenta'
+            self._sumar(conexion, f"rechazados_{motivo}" if motivo else 'permitidos')
+        return motivo
+
+    def registrar_fallo(self, ip, cuenta):
+        """
+        Registra un intento fallido para la IP y la cuenta. Devuelve True si con este fallo
+        alguna de las dos alcanzó su límite.
+        """
+        ahora = time.time()
+        desde = ahora - self.ventana
+        clave_cuenta = _clave_cuenta(cuenta)
+        claves = [f"ip:{ip}"] + ([clave_cuenta] if clave_cuenta else [])
+        with self._conectar() as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute("DELETE FROM fallos_login WHERE momento <= ?", (desde,))
+            conexion.executemany(
+                "INSERT INTO fallos_login (clave, momento) VALUES (?, ?)",
+                [(clave, ahora) for clave in claves]
+            )
+            self._sumar(conexion, 'fallos')
+            bloqueado = self._contar(conexion, f"ip:{ip}", desde) >= self.max_fallos_ip
+            if clave_cuenta:
+                bloqueado = bloqueado or self._contar(conexion, clave_cuenta, desde) >= self.max_fallos_cuenta
+        return bloqueado
+
+    def registrar_exito(self, ip, cuenta):
+        """
+        Olvida los fallos de la cuenta tras un login correcto. Los de la IP se conservan para que
+        un cliente no pueda reiniciar su contador con una cuenta propia.
+        """
+        clave_cuenta = _clave_cuenta(cuenta)
+        with self._conectar() as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            if clave_cuenta:
+                conexion.execute("DELETE FROM fallos_login WHERE clave = ?", (clave_cuenta,))
+            self._sumar(conexion, 'exitos')
+
+    def estadisticas(self):
+        """
+        Devuelve los contadores acumulados por todos los workers y los límites configurados.
+        """
+        with self._conectar() as conexion:
+            valores = dict(conexion.execute("SELECT nombre, valor FROM contadores_login").fetchall())
+            claves = conexion.execute(
+                "SELECT COUNT(DISTINCT clave) FROM fallos_login WHERE momento > ?",
+                (time.time() - self.ventana,)
+            ).fetchone()[0]
+        datos = {nombre: valores.get(nombre, 0) for nombre in CONTADORES}
+        rechazados = datos['rechazados_ip'] + datos['rechazados_cuenta']
+        total = datos['permitidos'] + rechazados
+        datos.update({
+            'claves_con_fallos': claves,
+            'tasa_rechazo': round(rechazados / total, 4) if total else 0.0,
+            'max_fallos_ip': self.max_fallos_ip,
+            'max_fallos_cuenta': self.max_fallos_cuenta,
+            'ventana': self.ventana,
+        })
+        return datos
+
+    def reiniciar(self):
+        """
+        Borra todos los fallos y contadores.
+        """
+        with self._conectar() as conexion:
+            conexion.execute("DELETE FROM fallos_login")
+            conexion.execute("DELETE FROM contadores_login")
+
+    def _conectar(self):
+        return conectar_sqlite(self.ruta)
+
+    def _contar(self, conexion, clave, desde):
+        return conexion.execute(
+            "SELECT COUNT(*) FROM fallos_login WHERE clave = ? AND momento > ?", (clave, desde)
+        ).fetchone()[0]
+
+    def _sumar(self, conexion, nombre):
+        conexion.execute("""
+            INSERT INTO contadores_login (nombre, valor) VALUES (?, 1)
+            ON CONFLICT(nombre) DO UPDATE SET valor = valor + 1
+        """, (nombre,))
+
+
+def _clave_cuenta(cuenta):
+    """
+    Clave de la cuenta en `fallos_login`. El correo se normaliza igual que lo compara MySQL (sin
+    distinguir mayúsculas), para que variar su escritura no reinicie el contador.
+    """
+    cuenta = (cuenta or '').strip().lower()
+    return f"cuenta:{cuenta}" if cuenta else None
+
+# ---------------------- LIMITADOR COMPARTIDO ----------------------
+
+limitador_login = LimitadorLogin(
+    ruta=os.getenv('LIMITADOR_DB', os.path.join(tempfile.gettempdir(), 'ugel_limitador_login.sqlite3')),
+    max_fallos_ip=int(os.getenv('LOGIN_MAX_FALLOS_IP', '20')),
+    max_fallos_cuenta=int(os.getenv('LOGIN_MAX_FALLOS_CUENTA', '3')),
+    ventana=float(os.getenv('LOGIN_VENTANA', '900')),
+)
@@ -0,0 +1,134 @@
+import math
+import statistics
+import time
+
+from contadores import sumar_contador, mover_contador
+from incidentes import TABLAS_INCIDENTE
+from instituciones import SQL_ID_DE_USUARIO
+from metricas import TIPO_INFRAESTRUCTURA
+from utils import bloquear_incidente, escribir_incidente
+
+# ---------------------- MEDICIÓN DE LA ACTUALIZACIÓN DE INCIDENTES ----------------------
+#
+# `flask medir-actualizacion` compara la latencia de actualizar un incidente con la secuencia
+# anterior (buscar el usuario por correo, bloquear el incidente, UPDATE con subconsulta y una
+# sentencia por contador) y con la actual (una lectura que bloquea el incidente y resuelve el
+# usuario con un JOIN, UPDATE por clave primaria y una sola sentencia para ambos contadores).
+# Cada repetición se deshace con rollback: las dos variantes miden lo mismo y no dejan cambios.
+
+class CursorContado:
+    """
+    Envoltorio de un cursor que cuenta las sentencias enviadas al servidor.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.sentencias = 0
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def execute(self, *args, **kwargs):
+        self.sentencias += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self.sentencias += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+def secuencia_anterior(cursor, tipo, incidente_id, correo, estado):
+    """
+    Secuencia de sentencias que usaba `actualizar_incidencia_por_id` antes de unificar la lectura.
+    """
+    tabla, _ = TABLAS_INCIDENTE[tipo]
+    cursor.execute("SELECT id, institucion_id FROM usuarios WHERE correo_electronico = %s", (correo,))
+    usuario_id, _ = cursor.fetchone()
+    cursor.execute(f"SELECT usuario_id, estado, institucion_id FROM {tabla} WHERE id = %s FOR UPDATE",
+                   (incidente_id,))
+    usuario_anterior, estado_anterior, _ = cursor.fetchone()
+    cursor.execute(f"""
+        UPDATE {tabla}
+        SET estado = %s, usuario_id = %s, institucion_id = {SQL_ID_DE_USUARIO}
+        WHERE id = %s
+    """, (estado, usuario_id, usuario_id, incidente_id))
+    sumar_contador(cursor, usuario_anterior, tipo, estado_anterior, -1)
+    sumar_contador(cursor, usuario_id, tipo, estado, 1)
+
+def secuencia_actual(cursor, tipo, incidente_id, correo, estado):
+    """
+    Secuencia de sentencias de `actualizar_incidencia_por_id`, con las mismas funciones que usa.
+    """
+    _, usuario_anterior, estado_anterior, _, usuario_id, institucion_id = bloquear_incidente(
+        cursor, tipo, correo, "r.id = %s", (incidente_id,))
+    escribir_incidente(cursor, tipo, incidente_id, {
+        'estado': estado, 'usuario_id': usuario_id, 'institucion_id': institucion_id,
+    })
+    mover_contador(cursor, tipo, usuario_anterior, estado_anterior, usuario_id, estado)
+
+VARIANTES = (('anterior', secuencia_anterior), ('actual', secuencia_actual))
+
+def medir_actualizacion(conexion, incidente_id, correo, repeticiones=200, tipo=TIPO_INFRAESTRUCTURA):
+    """
+    Ejecuta `repeticiones` veces cada variante (intercaladas, deshaciendo cada una) sobre el
+    incidente indicado y devuelve {variante: {'sentencias', 'media_ms', 'p50_ms', 'p95_ms'}}.
+    La latencia incluye el rollback, que cuesta lo mismo que el commit de la ruta real.
+    """
+    tiempos = {nombre: [] for nombre, _ in VARIANTES}
+    sentencias = {}
+    cursor = conexion.cursor(buffered=True)
+    try:
+        for repeticion in range(repeticiones):
+            estado = 'Resuelto' if repeticion % 2 else 'En proceso'
+            for nombre, variante in VARIANTES:
+                contado = CursorContado(cursor)
+                inicio = time.perf_counter()
+                variante(contado, tipo, incidente_id, correo, estado)
+                conexion.rollback()
+                tiempos[nombre].append((time.perf_counter() - inicio) * 1000)
+                sentencias[nombre] = contado.sentencias
+    finally:
+        cursor.close()
+    return {
+        nombre: {
+            'sentencias': sentencias.get(nombre, 0),
+            'media_ms': round(statistics.fmean(muestras), 3),
+            'p50_ms': round(statistics.median(muestras), 3),
+            'p95_ms': round(sorted(muestras)[math.ceil(len(muestras) * 0.95) - 1], 3),
+        }
+        for nombre, muestras in tiempos.items() if muestras
+    }
+
+def preparar_incidente_prueba(conexion, etiqueta):
+    """
+    Crea un usuario y un incidente de infraestructura marcados con `etiqueta` y devuelve
+    (incidente_id, correo).
+    """
+    correo = f"{etiqueta}@medicion.test"
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO usuarios (nombre, apellido, dni, telefono, correo_electronico, clave)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, ('Medición', etiqueta, etiqueta[:20], '999999999', correo, 'clave'))
+        usuario_id = cursor.lastrowid
+        cursor.execute("""
+            INSERT INTO registro_infraestructura (problema, descripcion_problema, estado, usuario_id)
+            VALUES (%s, %s, %s, %s)
+        """, ('Techo', 'Incidente de medición', 'Pendiente', usuario_id))
+        incidente_id = cursor.lastrowid
+        sumar_contador(cursor, usuario_id, TIPO_INFRAESTRUCTURA, 'Pendiente', 1)
+        conexion.commit()
+        return incidente_id, correo
+    finally:
+        cursor.close()
+
+def borrar_datos_prueba(conexion, etiqueta):
+    """
+    Borra el usuario de prueba; ON DELETE CASCADE borra su incidente y sus contadores.
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("DELETE FROM usuarios WHERE apellido = %s", (etiqueta,))
+        conexion.commit()
+    finally:
+        cursor.close()
@@ -0,0 +1,86 @@
+# ---------------------- MÉTRICAS DE INCIDENTES ----------------------
+
+ESTADO_PENDIENTE = 'Pendiente'
+ESTADO_EN_PROCESO = 'En proceso'
+ESTADO_RESUELTO = 'Resuelto'
+ESTADOS = (ESTADO_PENDIENTE, ESTADO_EN_PROCESO, ESTADO_RESUELTO)
+
+TIPO_INFRAESTRUCTURA = 'Infraestructura'
+TIPO_ACADEMICO = 'Académico'
+
+# Nombres de tipo aceptados en peticiones y archivos importados ('infraestructura', 'Académico', ...)
+TIPOS_POR_NOMBRE = {'infraestructura': TIPO_INFRAESTRUCTURA, 'academico': TIPO_ACADEMICO, 'académico': TIPO_ACADEMICO}
+
+METRICAS_VACIAS = {
+    'total_incidentes': 0,
+    'resueltos': 0,
+    'en_proceso': 0,
+    'pendientes': 0,
+    'infraestructura': 0,
+    'academico': 0,
+    'instituciones': 0,
+    'total_instituciones': 0,
+}
+
+def normalizar_estado(estado):
+    """
+    Devuelve la forma canónica del estado ('En Proceso' -> 'En proceso').
+    Si no corresponde a ningún estado conocido se devuelve sin cambios.
+    """
+    if not estado:
+        return estado
+    for canonico in ESTADOS:
+        if estado.strip().lower() == canonico.lower():
+            return canonico
+    return estado
+
+def construir_consulta_metricas(usuario_id=None, institucion=None):
+    """
+    Construye una única consulta de agregación condicional sobre `contadores_incidentes`,
+    globalmente o filtrada por usuario y/o institución. Devuelve la tupla (sql, parametros).
+    """
+    filtros = []
+    parametros_filtro = []
+    if usuario_id is not None:
+        filtros.append("c.usuario_id = %s")
+        parametros_filtro.append(usuario_id)
+    if institucion:
+        filtros.append("u.institucion = %s")
+        parametros_filtro.append(institucion)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+    sql = f"""
+        SELECT
+            COALESCE(SUM(c.total), 0) AS total_incidentes,
+            COALESCE(SUM(CASE WHEN c.estado = %s THEN c.total END), 0) AS resueltos,
+            COALESCE(SUM(CASE WHEN c.estado = %s THEN c.total END), 0) AS en_proceso,
+            COALESCE(SUM(CASE WHEN c.estado = %s THEN c.total END), 0) AS pendientes,
+            COALESCE(SUM(CASE WHEN c.tipo = %s THEN c.total END), 0) AS infraestructura,
+            COALESCE(SUM(CASE WHEN c.tipo = %s THEN c.total END), 0) AS academico,
+            COUNT(DISTINCT CASE WHEN c.total > 0 THEN u.institucion END) AS instituciones,
+            (SELECT COUNT(DISTINCT institucion) FROM usuarios) AS total_instituciones
+        FROM contadores_incidentes c
+        LEFT JOIN usuarios u ON c.usuario_id = u.id
+        {where}
+    """
+    parametros = (
+        ESTADO_RESUELTO, ESTADO_EN_PROCESO, ESTADO_PENDIENTE,
+        TIPO_INFRAESTRUCTURA, TIPO_ACADEMICO,
+        *parametros_filtro,
+    )
+    return sql, parametros
+
+def calcular_metricas(cursor, usuario_id=None, institucion=None):
+    """
+    Calcula en un solo viaje a la base de datos los totales de incidentes, por estado y por tipo,
+    globales o filtrados por `usuario_id` y/o `institucion`, leyendo los contadores mantenidos
+    por las rutas de escritura. Acepta cursores de tupla o de diccionario.
+    """
+    sql, parametros = construir_consulta_metricas(usuario_id, institucion)
+    cursor.execute(sql, parametros)
+    fila = cursor.fetchone()
+    if not fila:
+        return dict(METRICAS_VACIAS)
+    if not isinstance(fila, dict):
+        fila = dict(zip(METRICAS_VACIAS, fila))
+    return {clave: int(fila.get(clave) or 0) for clave in METRICAS_VACIAS}
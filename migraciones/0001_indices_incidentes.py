@@ -0,0 +1,37 @@
+"""
+Índices compuestos para los filtros por estado y usuario y para el orden por fecha de registro
+de ambas tablas de incidentes.
+"""
+
+from migrador import crear_indice_si_no_existe
+
+INDICES = [
+    ('registro_infraestructura', 'idx_ri_usuario_estado', ['usuario_id', 'estado']),
+    ('registro_infraestructura', 'idx_ri_estado_fecha', ['estado', 'fecha_registro']),
+    ('registro_infraestructura', 'idx_ri_fecha', ['fecha_registro']),
+    ('registro_academico', 'idx_ra_usuario_estado', ['usuario_id', 'estado']),
+    ('registro_academico', 'idx_ra_estado_fecha', ['estado', 'fecha_registro']),
+    ('registro_academico', 'idx_ra_fecha', ['fecha_registro']),
+]
+
+VERIFICACIONES = [
+    # obtener_incidencias_por_estado
+    ("SELECT id, fecha_registro FROM registro_infraestructura WHERE estado = %s ORDER BY fecha_registro DESC",
+     ('Pendiente',), 'idx_ri_estado_fecha'),
+    ("SELECT id, fecha_registro FROM registro_academico WHERE estado = %s ORDER BY fecha_registro DESC",
+     ('Pendiente',), 'idx_ra_estado_fecha'),
+    # Conteos por usuario y estado (reconciliación de contadores, dashboard de colegios)
+    ("SELECT COUNT(*) FROM registro_infraestructura WHERE usuario_id = %s AND estado = %s",
+     (1, 'Resuelto'), 'idx_ri_usuario_estado'),
+    ("SELECT COUNT(*) FROM registro_academico WHERE usuario_id = %s AND estado = %s",
+     (1, 'Resuelto'), 'idx_ra_usuario_estado'),
+    # Paginación por cursor de /api/incidentes y obtener_ultima_incidencia
+    ("SELECT id, fecha_registro FROM registro_infraestructura ORDER BY fecha_registro DESC, id DESC LIMIT 50",
+     (), 'idx_ri_fecha'),
+    ("SELECT id, fecha_registro FROM registro_academico ORDER BY fecha_registro DESC LIMIT 1",
+     (), 'idx_ra_fecha'),
+]
+
+def aplicar(conexion):
+    for tabla, nombre, columnas in INDICES:
+        crear_indice_si_no_existe(conexion, tabla, nombre, columnas)
@@ -0,0 +1,25 @@
+"""
+Índice sobre usuarios(institucion) para las búsquedas y agrupaciones por institución.
+"""
+
+from migrador import crear_indice_si_no_existe
+
+VERIFICACIONES = [
+    # obtener_instituciones
+    ("SELECT DISTINCT institucion FROM usuarios WHERE institucion IS NOT NULL AND institucion != ''",
+     (), 'idx_usuarios_institucion'),
+    # obtener_incidente_por_nombre / actualizar_incidencia_por_nombre
+    ("""SELECT ri.id FROM registro_infraestructura ri
+        JOIN usuarios u ON ri.usuario_id = u.id
+        WHERE u.institucion = %s
+        ORDER BY ri.fecha_registro DESC LIMIT 1""",
+     ('Colegio XYZ',), 'idx_usuarios_institucion'),
+    # obtener_todas_las_evidencias_por_institucion
+    ("""SELECT r.id FROM registro_academico r
+        JOIN usuarios u ON r.usuario_id = u.id
+        WHERE u.institucion = %s""",
+     ('Colegio XYZ',), 'idx_usuarios_institucion'),
+]
+
+def aplicar(conexion):
+    crear_indice_si_no_existe(conexion, 'usuarios', 'idx_usuarios_institucion', ['institucion'])
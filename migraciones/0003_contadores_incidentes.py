@@ -0,0 +1,13 @@
+"""
+Crea `contadores_incidentes` en bases existentes y la llena desde las tablas de registro.
+"""
+
+from contadores import reconciliar_contadores
+
+VERIFICACIONES = [
+    # calcular_metricas para un usuario
+    ("SELECT SUM(total) FROM contadores_incidentes WHERE usuario_id = %s", (1,), 'PRIMARY'),
+]
+
+def aplicar(conexion):
+    reconciliar_contadores(conexion, corregir=True)
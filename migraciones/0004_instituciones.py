@@ -0,0 +1,55 @@
+"""
+Tabla `instituciones` con clave entera, `institucion_id` en usuarios y en ambas tablas de
+incidentes, relleno de los datos existentes, índices para las búsquedas por institución y claves
+foráneas hacia `instituciones` (ON DELETE SET NULL, como el texto libre que reemplazan).
+"""
+
+from instituciones import SQL_CREAR_TABLA, backfill_instituciones
+from migrador import agregar_columna_si_no_existe, crear_clave_foranea_si_no_existe, crear_indice_si_no_existe
+
+COLUMNAS = [
+    ('usuarios', 'institucion_id', 'INT NULL'),
+    ('registro_academico', 'institucion_id', 'INT NULL'),
+    ('registro_infraestructura', 'institucion_id', 'INT NULL'),
+]
+
+INDICES = [
+    ('usuarios', 'idx_usuarios_institucion_id', ['institucion_id']),
+    ('registro_academico', 'idx_ra_institucion_fecha', ['institucion_id', 'fecha_registro']),
+    ('registro_infraestructura', 'idx_ri_institucion_fecha', ['institucion_id', 'fecha_registro']),
+]
+
+CLAVES_FORANEAS = [
+    ('usuarios', 'fk_usuarios_institucion'),
+    ('registro_academico', 'fk_ra_institucion'),
+    ('registro_infraestructura', 'fk_ri_institucion'),
+]
+
+VERIFICACIONES = [
+    # obtener_incidente_por_nombre / actualizar_incidencia_por_nombre
+    ("""SELECT id FROM registro_infraestructura
+        WHERE institucion_id = (SELECT id FROM instituciones WHERE nombre = %s)
+        ORDER BY fecha_registro DESC LIMIT 1""",
+     ('Colegio XYZ',), 'idx_ri_institucion_fecha'),
+    # evidencias y registros académicos por institución
+    ("""SELECT id FROM registro_academico
+        WHERE institucion_id = (SELECT id FROM instituciones WHERE nombre = %s)""",
+     ('Colegio XYZ',), 'idx_ra_institucion_fecha'),
+    # obtener_instituciones
+    ("SELECT 1 FROM usuarios WHERE institucion_id = %s", (1,), 'idx_usuarios_institucion_id'),
+]
+
+def aplicar(conexion):
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(SQL_CREAR_TABLA)
+    finally:
+        cursor.close()
+    for tabla, columna, definicion in COLUMNAS:
+        agregar_columna_si_no_existe(conexion, tabla, columna, definicion)
+    backfill_instituciones(conexion)
+    for tabla, nombre, columnas in INDICES:
+        crear_indice_si_no_existe(conexion, tabla, nombre, columnas)
+    # Después de los índices: cada clave foránea usa el índice que empieza por `institucion_id`
+    for tabla, nombre in CLAVES_FORANEAS:
+        crear_clave_foranea_si_no_existe(conexion, tabla, nombre, 'institucion_id', 'instituciones(id)')
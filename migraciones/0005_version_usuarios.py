@@ -0,0 +1,14 @@
+"""
+Columna `usuarios.version`, que se incrementa en cada actualización del usuario y se guarda en
+la sesión para invalidar sesiones y perfiles en caché desactualizados.
+"""
+
+from migrador import agregar_columna_si_no_existe
+
+VERIFICACIONES = [
+    # obtener_perfil_usuario / autenticar_usuario
+    ("SELECT id, version FROM usuarios WHERE id = %s", (1,), 'PRIMARY'),
+]
+
+def aplicar(conexion):
+    agregar_columna_si_no_existe(conexion, 'usuarios', 'version', 'INT NOT NULL DEFAULT 1')
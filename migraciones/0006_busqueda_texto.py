@@ -0,0 +1,46 @@
+"""
+Índices FULLTEXT sobre las columnas de texto de ambas tablas de incidentes para la búsqueda
+por relevancia. Las columnas pasan a `utf8mb4_unicode_ci` (insensible a acentos y mayúsculas)
+antes de indexarlas, para que la comparación sin acentos se resuelva en el índice.
+"""
+
+from incidentes import COLUMNAS_TEXTO
+from metricas import TIPO_ACADEMICO, TIPO_INFRAESTRUCTURA
+from migrador import cambiar_intercalacion, crear_indice_si_no_existe
+
+INTERCALACION = 'utf8mb4_unicode_ci'
+
+# Definición vigente de cada columna indexada (MODIFY COLUMN exige repetirla completa)
+COLUMNAS = {
+    'registro_academico': [
+        ('motivo', 'TEXT NOT NULL'),
+        ('nombre_estudiante', 'VARCHAR(200) NOT NULL'),
+        ('comentarios', 'TEXT'),
+    ],
+    'registro_infraestructura': [
+        ('problema', 'VARCHAR(200) NOT NULL'),
+        ('descripcion_problema', 'TEXT NOT NULL'),
+        ('comentarios', 'TEXT'),
+    ],
+}
+
+INDICES = [
+    ('registro_academico', 'ft_ra_texto', list(COLUMNAS_TEXTO[TIPO_ACADEMICO])),
+    ('registro_infraestructura', 'ft_ri_texto', list(COLUMNAS_TEXTO[TIPO_INFRAESTRUCTURA])),
+]
+
+VERIFICACIONES = [
+    # /api/incidentes/buscar
+    ("""SELECT id FROM registro_academico
+        WHERE MATCH(motivo, nombre_estudiante, comentarios) AGAINST (%s IN BOOLEAN MODE)""",
+     ('pelea*',), 'ft_ra_texto'),
+    ("""SELECT id FROM registro_infraestructura
+        WHERE MATCH(problema, descripcion_problema, comentarios) AGAINST (%s IN BOOLEAN MODE)""",
+     ('filtracion*',), 'ft_ri_texto'),
+]
+
+def aplicar(conexion):
+    for tabla, columnas in COLUMNAS.items():
+        cambiar_intercalacion(conexion, tabla, columnas, INTERCALACION)
+    for tabla, nombre, columnas in INDICES:
+        crear_indice_si_no_existe(conexion, tabla, nombre, columnas, tipo='FULLTEXT')
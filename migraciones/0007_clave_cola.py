@@ -0,0 +1,23 @@
+"""
+Columna `clave_cola` en ambas tablas de incidentes, con índice único: identifica los incidentes
+escritos desde la cola de escrituras diferidas (ver `cola_escritura`) para que reintentar un lote
+ya confirmado no los duplique. Los incidentes escritos directamente la dejan en NULL.
+"""
+
+from migrador import agregar_columna_si_no_existe, crear_indice_si_no_existe
+
+INDICES = [
+    ('registro_academico', 'uq_ra_clave_cola'),
+    ('registro_infraestructura', 'uq_ri_clave_cola'),
+]
+
+VERIFICACIONES = [
+    # cola_escritura.escribir_lote
+    ("SELECT id, clave_cola FROM registro_academico WHERE clave_cola IN (%s)", ('0' * 32,), 'uq_ra_clave_cola'),
+    ("SELECT id, clave_cola FROM registro_infraestructura WHERE clave_cola IN (%s)", ('0' * 32,), 'uq_ri_clave_cola'),
+]
+
+def aplicar(conexion):
+    for tabla, nombre in INDICES:
+        agregar_columna_si_no_existe(conexion, tabla, 'clave_cola', 'CHAR(32) NULL')
+        crear_indice_si_no_existe(conexion, tabla, nombre, ['clave_cola'], tipo='UNIQUE')
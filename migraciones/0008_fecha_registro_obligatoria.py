@@ -0,0 +1,29 @@
+"""
+`fecha_registro` NOT NULL en ambas tablas de incidentes: la paginación por cursor recorre
+(fecha_registro, id) y una fecha nula quedaba fuera de `fecha_registro < %s`. Los registros
+académicos sin fecha toman la del incidente (`fecha` y `hora`); los de infraestructura, que no
+tienen otra, la mínima, para que sigan al final del orden descendente como hasta ahora.
+"""
+
+TABLAS = [
+    ('registro_academico', "TIMESTAMP(fecha, hora)"),
+    ('registro_infraestructura', "'1970-01-01 00:00:00'"),
+]
+
+VERIFICACIONES = [
+    # obtener_pagina_infraestructura
+    ("""SELECT id FROM registro_infraestructura
+        WHERE (fecha_registro < %s OR (fecha_registro = %s AND id < %s) OR fecha_registro IS NULL)
+        ORDER BY fecha_registro DESC, id DESC LIMIT 51""",
+     ('2025-01-01', '2025-01-01', 1), 'idx_ri_fecha'),
+]
+
+def aplicar(conexion):
+    cursor = conexion.cursor()
+    try:
+        for tabla, relleno in TABLAS:
+            cursor.execute(f"UPDATE {tabla} SET fecha_registro = {relleno} WHERE fecha_registro IS NULL")
+            cursor.execute(f"ALTER TABLE {tabla} MODIFY COLUMN fecha_registro DATETIME NOT NULL "
+                           f"DEFAULT CURRENT_TIMESTAMP")
+    finally:
+        cursor.close()
@@ -0,0 +1,206 @@
+import importlib
+import os
+import re
+
+# ---------------------- MIGRACIONES DE ESQUEMA ----------------------
+#
+# Cada archivo `migraciones/NNNN_descripcion.py` define:
+#   - aplicar(conexion): cambios idempotentes sobre el esquema o los datos.
+#   - VERIFICACIONES: lista de (consulta, parametros, indice_esperado) que se comprueban
+#     con EXPLAIN para demostrar que las consultas calientes usan los índices creados.
+# La versión aplicada se guarda en `schema_migraciones`.
+
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migraciones')
+PATRON_ARCHIVO = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+SQL_TABLA_VERSIONES = """
+    CREATE TABLE IF NOT EXISTS schema_migraciones (
+        version INT PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        aplicada_en DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+def listar_migraciones():
+    """
+    Devuelve la lista ordenada de migraciones disponibles como tuplas (version, nombre, modulo).
+    """
+    migraciones = []
+    for archivo in sorted(os.listdir(DIRECTORIO_MIGRACIONES)):
+        coincidencia = PATRON_ARCHIVO.match(archivo)
+        if not coincidencia:
+            continue
+        modulo = importlib.import_module(f"migraciones.{archivo[:-3]}")
+        migraciones.append((int(coincidencia.group(1)), coincidencia.group(2), modulo))
+    return migraciones
+
+def versiones_aplicadas(conexion):
+    """
+    Devuelve el conjunto de versiones registradas en `schema_migraciones`, creando la tabla si falta.
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(SQL_TABLA_VERSIONES)
+        cursor.execute("SELECT version FROM schema_migraciones")
+        return {fila[0] for fila in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def aplicar_pendientes(conexion, migraciones=None):
+    """
+    Aplica en orden las migraciones que aún no figuran en `schema_migraciones` y devuelve
+    la lista de (version, nombre) aplicadas. Se detiene en la primera que falle.
+    """
+    migraciones = listar_migraciones() if migraciones is None else migraciones
+    aplicadas = versiones_aplicadas(conexion)
+    nuevas = []
+    for version, nombre, modulo in migraciones:
+        if version in aplicadas:
+            continue
+        modulo.aplicar(conexion)
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO schema_migraciones (version, nombre) VALUES (%s, %s)", (version, nombre)
+            )
+            conexion.commit()
+        finally:
+            cursor.close()
+        nuevas.append((version, nombre))
+    return nuevas
+
+# ---------------------- AYUDANTES PARA MIGRACIONES ----------------------
+
+def indice_existe(cursor, tabla, nombre):
+    """
+    Indica si la tabla ya tiene un índice con ese nombre en la base de datos actual.
+    """
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (tabla, nombre))
+    return cursor.fetchone()[0] > 0
+
+def crear_indice_si_no_existe(conexion, tabla, nombre, columnas, tipo=''):
+    """
+    Crea el índice `nombre` sobre `columnas` si todavía no existe. `tipo` admite 'UNIQUE' o 'FULLTEXT'.
+    """
+    cursor = conexion.cursor()
+    try:
+        if indice_existe(cursor, tabla, nombre):
+            return False
+        prefijo = f"{tipo} " if tipo else ""
+        cursor.execute(f"CREATE {prefijo}INDEX {nombre} ON {tabla} ({', '.join(columnas)})")
+        return True
+    finally:
+        cursor.close()
+
+def clave_foranea_existe(cursor, tabla, nombre):
+    """
+    Indica si la tabla ya tiene una clave foránea con ese nombre en la base de datos actual.
+    """
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.table_constraints
+        WHERE table_schema = DATABASE() AND table_name = %s AND constraint_name = %s
+          AND constraint_type = 'FOREIGN KEY'
+    """, (tabla, nombre))
+    return cursor.fetchone()[0] > 0
+
+def crear_clave_foranea_si_no_existe(conexion, tabla, nombre, columna, referencia, al_borrar='SET NULL'):
+    """
+    Agrega la clave foránea `nombre` de `columna` hacia `referencia` ('tabla(columna)') si todavía
+    no existe.
+    """
+    cursor = conexion.cursor()
+    try:
+        if clave_foranea_existe(cursor, tabla, nombre):
+            return False
+        cursor.execute(f"ALTER TABLE {tabla} ADD CONSTRAINT {nombre} FOREIGN KEY ({columna}) "
+                       f"REFERENCES {referencia} ON DELETE {al_borrar}")
+        return True
+    finally:
+        cursor.close()
+
+def columna_existe(cursor, tabla, columna):
+    """
+    Indica si la tabla ya tiene la columna en la base de datos actual.
+    """
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (tabla, columna))
+    return cursor.fetchone()[0] > 0
+
+def agregar_columna_si_no_existe(conexion, tabla, columna, definicion):
+    """
+    Agrega `columna` con la `definicion` SQL indicada si todavía no existe.
+    """
+    cursor = conexion.cursor()
+    try:
+        if columna_existe(cursor, tabla, columna):
+            return False
+        cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+        return True
+    finally:
+        cursor.close()
+
+def cambiar_intercalacion(conexion, tabla, columnas, intercalacion, juego='utf8mb4'):
+    """
+    Cambia la intercalación de las `columnas` [(columna, definicion)] que aún no la tengan, en un
+    solo ALTER TABLE para reconstruir la tabla una única vez. Devuelve las columnas modificadas.
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND collation_name = %s
+              AND column_name IN ({', '.join(['%s'] * len(columnas))})
+        """, (tabla, intercalacion, *[columna for columna, _ in columnas]))
+        correctas = {fila[0].lower() for fila in cursor.fetchall()}
+        pendientes = [(columna, definicion) for columna, definicion in columnas
+                      if columna.lower() not in correctas]
+        if pendientes:
+            cursor.execute(f"ALTER TABLE {tabla} " + ', '.join(
+                f"MODIFY COLUMN {columna} {definicion} CHARACTER SET {juego} COLLATE {intercalacion}"
+                for columna, definicion in pendientes
+            ))
+        return [columna for columna, _ in pendientes]
+    finally:
+        cursor.close()
+
+def indices_usados(conexion, consulta, parametros=()):
+    """
+    Ejecuta EXPLAIN sobre la consulta y devuelve los índices elegidos y los candidatos.
+    """
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + consulta, parametros)
+        filas = cursor.fetchall()
+    finally:
+        cursor.close()
+    usados = {fila['key'] for fila in filas if fila.get('key')}
+    posibles = set()
+    for fila in filas:
+        posibles.update(k for k in (fila.get('possible_keys') or '').split(',') if k)
+    return usados, posibles
+
+def verificar_migraciones(conexion, migraciones=None):
+    """
+    Ejecuta las comprobaciones EXPLAIN de cada migración. Devuelve una lista de diccionarios con
+    la consulta, el índice esperado, los índices usados y si la comprobación se cumple.
+    """
+    migraciones = listar_migraciones() if migraciones is None else migraciones
+    resultados = []
+    for version, nombre, modulo in migraciones:
+        for consulta, parametros, indice in getattr(modulo, 'VERIFICACIONES', []):
+            usados, posibles = indices_usados(conexion, consulta, parametros)
+            resultados.append({
+                'version': version,
+                'migracion': nombre,
+                'consulta': ' '.join(consulta.split()),
+                'indice': indice,
+                'usados': sorted(usados),
+                'posibles': sorted(posibles),
+                'ok': indice in usados,
+            })
+    return resultados
@@ -0,0 +1,70 @@
+import base64
+import datetime
+
+# ---------------------- PAGINACIÓN POR CURSOR (KEYSET) ----------------------
+#
+# Las listas se ordenan por (fecha_registro DESC, id DESC). El cursor codifica el último
+# par (fecha_registro, id) entregado y la página siguiente empieza estrictamente después de
+# él, así que el costo de cada página no depende de cuántas se hayan recorrido antes.
+# `fecha_registro` es NOT NULL desde la migración 0008, pero el cursor y la condición aceptan una
+# fecha nula: MySQL ordena los NULL al final en orden descendente.
+
+LIMITE_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
+def normalizar_limite(limite):
+    """
+    Convierte el parámetro `limit` de la petición a un entero entre 1 y LIMITE_MAXIMO.
+    Lanza ValueError si no es numérico.
+    """
+    if limite in (None, ''):
+        return LIMITE_DEFECTO
+    return max(1, min(int(limite), LIMITE_MAXIMO))
+
+def codificar_cursor(fecha, id_registro):
+    """
+    Codifica el par (fecha_registro, id) como una cadena opaca segura para URLs. Una fecha nula
+    se codifica vacía.
+    """
+    valor = f"{fecha.isoformat() if fecha else ''}|{id_registro}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor):
+    """
+    Decodifica un cursor generado por `codificar_cursor` en (fecha o None, id). Devuelve None si no
+    se indicó cursor y lanza ValueError si el cursor no es válido.
+    """
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, id_registro = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+        return (datetime.datetime.fromisoformat(fecha) if fecha else None), int(id_registro)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+def condicion_keyset(columna_fecha, columna_id, posicion):
+    """
+    Devuelve la condición SQL y sus parámetros para continuar después de `posicion`.
+    Si `posicion` es None no se filtra nada. Las filas con fecha nula van después de todas las
+    demás, como en `ORDER BY fecha DESC`.
+    """
+    if posicion is None:
+        return "", ()
+    fecha, id_registro = posicion
+    if fecha is None:
+        return f"({columna_fecha} IS NULL AND {columna_id} < %s)", (id_registro,)
+    sql = (f"({columna_fecha} < %s OR ({columna_fecha} = %s AND {columna_id} < %s) "
+           f"OR {columna_fecha} IS NULL)")
+    return sql, (fecha, fecha, id_registro)
+
+def cortar_pagina(filas, limite, columna_fecha='fecha', columna_id='id'):
+    """
+    Recibe hasta `limite + 1` filas y devuelve (pagina, siguiente_cursor). El cursor es None
+    cuando no hay más resultados.
+    """
+    if len(filas) <= limite:
+        return filas, None
+    pagina = filas[:limite]
+    ultima = pagina[-1]
+    return pagina, codificar_cursor(ultima[columna_fecha], ultima[columna_id])
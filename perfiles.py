@@ -0,0 +1,95 @@
+import os
+
+from cache import CacheTTL
+
+# ---------------------- PERFILES DE USUARIO ----------------------
+#
+# La sesión solo guarda {'id': ..., 'v': ...}: el id del usuario y la versión de su fila en
+# `usuarios`. El perfil (proyección sin `clave`) se lee una vez y queda en una caché LRU del
+# proceso indexada por id y por correo. Al actualizar un usuario se incrementa `version`, de modo
+# que las sesiones emitidas antes del cambio dejan de ser válidas en cuanto el perfil se recarga.
+# Las entradas llevan la versión de 'usuarios' en la secuencia de escrituras compartida: cuando
+# otro worker modifica o elimina un usuario, los perfiles en caché de este proceso dejan de valer
+# en la siguiente petición, sin esperar a `PERFILES_TTL`.
+
+COLUMNAS_PERFIL = ("id, nombre, apellido, correo_electronico, telefono, institucion, institucion_id, "
+                   "version")
+
+# El administrador se autentica con una clave fija y no tiene fila propia que versionar
+VERSION_ADMIN = 0
+PERFIL_ADMIN = {
+    'id': 1,
+    'nombre': 'Administrador',
+    'apellido': 'Principal',
+    'correo': 'admin@gmail.com',
+    'correo_electronico': 'admin@gmail.com',
+    'telefono': None,
+    'institucion': None,
+    'institucion_id': None,
+    'version': VERSION_ADMIN,
+}
+
+perfiles = CacheTTL(
+    max_entradas=int(os.getenv('PERFILES_MAX_ENTRADAS', '1024')),
+    ttl=float(os.getenv('PERFILES_TTL', '300')),
+    recursos={'': ('usuarios',)},
+)
+
+def datos_sesion(perfil):
+    """
+    Devuelve lo que se guarda en la cookie de sesión para el perfil: solo id y versión.
+    """
+    return {'id': perfil['id'], 'v': perfil['version']}
+
+def es_admin(datos):
+    """
+    Indica si los datos de sesión corresponden al administrador.
+    """
+    return bool(datos) and datos.get('v') == VERSION_ADMIN and datos.get('id') == PERFIL_ADMIN['id']
+
+def guardar_perfil(perfil):
+    """
+    Guarda el perfil en la caché bajo su id y su correo. La clave por correo apunta al id.
+    """
+    perfiles.guardar(f"id:{perfil['id']}", perfil)
+    perfiles.guardar(f"correo:{perfil['correo_electronico']}", perfil['id'])
+
+def perfil_en_cache(usuario_id=None, correo=None):
+    """
+    Busca un perfil en la caché por id o por correo. Devuelve None si no está o si el correo
+    ya no corresponde al perfil guardado.
+    """
+    if usuario_id is None:
+        encontrado, usuario_id = perfiles.obtener(f"correo:{correo}")
+        if not encontrado:
+            return None
+    encontrado, perfil = perfiles.obtener(f"id:{usuario_id}")
+    if not encontrado or (correo is not None and perfil['correo_electronico'] != correo):
+        return None
+    return perfil
+
+def invalidar_perfil(usuario_id):
+    """
+    Elimina de la caché el perfil del usuario y su entrada por correo.
+    """
+    encontrado, perfil = perfiles.obtener(f"id:{usuario_id}")
+    perfiles.invalidar(f"id:{usuario_id}")
+    if encontrado:
+        perfiles.invalidar(f"correo:{perfil['correo_electronico']}")
+
+def autenticar(cursor, correo, clave):
+    """
+    Verifica las credenciales y devuelve el perfil del usuario en una sola consulta, o None.
+    """
+    cursor.execute(
+        f"SELECT {COLUMNAS_PERFIL} FROM usuarios WHERE correo_electronico = %s AND clave = %s",
+        (correo, clave)
+    )
+    return cursor.fetchone()
+
+def leer_perfil(cursor, usuario_id):
+    """
+    Lee el perfil del usuario por id, o None si no existe.
+    """
+    cursor.execute(f"SELECT {COLUMNAS_PERFIL} FROM usuarios WHERE id = %s", (usuario_id,))
+    return cursor.fetchone()
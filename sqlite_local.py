@@ -0,0 +1,43 @@
+import sqlite3
+
+# ---------------------- SQLITE LOCAL ----------------------
+#
+# Conexión a los archivos SQLite que comparten los workers de un mismo servidor (limitador de
+# login, secuencia de escrituras, cola de escrituras diferidas, métricas). Todas se abren igual:
+# modo autocommit (cada módulo abre sus transacciones con `BEGIN IMMEDIATE`), espera de hasta
+# 5 s si otro proceso tiene el archivo bloqueado y diario WAL para que las lecturas no esperen
+# a las escrituras.
+
+def conectar_sqlite(ruta, sincrono=None):
+    """
+    Abre el archivo SQLite `ruta` y devuelve la conexión envuelta para usarla con `with`.
+    `sincrono` fija `PRAGMA synchronous` (p. ej. 'FULL') cuando el módulo lo necesita.
+    """
+    conexion = sqlite3.connect(ruta, timeout=5.0, isolation_level=None)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    if sincrono:
+        conexion.execute(f"PRAGMA synchronous={sincrono}")
+    return _Conexion(conexion)
+
+
+class _Conexion:
+    """
+    Conexión SQLite usada como contexto: confirma la transacción abierta al salir (o la deshace
+    si hubo error) y cierra la conexión.
+    """
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __enter__(self):
+        return self._conexion
+
+    def __exit__(self, tipo, *exc):
+        try:
+            if self._conexion.in_transaction:
+                self._conexion.execute("ROLLBACK" if tipo else "COMMIT")
+        finally:
+            self._conexion.close()
@@ -21,11 +21,89 @@ document.addEventListener('DOMContentLoaded', () => {
             });
     }
 
+    // Contenido inicial del panel, para volver a él sin recargar la página
+    const contenidoPrincipal = document.getElementById("main-content");
+    const vistaInicial = Array.from(contenidoPrincipal.childNodes);
+
     /**
-     * Recarga la página para volver a la vista inicial.
+     * Vuelve a la vista inicial (métricas, gráficos e incidentes recientes) sin recargar la página;
+     * la vista se mantiene al día con los eventos en tiempo real.
      */
     function mostrarInicio() {
-        location.reload();
+        contenidoPrincipal.replaceChildren(...vistaInicial);
+    }
+
+    // Incidentes marcados para el cambio de estado en lote, como "tipo:id"
+    const seleccionados = new Set();
+
+    /**
+     * Sincroniza la selección con las casillas visibles y muestra u oculta las acciones en lote.
+     */
+    function actualizarSeleccion() {
+        seleccionados.clear();
+        document.querySelectorAll("#resultadosEstado .seleccion-lote:checked").forEach(casilla => {
+            seleccionados.add(`${casilla.dataset.tipo}:${casilla.dataset.id}`);
+        });
+        const acciones = document.getElementById("accionesLote");
+        if (acciones) acciones.style.display = seleccionados.size ? '' : 'none';
+        const contador = document.getElementById("contadorSeleccion");
+        if (contador) contador.textContent = seleccionados.size;
+    }
+
+    /**
+     * Marca o desmarca todos los incidentes listados.
+     * @param {boolean} marcar
+     */
+    function seleccionarTodos(marcar) {
+        document.querySelectorAll("#resultadosEstado .seleccion-lote").forEach(casilla => {
+            casilla.checked = marcar;
+        });
+        actualizarSeleccion();
+    }
+
+    /**
+     * Envía el estado (y el comentario opcional) elegido para todos los incidentes seleccionados
+     * en una sola petición e informa los que no se pudieron actualizar.
+     */
+    function aplicarEstadoLote() {
+        if (!seleccionados.size) return;
+        const boton = document.getElementById("btnAplicarLote");
+        const estado = document.getElementById("estadoLote").value;
+        const comentarios = document.getElementById("comentariosLote").value.trim();
+        const cambios = Array.from(seleccionados).map(clave => {
+            const [tipo, id] = clave.split(":");
+            return { id: Number(id), tipo, estado, comentarios: comentarios || null };
+        });
+
+        boton.disabled = true;
+        fetch("/api/incidentes/estado", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ cambios })
+        })
+            .then(async res => {
+                const data = await res.json().catch(() => ({}));
+                if (!res.ok) throw new Error(data.error || `Error ${res.status}`);
+                return data;
+            })
+            .then(data => {
+                const fallidos = data.resultados.filter(r => !r.ok);
+                let mensaje = `${data.actualizados} incidente(s) actualizado(s).`;
+                if (fallidos.length) {
+                    mensaje += `\n${fallidos.length} con error:\n` + fallidos.map(r => `• ${r.tipo} ${r.id}: ${r.error}`).join("\n");
+                }
+                alert(mensaje);
+                seleccionados.clear();
+                document.getElementById("comentariosLote").value = '';
+                filtrarPorEstado();
+            })
+            .catch(err => {
+                console.error("Error al actualizar en lote:", err);
+                alert(`Error al actualizar los incidentes: ${err.message}`);
+            })
+            .finally(() => {
+                boton.disabled = false;
+            });
     }
 
     /**
@@ -38,6 +116,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!estadoSeleccionado || estadoSeleccionado === "todos") {
             contenedor.innerHTML = `
         <p class="text-muted">Seleccione un estado para ver detalles de las instituciones.</p>`;
+            actualizarSeleccion();
             return;
         }
 
@@ -61,6 +140,7 @@ document.addEventListener('DOMContentLoaded', () => {
             <div class='alert alert-warning'>
               <i class="bi bi-exclamation-circle"></i> No se encontraron registros en este estado.
             </div>`;
+                    actualizarSeleccion();
                     return [];
                 }
                 if (!res.ok) {
@@ -82,9 +162,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 const html = data.map(item => {
                     const tipo = item.tipo ? item.tipo.toLowerCase() : 'infraestructura';
                     const tipoNormalizado = tipo.normalize("NFD").replace(/[\u0300-\u036f]/g, "");
+                    const marcado = seleccionados.has(`${tipoNormalizado}:${item.id}`) ? "checked" : "";
                     return `
             <div class="card mb-3 shadow-sm">
               <div class="card-body position-relative">
+                <input class="form-check-input seleccion-lote float-start me-2" type="checkbox" title="Seleccionar"
+                  data-id="${item.id}" data-tipo="${tipoNormalizado}" onchange="actualizarSeleccion()" ${marcado}>
                 <div class="position-absolute top-0 end-0 m-2">
                   <button class="btn btn-sm btn-outline-primary me-1" onclick="abrirModalVer('${item.id}', '${tipoNormalizado}')" title="Ver">
                     <i class="bi bi-eye"></i>
@@ -102,7 +185,12 @@ document.addEventListener('DOMContentLoaded', () => {
             </div>
           `;
                 }).join("");
-                contenedor.innerHTML = html;
+                contenedor.innerHTML = `
+            <div class="form-check mb-2">
+              <input class="form-check-input" type="checkbox" id="seleccionarTodosLote" onchange="seleccionarTodos(this.checked)">
+              <label class="form-check-label small" for="seleccionarTodosLote">Seleccionar todos</label>
+            </div>` + html;
+                actualizarSeleccion();
             })
             .catch(err => {
                 const timestamp = new Date().toLocaleString();
@@ -233,7 +321,6 @@ document.addEventListener('DOMContentLoaded', () => {
                     const modal = bootstrap.Modal.getInstance(document.getElementById("modalEditarIncidente"));
                     modal.hide();
                     alert(resp.message || "Incidente actualizado con éxito");
-                    location.reload();
                 })
                 .catch(err => {
                     console.error("Error al actualizar:", err);
@@ -242,6 +329,135 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    /**
+     * Crea la fila de la tabla de incidentes recientes para un incidente de infraestructura.
+     * @param {Object} item - Incidente con id, fecha, problema, descripcion y estado.
+     * @returns {HTMLTableRowElement}
+     */
+    function crearFilaReciente(item) {
+        const fila = document.createElement("tr");
+        fila.dataset.id = item.id;
+        [["id", item.id], ["fecha", item.fecha], ["problema", item.problema],
+         ["descripcion", item.descripcion], ["estado", item.estado]].forEach(([campo, valor]) => {
+            const celda = document.createElement("td");
+            if (campo !== "id" && campo !== "fecha") celda.dataset.campo = campo;
+            celda.textContent = valor ?? '';
+            fila.appendChild(celda);
+        });
+        const acciones = document.createElement("td");
+        acciones.innerHTML = `
+            <button class="btn btn-sm btn-outline-primary" title="Ver">
+              <i class="bi bi-eye"></i>
+            </button>`;
+        acciones.querySelector("button").addEventListener("click", () => abrirModalVer(item.id, "infraestructura"));
+        fila.appendChild(acciones);
+        return fila;
+    }
+
+    /**
+     * Carga la siguiente página de incidentes recientes usando el cursor guardado en el botón
+     * y agrega las filas al final de la tabla.
+     */
+    function cargarMasIncidentes() {
+        const boton = document.getElementById("btnCargarMas");
+        const cuerpo = document.getElementById("tablaIncidentesRecientesBody");
+        const siguiente = boton.dataset.siguiente;
+        if (!siguiente) return;
+
+        boton.disabled = true;
+        fetch(`/api/incidentes?after=${encodeURIComponent(siguiente)}`)
+            .then(res => {
+                if (!res.ok) throw new Error(`Error ${res.status}`);
+                return res.json();
+            })
+            .then(data => {
+                data.incidentes.forEach(item => cuerpo.appendChild(crearFilaReciente(item)));
+                boton.dataset.siguiente = data.siguiente || '';
+                boton.style.display = data.siguiente ? '' : 'none';
+            })
+            .catch(err => {
+                console.error("Error al cargar más incidentes:", err);
+                alert(`No se pudieron cargar más incidentes: ${err.message}`);
+            })
+            .finally(() => {
+                boton.disabled = false;
+            });
+    }
+
+    /**
+     * Busca incidentes por texto en el servidor (índice FULLTEXT, ordenados por relevancia) y
+     * muestra la página indicada en el contenedor principal.
+     * @param {number} pagina - Número de página (desde 1).
+     */
+    function buscarIncidentes(pagina) {
+        const texto = document.getElementById("textoBusqueda").value.trim();
+        if (!texto) return;
+
+        fetch(`/api/incidentes/buscar?q=${encodeURIComponent(texto)}&pagina=${pagina}`)
+            .then(async res => {
+                if (!res.ok) {
+                    const error = await res.json().catch(() => ({}));
+                    throw new Error(error.error || `Error ${res.status}`);
+                }
+                return res.json();
+            })
+            .then(data => {
+                const contenedor = document.createElement("div");
+                contenedor.className = "mt-3";
+                contenedor.innerHTML = `
+          <h5 class="fw-bold mb-3"><i class="bi bi-search"></i> Resultados</h5>
+          <div class="table-responsive">
+            <table class="table table-hover align-middle">
+              <thead class="table-light">
+                <tr><th>#</th><th>Tipo</th><th>Institución</th><th>Descripción</th><th>Estado</th><th>Fecha</th><th></th></tr>
+              </thead>
+              <tbody></tbody>
+            </table>
+          </div>
+          <div class="d-flex gap-2">
+            <button class="btn btn-sm btn-outline-secondary" id="btnBusquedaAnterior">Anterior</button>
+            <button class="btn btn-sm btn-outline-secondary" id="btnBusquedaSiguiente">Siguiente</button>
+          </div>`;
+                const cuerpo = contenedor.querySelector("tbody");
+                if (data.incidentes.length === 0) {
+                    cuerpo.innerHTML = `<tr><td colspan="7" class="text-muted">No se encontraron incidentes.</td></tr>`;
+                }
+                data.incidentes.forEach(item => {
+                    const tipo = item.tipo.toLowerCase().normalize("NFD").replace(/[\u0300-\u036f]/g, "");
+                    const fila = document.createElement("tr");
+                    [item.id, item.tipo, item.institucion, item.problema || item.descripcion, item.estado, item.fecha]
+                        .forEach(valor => {
+                            const celda = document.createElement("td");
+                            celda.textContent = valor ?? '';
+                            fila.appendChild(celda);
+                        });
+                    const acciones = document.createElement("td");
+                    acciones.innerHTML = `
+            <button class="btn btn-sm btn-outline-primary" title="Ver"><i class="bi bi-eye"></i></button>`;
+                    acciones.querySelector("button").addEventListener("click", () => abrirModalVer(item.id, tipo));
+                    fila.appendChild(acciones);
+                    cuerpo.appendChild(fila);
+                });
+
+                const anterior = contenedor.querySelector("#btnBusquedaAnterior");
+                const siguiente = contenedor.querySelector("#btnBusquedaSiguiente");
+                anterior.disabled = pagina <= 1;
+                siguiente.disabled = !data.siguiente;
+                anterior.addEventListener("click", () => buscarIncidentes(pagina - 1));
+                siguiente.addEventListener("click", () => buscarIncidentes(data.siguiente));
+                contenidoPrincipal.replaceChildren(contenedor);
+            })
+            .catch(err => {
+                console.error("Error al buscar incidentes:", err);
+                alert(`No se pudo realizar la búsqueda: ${err.message}`);
+            });
+    }
+
+    // Métricas vigentes; se ajustan con cada evento en tiempo real
+    const metricas = { total: 0, resueltos: 0, enProceso: 0 };
+    let graficoBarra = null;
+    let graficoDona = null;
+
     // Inicializa los gráficos de barras y dona
     const barra = document.getElementById('graficoIncidentes');
     if (barra) {
@@ -249,8 +465,9 @@ document.addEventListener('DOMContentLoaded', () => {
         const resueltos = parseInt(barra.dataset.resueltos);
         const enProceso = parseInt(barra.dataset.enProceso);
         const pendientes = total - resueltos - enProceso;
+        Object.assign(metricas, { total, resueltos, enProceso });
 
-        new Chart(barra, {
+        graficoBarra = new Chart(barra, {
             type: 'bar',
             data: {
                 labels: ['Resueltos', 'En Proceso', 'Pendientes'],
@@ -280,7 +497,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         const porcentajes = [resueltos, enProceso, pendientes].map(x => Math.round((x / total) * 100));
 
-        new Chart(donut, {
+        graficoDona = new Chart(donut, {
             type: 'doughnut',
             data: {
                 labels: [`Resueltos (${porcentajes[0]}%)`, `En Proceso (${porcentajes[1]}%)`, `Pendientes (${porcentajes[2]}%)`],
@@ -299,12 +516,86 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    /**
+     * Suma `delta` a la métrica que corresponde al estado ('Pendiente' no tiene contador propio).
+     */
+    function sumarEstado(estado, delta) {
+        if (estado === "Resuelto") metricas.resueltos += delta;
+        else if (estado === "En proceso") metricas.enProceso += delta;
+    }
+
+    /**
+     * Refleja las métricas vigentes en las tarjetas y en los gráficos.
+     */
+    function pintarMetricas() {
+        const { total, resueltos, enProceso } = metricas;
+        const pendientes = total - resueltos - enProceso;
+        const valores = [resueltos, enProceso, pendientes];
+        [["metricaTotal", total], ["metricaResueltos", resueltos], ["metricaEnProceso", enProceso]].forEach(([id, valor]) => {
+            const elemento = document.getElementById(id);
+            if (elemento) elemento.textContent = valor;
+        });
+        if (graficoBarra) {
+            graficoBarra.data.datasets[0].data = valores;
+            graficoBarra.update();
+        }
+        if (graficoDona) {
+            const porcentajes = valores.map(x => total ? Math.round((x / total) * 100) : 0);
+            graficoDona.data.labels = [`Resueltos (${porcentajes[0]}%)`, `En Proceso (${porcentajes[1]}%)`, `Pendientes (${porcentajes[2]}%)`];
+            graficoDona.data.datasets[0].data = porcentajes;
+            graficoDona.update();
+        }
+    }
+
+    /**
+     * Aplica un evento `incidente` recibido por Socket.IO: ajusta métricas y gráficos, agrega o
+     * actualiza la fila de incidentes recientes y refresca el filtro por estado si hay uno activo.
+     * @param {Object} evento - {accion: 'nuevo'|'actualizado', tipo, id, estado, ...}
+     */
+    function aplicarEvento(evento) {
+        if (evento.accion === "nuevo") {
+            metricas.total += 1;
+            sumarEstado(evento.estado, 1);
+        } else if (evento.accion === "actualizado" && evento.estado !== evento.estado_anterior) {
+            sumarEstado(evento.estado_anterior, -1);
+            sumarEstado(evento.estado, 1);
+        }
+        pintarMetricas();
+
+        const cuerpo = document.getElementById("tablaIncidentesRecientesBody");
+        if (cuerpo && evento.tipo === "Infraestructura") {
+            const fila = cuerpo.querySelector(`tr[data-id="${evento.id}"]`);
+            if (evento.accion === "nuevo" && !fila) {
+                cuerpo.prepend(crearFilaReciente(evento));
+            } else if (evento.accion === "actualizado" && fila) {
+                ["problema", "descripcion", "estado"].forEach(campo => {
+                    const celda = fila.querySelector(`[data-campo="${campo}"]`);
+                    if (celda && evento[campo] != null) celda.textContent = evento[campo];
+                });
+            }
+        }
+
+        const selector = document.getElementById("selectorEstado");
+        if (selector && selector.value && selector.value !== "todos") filtrarPorEstado();
+    }
+
+    // Suscripción a los cambios de incidentes (reemplaza a la consulta periódica)
+    if (window.io) {
+        const socket = io();
+        socket.on("incidente", aplicarEvento);
+    }
+
     // Asocia funciones al objeto window para acceso global
     window.cargarVista = cargarVista;
     window.mostrarInicio = mostrarInicio;
     window.filtrarPorEstado = filtrarPorEstado;
     window.abrirModalVer = abrirModalVer;
     window.abrirModalEditar = abrirModalEditar;
+    window.cargarMasIncidentes = cargarMasIncidentes;
+    window.actualizarSeleccion = actualizarSeleccion;
+    window.seleccionarTodos = seleccionarTodos;
+    window.aplicarEstadoLote = aplicarEstadoLote;
+    window.buscarIncidentes = buscarIncidentes;
 
     // Protección contra clic derecho
     const redirectURL = 'https://encrypted-tbn0.gstatic.com/images?q=tbn9GcRQIRW5IsZOudQmVobxbJs4CcbYUIfFz-kmFg&s';
@@ -20,11 +20,15 @@ function cargarVista(url) {
     });
 }
 
+// Contenido inicial del panel, para volver a él sin recargar la página
+let vistaInicial = null;
+
 /**
- * Recarga la página para volver a la vista inicial.
+ * Vuelve a la vista inicial (métricas e incidentes) sin recargar la página; la vista se mantiene al
+ * día con los eventos en tiempo real.
  */
 function mostrarInicio() {
-  location.reload();
+  if (vistaInicial) document.getElementById("main-content").replaceChildren(...vistaInicial);
 }
 
 /**
@@ -89,10 +93,14 @@ function filtrarIncidentes() {
   }
 
   // Controla la visibilidad de la tabla y los mensajes según los resultados
-  if (filtro === '' && incidentesContainer) {
+  if (rows.length === 0) {
     tablaContainer.style.display = 'none';
     noResultadosInicial.style.display = '';
     noResultadosFiltro.style.display = 'none';
+  } else if (filtro === '' && incidentesContainer) {
+    tablaContainer.style.display = 'none';
+    noResultadosInicial.style.display = 'none';
+    noResultadosFiltro.style.display = 'none';
   } else if (hasVisibleRows) {
     tablaContainer.style.display = '';
     noResultadosInicial.style.display = 'none';
@@ -191,6 +199,115 @@ Verifica si el backend está respondiendo correctamente o si los datos están ma
     });
 }
 
+/**
+ * Pinta el estado en la celda con la misma insignia que la plantilla.
+ * @param {HTMLElement} celda - Celda `data-campo="estado"`.
+ * @param {string} estado - Estado del incidente.
+ */
+function pintarEstado(celda, estado) {
+  const badge = document.createElement("span");
+  badge.className = `badge bg-${estado === 'Resuelto' ? 'success' : 'warning'}`;
+  badge.textContent = estado;
+  celda.replaceChildren(badge);
+}
+
+/**
+ * Crea la fila de la tabla para un incidente recibido en tiempo real.
+ * @param {Object} evento - Evento `incidente` con acción 'nuevo'.
+ * @param {string} tipo - 'academico' o 'infraestructura'.
+ * @returns {HTMLTableRowElement}
+ */
+function crearFilaIncidente(evento, tipo) {
+  const fila = document.createElement("tr");
+  fila.dataset.tipo = tipo;
+  fila.dataset.id = evento.id;
+  fila.dataset.estado = evento.estado;
+  const valores = [
+    ["", ""],
+    ["", evento.institucion],
+    ["", tipo === "academico" ? (evento.nombre_estudiante || 'Sin estudiante') : ''],
+    ["", tipo === "infraestructura" ? (evento.problema || 'Sin tipo') : ''],
+    ["", evento.correo],
+    ["", evento.telefono],
+    ["estado", ""],
+    ["descripcion", evento.descripcion],
+    ["comentarios", evento.comentarios || 'Sin comentarios'],
+    ["", evento.fecha]
+  ];
+  valores.forEach(([campo, valor]) => {
+    const celda = document.createElement("td");
+    if (campo) celda.dataset.campo = campo;
+    celda.textContent = valor ?? '';
+    fila.appendChild(celda);
+  });
+  pintarEstado(fila.querySelector('[data-campo="estado"]'), evento.estado);
+  const acciones = document.createElement("td");
+  const boton = document.createElement("button");
+  boton.className = "btn btn-sm btn-primary";
+  boton.textContent = "Editar";
+  boton.addEventListener("click", () => abrirModalEditar(String(evento.id), tipo));
+  acciones.appendChild(boton);
+  fila.appendChild(acciones);
+  return fila;
+}
+
+/**
+ * Suma `delta` a la tarjeta de métrica indicada.
+ */
+function sumarMetrica(id, delta) {
+  const elemento = document.getElementById(id);
+  if (elemento) elemento.textContent = (parseInt(elemento.textContent) || 0) + delta;
+}
+
+/**
+ * Suma `delta` a la métrica que corresponde al estado ('Pendiente' no tiene tarjeta propia).
+ */
+function sumarEstado(estado, delta) {
+  if (estado === "Resuelto") sumarMetrica("metricaResueltos", delta);
+  else if (estado === "En proceso") sumarMetrica("metricaEnProceso", delta);
+}
+
+/**
+ * Aplica un evento `incidente` recibido por Socket.IO a la tabla y a las métricas del usuario.
+ * Solo se muestran los incidentes propios: un incidente reasignado a otro usuario sale de la tabla.
+ * @param {Object} evento - {accion: 'nuevo'|'actualizado', tipo, id, usuario_id, estado, ...}
+ */
+function aplicarEvento(evento) {
+  const cuerpo = document.getElementById("tablaIncidentesBody");
+  const usuarioId = document.getElementById("main-content").dataset.usuarioId;
+  if (!cuerpo) return;
+
+  const tipo = (evento.tipo || '').toLowerCase().normalize("NFD").replace(/[\u0300-\u036f]/g, "");
+  const propio = String(evento.usuario_id) === usuarioId;
+  const fila = cuerpo.querySelector(`tr[data-tipo="${tipo}"][data-id="${evento.id}"]`);
+
+  if (evento.accion === "nuevo") {
+    if (!propio || fila) return;
+    cuerpo.prepend(crearFilaIncidente(evento, tipo));
+    sumarMetrica("metricaTotal", 1);
+    sumarEstado(evento.estado, 1);
+  } else if (evento.accion === "actualizado" && fila) {
+    sumarEstado(fila.dataset.estado, -1);
+    if (!propio) {
+      fila.remove();
+      sumarMetrica("metricaTotal", -1);
+    } else {
+      fila.dataset.estado = evento.estado;
+      sumarEstado(evento.estado, 1);
+      pintarEstado(fila.querySelector('[data-campo="estado"]'), evento.estado);
+      ["descripcion", "comentarios"].forEach(campo => {
+        if (evento[campo] != null) fila.querySelector(`[data-campo="${campo}"]`).textContent = evento[campo];
+      });
+    }
+  } else {
+    return;
+  }
+
+  // Renumera las filas y vuelve a aplicar el filtro seleccionado
+  Array.from(cuerpo.rows).forEach((tr, indice) => { tr.cells[0].textContent = indice + 1; });
+  filtrarIncidentes();
+}
+
 // Asocia funciones al objeto window para que sean accesibles desde HTML
 window.cargarVista = cargarVista;
 window.mostrarInicio = mostrarInicio;
@@ -200,6 +317,15 @@ window.abrirModalEditar = abrirModalEditar;
 // Inicializa el filtrado de incidentes al cargar la página
 document.addEventListener('DOMContentLoaded', filtrarIncidentes);
 
+// Guarda la vista inicial y se suscribe a los cambios de incidentes (reemplaza a la consulta periódica)
+document.addEventListener('DOMContentLoaded', () => {
+  vistaInicial = Array.from(document.getElementById("main-content").childNodes);
+  if (window.io) {
+    const socket = io();
+    socket.on("incidente", aplicarEvento);
+  }
+});
+
 /**
  * Configura el evento de envío del formulario de edición al cargar la página.
  */
@@ -261,7 +387,6 @@ document.addEventListener('DOMContentLoaded', () => {
           const modal = bootstrap.Modal.getInstance(document.getElementById("modalEditarIncidente"));
           modal.hide();
           alert(resp.message || "Incidente actualizado con éxito");
-          location.reload();
         })
         .catch(err => {
           console.error("Error al guardar:", err);
@@ -2,18 +2,23 @@ document.addEventListener("DOMContentLoaded", function () {
   const selectInstitucion = document.getElementById("selectInstitucion");
   const preview = document.getElementById("preview");
 
+  // Muestra la miniatura con carga diferida. Si existe (las variantes se generan en segundo
+  // plano), el enlace abre la versión media; si no, se muestran la imagen y el enlace originales.
+  const miniatura = row => `
+    <a href="${row.evidencia}" target="_blank">
+      <img src="${row.evidencia_miniatura || row.evidencia}" alt="Evidencia" loading="lazy"
+           class="img-thumbnail" style="max-width: 120px"
+           data-media="${row.evidencia_media || ''}"
+           onload="if (this.dataset.media) this.parentNode.href = this.dataset.media"
+           onerror="this.onerror = null; this.dataset.media = ''; this.src = '${row.evidencia}'">
+    </a>`;
+
   selectInstitucion.addEventListener("change", () => {
     const institucion = selectInstitucion.value;
 
     preview.innerHTML = `<div class="text-center my-4"><div class="spinner-border text-primary" role="status"><span class="visually-hidden">Cargando...</span></div></div>`;
 
-    fetch("/api/evidencias", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({ institucion }),
-    })
+    fetch(`/api/evidencias?institucion=${encodeURIComponent(institucion)}`)
       .then(response => response.json())
       .then(data => {
         if (data.length === 0) {
@@ -46,7 +51,7 @@ document.addEventListener("DOMContentLoaded", function () {
                 <td>${row.estado}</td>
                 <td>${row.institucion}</td>
                 <td>
-                  ${row.evidencia ? `<a href="${row.evidencia}" target="_blank">Ver imagen</a>` : "No hay"}
+                  ${row.evidencia ? miniatura(row) : "No hay"}
                 </td>
               </tr>
             `;
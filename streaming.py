@@ -0,0 +1,117 @@
+import datetime
+import os
+
+from flask import Response, current_app, stream_with_context
+
+from paginacion import codificar_cursor
+
+# ---------------------- RESPUESTAS EN STREAMING ----------------------
+#
+# Las listas grandes (JSON o archivos exportados) se envían fila a fila desde un cursor sin
+# buffer (server-side), leyendo en lotes con fetchmany. La memoria por petición queda acotada por
+# el tamaño del lote y no por el tamaño de la tabla.
+
+TAMANO_LOTE = int(os.getenv('STREAM_TAMANO_LOTE', '500'))
+
+def iterar_filas(cursor, tamano_lote=TAMANO_LOTE):
+    """
+    Recorre el resultado del cursor en lotes de `tamano_lote` filas.
+    """
+    while True:
+        filas = cursor.fetchmany(tamano_lote)
+        if not filas:
+            return
+        yield from filas
+
+def serializar_fila(fila):
+    """
+    Convierte una fila a JSON con el proveedor de la app, pasando los TIME (timedelta) a texto.
+    """
+    fila = {clave: str(valor) if isinstance(valor, datetime.timedelta) else valor
+            for clave, valor in fila.items()}
+    return current_app.json.dumps(fila)
+
+def transmitir_json(conexion, consultas, clave=None, limite=None, columnas_cursor=None,
+                    tamano_lote=TAMANO_LOTE, transformar=None):
+    """
+    Ejecuta `consultas` (lista de (sql, parametros)) y transmite todas sus filas como un único array JSON.
+    La primera consulta se ejecuta antes de devolver la respuesta para que sus errores lleguen al llamador.
+    Si se indica `clave`, el array va dentro de {clave: [...], "siguiente": cursor}: se entregan como
+    máximo `limite` filas y, si existe una fila extra, se codifica un cursor con `columnas_cursor`.
+    `transformar(fila)`, si se indica, devuelve la fila a serializar (p. ej. con campos calculados).
+    La respuesta se hace cargo de la conexión y la devuelve al pool al cerrarse.
+    """
+    cursor = _abrir_cursor(conexion, consultas)
+
+    def generar():
+        yield '{"%s":[' % clave if clave else '['
+        entregadas = 0
+        ultima = None
+        siguiente = None
+        for indice, (sql, parametros) in enumerate(consultas):
+            if indice:
+                cursor.execute(sql, parametros)
+            for fila in iterar_filas(cursor, tamano_lote):
+                if limite is not None and entregadas == limite:
+                    siguiente = codificar_cursor(*(ultima[c] for c in columnas_cursor))
+                    # Lee el resto del resultado para dejar la conexión reutilizable
+                    for _ in iterar_filas(cursor, tamano_lote):
+                        pass
+                    break
+                yield (',' if entregadas else '') + serializar_fila(transformar(fila) if transformar else fila)
+                entregadas += 1
+                ultima = fila
+        if clave:
+            yield '],"siguiente":%s}' % current_app.json.dumps(siguiente)
+        else:
+            yield ']'
+
+    return _responder(conexion, cursor, generar(), 'application/json')
+
+def transmitir_archivo(conexion, consultas, escribir, mimetype, nombre_archivo, tamano_lote=TAMANO_LOTE):
+    """
+    Ejecuta `consultas` y transmite sus filas como un archivo descargable. `escribir(filas)` recibe
+    un iterador perezoso de filas y devuelve los fragmentos (bytes) del archivo, de modo que la
+    memoria no depende de la cantidad de filas. Como en `transmitir_json`, la primera consulta se
+    ejecuta antes de responder y la conexión se devuelve al pool al cerrarse la respuesta.
+    """
+    cursor = _abrir_cursor(conexion, consultas)
+
+    def filas():
+        for indice, (sql, parametros) in enumerate(consultas):
+            if indice:
+                cursor.execute(sql, parametros)
+            yield from iterar_filas(cursor, tamano_lote)
+
+    respuesta = _responder(conexion, cursor, escribir(filas()), mimetype)
+    respuesta.headers.set('Content-Disposition', 'attachment', filename=nombre_archivo)
+    return respuesta
+
+def _abrir_cursor(conexion, consultas):
+    """
+    Abre un cursor sin buffer y ejecuta la primera consulta; si falla, cierra el cursor y relanza.
+    """
+    cursor = conexion.cursor(dictionary=True, buffered=False)
+    try:
+        sql, parametros = consultas[0]
+        cursor.execute(sql, parametros)
+    except Exception:
+        cursor.close()
+        raise
+    return cursor
+
+def _responder(conexion, cursor, cuerpo, mimetype):
+    """
+    Envuelve el generador `cuerpo` en una respuesta que cierra el cursor y la conexión al terminar.
+    """
+    def liberar():
+        # Si el cliente cortó la descarga quedan filas sin leer: el pool descarta esa conexión
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conexion.close()
+
+    respuesta = Response(stream_with_context(cuerpo), mimetype=mimetype)
+    respuesta.call_on_close(liberar)
+    return respuesta
@@ -0,0 +1,111 @@
+"""
+Este archivo contiene pruebas unitarias para los activos estáticos versionados de `activos.py`.
+Se compila una carpeta `static` temporal y se sirve con una aplicación Flask mínima.
+"""
+
+import gzip
+import json
+
+import brotli
+import pytest
+from flask import Flask, render_template_string
+
+import activos
+from activos import construir_activos, nombre_versionado, registrar_activos
+
+CONTENIDO_JS = b"function saludar() { return 'hola'; }\n" * 50
+
+@pytest.fixture
+def carpeta_static(tmp_path):
+    """
+    Fixture que crea una carpeta `static` con un JS, un CSS, un vendor y una imagen (que no se compila).
+    """
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'vendor' / 'lib').mkdir(parents=True)
+    (tmp_path / 'js' / 'app.js').write_bytes(CONTENIDO_JS)
+    (tmp_path / 'css' / 'estilo.css').write_bytes(b"body{}")
+    (tmp_path / 'vendor' / 'lib' / 'lib.min.js').write_bytes(b"var lib = 1;" * 100)
+    (tmp_path / 'js' / 'logo.png').write_bytes(b"png")
+    yield tmp_path
+    activos.manifiesto.clear()
+
+@pytest.fixture
+def cliente(carpeta_static):
+    """
+    Fixture que compila los activos y devuelve un cliente de una app que los registra.
+    """
+    construir_activos(str(carpeta_static))
+    app = Flask(__name__, static_folder=str(carpeta_static), static_url_path='/static')
+    registrar_activos(app)
+    return app.test_client()
+
+def test_nombre_versionado_depende_del_contenido():
+    """
+    Prueba que el hash va antes de la extensión y cambia con el contenido.
+    """
+    uno = nombre_versionado('js/app.js', b'a')
+    assert uno.startswith('js/app.') and uno.endswith('.js')
+    assert uno != nombre_versionado('js/app.js', b'b')
+
+def test_construir_genera_manifiesto_y_comprimidos(carpeta_static):
+    """
+    Prueba que se versionan JS, CSS y vendor (no las imágenes), que se escriben las versiones
+    .gz y .br cuando son más pequeñas y que el manifiesto queda en disco.
+    """
+    generado = construir_activos(str(carpeta_static))
+    assert sorted(generado) == ['css/estilo.css', 'js/app.js', 'vendor/lib/lib.min.js']
+    dist = carpeta_static / 'dist'
+    assert json.loads((dist / 'manifest.json').read_text()) == generado
+
+    js = dist / generado['js/app.js']
+    assert js.read_bytes() == CONTENIDO_JS
+    assert gzip.decompress((dist / (generado['js/app.js'] + '.gz')).read_bytes()) == CONTENIDO_JS
+    assert brotli.decompress((dist / (generado['js/app.js'] + '.br')).read_bytes()) == CONTENIDO_JS
+    # Un archivo diminuto no gana nada comprimido
+    assert not (dist / (generado['css/estilo.css'] + '.gz')).exists()
+
+def test_url_for_emite_url_versionada(cliente, carpeta_static):
+    """
+    Prueba que `url_for('static', ...)` en plantillas apunta a la versión con hash y que los
+    archivos fuera del manifiesto conservan la URL normal.
+    """
+    with cliente.application.test_request_context():
+        html = render_template_string(
+            "{{ url_for('static', filename='js/app.js') }}|{{ url_for('static', filename='js/logo.png') }}"
+        )
+    versionada, normal = html.split('|')
+    assert versionada == f"/activos/{activos.manifiesto['js/app.js']}"
+    assert normal == '/static/js/logo.png'
+
+def test_sirve_brotli_gzip_o_plano_segun_accept_encoding(cliente):
+    """
+    Prueba que se elige .br, luego .gz, y si no se acepta compresión el archivo plano; siempre con
+    caché inmutable y `Vary: Accept-Encoding`.
+    """
+    url = f"/activos/{activos.manifiesto['js/app.js']}"
+
+    respuesta = cliente.get(url, headers={'Accept-Encoding': 'gzip, br'})
+    assert respuesta.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(respuesta.data) == CONTENIDO_JS
+    assert respuesta.mimetype == 'text/javascript'
+    assert 'immutable' in respuesta.headers['Cache-Control']
+    assert 'max-age=31536000' in respuesta.headers['Cache-Control']
+    assert 'Accept-Encoding' in respuesta.headers['Vary']
+
+    respuesta = cliente.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(respuesta.data) == CONTENIDO_JS
+
+    respuesta = cliente.get(url)
+    assert 'Content-Encoding' not in respuesta.headers
+    assert respuesta.data == CONTENIDO_JS
+
+def test_sin_manifiesto_no_se_versiona(carpeta_static):
+    """
+    Prueba que sin compilación previa las plantillas usan las URLs estáticas de siempre.
+    """
+    app = Flask(__name__, static_folder=str(carpeta_static), static_url_path='/static')
+    registrar_activos(app)
+    with app.test_request_context():
+        assert render_template_string("{{ url_for('static', filename='js/app.js') }}") == '/static/js/app.js'
@@ -0,0 +1,72 @@
+"""
+Este archivo contiene pruebas unitarias para el almacenamiento de evidencias por contenido
+definido en `almacenamiento.py`. Se usan archivos `FileStorage` en memoria y un directorio temporal.
+"""
+
+import hashlib
+import os
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from almacenamiento import extension_de, guardar_archivo, ruta_relativa
+
+def _subida(contenido, nombre='foto.jpg'):
+    return FileStorage(stream=BytesIO(contenido), filename=nombre)
+
+def test_ruta_relativa_reparte_por_hash():
+    """
+    Prueba que la ruta usa los primeros caracteres del hash como subdirectorios.
+    """
+    assert ruta_relativa('abcdef0123', 'png') == 'ab/cd/abcdef0123.png'
+
+def test_extension_normalizada():
+    """
+    Prueba que la extensión se pasa a minúsculas y que 'jpeg' se guarda como 'jpg'.
+    """
+    assert extension_de('Foto.JPEG') == 'jpg'
+    assert extension_de('plano.PNG') == 'png'
+    assert extension_de('sin_extension') == ''
+
+def test_guarda_por_contenido(tmp_path):
+    """
+    Prueba que el archivo se guarda bajo su SHA-256 y que la URL apunta a esa ruta.
+    """
+    contenido = b'x' * 200000
+    url = guardar_archivo(_subida(contenido), str(tmp_path), '/static/uploads')
+    digest = hashlib.sha256(contenido).hexdigest()
+    assert url == f"/static/uploads/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+    ruta = tmp_path / digest[:2] / digest[2:4] / f"{digest}.jpg"
+    assert ruta.read_bytes() == contenido
+    assert os.stat(ruta).st_mode & 0o777 == 0o644
+
+def test_mismo_nombre_distinto_contenido_no_se_pisan(tmp_path):
+    """
+    Prueba que dos subidas con el mismo nombre original y distinto contenido conservan ambos archivos.
+    """
+    url_a = guardar_archivo(_subida(b'colegio A'), str(tmp_path), '/u')
+    url_b = guardar_archivo(_subida(b'colegio B'), str(tmp_path), '/u')
+    assert url_a != url_b
+    for url in (url_a, url_b):
+        assert (tmp_path / url[len('/u/'):]).exists()
+
+def test_contenido_repetido_no_se_reescribe(tmp_path):
+    """
+    Prueba que una subida cuyo contenido ya existe devuelve la misma URL sin escribir de nuevo.
+    """
+    primera = guardar_archivo(_subida(b'igual', 'a.jpg'), str(tmp_path), '/u')
+    with patch('almacenamiento.tempfile.mkstemp') as mock_mkstemp:
+        segunda = guardar_archivo(_subida(b'igual', 'b.jpg'), str(tmp_path), '/u')
+    assert primera == segunda
+    mock_mkstemp.assert_not_called()
+
+def test_error_al_escribir_no_deja_temporales(tmp_path):
+    """
+    Prueba que si falla la escritura se elimina el archivo temporal y no queda el destino.
+    """
+    with patch('almacenamiento.os.replace', side_effect=OSError("disco lleno")):
+        with pytest.raises(OSError):
+            guardar_archivo(_subida(b'datos'), str(tmp_path), '/u')
+    assert [nombres for _, _, nombres in os.walk(tmp_path) if nombres] == []
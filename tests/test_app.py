@@ -8,8 +8,15 @@ y mocking para simular interacciones con la base de datos y
 asegurar un entorno aislado.
 """
 
+import hashlib
+import os
+import shutil
+import tempfile
 from flask_testing import TestCase
 from app import app, get_db_connection, allowed_file
+from perfiles import guardar_perfil, perfiles
+from limitador import limitador_login
+from tiempo_real import emitir_incidente, socketio
 from unittest.mock import patch, MagicMock, ANY
 from io import BytesIO
 from mysql.connector import Error
@@ -22,10 +29,13 @@ class TestApp(TestCase):
           como el manejo automático de errores en modo desarrollo.
         - Establece una clave secreta ficticia (`test-secret-key`) para las sesiones
           durante las pruebas, necesaria para la gestión de sesiones en Flask.
+        - Guarda las subidas en un directorio temporal para no escribir en `static/uploads`.
         - Retorna la instancia de la aplicación configurada para ser usada por Flask-Testing.
         """
         app.config['TESTING'] = True
         app.config['SECRET_KEY'] = 'test-secret-key'
+        self.carpeta_subidas = tempfile.mkdtemp()
+        app.config['UPLOAD_FOLDER'] = self.carpeta_subidas
         return app
 
     def setUp(self):
@@ -34,18 +44,20 @@ class TestApp(TestCase):
         - Crea un cliente de prueba (`self.client`) para simular solicitudes HTTP a la app.
         - Establece un contexto de aplicación (`self.app_context`) para que funciones como
           las sesiones y el acceso a `current_app` funcionen correctamente durante las pruebas.
-        - Reinicia las variables globales `intentos_fallidos` y `bloqueado` en el módulo `app`
-          a sus valores iniciales (0 y False) para evitar interferencias entre pruebas y
-          garantizar un estado limpio.
+        - Reinicia el limitador de intentos de login (fallos y contadores) para evitar
+          interferencias entre pruebas y garantizar un estado limpio.
+        - Simula `encolar_variantes` para no lanzar el pool de procesos de imágenes.
         """
         self.client = self.app.test_client()
         self.app_context = self.app.app_context()
         self.app_context.push()
 
-        # Reiniciar variables globales para un estado limpio
-        import app
-        app.intentos_fallidos = 0
-        app.bloqueado = False
+        # Reiniciar el limitador de login para un estado limpio
+        limitador_login.reiniciar()
+
+        encolar = patch('app.encolar_variantes')
+        self.mock_encolar_variantes = encolar.start()
+        self.addCleanup(encolar.stop)
 
     def tearDown(self):
         """
@@ -54,6 +66,20 @@ class TestApp(TestCase):
           y evitar efectos secundarios entre pruebas, como sesiones residuales o configuraciones.
         """
         self.app_context.pop()
+        perfiles.limpiar()
+        shutil.rmtree(self.carpeta_subidas, ignore_errors=True)
+
+    def iniciar_sesion(self, **datos):
+        """
+        Inicia sesión como un usuario de colegio: guarda su perfil en la caché de perfiles y
+        deja en la cookie solo el id y la versión, como hace el login.
+        """
+        perfil = {'id': 1, 'nombre': 'Juan', 'apellido': 'Perez', 'correo_electronico': 'juan@example.com',
+                  'telefono': None, 'institucion': 'Colegio XYZ', 'institucion_id': 1, 'version': 1}
+        perfil.update(datos)
+        guardar_perfil(perfil)
+        with self.client.session_transaction() as session:
+            session['usuario'] = {'id': perfil['id'], 'v': perfil['version']}
 
     @patch('app.get_db_connection')
     def test_login_success_admin(self, mock_db_connection):
@@ -83,35 +109,31 @@ class TestApp(TestCase):
         self.assertIn(b'Dashboard', response.data)  # Verifica redirección al dashboard
         with self.client.session_transaction() as session:
             self.assertIn('usuario', session)  # Verifica que la sesión se haya creado
-            self.assertEqual(session['usuario']['correo'], 'admin@gmail.com')  # Verifica datos del usuario
+            self.assertEqual(session['usuario'], {'id': 1, 'v': 0})  # Solo id y versión del administrador
 
     @patch('app.get_db_connection')
-    @patch('app.verificar_credenciales')
-    @patch('app.obtener_datos_usuario')
-    def test_login_success_user(self, mock_obtener_datos, mock_verificar, mock_db_connection):
+    @patch('app.autenticar_usuario')
+    def test_login_success_user(self, mock_autenticar, mock_db_connection):
         """
         Prueba el inicio de sesión exitoso para un usuario regular (no administrador).
-        - Simula la conexión a la base de datos y las funciones `verificar_credenciales` y
-          `obtener_datos_usuario` con mocks para aislar la lógica del endpoint.
-        - Configura los mocks para simular una autenticación exitosa (`verificar_credenciales=True`)
-          y datos de usuario válidos (un diccionario con id, nombre, apellido y correo).
+        - Simula la conexión a la base de datos y `autenticar_usuario`, que verifica las credenciales
+          y devuelve el perfil en una sola consulta.
         - Envía una solicitud POST al endpoint raíz ('/') con credenciales válidas:
           correo 'juan@example.com' y contraseña '123456'.
         - Verifica que:
           - El código de estado sea 200 (éxito tras redirección).
           - La respuesta contenga 'Dashboard', indicando que el usuario accedió a su dashboard.
-          - La sesión contenga los datos del usuario con el correo correcto.
-        Este test valida que los usuarios regulares puedan autenticarse y acceder a su área.
+          - La sesión guarde solo el id y la versión del usuario (sin clave ni datos personales).
         """
-        # Simular conexión y funciones de utils.py
         mock_db_connection.return_value = MagicMock()
-        mock_verificar.return_value = True
-        mock_obtener_datos.return_value = {
+        perfil = {
             'id': 1,
             'nombre': 'Juan',
             'apellido': 'Perez',
-            'correo': 'juan@example.com'
+            'correo_electronico': 'juan@example.com',
+            'version': 3
         }
+        mock_autenticar.side_effect = lambda correo, clave: guardar_perfil(perfil) or perfil
 
         # Simular solicitud de login
         response = self.client.post('/', data={
@@ -122,42 +144,58 @@ class TestApp(TestCase):
         # Verificaciones
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Dashboard', response.data)
+        mock_autenticar.assert_called_once_with('juan@example.com', '123456')
+        with self.client.session_transaction() as session:
+            self.assertEqual(session['usuario'], {'id': 1, 'v': 3})
+
+    def test_sesion_con_version_antigua_se_descarta(self):
+        """
+        Prueba que una sesión cuya versión no coincide con la del perfil (usuario actualizado
+        después del login) se descarta y redirige al login.
+        """
+        self.iniciar_sesion(version=2)
         with self.client.session_transaction() as session:
-            self.assertIn('usuario', session)
-            self.assertEqual(session['usuario']['correo'], 'juan@example.com')
+            session['usuario'] = {'id': 1, 'v': 1}
+        response = self.client.get('/dashboard_colegios')
+        self.assertEqual(response.status_code, 302)
+        with self.client.session_transaction() as session:
+            self.assertNotIn('usuario', session)
 
     @patch('app.get_db_connection')
     def test_login_blocked(self, mock_db_connection):
         """
         Prueba el comportamiento del login cuando el usuario está bloqueado por intentos fallidos.
         - Simula una conexión a la base de datos con un mock.
-        - Modifica las variables globales `intentos_fallidos` y `bloqueado` en el módulo `app`
-          para simular un estado de bloqueo (3 intentos fallidos y bloqueado=True).
+        - Registra en el limitador 3 intentos fallidos para la cuenta, simulando un estado de bloqueo.
         - Envía una solicitud POST al endpoint raíz ('/') con credenciales cualesquiera,
           ya que el bloqueo debería impedir el acceso independientemente de su validez.
         - Verifica que:
-          - El código de estado sea 200 (la página de login se renderiza nuevamente).
+          - El código de estado sea 429 (la página de login se renderiza con el bloqueo).
           - La respuesta contenga el mensaje 'Demasiados intentos fallidos', indicando que
             el sistema detectó el bloqueo y notificó al usuario.
+          - No se haya pedido ninguna conexión a la base de datos.
         Este test asegura que el mecanismo de seguridad de bloqueo funcione como se espera.
         """
         # Simular conexión a la base de datos
         mock_db_connection.return_value = MagicMock()
         
         # Simular estado de bloqueo
-        import app
-        app.intentos_fallidos = 3
-        app.bloqueado = True
+        for _ in range(3):
+            limitador_login.registrar_fallo('10.0.0.9', 'test@example.com')
 
         # Simular solicitud de login
-        response = self.client.post('/', data={
-            'usuario': 'test@example.com',
-            'clave': 'wrong'
-        })
+        with patch('app.autenticar_usuario') as mock_autenticar:
+            response = self.client.post('/', data={
+                'usuario': 'test@example.com',
+                'clave': 'wrong'
+            })
 
         # Verificaciones
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 429)
         self.assertIn(b'Demasiados intentos fallidos', response.data)
+        mock_autenticar.assert_not_called()
+        mock_db_connection.assert_not_called()
+        self.assertEqual(limitador_login.estadisticas()['rechazados_cuenta'], 1)
 
     def test_logout(self):
         """
@@ -205,8 +243,7 @@ class TestApp(TestCase):
         mock_db_connection.return_value = MagicMock()
         mock_guardar_registro.return_value = True
         with patch('app.allowed_file', return_value=True):
-            with self.client.session_transaction() as session:
-                session['usuario'] = {'id': 1, 'correo': 'juan@example.com', 'nombre': 'Juan', 'apellido': 'Perez'}
+            self.iniciar_sesion(correo_electronico='juan@example.com', nombre='Juan', apellido='Perez')
             data = {
                 'nombre_estudiante': 'Teddy Sanchez',
                 'motivo': 'Falta de asistencia',
@@ -270,8 +307,7 @@ class TestApp(TestCase):
         mock_db_connection.return_value = MagicMock()
         mock_guardar_registro.return_value = False
         with patch('app.allowed_file', return_value=True):
-            with self.client.session_transaction() as session:
-                session['usuario'] = {'id': 1, 'correo': 'juan@example.com', 'nombre': 'Juan', 'apellido': 'Perez'}
+            self.iniciar_sesion(correo_electronico='juan@example.com', nombre='Juan', apellido='Perez')
             data = {
                 'nombre_estudiante': 'Teddy Sanchez',
                 'motivo': 'Falta de asistencia',
@@ -326,8 +362,7 @@ class TestApp(TestCase):
         mock_db_connection.return_value = MagicMock()
         mock_guardar_registro.return_value = True
         with patch('app.allowed_file', return_value=False):
-            with self.client.session_transaction() as session:
-                session['usuario'] = {'id': 1, 'correo': 'juan@example.com', 'nombre': 'Juan', 'apellido': 'Perez'}
+            self.iniciar_sesion(correo_electronico='juan@example.com', nombre='Juan', apellido='Perez')
             data = {
                 'nombre_estudiante': 'Teddy Sanchez',
                 'motivo': 'Falta de asistencia',
@@ -381,8 +416,7 @@ class TestApp(TestCase):
         mock_db_connection.return_value = MagicMock()
         mock_guardar_registro.return_value = True
         with patch('app.allowed_file', return_value=True):
-            with self.client.session_transaction() as session:
-                session['usuario'] = {'id': 1, 'correo': 'juan@example.com', 'nombre': 'Juan', 'apellido': 'Perez'}
+            self.iniciar_sesion(correo_electronico='juan@example.com', nombre='Juan', apellido='Perez')
             data = {
                 'problema': 'Fuga de agua',
                 'descripcion_problema': 'Fuga en el baño principal',
@@ -428,8 +462,7 @@ class TestApp(TestCase):
         mock_db_connection.return_value = MagicMock()
         mock_guardar_registro.return_value = True
         with patch('app.allowed_file', return_value=True):
-            with self.client.session_transaction() as session:
-                session['usuario'] = {'id': 1, 'correo': 'juan@example.com', 'nombre': 'Juan', 'apellido': 'Perez'}
+            self.iniciar_sesion(correo_electronico='juan@example.com', nombre='Juan', apellido='Perez')
             data = {
                 'problema': 'Techo roto',
                 'descripcion_problema': 'Filtración en aula',
@@ -452,6 +485,33 @@ class TestApp(TestCase):
                 'Techo roto', 'Filtración en aula', ANY, 'Pendiente', 'on'
             )
 
+    @patch('app.guardar_registro_infraestructura')
+    def test_subidas_iguales_se_guardan_una_vez(self, mock_guardar_registro):
+        """
+        Prueba que dos subidas con el mismo contenido y distinto nombre original se guardan en un solo
+        archivo direccionado por su SHA-256, y que ambas reciben la misma URL.
+        - Envía la misma imagen como 'a.jpg' y 'b.JPEG' al endpoint '/guardar_incidencia_colegios'.
+        - Verifica que la URL registrada sea '/static/uploads/<h[:2]>/<h[2:4]>/<h>.jpg' en ambos casos
+          y que el directorio de subidas contenga un único archivo.
+        """
+        mock_guardar_registro.return_value = True
+        self.iniciar_sesion()
+        contenido = b'misma imagen'
+        for nombre in ('a.jpg', 'b.JPEG'):
+            self.client.post('/guardar_incidencia_colegios', data={
+                'problema': 'Techo roto',
+                'imagen_problema': (BytesIO(contenido), nombre, 'image/jpeg')
+            }, content_type='multipart/form-data')
+
+        digest = hashlib.sha256(contenido).hexdigest()
+        esperada = f"/static/uploads/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+        urls = [llamada.args[2] for llamada in mock_guardar_registro.call_args_list]
+        self.assertEqual(urls, [esperada, esperada])
+        archivos = [nombre for _, _, nombres in os.walk(self.carpeta_subidas) for nombre in nombres]
+        self.assertEqual(archivos, [f"{digest}.jpg"])
+        self.mock_encolar_variantes.assert_called_with(
+            os.path.join(self.carpeta_subidas, digest[:2], digest[2:4], f"{digest}.jpg"))
+
     @patch('app.get_db_connection')
     @patch('app.guardar_registro_infraestructura')
     def test_guardar_incidencia_colegios_failure(self, mock_guardar_registro, mock_db_connection):
@@ -472,8 +532,7 @@ class TestApp(TestCase):
         """
         mock_db_connection.return_value = MagicMock()
         mock_guardar_registro.return_value = False
-        with self.client.session_transaction() as session:
-            session['usuario'] = {'id': 1, 'correo': 'juan@example.com', 'nombre': 'Juan', 'apellido': 'Perez'}
+        self.iniciar_sesion(correo_electronico='juan@example.com', nombre='Juan', apellido='Perez')
         data = {
             'problema': 'Techo roto',
             'descripcion_problema': 'Filtración en aula',
@@ -534,25 +593,24 @@ class TestApp(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn('Estado inválido', response.json['error'])
 
-    @patch('app.obtener_todos_los_usuarios')
     @patch('app.get_db_connection')
-    def test_api_usuarios(self, mock_db_connection, mock_obtener_todos_los_usuarios):
+    def test_api_usuarios(self, mock_db_connection):
         """
         Prueba el endpoint '/api/usuarios' que devuelve la lista de todos los usuarios.
-        - Simula una conexión a la base de datos con `mock_db_connection` y la función
-          `obtener_todos_los_usuarios` con `mock_obtener_todos_los_usuarios`.
-        - Configura `obtener_todos_los_usuarios` para devolver una lista con un usuario simulado.
+        - Simula una conexión a la base de datos con `mock_db_connection` cuyo cursor entrega
+          un usuario en el primer lote de `fetchmany`.
         - Envía una solicitud GET al endpoint '/api/usuarios'.
         - Verifica que:
           - El código de estado sea 200, indicando éxito.
           - La respuesta JSON contenga la lista de usuarios esperada, con los campos id, nombre,
             apellido y correo electrónico.
-        Este test asegura que el endpoint devuelva correctamente la lista de usuarios obtenida
-        de la función `obtener_todos_los_usuarios`.
+          - La conexión se devuelva al cerrar la respuesta transmitida.
         """
-        mock_db_connection.return_value = MagicMock()
-        mock_obtener_todos_los_usuarios.return_value = [
-            {'id': 1, 'nombre': 'Teddy', 'apellido': 'Sanchez', 'correo_electronico': 'teddy@example.com'}
+        mock_conn = MagicMock()
+        mock_db_connection.return_value = mock_conn
+        mock_conn.cursor.return_value.fetchmany.side_effect = [
+            [{'id': 1, 'nombre': 'Teddy', 'apellido': 'Sanchez', 'correo_electronico': 'teddy@example.com'}],
+            []
         ]
         
         response = self.client.get('/api/usuarios')
@@ -561,6 +619,8 @@ class TestApp(TestCase):
         self.assertEqual(response.json, [
             {'id': 1, 'nombre': 'Teddy', 'apellido': 'Sanchez', 'correo_electronico': 'teddy@example.com'}
         ])
+        response.close()
+        mock_conn.close.assert_called_once()
 
     @patch('app.obtener_registros_filtrados_por_institucion')
     def test_api_evidencias_sin_registros(self, mock_obtener_registros):
@@ -620,42 +680,44 @@ class TestApp(TestCase):
         self.assertFalse(allowed_file('no_extension'))
 
     @patch('app.get_db_connection')
-    @patch('app.verificar_credenciales')
+    @patch('app.autenticar_usuario')
     def test_login_multiple_failed_attempts(self, mock_verificar, mock_db_connection):
         """
         Prueba el endpoint de login ('/') cuando se hacen varios intentos fallidos hasta que la cuenta se bloquea.
         - Simula una conexión a la base de datos con mock_db_connection para evitar usar una base real.
-        - Usa mock_verificar para simular que las credenciales son incorrectas (retorna False).
-        - Configura las variables globales intentos_fallidos y bloqueado en 0 y False para un estado inicial limpio.
+        - Usa mock_verificar (`autenticar_usuario`) para simular que las credenciales son incorrectas (retorna None).
+        - Parte de un limitador reiniciado en `setUp`.
         - Realiza tres intentos de login con credenciales inválidas:
-        1. Primer intento: Verifica que retorna código 200, muestra 'Credenciales incorrectas' y aumenta intentos_fallidos a 1.
-        2. Segundo intento: Igual, pero intentos_fallidos sube a 2.
-        3. Tercer intento: Alcanza el límite (MAX_INTENTOS=3), activa bloqueado=True y muestra 'Demasiados intentos fallidos'.
+        1. Primer intento: Verifica que retorna código 200, muestra 'Credenciales incorrectas' y registra 1 fallo.
+        2. Segundo intento: Igual, pero los fallos suben a 2.
+        3. Tercer intento: Alcanza el límite por cuenta (3) y muestra 'Demasiados intentos fallidos'.
+        4. Cuarto intento: Se rechaza antes de consultar la base de datos.
         - Asegura que el sistema de bloqueo por intentos fallidos funcione y que los mensajes sean correctos.
         """
         mock_db_connection.return_value = MagicMock()
-        mock_verificar.return_value = False
-        import app
-        app.intentos_fallidos = 0
-        app.bloqueado = False
+        mock_verificar.return_value = None
 
         # Primer intento fallido
         response = self.client.post('/', data={'usuario': 'test@example.com', 'clave': 'wrong'})
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Credenciales incorrectas', response.data)
-        self.assertEqual(app.intentos_fallidos, 1)
+        self.assertEqual(limitador_login.estadisticas()['fallos'], 1)
 
         # Segundo intento fallido
         response = self.client.post('/', data={'usuario': 'test@example.com', 'clave': 'wrong'})
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Credenciales incorrectas', response.data)
-        self.assertEqual(app.intentos_fallidos, 2)
+        self.assertEqual(limitador_login.estadisticas()['fallos'], 2)
 
         # Tercer intento fallido (activa bloqueo)
         response = self.client.post('/', data={'usuario': 'test@example.com', 'clave': 'wrong'})
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Demasiados intentos fallidos', response.data)
-        self.assertTrue(app.bloqueado)
+
+        # Cuarto intento: rechazado sin consultar credenciales
+        response = self.client.post('/', data={'usuario': 'test@example.com', 'clave': 'wrong'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(mock_verificar.call_count, 3)
 
     @patch('app.get_db_connection')
     def test_dashboard_no_session(self, mock_db_connection):
@@ -693,8 +755,7 @@ class TestApp(TestCase):
         - Verifica que retorna código 200 y que la respuesta contiene 'Estudiantes', indicando que la plantilla se renderizó correctamente.
         - Asegura que la página de estudiantes sea accesible para usuarios autenticados.
         """
-        with self.client.session_transaction() as session:
-            session['usuario'] = {'id': 1, 'correo': 'test@example.com', 'nombre': 'Test', 'apellido': 'User'}
+        self.iniciar_sesion(correo_electronico='test@example.com', nombre='Test', apellido='User')
         response = self.client.get('/estudiantes')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Estudiantes', response.data)
@@ -707,8 +768,7 @@ class TestApp(TestCase):
         - Comprueba que retorna código 200 y que la respuesta incluye 'Estudiantes', confirmando que la plantilla se cargó bien.
         - Valida que los usuarios autenticados puedan acceder a esta vista sin problemas.
         """
-        with self.client.session_transaction() as session:
-            session['usuario'] = {'id': 1, 'correo': 'test@example.com', 'nombre': 'Test', 'apellido': 'User'}
+        self.iniciar_sesion(correo_electronico='test@example.com', nombre='Test', apellido='User')
         response = self.client.get('/estudiantes_colegios')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Estudiantes', response.data)
@@ -721,8 +781,7 @@ class TestApp(TestCase):
         - Verifica que retorna código 200 y que la respuesta contiene 'Registrar Incidente', indicando que la plantilla se renderizó correctamente.
         - Confirma que la página de incidentes sea accesible para usuarios autenticados.
         """
-        with self.client.session_transaction() as session:
-            session['usuario'] = {'id': 1, 'correo': 'test@example.com', 'nombre': 'Test', 'apellido': 'User'}
+        self.iniciar_sesion(correo_electronico='test@example.com', nombre='Test', apellido='User')
         response = self.client.get('/incidente-colegios')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Registrar Incidente', response.data)
@@ -735,8 +794,7 @@ class TestApp(TestCase):
         - Comprueba que retorna código 200 y que la respuesta incluye 'Registro de Incidente', confirmando que la plantilla se cargó correctamente.
         - Asegura que los usuarios autenticados puedan acceder a esta vista sin errores.
         """
-        with self.client.session_transaction() as session:
-            session['usuario'] = {'id': 1, 'correo': 'test@example.com', 'nombre': 'Test', 'apellido': 'User'}
+        self.iniciar_sesion(correo_electronico='test@example.com', nombre='Test', apellido='User')
         response = self.client.get('/registro_incidente')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Registrar Incidente', response.data)
@@ -755,8 +813,7 @@ class TestApp(TestCase):
         """
         mock_db.return_value = MagicMock()
         mock_gri.side_effect = Exception("Error inesperado")
-        with self.client.session_transaction() as session:
-            session['usuario'] = {'id': 1, 'correo': 'juan@example.com'}
+        self.iniciar_sesion(correo_electronico='juan@example.com')
         data = {
             'problema': 'Fuga',
             'descripcion_problema': 'Descripción',
@@ -835,4 +892,307 @@ class TestApp(TestCase):
         mock_obtener.return_value = []
         response = self.client.post('/filtrar_estado', json={'estado': 'Pendiente'})
         self.assertEqual(response.status_code, 404)
-        self.assertIn('No se encontraron registros', response.json['error'])
\ No newline at end of file
+        self.assertIn('No se encontraron registros', response.json['error'])
+    @patch('app.get_db_connection')
+    def test_api_incidentes_paginado(self, mock_db):
+        """
+        Prueba la paginación por cursor del endpoint '/api/incidentes'.
+        - Simula un cursor que devuelve `limit + 1` filas, lo que indica que hay otra página.
+        - Envía una solicitud GET con `limit=2`.
+        - Verifica que se devuelvan solo 2 incidentes, que `siguiente` contenga un cursor y que
+          la consulta pida `limit + 1` filas ordenadas por (fecha_registro, id).
+        """
+        from datetime import datetime
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_db.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchmany.side_effect = [[
+            {'id': 3, 'fecha': datetime(2025, 6, 27, 12, 0), 'estado': 'Pendiente'},
+            {'id': 2, 'fecha': datetime(2025, 6, 27, 11, 0), 'estado': 'Pendiente'},
+            {'id': 1, 'fecha': datetime(2025, 6, 27, 10, 0), 'estado': 'Resuelto'},
+        ], []]
+        response = self.client.get('/api/incidentes?limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['id'] for i in response.json['incidentes']], [3, 2])
+        self.assertTrue(response.json['siguiente'])
+        sql, parametros = mock_cursor.execute.call_args.args
+        self.assertIn('ORDER BY fecha_registro DESC, id DESC', sql)
+        self.assertEqual(parametros, (3,))
+
+        # La página siguiente filtra a partir del cursor recibido
+        mock_cursor.fetchmany.side_effect = [[]]
+        response = self.client.get(f"/api/incidentes?limit=2&after={response.json['siguiente']}")
+        self.assertEqual(response.json, {'incidentes': [], 'siguiente': None})
+        _, parametros = mock_cursor.execute.call_args.args
+        self.assertEqual(parametros, (datetime(2025, 6, 27, 11, 0), datetime(2025, 6, 27, 11, 0), 2, 3))
+
+    @patch('app.get_db_connection')
+    def test_api_evidencias_incluye_variantes(self, mock_db):
+        """
+        Prueba que '/api/evidencias' añade las URLs de miniatura y versión media a las evidencias
+        guardadas en `static/uploads`, y None a las filas sin evidencia.
+        """
+        mock_db.return_value.cursor.return_value.fetchmany.side_effect = [[
+            {'tipo': 'Académico', 'evidencia': '/static/uploads/ab/cd/abcd.jpg'},
+            {'tipo': 'Infraestructura', 'evidencia': None},
+        ], []]
+        response = self.client.post('/api/evidencias', json={'institucion': 'Colegio XYZ'})
+        self.assertEqual(response.status_code, 200)
+        con, sin = response.json
+        self.assertEqual(con['evidencia_miniatura'], '/static/uploads/ab/cd/abcd.miniatura.webp')
+        self.assertEqual(con['evidencia_media'], '/static/uploads/ab/cd/abcd.media.webp')
+        self.assertIsNone(sin['evidencia_miniatura'])
+
+    def test_api_incidentes_cursor_invalido(self):
+        """
+        Prueba que '/api/incidentes' responde 400 ante un cursor o límite inválido.
+        """
+        response = self.client.get('/api/incidentes?after=no-es-un-cursor')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/incidentes?limit=abc')
+        self.assertEqual(response.status_code, 400)
+
+    def conectar_socket(self):
+        """
+        Abre una conexión Socket.IO de prueba que comparte las cookies de sesión del cliente HTTP.
+        """
+        cliente = socketio.test_client(self.app, flask_test_client=self.client)
+        self.addCleanup(lambda: cliente.is_connected() and cliente.disconnect())
+        return cliente
+
+    def test_socket_sin_sesion_se_rechaza(self):
+        """
+        Prueba que una conexión Socket.IO sin sesión no se acepta.
+        """
+        cliente = self.conectar_socket()
+        self.assertFalse(cliente.is_connected())
+
+    def test_socket_eventos_por_sala(self):
+        """
+        Prueba que un colegio solo recibe los eventos de su institución y que el administrador
+        recibe todos.
+        """
+        self.iniciar_sesion(institucion_id=7)
+        colegio = self.conectar_socket()
+        self.assertTrue(colegio.is_connected())
+
+        emitir_incidente('nuevo', {'id': 1, 'estado': 'Pendiente'}, [8])
+        self.assertEqual(colegio.get_received(), [])
+        emitir_incidente('nuevo', {'id': 2, 'estado': 'Pendiente'}, [7])
+        recibidos = colegio.get_received()
+        self.assertEqual(len(recibidos), 1)
+        self.assertEqual(recibidos[0]['name'], 'incidente')
+        self.assertEqual(recibidos[0]['args'][0], {'accion': 'nuevo', 'id': 2, 'estado': 'Pendiente'})
+
+        with self.client.session_transaction() as session:
+            session['usuario'] = {'id': 1, 'v': 0}
+        admin = self.conectar_socket()
+        emitir_incidente('nuevo', {'id': 3}, [8])
+        self.assertEqual([e['args'][0]['id'] for e in admin.get_received()], [3])
+
+    @patch('app.emitir_incidente')
+    @patch('app.get_db_connection')
+    def test_actualizar_estado_emite_evento(self, mock_db, mock_emitir):
+        """
+        Prueba que cambiar el estado confirma la transacción, fija la sesión a la primaria y después
+        notifica el cambio a la institución del incidente.
+        """
+        mock_conn = MagicMock()
+        mock_db.return_value = mock_conn
+        mock_conn.cursor.return_value.fetchone.return_value = (5, 'Pendiente', 7)
+        with patch('app.forzar_primaria') as mock_forzar:
+            response = self.client.post('/api/incidentes/3/estado', json={'estado': 'Resuelto'})
+        self.assertEqual(response.status_code, 200)
+        mock_conn.commit.assert_called_once()
+        mock_forzar.assert_called_once_with()
+        mock_emitir.assert_called_once_with('actualizado', {
+            'tipo': 'Infraestructura', 'id': 3, 'usuario_id': 5, 'institucion_id': 7,
+            'estado': 'Resuelto', 'estado_anterior': 'Pendiente'
+        }, [7])
+
+    @patch('app.get_db_connection')
+    def test_api_usuarios_condicional(self, mock_db):
+        """
+        Prueba que '/api/usuarios' responde 304 con el ETag vigente sin abrir una conexión y que
+        '/api/evidencias' acepta GET con la institución en la URL.
+        """
+        mock_db.return_value.cursor.return_value.fetchmany.side_effect = [[{'id': 1}], []]
+        response = self.client.get('/api/usuarios')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+
+        mock_db.reset_mock()
+        response = self.client.get('/api/usuarios', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        mock_db.assert_not_called()
+
+        mock_db.return_value.cursor.return_value.fetchmany.side_effect = [[], []]
+        response = self.client.get('/api/evidencias?institucion=Colegio%20XYZ')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, [])
+        self.assertIn('ETag', response.headers)
+
+    @patch('app.actualizar_estados_en_lote')
+    def test_actualizar_estados_lote(self, mock_lote):
+        """
+        Prueba '/api/incidentes/estado': solo para el administrador, exige una lista de cambios y
+        devuelve el resultado por cambio con el total actualizado.
+        """
+        cambios = [{'id': 1, 'tipo': 'infraestructura', 'estado': 'Resuelto'},
+                   {'id': 2, 'tipo': 'academico', 'estado': 'Resuelto'}]
+        response = self.client.post('/api/incidentes/estado', json={'cambios': cambios})
+        self.assertEqual(response.status_code, 403)
+
+        with self.client.session_transaction() as session:
+            session['usuario'] = {'id': 1, 'v': 0}
+        response = self.client.post('/api/incidentes/estado', json={'cambios': []})
+        self.assertEqual(response.status_code, 400)
+
+        mock_lote.return_value = [{'id': 1, 'tipo': 'Infraestructura', 'ok': True},
+                                  {'id': 2, 'tipo': 'Académico', 'ok': False, 'error': 'Incidente no encontrado'}]
+        response = self.client.post('/api/incidentes/estado', json={'cambios': cambios})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['actualizados'], 1)
+        mock_lote.assert_called_once_with(cambios)
+
+        mock_lote.return_value = None
+        response = self.client.post('/api/incidentes/estado', json={'cambios': cambios})
+        self.assertEqual(response.status_code, 500)
+
+    @patch('app.importar_csv')
+    @patch('app.get_db_connection')
+    def test_importar_csv(self, mock_db, mock_importar):
+        """
+        Prueba '/api/importar/<tipo>': solo para el administrador, valida el tipo y el archivo y
+        devuelve el informe de la importación.
+        """
+        datos = {'archivo': (BytesIO('nombre,dni\nAna,1\n'.encode()), 'usuarios.csv')}
+        response = self.client.post('/api/importar/usuarios', data=datos, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 403)
+
+        with self.client.session_transaction() as session:
+            session['usuario'] = {'id': 1, 'v': 0}
+        response = self.client.post('/api/importar/colegios', data={}, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post('/api/importar/usuarios', data={}, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+
+        def importar(conn, texto, tipo):
+            self.assertEqual(texto.read(), 'nombre,dni\nAna,1\n')
+            return {'tipo': tipo, 'filas': 1, 'insertadas': 1, 'rechazadas': []}
+        mock_importar.side_effect = importar
+        datos = {'archivo': (BytesIO('\ufeffnombre,dni\nAna,1\n'.encode()), 'usuarios.csv')}
+        response = self.client.post('/api/importar/usuarios', data=datos, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['insertadas'], 1)
+
+    @patch('app.actualizar_incidencia_por_nombre')
+    def test_actualizar_incidente_por_nombre(self, mock_actualizar):
+        """
+        Prueba que '/api/actualizar_incidente_por_nombre/<institucion>' valida los datos y pasa a
+        la función de actualización los campos que recibe (el teléfono solo se valida).
+        """
+        datos = {'tipo': 'infraestructura', 'estado': 'Resuelto', 'descripcion': 'Techo',
+                 'correo': 'a@example.com', 'telefono': '999', 'comentarios': 'Listo'}
+        response = self.client.put('/api/actualizar_incidente_por_nombre/IE 1', json={'tipo': 'academico'})
+        self.assertEqual(response.status_code, 400)
+
+        mock_actualizar.return_value = True
+        response = self.client.put('/api/actualizar_incidente_por_nombre/IE 1', json=datos)
+        self.assertEqual(response.status_code, 200)
+        mock_actualizar.assert_called_once_with('IE 1', 'infraestructura', 'Resuelto', 'Techo', 'a@example.com', 'Listo')
+
+        mock_actualizar.return_value = False
+        response = self.client.put('/api/actualizar_incidente_por_nombre/IE 1', json=datos)
+        self.assertEqual(response.status_code, 400)
+
+    @patch('app.buscar_incidentes')
+    def test_api_buscar_incidentes(self, mock_buscar):
+        """
+        Prueba '/api/incidentes/buscar': solo para el administrador, valida el texto, la página y el
+        tipo, y devuelve la página de resultados con el número de la siguiente.
+        """
+        self.assertEqual(self.client.get('/api/incidentes/buscar?q=techo').status_code, 403)
+
+        with self.client.session_transaction() as session:
+            session['usuario'] = {'id': 1, 'v': 0}
+        self.assertEqual(self.client.get('/api/incidentes/buscar?q=%20').status_code, 400)
+        self.assertEqual(self.client.get('/api/incidentes/buscar?q=techo&pagina=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/incidentes/buscar?q=techo&tipo=otro').status_code, 400)
+
+        mock_buscar.return_value = ([{'id': 4, 'tipo': 'Infraestructura', 'relevancia': 1.5}], True)
+        response = self.client.get('/api/incidentes/buscar?q=filtración&pagina=2&limit=1&tipo=infraestructura')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {'incidentes': [{'id': 4, 'tipo': 'Infraestructura', 'relevancia': 1.5}],
+                                         'pagina': 2, 'siguiente': 3})
+        mock_buscar.assert_called_once_with('filtración', 2, 1, estado=None, institucion=None,
+                                            tipos=('Infraestructura',))
+
+        mock_buscar.return_value = None
+        self.assertEqual(self.client.get('/api/incidentes/buscar?q=techo').status_code, 500)
+
+    @patch('app.get_db_connection')
+    def test_exportar_evidencias_csv(self, mock_db):
+        """
+        Prueba '/api/evidencias/exportar': solo para el administrador, valida formato y fechas y
+        transmite el CSV desde un cursor sin buffer con el rango de fechas (fin inclusive).
+        """
+        from datetime import date, timedelta
+        response = self.client.get('/api/evidencias/exportar')
+        self.assertEqual(response.status_code, 403)
+
+        with self.client.session_transaction() as session:
+            session['usuario'] = {'id': 1, 'v': 0}
+        self.assertEqual(self.client.get('/api/evidencias/exportar?formato=pdf').status_code, 400)
+        self.assertEqual(self.client.get('/api/evidencias/exportar?desde=ayer').status_code, 400)
+        response = self.client.get('/api/evidencias/exportar?desde=2025-02-01&hasta=2025-01-01')
+        self.assertEqual(response.status_code, 400)
+
+        mock_cursor = mock_db.return_value.cursor.return_value
+        mock_cursor.fetchmany.side_effect = [[
+            {'tipo': 'academico', 'institucion': 'IE 1', 'nombre_estudiante': 'Ana', 'motivo': 'Falta',
+             'estado': 'Pendiente', 'fecha': date(2025, 1, 15), 'hora': timedelta(hours=8), 'evidencia': None},
+        ], []]
+        response = self.client.get('/api/evidencias/exportar?institucion=IE 1&desde=2025-01-01&hasta=2025-01-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('evidencias_2025-01-01_2025-01-31.csv', response.headers['Content-Disposition'])
+        lineas = response.data.decode('utf-8-sig').splitlines()
+        self.assertEqual(lineas[1], 'academico,IE 1,Ana,Falta,Pendiente,2025-01-15,8:00:00,')
+        mock_db.return_value.cursor.assert_called_with(dictionary=True, buffered=False)
+        _, parametros = mock_cursor.execute.call_args.args
+        self.assertEqual(parametros[:3], ('IE 1', date(2025, 1, 1), date(2025, 2, 1)))
+
+    @patch('app.obtener_cola')
+    def test_estadisticas_internas_solo_para_el_administrador(self, mock_cola):
+        """
+        Prueba que las rutas de estadísticas internas (pool, caché, limitador, réplicas y cola de
+        escrituras) responden 403 sin sesión de administrador y 200 con ella.
+        """
+        mock_cola.return_value.estadisticas.return_value = {'pendientes': 0}
+        rutas = ['/api/pool', '/api/cache', '/api/limitador', '/api/replicas', '/api/cola-escrituras']
+        for ruta in rutas:
+            self.assertEqual(self.client.get(ruta).status_code, 403, ruta)
+        with self.client.session_transaction() as session:
+            session['usuario'] = {'id': 1, 'v': 0}
+        for ruta in rutas:
+            self.assertEqual(self.client.get(ruta).status_code, 200, ruta)
+
+    @patch('app.get_db_connection')
+    def test_actualizar_estado_valida_y_normaliza(self, mock_db):
+        """
+        Prueba que '/api/incidentes/<id>/estado' rechaza con 400 un estado faltante o desconocido sin
+        tocar la base de datos y que escribe el estado en su forma canónica.
+        """
+        for cuerpo in ({}, {'estado': 'Cerrado'}):
+            self.assertEqual(self.client.post('/api/incidentes/3/estado', json=cuerpo).status_code, 400)
+        mock_db.assert_not_called()
+
+        mock_cursor = mock_db.return_value.cursor.return_value
+        mock_cursor.fetchone.return_value = (5, 'Pendiente', 7)
+        with patch('app.emitir_incidente'):
+            response = self.client.post('/api/incidentes/3/estado', json={'estado': 'en Proceso'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(("UPDATE registro_infraestructura SET estado = %s WHERE id = %s", ('En proceso', 3)),
+                      [c.args for c in mock_cursor.execute.call_args_list])
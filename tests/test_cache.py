@@ -0,0 +1,127 @@
+"""
+Este archivo contiene pruebas unitarias para la caché en memoria definida en `cache.py`.
+Verifica la expiración por TTL, el desalojo LRU, la invalidación explícita, los contadores
+de aciertos y fallos, y que las funciones de escritura de `utils.py` invaliden las métricas.
+"""
+
+from unittest.mock import patch, MagicMock
+
+from cache import CacheTTL, cache
+from versiones import secuencia_escrituras
+from utils import guardar_registro_academico
+
+def test_acierto_y_fallo():
+    """
+    Prueba que una clave guardada se encuentra y que los contadores lo registran.
+    """
+    c = CacheTTL()
+    assert c.obtener('a') == (False, None)
+    c.guardar('a', 1)
+    assert c.obtener('a') == (True, 1)
+    stats = c.estadisticas()
+    assert stats['aciertos'] == 1
+    assert stats['fallos'] == 1
+    assert stats['tasa_aciertos'] == 0.5
+
+def test_expiracion_por_ttl():
+    """
+    Prueba que una entrada deja de devolverse cuando vence su TTL.
+    """
+    c = CacheTTL(ttl=10)
+    with patch('cache.time.monotonic', return_value=100.0):
+        c.guardar('a', 1)
+    with patch('cache.time.monotonic', return_value=111.0):
+        assert c.obtener('a') == (False, None)
+    assert c.estadisticas()['expiraciones'] == 1
+
+def test_desalojo_lru():
+    """
+    Prueba que al superar `max_entradas` se desaloja la entrada usada hace más tiempo.
+    """
+    c = CacheTTL(max_entradas=2)
+    c.guardar('a', 1)
+    c.guardar('b', 2)
+    c.obtener('a')
+    c.guardar('c', 3)
+    assert c.obtener('b') == (False, None)
+    assert c.obtener('a') == (True, 1)
+    assert c.estadisticas()['desalojos'] == 1
+
+def test_obtener_o_calcular_no_guarda_vacios():
+    """
+    Prueba que `obtener_o_calcular` guarda resultados válidos pero no los vacíos.
+    """
+    c = CacheTTL()
+    funcion = MagicMock(return_value={'total': 1})
+    c.obtener_o_calcular('m', funcion)
+    c.obtener_o_calcular('m', funcion)
+    assert funcion.call_count == 1
+    vacia = MagicMock(return_value={})
+    c.obtener_o_calcular('v', vacia)
+    c.obtener_o_calcular('v', vacia)
+    assert vacia.call_count == 2
+
+def test_invalidar_prefijo():
+    """
+    Prueba que la invalidación por prefijo solo elimina las claves afectadas.
+    """
+    c = CacheTTL()
+    c.guardar('metricas:global', 1)
+    c.guardar('metricas:usuario:1', 2)
+    c.guardar('usuarios:lista', 3)
+    c.invalidar_prefijo('metricas:')
+    assert c.obtener('metricas:global')[0] is False
+    assert c.obtener('usuarios:lista')[0] is True
+    assert c.estadisticas()['invalidaciones'] == 2
+
+def test_ttl_cero_desactiva_cache():
+    """
+    Prueba que con TTL 0 no se guarda nada.
+    """
+    c = CacheTTL(ttl=0)
+    c.guardar('a', 1)
+    assert c.obtener('a') == (False, None)
+
+def test_escritura_invalida_metricas():
+    """
+    Prueba que `guardar_registro_academico` invalida las métricas en caché tras confirmar.
+    """
+    cache.guardar('metricas:global', {'total_incidentes': 1})
+    with patch('utils.get_db_connection', return_value=MagicMock()):
+        with patch('utils.session', {'usuario': {'id': 1}}):
+            assert guardar_registro_academico('Ana', 'Falta', '2025-06-27', '10:00', 'Pendiente', None)
+    assert cache.obtener('metricas:global') == (False, None)
+
+def test_escritura_avanza_secuencia():
+    """
+    Prueba que una escritura de incidentes cambia el ETag de las APIs de incidentes y no el de usuarios.
+    """
+    incidentes, _ = secuencia_escrituras.validador('incidentes')
+    usuarios, _ = secuencia_escrituras.validador('usuarios')
+    with patch('utils.get_db_connection', return_value=MagicMock()):
+        with patch('utils.session', {'usuario': {'id': 1}}):
+            assert guardar_registro_academico('Ana', 'Falta', '2025-06-27', '10:00', 'Pendiente', None)
+    assert secuencia_escrituras.validador('incidentes')[0] != incidentes
+    assert secuencia_escrituras.validador('usuarios')[0] == usuarios
+
+def test_invalidacion_durante_el_calculo_no_guarda_el_valor():
+    """
+    Prueba que si la clave se invalida mientras se calcula su valor (una escritura confirmada entre
+    la lectura y el guardado), el valor anterior a la escritura no queda en caché.
+    """
+    c = CacheTTL()
+
+    def calcular():
+        c.invalidar_prefijo('metricas:')
+        return {'total': 1}
+
+    assert c.obtener_o_calcular('metricas:global', calcular) == {'total': 1}
+    assert c.obtener('metricas:global') == (False, None)
+    assert c.estadisticas()['descartadas'] == 1
+
+    marca = c.marca('metricas:usuario:3')
+    c.invalidar('metricas:usuario:3')
+    c.guardar('metricas:usuario:3', {'total': 2}, marca=marca)
+    c.guardar('otra', 3, marca=c.marca('otra'))
+    assert c.obtener('metricas:usuario:3') == (False, None)
+    assert c.obtener('otra') == (True, 3)
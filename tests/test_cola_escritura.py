@@ -0,0 +1,198 @@
+"""
+Este archivo contiene pruebas unitarias para la cola de escrituras diferidas de `cola_escritura.py`.
+Cada prueba usa un archivo SQLite temporal propio; MySQL se simula con una conexión `MagicMock`.
+"""
+
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import pytest
+from mysql.connector import Error
+
+from cola_escritura import (
+    ColaEscrituras, comprobar_ruta_duradera, escribir_lote, obtener_cola, ruta_cola, validar_incidente
+)
+from metricas import TIPO_ACADEMICO, TIPO_INFRAESTRUCTURA
+
+ACADEMICO = {
+    'nombre_estudiante': 'Ana', 'motivo': 'Inasistencia', 'fecha': '2025-03-10', 'hora': '08:30',
+    'estado': 'Pendiente', 'evidencia': None, 'fecha_registro': '2025-03-10 08:31:00', 'usuario_id': 7,
+}
+INFRAESTRUCTURA = {
+    'problema': 'Techo', 'descripcion_problema': 'Filtración', 'imagen_problema': None, 'estado': 'En proceso',
+    'fecha_registro': '2025-03-10 09:00:00', 'usuario_id': 8, 'tipo': 'on',
+}
+AUTOR = {'institucion_id': 3, 'institucion': 'IE 3', 'correo': 'a@x.pe', 'telefono': '999'}
+
+@pytest.fixture
+def cola(tmp_path):
+    """
+    Fixture que crea una cola sobre un archivo SQLite temporal, con reintentos sin espera.
+    """
+    return ColaEscrituras(str(tmp_path / 'cola.sqlite3'), tamano_lote=10, max_intentos=2, espera_reintento=0)
+
+@pytest.fixture
+def mysql():
+    """
+    Fixture con una conexión MySQL simulada devuelta por `obtener_conexion`, sin invalidar cachés
+    ni emitir eventos reales.
+    """
+    conexion = MagicMock()
+    with patch('cola_escritura.obtener_conexion', return_value=conexion), \
+            patch('cola_escritura.invalidar_incidentes') as invalidar, \
+            patch('cola_escritura.emitir_incidente') as emitir:
+        yield conexion, invalidar, emitir
+
+def test_validar_incidente_normaliza_y_rechaza():
+    """
+    Prueba que la validación normaliza el estado y rechaza faltantes, fechas y estados inválidos.
+    """
+    assert validar_incidente(TIPO_ACADEMICO, {**ACADEMICO, 'estado': 'en Proceso'})['estado'] == 'En proceso'
+    for cambios, motivo in [({'motivo': ''}, 'Falta motivo'), ({'fecha': '10/03/2025'}, 'fecha inválida'),
+                            ({'estado': 'Cerrado'}, 'Estado inválido'), ({'nombre_estudiante': 'x' * 201}, 'supera')]:
+        with pytest.raises(ValueError, match=motivo):
+            validar_incidente(TIPO_ACADEMICO, {**ACADEMICO, **cambios})
+    assert validar_incidente(TIPO_INFRAESTRUCTURA, INFRAESTRUCTURA)['tipo'] == 'on'
+
+def test_encolar_y_tomar_reserva_las_entradas(cola):
+    """
+    Prueba que las entradas se toman en orden y que una entrada reservada no la toma otro worker.
+    """
+    with patch.object(cola, 'iniciar'):
+        primera = cola.encolar(TIPO_ACADEMICO, ACADEMICO, AUTOR)
+        cola.encolar(TIPO_INFRAESTRUCTURA, INFRAESTRUCTURA)
+    tomadas = cola.tomar(1)
+    assert [(e['clave'], e['datos'], e['autor']) for e in tomadas] == [(primera, ACADEMICO, AUTOR)]
+    assert [e['tipo'] for e in cola.tomar(10)] == [TIPO_INFRAESTRUCTURA]
+    assert cola.tomar(10) == []
+    assert cola.estadisticas()['reservadas'] == 2
+
+def test_escribir_lote_inserta_varias_filas_y_omite_las_ya_escritas():
+    """
+    Prueba que cada tabla recibe un único INSERT de varias filas con su `clave_cola`, que las
+    entradas ya escritas (clave existente) se omiten y que los contadores se suman en un commit.
+    """
+    entradas = [{'clave': f'c{i}', 'tipo': TIPO_ACADEMICO, 'datos': ACADEMICO} for i in range(3)]
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchall.side_effect = [[(50, 'c0')], [(51, 'c1'), (52, 'c2')]]
+    escritas = escribir_lote(conexion, entradas)
+
+    assert [(e['clave'], incidente_id) for e, incidente_id in escritas] == [('c1', 51), ('c2', 52)]
+    sql, filas = cursor.executemany.call_args_list[0].args
+    assert 'INSERT INTO registro_academico' in sql and 'clave_cola' in sql
+    assert [fila[-2:] for fila in filas] == [('c1', 7), ('c2', 7)]
+    assert cursor.executemany.call_args_list[1].args[1] == [(7, TIPO_ACADEMICO, 'Pendiente', 2)]
+    conexion.commit.assert_called_once()
+
+def test_procesar_lote_confirma_y_emite(cola, mysql):
+    """
+    Prueba que un lote escrito sale de la cola, invalida las cachés y emite el evento `nuevo` con
+    los datos del autor capturados al encolar.
+    """
+    conexion, invalidar, emitir = mysql
+    with patch.object(cola, 'iniciar'):
+        clave = cola.encolar(TIPO_ACADEMICO, ACADEMICO, AUTOR)
+    conexion.cursor.return_value.fetchall.side_effect = [[], [(90, clave)]]
+
+    assert cola.vaciar() == 1
+    assert cola.estadisticas()['pendientes'] == 0
+    invalidar.assert_called_once()
+    accion, evento, salas = emitir.call_args.args
+    assert (accion, evento['id'], evento['institucion'], evento['descripcion'], salas) == \
+        ('nuevo', 90, 'IE 3', 'Inasistencia', [3])
+    conexion.close.assert_called_once()
+
+def test_procesar_lote_reintenta_y_pasa_a_muertas(cola, mysql):
+    """
+    Prueba que si el lote falla se reintenta entrada por entrada: la válida se escribe y la que
+    falla cuenta un intento, y al agotar `max_intentos` pasa a las muertas. Reintentarlas las
+    devuelve a la cola.
+    """
+    conexion, _, emitir = mysql
+    with patch.object(cola, 'iniciar'):
+        mala = cola.encolar(TIPO_INFRAESTRUCTURA, {**INFRAESTRUCTURA, 'usuario_id': 999})
+        buena = cola.encolar(TIPO_INFRAESTRUCTURA, INFRAESTRUCTURA)
+    cursor = conexion.cursor.return_value
+
+    def insertar(sql, filas):
+        if 'registro_infraestructura' in sql and any(fila[-1] == 999 for fila in filas):
+            raise Error("Cannot add or update a child row")
+    cursor.executemany.side_effect = insertar
+    cursor.fetchall.side_effect = [[], [], [], [(5, buena)]]
+
+    with patch('builtins.print'):
+        assert cola.procesar_lote() == 2
+    assert emitir.call_count == 1
+    assert cola.estadisticas()['pendientes'] == 1
+
+    cursor.fetchall.side_effect = None
+    cursor.fetchall.return_value = []
+    with patch('builtins.print'):
+        cola.procesar_lote()
+    assert cola.estadisticas()['muertas'] == 1
+    assert cola.estadisticas()['pendientes'] == 0
+
+    assert cola.reintentar_muertas() == 1
+    assert [e['clave'] for e in cola.tomar(10)] == [mala]
+
+def test_procesar_lote_sin_conexion_no_cuenta_intentos(cola):
+    """
+    Prueba que sin conexión a MySQL las entradas vuelven a la cola sin sumar intentos.
+    """
+    with patch.object(cola, 'iniciar'):
+        cola.encolar(TIPO_ACADEMICO, ACADEMICO)
+    with patch('cola_escritura.obtener_conexion', side_effect=Error("sin conexión")), patch('builtins.print'):
+        assert cola.procesar_lote() == 0
+    assert cola.tomar(10)[0]['intentos'] == 0
+
+def test_detener_vacia_la_cola(cola, mysql):
+    """
+    Prueba que al detener el hilo de fondo se escriben las entradas que quedaron en la cola (las
+    escriba el hilo o el vaciado final, cada entrada se escribe una sola vez).
+    """
+    conexion, _, emitir = mysql
+    cola.intervalo = 60
+    with patch('cola_escritura.atexit.register') as registrar:
+        cola.iniciar()
+    registrar.assert_called_once_with(cola.detener)
+    with patch.object(cola, 'iniciar'):
+        clave = cola.encolar(TIPO_ACADEMICO, ACADEMICO)
+    conexion.cursor.return_value.fetchall.side_effect = [[], [(1, clave)]]
+    cola.detener(limite_segundos=5)
+    assert not cola._hilo.is_alive()
+    assert cola.estadisticas()['pendientes'] == 0
+    assert emitir.call_count == 1
+
+def test_ruta_de_la_cola_fuera_del_directorio_temporal(tmp_path):
+    """
+    Prueba que por defecto la cola vive en la carpeta `instance` de la aplicación y que una ruta
+    en el directorio temporal se rechaza al arrancar.
+    """
+    with patch.dict('os.environ', {}, clear=True), \
+            patch('cola_escritura.CARPETA_INSTANCIA', str(tmp_path / 'instance')):
+        assert ruta_cola() == str(tmp_path / 'instance' / 'cola_escrituras.sqlite3')
+    with patch.dict('os.environ', {'COLA_ESCRITURAS_DB': '/var/lib/ugel/cola.sqlite3'}):
+        assert ruta_cola() == '/var/lib/ugel/cola.sqlite3'
+    comprobar_ruta_duradera('/var/lib/ugel/cola.sqlite3')
+    with pytest.raises(RuntimeError, match='COLA_ESCRITURAS_DB'):
+        comprobar_ruta_duradera(os.path.join(tempfile.gettempdir(), 'cola.sqlite3'))
+
+def test_cola_se_crea_al_usarla(tmp_path):
+    """
+    Prueba que la cola compartida se crea la primera vez que se pide, una sola vez, y que una
+    ruta en el directorio temporal se rechaza en ese momento.
+    """
+    carpeta = tmp_path / 'instance'
+    with patch.dict('os.environ', {}, clear=True), patch('cola_escritura._cola', None), \
+            patch('cola_escritura.CARPETA_INSTANCIA', str(carpeta)), \
+            patch('cola_escritura.comprobar_ruta_duradera') as comprobar:
+        assert not carpeta.exists()
+        cola = obtener_cola()
+        assert cola is obtener_cola()
+        assert cola.ruta == str(carpeta / 'cola_escrituras.sqlite3') and carpeta.exists()
+        comprobar.assert_called_once_with(cola.ruta)
+    with patch.dict('os.environ', {'COLA_ESCRITURAS_DB': os.path.join(tempfile.gettempdir(), 'cola.sqlite3')}), \
+            patch('cola_escritura._cola', None), pytest.raises(RuntimeError, match='COLA_ESCRITURAS_DB'):
+        obtener_cola()
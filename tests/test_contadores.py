@@ -0,0 +1,98 @@
+"""
+Este archivo contiene pruebas unitarias para los contadores de incidentes de `contadores.py`.
+Verifica el incremento y traslado de contadores dentro de la transacción del llamador y la
+reconciliación contra las tablas de registro.
+"""
+
+from unittest.mock import MagicMock, ANY
+
+from contadores import sumar_contador, sumar_contadores, mover_contador, reconciliar_contadores, tipo_contador
+
+def test_sumar_contador_normaliza_estado():
+    """
+    Prueba que `sumar_contador` hace un upsert con el estado canónico.
+    """
+    cursor = MagicMock()
+    sumar_contador(cursor, 4, 'Académico', 'En Proceso')
+    cursor.execute.assert_called_once_with(ANY, (4, 'Académico', 'En proceso', 1, 1))
+
+def test_sumar_contadores_un_solo_insert():
+    """
+    Prueba que `sumar_contadores` envía todos los ajustes en un `executemany`, omitiendo los nulos.
+    """
+    cursor = MagicMock()
+    sumar_contadores(cursor, {(1, 'Infraestructura', 'Pendiente'): -2, (1, 'Infraestructura', 'En Proceso'): 2,
+                              (3, 'Académico', 'Resuelto'): 0})
+    cursor.executemany.assert_called_once_with(ANY, [(1, 'Infraestructura', 'Pendiente', -2),
+                                                     (1, 'Infraestructura', 'En proceso', 2)])
+    cursor.reset_mock()
+    sumar_contadores(cursor, {})
+    cursor.executemany.assert_not_called()
+
+def test_mover_contador_cambio_de_estado():
+    """
+    Prueba que un cambio de estado resta del contador anterior y suma al nuevo en una sola sentencia.
+    """
+    cursor = MagicMock()
+    mover_contador(cursor, 'Infraestructura', 1, 'Pendiente', 1, 'Resuelto')
+    cursor.execute.assert_not_called()
+    cursor.executemany.assert_called_once()
+    assert cursor.executemany.call_args.args[1] == [(1, 'Infraestructura', 'Pendiente', -1),
+                                                    (1, 'Infraestructura', 'Resuelto', 1)]
+
+def test_mover_contador_sin_cambios():
+    """
+    Prueba que no se ejecuta nada si el usuario y el estado no cambian.
+    """
+    cursor = MagicMock()
+    mover_contador(cursor, 'Académico', 2, 'En Proceso', 2, 'En proceso')
+    cursor.execute.assert_not_called()
+    cursor.executemany.assert_not_called()
+
+def test_tipo_contador():
+    """
+    Prueba la traducción de los tipos usados por las rutas.
+    """
+    assert tipo_contador('infraestructura') == 'Infraestructura'
+    assert tipo_contador('Infraestructura') == 'Infraestructura'
+    assert tipo_contador('academico') == 'Académico'
+
+def test_reconciliar_sin_diferencias():
+    """
+    Prueba que no se reconstruye la tabla cuando los contadores coinciden.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    filas = [(1, 'Infraestructura', 'Pendiente', 3)]
+    cursor.fetchall.side_effect = [filas, list(filas)]
+    assert reconciliar_contadores(conexion) == []
+    conexion.commit.assert_not_called()
+
+def test_reconciliar_informa_y_corrige_diferencias():
+    """
+    Prueba que se informan los contadores desviados o sobrantes y se reconstruye la tabla.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchall.side_effect = [
+        [(1, 'Infraestructura', 'Pendiente', 3), (2, 'Académico', 'Resuelto', 1)],
+        [(1, 'Infraestructura', 'Pendiente', 2), (3, 'Académico', 'Pendiente', 1)],
+    ]
+    diferencias = reconciliar_contadores(conexion)
+    assert diferencias == [
+        {'usuario_id': 1, 'tipo': 'Infraestructura', 'estado': 'Pendiente', 'esperado': 3, 'actual': 2},
+        {'usuario_id': 2, 'tipo': 'Académico', 'estado': 'Resuelto', 'esperado': 1, 'actual': 0},
+        {'usuario_id': 3, 'tipo': 'Académico', 'estado': 'Pendiente', 'esperado': 0, 'actual': 1},
+    ]
+    cursor.execute.assert_any_call("DELETE FROM contadores_incidentes")
+    conexion.commit.assert_called_once()
+
+def test_reconciliar_solo_verificar():
+    """
+    Prueba que con `corregir=False` solo se informan las diferencias.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchall.side_effect = [[(1, 'Académico', 'Pendiente', 1)], []]
+    assert len(reconciliar_contadores(conexion, corregir=False)) == 1
+    conexion.commit.assert_not_called()
@@ -0,0 +1,201 @@
+"""
+Este archivo contiene pruebas unitarias para el pool de conexiones definido en `db_pool.py`.
+Se simulan las conexiones de `mysql.connector` para verificar el préstamo, la devolución,
+la verificación previa (pre-ping), la edad máxima, el tiempo de espera y las estadísticas.
+"""
+
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from mysql.connector.errors import PoolError
+
+from flask import Flask
+
+from db_pool import PoolConexiones, conexion_peticion, registrar_conexion_peticion
+
+def _nueva_conexion(*args, **kwargs):
+    conexion = MagicMock()
+    conexion.in_transaction = False
+    conexion.unread_result = False
+    conexion.is_connected.return_value = True
+    return conexion
+
+@pytest.fixture
+def mock_connect():
+    """
+    Fixture que simula `mysql.connector.connect` para que cada llamada devuelva
+    una conexión simulada distinta y sana.
+    """
+    with patch('mysql.connector.connect', side_effect=_nueva_conexion) as mock:
+        yield mock
+
+def test_reutiliza_conexion_devuelta(mock_connect):
+    """
+    Prueba que una conexión devuelta con `close()` se reutiliza en el siguiente préstamo
+    sin abrir una conexión nueva.
+    """
+    pool = PoolConexiones(tamano=2)
+    conexion = pool.obtener_conexion()
+    real = conexion._conexion
+    conexion.close()
+    otra = pool.obtener_conexion()
+    assert otra._conexion is real
+    assert mock_connect.call_count == 1
+    real.close.assert_not_called()
+
+def test_estadisticas_en_uso_y_libres(mock_connect):
+    """
+    Prueba que las estadísticas reflejan las conexiones prestadas y libres.
+    """
+    pool = PoolConexiones(tamano=3)
+    a = pool.obtener_conexion()
+    b = pool.obtener_conexion()
+    a.close()
+    stats = pool.estadisticas()
+    assert stats['abiertas'] == 2
+    assert stats['en_uso'] == 1
+    assert stats['libres'] == 1
+    b.close()
+    assert pool.estadisticas()['en_uso'] == 0
+
+def test_pre_ping_descarta_conexion_caida(mock_connect):
+    """
+    Prueba que una conexión libre que no responde al ping se descarta y se reemplaza.
+    """
+    pool = PoolConexiones(tamano=1)
+    conexion = pool.obtener_conexion()
+    caida = conexion._conexion
+    conexion.close()
+    caida.is_connected.return_value = False
+    nueva = pool.obtener_conexion()
+    assert nueva._conexion is not caida
+    caida.close.assert_called_once()
+    assert pool.estadisticas()['descartadas'] == 1
+
+def test_edad_maxima_recicla_conexion(mock_connect):
+    """
+    Prueba que una conexión más antigua que `max_edad` se recicla al prestarse.
+    """
+    pool = PoolConexiones(tamano=1, max_edad=60)
+    conexion = pool.obtener_conexion()
+    vieja = conexion._conexion
+    conexion.close()
+    with patch('db_pool.time.monotonic', return_value=10 ** 9):
+        nueva = pool.obtener_conexion()
+    assert nueva._conexion is not vieja
+    vieja.close.assert_called_once()
+
+def test_timeout_cuando_pool_lleno(mock_connect):
+    """
+    Prueba que se lanza `PoolError` cuando no se libera ninguna conexión dentro del
+    tiempo de espera, y que la espera queda registrada.
+    """
+    pool = PoolConexiones(tamano=1, timeout=0.05)
+    pool.obtener_conexion()
+    with pytest.raises(PoolError):
+        pool.obtener_conexion()
+    stats = pool.estadisticas()
+    assert stats['timeouts'] == 1
+    assert stats['esperas'] == 1
+
+def test_espera_hasta_que_se_libera(mock_connect):
+    """
+    Prueba que un préstamo bloqueado obtiene la conexión cuando otro hilo la devuelve.
+    """
+    pool = PoolConexiones(tamano=1, timeout=2)
+    conexion = pool.obtener_conexion()
+    threading.Timer(0.05, conexion.close).start()
+    otra = pool.obtener_conexion()
+    assert otra is not None
+    assert pool.estadisticas()['esperas'] == 1
+
+def test_devolver_deshace_transaccion_pendiente(mock_connect):
+    """
+    Prueba que al devolver una conexión con transacción abierta se hace rollback.
+    """
+    pool = PoolConexiones(tamano=1)
+    conexion = pool.obtener_conexion()
+    real = conexion._conexion
+    real.in_transaction = True
+    conexion.close()
+    real.rollback.assert_called_once()
+
+def test_fallo_al_conectar_libera_cupo():
+    """
+    Prueba que un fallo al crear la conexión no consume cupo del pool.
+    """
+    pool = PoolConexiones(tamano=1)
+    with patch('mysql.connector.connect', side_effect=Exception("sin red")):
+        with pytest.raises(Exception):
+            pool.obtener_conexion()
+    assert pool.estadisticas()['abiertas'] == 0
+
+def test_devolver_descarta_conexion_con_resultados_pendientes(mock_connect):
+    """
+    Prueba que una conexión devuelta con filas sin leer (streaming interrumpido) se cierra
+    en lugar de volver al pool.
+    """
+    pool = PoolConexiones(tamano=1)
+    conexion = pool.obtener_conexion()
+    real = conexion._conexion
+    real.unread_result = True
+    conexion.close()
+    real.close.assert_called_once()
+    assert pool.estadisticas()['abiertas'] == 0
+
+def test_conexion_peticion_se_comparte_y_libera():
+    """
+    Prueba que dentro de una petición todas las llamadas reciben la misma conexión, que su
+    `close()` no la devuelve y que el teardown la devuelve al pool una sola vez.
+    """
+    app = Flask(__name__)
+    app.config['DEBUG_CONEXIONES_BD'] = True
+    registrar_conexion_peticion(app)
+    prestada = MagicMock()
+    prestada.in_transaction = False
+
+    @app.route('/prueba')
+    def prueba():
+        a = conexion_peticion()
+        a.close()
+        b = conexion_peticion()
+        b.close()
+        assert a is b
+        prestada.close.assert_not_called()
+        return 'ok'
+
+    with patch('db_pool.obtener_pool') as mock_pool:
+        mock_pool.return_value.obtener_conexion.return_value = prestada
+        respuesta = app.test_client().get('/prueba')
+    assert respuesta.headers['X-Conexiones-BD'] == 'abiertas=1; usos=2'
+    mock_pool.return_value.obtener_conexion.assert_called_once()
+    prestada.close.assert_called_once()
+
+def test_conexion_peticion_close_deshace_transaccion():
+    """
+    Prueba que `close()` sobre la conexión de la petición deshace una transacción pendiente.
+    """
+    app = Flask(__name__)
+    prestada = MagicMock()
+    prestada.in_transaction = True
+    with patch('db_pool.obtener_pool') as mock_pool:
+        mock_pool.return_value.obtener_conexion.return_value = prestada
+        with app.test_request_context():
+            conexion_peticion().close()
+    prestada.rollback.assert_called_once()
+
+def test_cursores_instrumentados_y_tiempo_de_obtencion(mock_connect):
+    """
+    Prueba que el pool entrega cursores instrumentados que delegan en el cursor real y que
+    registra el tiempo de obtención de cada conexión bajo 'host:puerto'.
+    """
+    pool = PoolConexiones(tamano=1, host='bd', port=3306)
+    with patch('db_pool.observar_obtencion_conexion') as observar:
+        conexion = pool.obtener_conexion()
+    segundos, servidor = observar.call_args.args
+    assert segundos >= 0 and servidor == 'bd:3306'
+
+    cursor = conexion.cursor(dictionary=True)
+    assert type(cursor).__name__ == 'CursorInstrumentado'
+    conexion._conexion.cursor.assert_called_once_with(dictionary=True)
+    assert cursor.rowcount is conexion._conexion.cursor.return_value.rowcount
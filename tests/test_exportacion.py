@@ -0,0 +1,76 @@
+"""
+Este archivo contiene pruebas unitarias para la exportación en CSV y XLSX de `exportacion.py`.
+Los generadores se alimentan con filas en memoria y se verifica el archivo armado con sus bloques.
+"""
+
+import csv
+import io
+import zipfile
+from datetime import date, timedelta
+from xml.etree import ElementTree
+
+import exportacion
+from exportacion import generar_csv, generar_xlsx
+
+NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+FILA = {'tipo': 'academico', 'institucion': 'IE <1> & "A"', 'nombre_estudiante': 'Ana',
+        'motivo': 'Pelea', 'estado': 'Pendiente', 'fecha': date(2025, 3, 4),
+        'hora': timedelta(hours=9, minutes=30), 'evidencia': None}
+
+def _filas(cantidad):
+    return ({**FILA, 'nombre_estudiante': f"Alumno {i}"} for i in range(cantidad))
+
+def test_csv_con_bom_encabezados_y_valores():
+    """
+    Prueba que el CSV empieza con BOM, trae los encabezados y formatea fechas, horas y nulos.
+    """
+    texto = b''.join(generar_csv([FILA])).decode('utf-8')
+    assert texto.startswith('\ufeff')
+    encabezados, fila = list(csv.reader(io.StringIO(texto[1:])))
+    assert encabezados[:4] == ['Tipo', 'Institución', 'Estudiante', 'Descripción']
+    assert fila == ['academico', 'IE <1> & "A"', 'Ana', 'Pelea', 'Pendiente', '2025-03-04', '9:30:00', '']
+
+def test_csv_neutraliza_formulas():
+    """
+    Prueba que los textos que Excel tomaría como fórmula se anteponen con un apóstrofo.
+    """
+    texto = b''.join(generar_csv([{**FILA, 'motivo': '=HYPERLINK("x")'}])).decode('utf-8-sig')
+    assert list(csv.reader(io.StringIO(texto)))[1][3] == '\'=HYPERLINK("x")'
+
+def test_csv_por_bloques(monkeypatch):
+    """
+    Prueba que el CSV se entrega en varios bloques en lugar de acumularse completo.
+    """
+    monkeypatch.setattr(exportacion, 'TAMANO_BLOQUE', 1024)
+    bloques = list(generar_csv(_filas(500)))
+    assert len(bloques) > 10
+    assert max(len(bloque) for bloque in bloques) < 2048
+    assert len(b''.join(bloques).decode('utf-8-sig').splitlines()) == 501
+
+def test_xlsx_valido_y_por_bloques(monkeypatch):
+    """
+    Prueba que el XLSX es un ZIP válido con la hoja completa, las celdas escapadas y los
+    caracteres de control eliminados, y que se entrega en varios bloques.
+    """
+    monkeypatch.setattr(exportacion, 'TAMANO_BLOQUE', 1024)
+    filas = list(_filas(20000)) + [{**FILA, 'motivo': 'con\x01control', 'nombre_estudiante': 7}]
+    bloques = list(generar_xlsx(iter(filas)))
+    assert len(bloques) > 2
+
+    libro = zipfile.ZipFile(io.BytesIO(b''.join(bloques)))
+    assert libro.testzip() is None
+    assert '[Content_Types].xml' in libro.namelist()
+    hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+    filas_xml = hoja.findall('.//x:row', NS)
+    assert len(filas_xml) == 20002
+
+    def valores(fila):
+        return [''.join(celda.itertext()) for celda in fila.findall('x:c', NS)]
+
+    assert valores(filas_xml[0])[0] == 'Tipo'
+    assert valores(filas_xml[1])[1] == 'IE <1> & "A"'
+    ultima = filas_xml[-1].findall('x:c', NS)
+    assert ultima[2].get('t') is None and valores(filas_xml[-1])[2] == '7'
+    assert valores(filas_xml[-1])[3] == 'concontrol'
+    assert len(ultima) == 8
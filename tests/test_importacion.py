@@ -0,0 +1,144 @@
+"""
+Este archivo contiene pruebas unitarias para la importación masiva de `importacion.py`.
+La base de datos se simula con una conexión y un cursor `MagicMock`.
+"""
+
+import io
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from mysql.connector import Error
+
+from importacion import escribir_rechazados, generar_csv_prueba, importar_csv, leer_csv
+
+@pytest.fixture
+def conexion():
+    """
+    Fixture con una conexión simulada cuyo cursor no encuentra registros existentes.
+    """
+    conexion = MagicMock()
+    conexion.cursor.return_value.fetchall.return_value = []
+    with patch('importacion.invalidar_usuarios'), patch('importacion.invalidar_incidentes'):
+        yield conexion
+
+def csv_usuarios(*filas, separador=','):
+    encabezado = separador.join(['Nombre', 'Apellido', 'DNI', 'Telefono', 'Correo_Electronico', 'Institucion', 'Clave'])
+    return io.StringIO('\n'.join([encabezado] + [separador.join(f) for f in filas]) + '\n')
+
+def test_leer_csv_detecta_separador_y_normaliza_columnas():
+    """
+    Prueba que se acepta ';' como separador, que los encabezados se normalizan (con alias),
+    que se omiten las líneas vacías y que se informa el número de línea del archivo.
+    """
+    texto = csv_usuarios(['Ana', 'Pérez', '1', '', 'ana@x.pe', 'IE 1', 'c'], [''] * 7,
+                         ['Luis', 'Díaz', '2', '', 'luis@x.pe', '', 'c'], separador=';')
+    filas = list(leer_csv(texto))
+    assert [numero for numero, _ in filas] == [2, 4]
+    assert filas[0][1]['correo'] == 'ana@x.pe'
+    assert filas[1][1]['nombre'] == 'Luis'
+
+def test_importar_usuarios_por_lotes(conexion):
+    """
+    Prueba que los usuarios válidos se insertan con un `executemany` y un commit por lote y que
+    los inválidos, los repetidos en el archivo y los ya registrados se rechazan con su motivo; al
+    haber insertadas, la sesión queda fijada a la primaria.
+    """
+    cursor = conexion.cursor.return_value
+    cursor.fetchall.side_effect = [[('3', 'otro@x.pe')], []]
+    texto = csv_usuarios(
+        ['Ana', 'Pérez', '1', '', 'ana@x.pe', 'IE 1', 'c'],
+        ['Ana', 'Pérez', '1', '', 'ana2@x.pe', 'IE 1', 'c'],
+        ['Eva', 'Ruiz', '3', '', 'eva@x.pe', 'IE 1', 'c'],
+        ['Sin', 'Correo', '4', '', 'no-es-correo', 'IE 2', 'c'],
+        ['Luis', 'Díaz', '5', '', 'luis@x.pe', 'IE 2', 'c'],
+        ['Rosa', 'Vega', '6', '', 'rosa@x.pe', '', 'c'],
+    )
+    with patch('importacion.forzar_primaria') as forzar:
+        informe = importar_csv(conexion, texto, 'usuarios', tamano_lote=2)
+
+    forzar.assert_called_once_with()
+    assert informe['filas'] == 6
+    assert informe['insertadas'] == 3
+    assert informe['lotes'] == 2
+    assert [(r['fila'], r['motivo']) for r in informe['rechazadas']] == [
+        (3, 'DNI repetido en el archivo'), (4, 'DNI ya registrado'), (5, 'Correo inválido: no-es-correo')]
+    assert 'clave' not in informe['rechazadas'][0]['datos']
+    assert conexion.commit.call_count == 2
+
+    inserciones = [c for c in cursor.executemany.call_args_list if 'INTO usuarios' in c.args[0]]
+    assert [len(c.args[1]) for c in inserciones] == [1, 2]
+    assert inserciones[1].args[1][1][2] == '6'
+
+def test_lote_fallido_se_reintenta_fila_a_fila(conexion):
+    """
+    Prueba que si la base de datos rechaza un lote se deshace y se reintenta fila a fila,
+    rechazando solo la fila que falla.
+    """
+    cursor = conexion.cursor.return_value
+    llamadas = {'n': 0}
+
+    def executemany(sql, filas):
+        if 'INTO usuarios' in sql:
+            llamadas['n'] += 1
+            if len(filas) > 1 or filas[0][2] == '2':
+                raise Error("Duplicate entry")
+    cursor.executemany.side_effect = executemany
+    texto = csv_usuarios(['Ana', 'P', '1', '', 'ana@x.pe', '', 'c'], ['Luis', 'D', '2', '', 'luis@x.pe', '', 'c'])
+    informe = importar_csv(conexion, texto, 'usuarios')
+
+    assert informe['insertadas'] == 1
+    assert informe['rechazadas'][0]['fila'] == 3
+    assert informe['rechazadas'][0]['motivo'].startswith('Error de base de datos')
+    assert conexion.rollback.call_count == 2
+    assert llamadas['n'] == 3
+
+def test_importar_incidentes_historicos(conexion):
+    """
+    Prueba que los incidentes se asignan al usuario por correo (con su institución), conservan la
+    fecha histórica en `fecha_registro`, se insertan por tabla y ajustan los contadores.
+    """
+    cursor = conexion.cursor.return_value
+    cursor.fetchall.return_value = [(10, 'Ana@X.pe', 7)]
+    texto = io.StringIO(
+        "tipo,correo,estado,fecha,hora,nombre_estudiante,motivo,problema,descripcion\n"
+        "academico,ana@x.pe,resuelto,01/03/2024,08:30,Juan,Tardanza,,\n"
+        "infraestructura,ana@x.pe,Pendiente,2024-03-02,,,,Techo,Goteras\n"
+        "infraestructura,nadie@x.pe,Pendiente,2024-03-02,,,,Techo,Goteras\n"
+        "infraestructura,ana@x.pe,Cerrado,2024-03-02,,,,Techo,Goteras\n"
+        "academico,ana@x.pe,Pendiente,2024-13-01,,Juan,Tardanza,,\n"
+    )
+    informe = importar_csv(conexion, texto, 'incidentes')
+
+    assert informe['insertadas'] == 2
+    assert [r['motivo'] for r in informe['rechazadas']] == [
+        'Usuario no encontrado', 'Estado inválido: Cerrado', 'Fecha inválida: 2024-13-01']
+    academico = next(c for c in cursor.executemany.call_args_list if 'registro_academico' in c.args[0]).args[1]
+    assert academico[0][4] == 'Resuelto'
+    assert academico[0][6:] == (10, datetime(2024, 3, 1, 8, 30), None, 7)
+    infraestructura = next(c for c in cursor.executemany.call_args_list if 'registro_infraestructura' in c.args[0]).args[1]
+    assert infraestructura[0][4] == datetime(2024, 3, 2)
+    contadores = next(c for c in cursor.executemany.call_args_list if 'contadores_incidentes' in c.args[0]).args[1]
+    assert sorted(contadores) == [(10, 'Académico', 'Resuelto', 1), (10, 'Infraestructura', 'Pendiente', 1)]
+    conexion.commit.assert_called_once()
+
+def test_tipo_desconocido(conexion):
+    with pytest.raises(ValueError):
+        importar_csv(conexion, io.StringIO(''), 'colegios')
+
+def test_escribir_rechazados():
+    """
+    Prueba que el informe de rechazos lleva la fila, el motivo y las columnas originales.
+    """
+    salida = io.StringIO()
+    escribir_rechazados([{'fila': 3, 'motivo': 'Falta dni', 'datos': {'nombre': 'Ana', 'dni': ''}}], salida)
+    assert salida.getvalue().splitlines() == ['fila,motivo,nombre,dni', '3,Falta dni,Ana,']
+
+def test_generar_csv_prueba_es_importable(conexion):
+    """
+    Prueba que los CSV generados para medir el rendimiento pasan la validación completa.
+    """
+    usuarios, incidentes = generar_csv_prueba(10, 'imp1234')
+    assert importar_csv(conexion, usuarios, 'usuarios')['rechazadas'] == []
+    conexion.cursor.return_value.fetchall.return_value = [(n, f'imp1234.{n}@importacion.test', 1) for n in range(10)]
+    assert importar_csv(conexion, incidentes, 'incidentes')['insertadas'] == 10
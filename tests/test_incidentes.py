@@ -0,0 +1,108 @@
+"""
+Este archivo contiene pruebas unitarias para la consulta unificada de incidentes de `incidentes.py`.
+Verifica que ambos tipos se lean en un solo UNION ALL, que los filtros se apliquen en cada rama,
+que el orden y el LIMIT se resuelvan en SQL y que las columnas pedidas se validen.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from incidentes import consulta_incidentes, leer_incidentes, preparar_busqueda
+from metricas import TIPO_INFRAESTRUCTURA
+
+def test_consulta_sin_filtros_lee_ambas_tablas():
+    """
+    Prueba que sin filtros se combinan ambas tablas con el discriminador `tipo` y sin parámetros.
+    """
+    sql, parametros = consulta_incidentes()
+    assert 'FROM registro_academico r' in sql
+    assert 'FROM registro_infraestructura r' in sql
+    assert sql.count('UNION ALL') == 1
+    assert "'Académico' AS tipo" in sql
+    assert 'ORDER BY i.fecha_registro DESC, i.id DESC' in sql
+    assert parametros == ()
+
+def test_filtros_en_cada_rama():
+    """
+    Prueba que estado, usuario e institución se repiten en cada rama para usar sus índices.
+    """
+    sql, parametros = consulta_incidentes(estado='Pendiente', usuario_id=7, institucion='IE 1')
+    assert sql.count('r.estado = %s AND r.usuario_id = %s AND r.institucion_id = '
+                     '(SELECT id FROM instituciones WHERE nombre = %s)') == 2
+    assert parametros == ('Pendiente', 7, 'IE 1', 'Pendiente', 7, 'IE 1')
+
+def test_filtro_por_institucion_sin_unir_usuarios():
+    """
+    Prueba que filtrar por `institucion_id` no une con `usuarios` si no se piden sus columnas.
+    """
+    sql, parametros = consulta_incidentes(columnas=('id', 'institucion'), institucion_id=4)
+    assert 'JOIN usuarios' not in sql
+    assert 'LEFT JOIN instituciones n ON r.institucion_id = n.id' in sql
+    assert parametros == (4, 4)
+
+def test_rango_de_fechas_en_cada_rama():
+    """
+    Prueba que `desde` (inclusive) y `hasta` (exclusivo) filtran `fecha_registro` en cada rama,
+    después de la institución para usar el índice compuesto.
+    """
+    sql, parametros = consulta_incidentes(institucion_id=4, desde='2025-01-01', hasta='2025-02-01')
+    assert sql.count('r.institucion_id = %s AND r.fecha_registro >= %s AND r.fecha_registro < %s') == 2
+    assert parametros == (4, '2025-01-01', '2025-02-01') * 2
+
+def test_limite_por_rama_y_global():
+    """
+    Prueba que con `limite` cada rama se ordena y corta antes de combinar, y el resultado también.
+    """
+    sql, parametros = consulta_incidentes(estado='Resuelto', limite=10)
+    assert sql.count('LIMIT %s') == 3
+    assert parametros == ('Resuelto', 10, 'Resuelto', 10, 10)
+
+def test_preparar_busqueda_quita_operadores():
+    """
+    Prueba que las palabras se buscan como prefijos opcionales y que se descartan los operadores
+    del modo booleano escritos por el usuario.
+    """
+    assert preparar_busqueda('Filtración  techo') == 'Filtración* techo*'
+    assert preparar_busqueda('+techo -"agua" (x)~') == 'techo* agua* x*'
+    assert preparar_busqueda(' * ') is None
+    assert preparar_busqueda(None) is None
+
+def test_busqueda_por_relevancia_con_desplazamiento():
+    """
+    Prueba que la búsqueda usa MATCH sobre las columnas del índice FULLTEXT de cada tabla, ordena
+    por relevancia y que cada rama aporta las filas necesarias para llegar a la página pedida.
+    """
+    sql, parametros = consulta_incidentes(columnas=('id',), estado='Pendiente', busqueda='techo*',
+                                          limite=10, desplazamiento=20)
+    assert 'MATCH(r.motivo, r.nombre_estudiante, r.comentarios) AGAINST (%s IN BOOLEAN MODE)' in sql
+    assert 'MATCH(r.problema, r.descripcion_problema, r.comentarios) AGAINST (%s IN BOOLEAN MODE)' in sql
+    assert sql.count('ORDER BY relevancia DESC, r.fecha_registro DESC, r.id DESC LIMIT %s') == 2
+    assert 'i.relevancia' in sql and sql.endswith('LIMIT %s OFFSET %s')
+    # Relevancia en el SELECT, filtros, coincidencia en el WHERE y límite de la rama
+    assert parametros == ('techo*', 'Pendiente', 'techo*', 30) * 2 + (10, 20)
+
+def test_columnas_con_alias_y_un_solo_tipo():
+    """
+    Prueba que se pueden renombrar columnas y leer un único tipo.
+    """
+    sql, _ = consulta_incidentes(columnas=('id', ('descripcion', 'motivo')), tipos=(TIPO_INFRAESTRUCTURA,))
+    assert 'i.descripcion AS motivo' in sql
+    assert 'r.descripcion_problema AS descripcion' in sql
+    assert 'registro_academico' not in sql
+    assert 'UNION ALL' not in sql
+
+def test_columna_desconocida():
+    """
+    Prueba que pedir una columna fuera del modelo común lanza ValueError.
+    """
+    with pytest.raises(ValueError):
+        consulta_incidentes(columnas=('clave',))
+
+def test_leer_incidentes_una_consulta():
+    """
+    Prueba que `leer_incidentes` ejecuta una sola consulta y devuelve sus filas.
+    """
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{'id': 1, 'tipo': TIPO_INFRAESTRUCTURA}]
+    assert leer_incidentes(cursor, usuario_id=1) == [{'id': 1, 'tipo': TIPO_INFRAESTRUCTURA}]
+    cursor.execute.assert_called_once()
@@ -0,0 +1,67 @@
+"""
+Este archivo contiene pruebas unitarias para la tabla de instituciones de `instituciones.py`.
+Verifica la resolución de nombres a ids, la propagación del id a los incidentes del usuario
+y el relleno (backfill) de los datos existentes.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from instituciones import (
+    backfill_instituciones,
+    obtener_o_crear_institucion,
+    propagar_institucion,
+)
+
+def test_obtener_o_crear_institucion_devuelve_id():
+    """
+    Prueba que se usa un único INSERT ... ON DUPLICATE KEY y se devuelve `lastrowid`.
+    """
+    cursor = MagicMock()
+    cursor.lastrowid = 3
+    assert obtener_o_crear_institucion(cursor, '  Colegio XYZ ') == 3
+    sql, parametros = cursor.execute.call_args.args
+    assert 'LAST_INSERT_ID(id)' in sql
+    assert parametros == ('Colegio XYZ',)
+
+def test_obtener_o_crear_institucion_vacia():
+    """
+    Prueba que un nombre vacío no crea ninguna institución.
+    """
+    cursor = MagicMock()
+    assert obtener_o_crear_institucion(cursor, '') is None
+    assert obtener_o_crear_institucion(cursor, None) is None
+    cursor.execute.assert_not_called()
+
+def test_propagar_institucion_a_ambas_tablas():
+    """
+    Prueba que el id se copia a los incidentes del usuario en ambas tablas.
+    """
+    cursor = MagicMock()
+    propagar_institucion(cursor, 7, 3)
+    assert cursor.execute.call_count == 2
+    for llamada, tabla in zip(cursor.execute.call_args_list, ('registro_academico', 'registro_infraestructura')):
+        assert tabla in llamada.args[0]
+        assert llamada.args[1] == (3, 7)
+
+def test_backfill_confirma_en_una_transaccion():
+    """
+    Prueba que el relleno crea instituciones, actualiza usuarios e incidentes y confirma una vez.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    backfill_instituciones(conexion)
+    assert cursor.execute.call_count == 4
+    assert 'INSERT IGNORE INTO instituciones' in cursor.execute.call_args_list[0].args[0]
+    conexion.commit.assert_called_once()
+
+def test_backfill_deshace_si_falla():
+    """
+    Prueba que un error durante el relleno hace rollback y se propaga.
+    """
+    conexion = MagicMock()
+    conexion.cursor.return_value.execute.side_effect = [None, Exception("bloqueo")]
+    with pytest.raises(Exception):
+        backfill_instituciones(conexion)
+    conexion.rollback.assert_called_once()
+    conexion.commit.assert_not_called()
@@ -0,0 +1,152 @@
+"""
+Este archivo contiene pruebas unitarias para la instrumentación de consultas y el exportador de
+métricas de `instrumentacion.py`. Cada prueba usa un archivo SQLite temporal propio; los cursores
+de MySQL se simulan con `MagicMock`.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+from mysql.connector import Error
+
+import instrumentacion
+from instrumentacion import CursorInstrumentado, RegistroMetricas, huella_sql, registrar_instrumentacion
+
+@pytest.fixture
+def registro(tmp_path):
+    """
+    Fixture que reemplaza el registro compartido por uno sobre un archivo SQLite temporal.
+    """
+    registro = RegistroMetricas(str(tmp_path / 'metricas.sqlite3'), intervalo=0)
+    with patch('instrumentacion.registro_metricas', registro), \
+            patch.object(registro, '_atexit', True):
+        yield registro
+
+def test_huella_sql_agrupa_por_forma():
+    """
+    Prueba que literales, marcadores, listas IN y filas de VALUES se normalizan y que los espacios
+    se colapsan.
+    """
+    assert huella_sql("SELECT * FROM usuarios\n   WHERE id = 5 AND correo = 'a@x.pe'") == \
+        "SELECT * FROM usuarios WHERE id = ? AND correo = ?"
+    assert huella_sql("SELECT id FROM t WHERE id IN (%s, %s, %s) LIMIT %(limite)s") == \
+        huella_sql("SELECT id FROM t WHERE id IN (1,2) LIMIT 20") == "SELECT id FROM t WHERE id IN (?+) LIMIT ?"
+    assert huella_sql("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == "INSERT INTO t (a, b) VALUES (?+)"
+    assert huella_sql("SELECT * FROM tabla2") == "SELECT * FROM tabla2"
+
+def test_exportar_formato_prometheus(registro):
+    """
+    Prueba que los histogramas se exportan con cubetas acumuladas en orden, `+Inf`, `_sum` y
+    `_count`, y que los valores de las etiquetas se escapan.
+    """
+    etiquetas = (('consulta', 'SELECT "a"\\n'),)
+    registro.observar('ugel_sql_duracion_segundos', 0.003, etiquetas)
+    registro.observar('ugel_sql_duracion_segundos', 0.2, etiquetas)
+    registro.incrementar('ugel_sql_filas_total', etiquetas, 7)
+    texto = registro.exportar()
+
+    assert '# TYPE ugel_sql_duracion_segundos histogram' in texto
+    lineas = [linea for linea in texto.splitlines() if linea.startswith('ugel_sql_duracion_segundos')]
+    consulta = 'consulta="SELECT \\"a\\"\\\\n"'
+    assert lineas[0] == f'ugel_sql_duracion_segundos_bucket{{{consulta},le="0.001"}} 0'
+    assert f'ugel_sql_duracion_segundos_bucket{{{consulta},le="0.005"}} 1' in lineas
+    assert f'ugel_sql_duracion_segundos_bucket{{{consulta},le="0.25"}} 2' in lineas
+    assert lineas[-3:] == [
+        f'ugel_sql_duracion_segundos_bucket{{{consulta},le="+Inf"}} 2',
+        f'ugel_sql_duracion_segundos_sum{{{consulta}}} 0.203',
+        f'ugel_sql_duracion_segundos_count{{{consulta}}} 2',
+    ]
+    assert f'ugel_sql_filas_total{{{consulta}}} 7' in texto
+
+def test_procesos_suman_en_el_archivo_compartido(registro):
+    """
+    Prueba que dos registros sobre el mismo archivo (dos workers) exportan la suma de ambos.
+    """
+    otro = RegistroMetricas(registro.ruta, intervalo=0)
+    otro._atexit = True
+    registro.incrementar('ugel_http_peticiones_total', (('ruta', '/'), ('metodo', 'GET'), ('estado', '200')))
+    otro.incrementar('ugel_http_peticiones_total', (('ruta', '/'), ('metodo', 'GET'), ('estado', '200')), 2)
+    otro.volcar()
+    assert 'ugel_http_peticiones_total{ruta="/",metodo="GET",estado="200"} 3' in registro.exportar()
+
+def test_cursor_mide_sentencias_y_filas(registro):
+    """
+    Prueba que el cursor instrumentado delega en el real, mide cada sentencia bajo su huella,
+    cuenta las filas leídas y los errores.
+    """
+    real = MagicMock()
+    real.fetchall.return_value = [(1,), (2,)]
+    real.fetchone.side_effect = [(3,), None]
+    real.lastrowid = 11
+    cursor = CursorInstrumentado(real)
+
+    cursor.execute("SELECT id FROM usuarios WHERE institucion_id = %s", (4,))
+    assert cursor.fetchall() == [(1,), (2,)]
+    assert cursor.fetchone() == (3,)
+    assert cursor.fetchone() is None
+    assert cursor.lastrowid == 11
+    real.execute.assert_called_once_with("SELECT id FROM usuarios WHERE institucion_id = %s", (4,))
+
+    real.execute.side_effect = Error("Table doesn't exist")
+    with pytest.raises(Error):
+        cursor.execute("SELECT * FROM otra")
+    texto = registro.exportar()
+    assert 'ugel_sql_filas_total{consulta="SELECT id FROM usuarios WHERE institucion_id = ?"} 3' in texto
+    assert 'ugel_sql_duracion_segundos_count{consulta="SELECT id FROM usuarios WHERE institucion_id = ?"} 1' in texto
+    assert 'ugel_sql_errores_total{consulta="SELECT * FROM otra"} 1' in texto
+
+def test_consulta_lenta_se_registra_sin_parametros(registro):
+    """
+    Prueba que una sentencia que supera `SQL_LENTA_MS` se cuenta y se registra con su huella y
+    su ruta, sin los parámetros.
+    """
+    cursor = CursorInstrumentado(MagicMock())
+    app = Flask(__name__)
+    with patch('instrumentacion.SQL_LENTA_MS', 100), \
+            patch('instrumentacion.time.perf_counter', side_effect=[0.0, 0.25]), \
+            patch.object(instrumentacion.log_consultas_lentas, 'warning') as advertir, \
+            app.test_request_context('/buscar'):
+        cursor.execute("SELECT * FROM usuarios WHERE dni = %s", ('12345678',))
+    formato, milisegundos, ruta, huella = advertir.call_args.args
+    assert (milisegundos, ruta, huella) == (250.0, 'GET /buscar', 'SELECT * FROM usuarios WHERE dni = ?')
+    assert '12345678' not in repr(advertir.call_args)
+    assert 'ugel_sql_lentas_total{consulta="SELECT * FROM usuarios WHERE dni = ?"} 1' in registro.exportar()
+
+def test_peticiones_por_ruta_y_consultas_por_peticion(registro):
+    """
+    Prueba que cada petición se registra bajo su regla de URL con su método y estado, y que se
+    cuentan las sentencias ejecutadas en ella.
+    """
+    app = Flask(__name__)
+    registrar_instrumentacion(app)
+
+    @app.route('/incidentes/<int:incidente_id>')
+    def ver(incidente_id):
+        cursor = CursorInstrumentado(MagicMock())
+        cursor.execute("SELECT 1")
+        cursor.execute("SELECT 2")
+        return 'ok'
+
+    cliente = app.test_client()
+    cliente.get('/incidentes/5')
+    cliente.get('/incidentes/6')
+    cliente.get('/no-existe')
+    texto = registro.exportar()
+    assert 'ugel_http_peticiones_total{ruta="/incidentes/<int:incidente_id>",metodo="GET",estado="200"} 2' in texto
+    assert 'ugel_http_peticiones_total{ruta="sin_ruta",metodo="GET",estado="404"} 1' in texto
+    assert 'ugel_http_duracion_segundos_count{ruta="/incidentes/<int:incidente_id>",metodo="GET"} 2' in texto
+    assert 'ugel_sql_consultas_por_peticion_bucket{le="2"} 3' in texto
+    assert 'ugel_sql_consultas_por_peticion_sum 4' in texto
+
+def test_metricas_con_token():
+    """
+    Prueba que con `METRICAS_TOKEN` solo la cabecera Bearer correcta da acceso y que sin token
+    configurado el acceso queda abierto.
+    """
+    with patch('instrumentacion.METRICAS_TOKEN', None):
+        assert instrumentacion.metricas_autorizadas(None)
+    with patch('instrumentacion.METRICAS_TOKEN', 's3creto'):
+        assert instrumentacion.metricas_autorizadas('Bearer s3creto')
+        assert not instrumentacion.metricas_autorizadas('Bearer otro')
+        assert not instrumentacion.metricas_autorizadas(None)
@@ -0,0 +1,109 @@
+"""
+Este archivo contiene pruebas unitarias para el limitador de intentos de login definido en
+`limitador.py`. Cada prueba usa un archivo SQLite temporal propio.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from limitador import LimitadorLogin
+
+@pytest.fixture
+def limitador(tmp_path):
+    """
+    Fixture que crea un limitador con límites bajos sobre un archivo SQLite temporal.
+    """
+    return LimitadorLogin(str(tmp_path / 'limitador.sqlite3'), max_fallos_ip=5,
+                          max_fallos_cuenta=3, ventana=60)
+
+def test_bloquea_cuenta_tras_max_fallos(limitador):
+    """
+    Prueba que la cuenta queda bloqueada al alcanzar `max_fallos_cuenta` y que otra cuenta
+    desde la misma IP sigue permitida.
+    """
+    assert limitador.registrar_fallo('1.1.1.1', 'a@x.com') is False
+    assert limitador.registrar_fallo('1.1.1.1', 'a@x.com') is False
+    assert limitador.registrar_fallo('1.1.1.1', 'a@x.com') is True
+    assert limitador.verificar('2.2.2.2', 'a@x.com') == 'cuenta'
+    assert limitador.verificar('1.1.1.1', 'b@x.com') is None
+
+def test_cuenta_no_distingue_mayusculas(limitador):
+    """
+    Prueba que variar mayúsculas y espacios del correo no reparte los fallos entre claves
+    distintas y que el éxito con otra escritura también los olvida.
+    """
+    limitador.registrar_fallo('1.1.1.1', 'a@x.com')
+    limitador.registrar_fallo('2.2.2.2', 'A@X.com')
+    assert limitador.registrar_fallo('3.3.3.3', ' a@X.COM ') is True
+    assert limitador.verificar('4.4.4.4', 'A@x.Com') == 'cuenta'
+    limitador.registrar_exito('4.4.4.4', 'A@X.COM')
+    assert limitador.verificar('4.4.4.4', 'a@x.com') is None
+
+def test_bloquea_ip_con_varias_cuentas(limitador):
+    """
+    Prueba que una IP que falla con muchas cuentas distintas se bloquea para cualquier cuenta.
+    """
+    for i in range(5):
+        limitador.registrar_fallo('9.9.9.9', f'c{i}@x.com')
+    assert limitador.verificar('9.9.9.9', 'nueva@x.com') == 'ip'
+    assert limitador.verificar('8.8.8.8', 'nueva@x.com') is None
+
+def test_exito_olvida_fallos_de_la_cuenta(limitador):
+    """
+    Prueba que un login correcto borra los fallos de la cuenta pero no los de la IP.
+    """
+    limitador.registrar_fallo('1.1.1.1', 'a@x.com')
+    limitador.registrar_fallo('1.1.1.1', 'a@x.com')
+    limitador.registrar_exito('1.1.1.1', 'a@x.com')
+    assert limitador.registrar_fallo('1.1.1.1', 'a@x.com') is False
+    assert limitador.estadisticas()['claves_con_fallos'] == 2
+
+def test_fallos_caducan_con_la_ventana(limitador):
+    """
+    Prueba que los fallos fuera de la ventana deslizante dejan de contar.
+    """
+    with patch('limitador.time.time', return_value=1000.0):
+        for _ in range(3):
+            limitador.registrar_fallo('1.1.1.1', 'a@x.com')
+        assert limitador.verificar('1.1.1.1', 'a@x.com') == 'cuenta'
+    with patch('limitador.time.time', return_value=1061.0):
+        assert limitador.verificar('1.1.1.1', 'a@x.com') is None
+
+def test_estado_compartido_entre_instancias(tmp_path):
+    """
+    Prueba que dos limitadores sobre el mismo archivo (como dos workers) comparten fallos
+    y contadores.
+    """
+    ruta = str(tmp_path / 'compartido.sqlite3')
+    worker_a = LimitadorLogin(ruta, max_fallos_cuenta=2)
+    worker_b = LimitadorLogin(ruta, max_fallos_cuenta=2)
+    worker_a.registrar_fallo('1.1.1.1', 'a@x.com')
+    worker_b.registrar_fallo('1.1.1.1', 'a@x.com')
+    assert worker_a.verificar('1.1.1.1', 'a@x.com') == 'cuenta'
+    assert worker_b.estadisticas()['rechazados_cuenta'] == 1
+
+def test_estadisticas_cuentan_permitidos_y_rechazados(limitador):
+    """
+    Prueba los contadores de permitidos, rechazados, fallos y éxitos, y la tasa de rechazo.
+    """
+    limitador.verificar('1.1.1.1', 'a@x.com')
+    for _ in range(3):
+        limitador.registrar_fallo('1.1.1.1', 'a@x.com')
+    limitador.verificar('1.1.1.1', 'a@x.com')
+    limitador.registrar_exito('3.3.3.3', 'b@x.com')
+    stats = limitador.estadisticas()
+    assert stats['permitidos'] == 1
+    assert stats['rechazados_cuenta'] == 1
+    assert stats['fallos'] == 3
+    assert stats['exitos'] == 1
+    assert stats['tasa_rechazo'] == 0.5
+
+def test_reiniciar_borra_todo(limitador):
+    """
+    Prueba que `reiniciar()` elimina fallos y contadores.
+    """
+    for _ in range(3):
+        limitador.registrar_fallo('1.1.1.1', 'a@x.com')
+    limitador.reiniciar()
+    assert limitador.verificar('1.1.1.1', 'a@x.com') is None
+    assert limitador.estadisticas()['fallos'] == 0
@@ -0,0 +1,36 @@
+"""
+Este archivo contiene pruebas unitarias para la medición de la actualización de incidentes de
+`medicion.py`. Se usa una conexión simulada y se cuentan las sentencias de cada variante.
+"""
+
+from unittest.mock import MagicMock
+
+from medicion import CursorContado, medir_actualizacion
+
+def test_cursor_contado_cuenta_sentencias():
+    """
+    Prueba que se cuentan `execute` y `executemany` y que el resto se delega en el cursor.
+    """
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (1,)
+    contado = CursorContado(cursor)
+    contado.execute("SELECT 1")
+    contado.executemany("INSERT", [(1,), (2,)])
+    assert contado.fetchone() == (1,)
+    assert contado.sentencias == 2
+
+def test_medir_actualizacion_compara_variantes():
+    """
+    Prueba que la variante actual envía 3 sentencias frente a 5 de la anterior, que cada
+    repetición se deshace y que se informan las latencias de ambas.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchone.side_effect = [(5, 8), (2, 'Pendiente', 7), (3, 2, 'Pendiente', 7, 5, 8)] * 2
+    resultados = medir_actualizacion(conexion, 3, 'a@example.com', repeticiones=2)
+    assert resultados['anterior']['sentencias'] == 5
+    assert resultados['actual']['sentencias'] == 3
+    assert conexion.rollback.call_count == 4
+    conexion.commit.assert_not_called()
+    for datos in resultados.values():
+        assert datos['p50_ms'] <= datos['p95_ms']
@@ -0,0 +1,86 @@
+"""
+Este archivo contiene pruebas unitarias para el motor de métricas definido en `metricas.py`.
+Verifica que todas las métricas se obtengan en una sola consulta sobre los contadores, que los
+filtros por usuario e institución se apliquen y que el estado 'En proceso' sea canónico.
+"""
+
+from unittest.mock import MagicMock
+
+from metricas import (
+    calcular_metricas,
+    construir_consulta_metricas,
+    normalizar_estado,
+    ESTADO_EN_PROCESO,
+)
+
+def test_calcular_metricas_una_sola_consulta():
+    """
+    Prueba que `calcular_metricas` ejecuta una única consulta y convierte los valores a enteros.
+    """
+    cursor = MagicMock()
+    cursor.fetchone.return_value = {
+        'total_incidentes': 5, 'resueltos': 2, 'en_proceso': 1, 'pendientes': 2,
+        'infraestructura': 3, 'academico': 2, 'instituciones': 2, 'total_instituciones': 4
+    }
+    result = calcular_metricas(cursor)
+    cursor.execute.assert_called_once()
+    assert result['total_incidentes'] == 5
+    assert result['en_proceso'] == 1
+    assert result['total_instituciones'] == 4
+
+def test_calcular_metricas_cursor_de_tuplas():
+    """
+    Prueba que `calcular_metricas` acepta cursores que devuelven tuplas.
+    """
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (6, 1, 2, 3, 4, 2, 1, 1)
+    result = calcular_metricas(cursor, usuario_id=7)
+    assert result == {
+        'total_incidentes': 6, 'resueltos': 1, 'en_proceso': 2, 'pendientes': 3,
+        'infraestructura': 4, 'academico': 2, 'instituciones': 1, 'total_instituciones': 1
+    }
+
+def test_calcular_metricas_sin_fila():
+    """
+    Prueba que sin resultados se devuelven todas las métricas en cero.
+    """
+    cursor = MagicMock()
+    cursor.fetchone.return_value = None
+    assert set(calcular_metricas(cursor).values()) == {0}
+
+def test_consulta_lee_contadores_por_usuario():
+    """
+    Prueba que las métricas de un usuario se leen de `contadores_incidentes` por su clave.
+    """
+    sql, parametros = construir_consulta_metricas(usuario_id=3)
+    assert "FROM contadores_incidentes c" in sql
+    assert "c.usuario_id = %s" in sql
+    assert "registro_infraestructura" not in sql
+    assert parametros[-1] == 3
+    assert sql.count("%s") == len(parametros)
+
+def test_consulta_filtra_por_institucion():
+    """
+    Prueba que el filtro por institución añade sus parámetros en el orden correcto.
+    """
+    sql, parametros = construir_consulta_metricas(usuario_id=3, institucion='Colegio XYZ')
+    assert "u.institucion = %s" in sql
+    assert sql.count("%s") == len(parametros)
+    assert parametros[-2:] == (3, 'Colegio XYZ')
+
+def test_consulta_usa_estado_canonico():
+    """
+    Prueba que la consulta compara contra 'En proceso', el valor del ENUM en la base de datos.
+    """
+    _, parametros = construir_consulta_metricas()
+    assert ESTADO_EN_PROCESO in parametros
+    assert 'En Proceso' not in parametros
+
+def test_normalizar_estado():
+    """
+    Prueba la normalización de variantes de mayúsculas del estado.
+    """
+    assert normalizar_estado('En Proceso') == 'En proceso'
+    assert normalizar_estado(' resuelto ') == 'Resuelto'
+    assert normalizar_estado('Otro') == 'Otro'
+    assert normalizar_estado(None) is None
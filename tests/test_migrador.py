@@ -0,0 +1,131 @@
+"""
+Este archivo contiene pruebas unitarias para el ejecutor de migraciones de `migrador.py`.
+Verifica el orden de las migraciones, que solo se apliquen las pendientes, la creación
+idempotente de índices y la interpretación de las comprobaciones EXPLAIN.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from migrador import (
+    listar_migraciones,
+    aplicar_pendientes,
+    crear_indice_si_no_existe,
+    agregar_columna_si_no_existe,
+    crear_clave_foranea_si_no_existe,
+    cambiar_intercalacion,
+    verificar_migraciones,
+)
+
+def test_listar_migraciones_ordenadas():
+    """
+    Prueba que las migraciones se listan por versión y que todas definen `aplicar` y comprobaciones.
+    """
+    migraciones = listar_migraciones()
+    versiones = [version for version, _, _ in migraciones]
+    assert versiones == sorted(versiones)
+    assert versiones[:3] == [1, 2, 3]
+    for _, _, modulo in migraciones:
+        assert callable(modulo.aplicar)
+        assert modulo.VERIFICACIONES
+
+def test_aplicar_solo_pendientes():
+    """
+    Prueba que las versiones ya registradas se omiten y las nuevas se registran en orden.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchall.return_value = [(1,)]
+    m1 = SimpleNamespace(aplicar=MagicMock())
+    m2 = SimpleNamespace(aplicar=MagicMock())
+    aplicadas = aplicar_pendientes(conexion, [(1, 'uno', m1), (2, 'dos', m2)])
+    assert aplicadas == [(2, 'dos')]
+    m1.aplicar.assert_not_called()
+    m2.aplicar.assert_called_once_with(conexion)
+    cursor.execute.assert_any_call(
+        "INSERT INTO schema_migraciones (version, nombre) VALUES (%s, %s)", (2, 'dos')
+    )
+
+def test_crear_indice_idempotente():
+    """
+    Prueba que no se ejecuta CREATE INDEX si el índice ya existe.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchone.return_value = (1,)
+    assert crear_indice_si_no_existe(conexion, 'usuarios', 'idx_x', ['institucion']) is False
+    assert cursor.execute.call_count == 1
+
+    cursor.fetchone.return_value = (0,)
+    assert crear_indice_si_no_existe(conexion, 'usuarios', 'idx_x', ['institucion']) is True
+    cursor.execute.assert_called_with("CREATE INDEX idx_x ON usuarios (institucion)")
+
+def test_agregar_columna_idempotente():
+    """
+    Prueba que no se ejecuta ALTER TABLE si la columna ya existe.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchone.return_value = (1,)
+    assert agregar_columna_si_no_existe(conexion, 'usuarios', 'institucion_id', 'INT NULL') is False
+    assert cursor.execute.call_count == 1
+
+    cursor.fetchone.return_value = (0,)
+    assert agregar_columna_si_no_existe(conexion, 'usuarios', 'institucion_id', 'INT NULL') is True
+    cursor.execute.assert_called_with("ALTER TABLE usuarios ADD COLUMN institucion_id INT NULL")
+
+def test_crear_clave_foranea_idempotente():
+    """
+    Prueba que no se ejecuta ALTER TABLE si la clave foránea ya existe.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchone.return_value = (1,)
+    assert crear_clave_foranea_si_no_existe(conexion, 'usuarios', 'fk_x', 'institucion_id',
+                                            'instituciones(id)') is False
+    assert cursor.execute.call_count == 1
+
+    cursor.fetchone.return_value = (0,)
+    assert crear_clave_foranea_si_no_existe(conexion, 'usuarios', 'fk_x', 'institucion_id',
+                                            'instituciones(id)') is True
+    cursor.execute.assert_called_with("ALTER TABLE usuarios ADD CONSTRAINT fk_x FOREIGN KEY (institucion_id) "
+                                      "REFERENCES instituciones(id) ON DELETE SET NULL")
+
+def test_cambiar_intercalacion_solo_pendientes():
+    """
+    Prueba que solo se modifican las columnas que aún no tienen la intercalación, en un único
+    ALTER TABLE, y que no se ejecuta nada si ya la tienen todas.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    columnas = [('motivo', 'TEXT NOT NULL'), ('comentarios', 'TEXT')]
+    cursor.fetchall.return_value = [('MOTIVO',)]
+    assert cambiar_intercalacion(conexion, 'registro_academico', columnas, 'utf8mb4_unicode_ci') == ['comentarios']
+    cursor.execute.assert_called_with(
+        "ALTER TABLE registro_academico MODIFY COLUMN comentarios TEXT "
+        "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+    )
+
+    cursor.reset_mock()
+    cursor.fetchall.return_value = [('motivo',), ('comentarios',)]
+    assert cambiar_intercalacion(conexion, 'registro_academico', columnas, 'utf8mb4_unicode_ci') == []
+    assert cursor.execute.call_count == 1
+
+def test_verificar_migraciones_con_explain():
+    """
+    Prueba que la comprobación se cumple solo cuando EXPLAIN elige el índice esperado.
+    """
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchall.side_effect = [
+        [{'key': 'idx_a', 'possible_keys': 'idx_a,idx_b'}],
+        [{'key': None, 'possible_keys': 'idx_b'}],
+    ]
+    modulo = SimpleNamespace(VERIFICACIONES=[
+        ("SELECT 1 FROM t WHERE a = %s", (1,), 'idx_a'),
+        ("SELECT 1 FROM t WHERE b = %s", (2,), 'idx_b'),
+    ])
+    resultados = verificar_migraciones(conexion, [(9, 'prueba', modulo)])
+    assert [r['ok'] for r in resultados] == [True, False]
+    assert resultados[1]['posibles'] == ['idx_b']
+    cursor.execute.assert_any_call("EXPLAIN SELECT 1 FROM t WHERE a = %s", (1,))
@@ -0,0 +1,76 @@
+"""
+Este archivo contiene pruebas unitarias para la paginación por cursor de `paginacion.py`.
+Verifica la codificación del cursor, la condición keyset y el corte de páginas.
+"""
+
+import datetime
+import pytest
+
+from paginacion import (
+    codificar_cursor,
+    decodificar_cursor,
+    condicion_keyset,
+    cortar_pagina,
+    normalizar_limite,
+    LIMITE_DEFECTO,
+    LIMITE_MAXIMO,
+)
+
+def test_cursor_ida_y_vuelta():
+    """
+    Prueba que un cursor codificado se decodifica al mismo par (fecha, id).
+    """
+    fecha = datetime.datetime(2025, 6, 27, 12, 30, 5)
+    assert decodificar_cursor(codificar_cursor(fecha, 42)) == (fecha, 42)
+
+def test_cursor_invalido():
+    """
+    Prueba que un cursor manipulado lanza ValueError y que un cursor vacío equivale a ninguno.
+    """
+    with pytest.raises(ValueError):
+        decodificar_cursor('xxx')
+    assert decodificar_cursor('') is None
+    assert decodificar_cursor(None) is None
+
+def test_condicion_keyset():
+    """
+    Prueba la condición que continúa estrictamente después de la última fila entregada.
+    """
+    fecha = datetime.datetime(2025, 6, 27)
+    sql, parametros = condicion_keyset('r.fecha_registro', 'r.id', (fecha, 7))
+    assert sql == ("(r.fecha_registro < %s OR (r.fecha_registro = %s AND r.id < %s) "
+                   "OR r.fecha_registro IS NULL)")
+    assert parametros == (fecha, fecha, 7)
+    assert condicion_keyset('f', 'i', None) == ("", ())
+
+def test_cursor_con_fecha_nula():
+    """
+    Prueba que una página que termina en una fila sin `fecha_registro` entrega un cursor válido y
+    que la página siguiente sigue solo por las filas sin fecha de id menor.
+    """
+    filas = [{'id': i, 'fecha': None} for i in (9, 8, 7)]
+    _, siguiente = cortar_pagina(filas, 2)
+    assert decodificar_cursor(siguiente) == (None, 8)
+    assert condicion_keyset('r.fecha_registro', 'r.id', (None, 8)) == \
+        ("(r.fecha_registro IS NULL AND r.id < %s)", (8,))
+
+def test_cortar_pagina():
+    """
+    Prueba que se entrega el cursor solo cuando hay más filas que el límite.
+    """
+    fecha = datetime.datetime(2025, 6, 27)
+    filas = [{'id': i, 'fecha': fecha} for i in (3, 2, 1)]
+    pagina, siguiente = cortar_pagina(filas, 2)
+    assert [f['id'] for f in pagina] == [3, 2]
+    assert decodificar_cursor(siguiente) == (fecha, 2)
+    assert cortar_pagina(filas, 3) == (filas, None)
+
+def test_normalizar_limite():
+    """
+    Prueba los valores por defecto y los límites del parámetro `limit`.
+    """
+    assert normalizar_limite(None) == LIMITE_DEFECTO
+    assert normalizar_limite('0') == 1
+    assert normalizar_limite('100000') == LIMITE_MAXIMO
+    with pytest.raises(ValueError):
+        normalizar_limite('abc')
@@ -0,0 +1,126 @@
+"""
+Este archivo contiene pruebas unitarias para la caché de perfiles de `perfiles.py` y el login
+en una sola consulta de `utils.py`. Verifica la búsqueda por id y por correo, la invalidación
+tras actualizar o eliminar un usuario y que la sesión guarde solo id y versión.
+"""
+
+import pytest
+from unittest.mock import patch, MagicMock
+
+from perfiles import (
+    COLUMNAS_PERFIL,
+    datos_sesion,
+    guardar_perfil,
+    invalidar_perfil,
+    perfil_en_cache,
+    perfiles,
+)
+from utils import autenticar_usuario, obtener_perfil_usuario, actualizar_usuario_por_id
+from versiones import SecuenciaEscrituras
+
+PERFIL = {'id': 7, 'nombre': 'Ana', 'apellido': 'Lopez', 'correo_electronico': 'ana@example.com',
+          'telefono': '999', 'institucion': 'Colegio XYZ', 'institucion_id': 2, 'version': 4}
+
+@pytest.fixture(autouse=True)
+def limpiar_perfiles():
+    """
+    Fixture que vacía la caché de perfiles antes y después de cada prueba.
+    """
+    perfiles.limpiar()
+    yield
+    perfiles.limpiar()
+
+@pytest.fixture
+def mock_db_connection():
+    """
+    Fixture que simula `utils.get_db_connection` con una conexión y un cursor simulados.
+    """
+    with patch('utils.get_db_connection') as mock_conn:
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.return_value = mock_connection
+        mock_connection.cursor.return_value = mock_cursor
+        yield mock_connection, mock_cursor
+
+def test_perfil_por_id_y_por_correo():
+    """
+    Prueba que un perfil guardado se encuentra por id y por correo.
+    """
+    guardar_perfil(PERFIL)
+    assert perfil_en_cache(usuario_id=7) is PERFIL
+    assert perfil_en_cache(correo='ana@example.com') is PERFIL
+    assert perfil_en_cache(correo='otro@example.com') is None
+
+def test_invalidar_perfil_elimina_ambas_claves():
+    """
+    Prueba que invalidar por id también elimina la entrada por correo.
+    """
+    guardar_perfil(PERFIL)
+    invalidar_perfil(7)
+    assert perfil_en_cache(usuario_id=7) is None
+    assert perfil_en_cache(correo='ana@example.com') is None
+
+def test_datos_sesion_solo_id_y_version():
+    """
+    Prueba que la sesión guarda únicamente el id y la versión del perfil.
+    """
+    assert datos_sesion(PERFIL) == {'id': 7, 'v': 4}
+
+def test_autenticar_usuario_una_consulta(mock_db_connection):
+    """
+    Prueba que el login verifica credenciales y lee el perfil (sin clave) en una sola consulta
+    y deja el perfil en caché.
+    """
+    _, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = PERFIL
+    assert autenticar_usuario('ana@example.com', 'secreta') == PERFIL
+    mock_cursor.execute.assert_called_once()
+    sql, parametros = mock_cursor.execute.call_args.args
+    assert COLUMNAS_PERFIL in sql
+    assert 'clave,' not in sql and '*' not in sql
+    assert parametros == ('ana@example.com', 'secreta')
+    assert perfil_en_cache(usuario_id=7) == PERFIL
+
+def test_autenticar_usuario_invalido(mock_db_connection):
+    """
+    Prueba que con credenciales inválidas se devuelve None y no se guarda nada.
+    """
+    _, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = None
+    assert autenticar_usuario('ana@example.com', 'mala') is None
+    assert perfiles.estadisticas()['entradas'] == 0
+
+def test_obtener_perfil_usuario_usa_cache(mock_db_connection):
+    """
+    Prueba que el perfil se lee de la base de datos una sola vez y luego sale de la caché.
+    """
+    _, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = PERFIL
+    assert obtener_perfil_usuario(7) == PERFIL
+    assert obtener_perfil_usuario(7) == PERFIL
+    mock_cursor.execute.assert_called_once()
+
+def test_actualizar_usuario_invalida_perfil_y_sube_version(mock_db_connection):
+    """
+    Prueba que `actualizar_usuario_por_id` incrementa la versión y descarta el perfil en caché.
+    """
+    _, mock_cursor = mock_db_connection
+    guardar_perfil(PERFIL)
+    assert actualizar_usuario_por_id(7, 'Ana', 'Lopez', '1', '999', 'ana@example.com', 'Colegio XYZ', 'x')
+    assert any('version = version + 1' in llamada.args[0] for llamada in mock_cursor.execute.call_args_list)
+    assert perfil_en_cache(usuario_id=7) is None
+
+def test_escritura_de_otro_worker_invalida_perfiles_en_cache(tmp_path):
+    """
+    Prueba que cuando otro worker modifica un usuario (avanza 'usuarios' en la secuencia
+    compartida), el perfil en caché de este proceso deja de servirse aunque no haya vencido su TTL.
+    """
+    secuencia = SecuenciaEscrituras(str(tmp_path / 'secuencia.sqlite3'))
+    with patch.object(perfiles, 'secuencia', secuencia):
+        guardar_perfil(PERFIL)
+        assert perfil_en_cache(usuario_id=7) == PERFIL
+        secuencia.avanzar('incidentes')
+        assert perfil_en_cache(correo='ana@example.com') == PERFIL
+        secuencia.avanzar('usuarios')
+        assert perfil_en_cache(usuario_id=7) is None
+        assert perfil_en_cache(correo='ana@example.com') is None
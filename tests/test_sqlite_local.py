@@ -0,0 +1,28 @@
+"""
+Este archivo contiene pruebas unitarias para la conexión SQLite compartida de `sqlite_local.py`.
+Cada prueba usa un archivo SQLite temporal propio.
+"""
+
+import pytest
+
+from sqlite_local import conectar_sqlite
+
+def test_confirma_o_deshace_la_transaccion_abierta(tmp_path):
+    """
+    Prueba que una transacción abierta se confirma al salir del contexto sin error y se deshace
+    si hubo una excepción, y que el archivo queda en modo WAL.
+    """
+    ruta = str(tmp_path / 'local.sqlite3')
+    with conectar_sqlite(ruta) as conexion:
+        conexion.execute("CREATE TABLE t (valor INTEGER)")
+        conexion.execute("BEGIN IMMEDIATE")
+        conexion.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(RuntimeError):
+        with conectar_sqlite(ruta) as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError('fallo')
+    with conectar_sqlite(ruta, sincrono='FULL') as conexion:
+        assert conexion.execute("SELECT valor FROM t").fetchall() == [(1,)]
+        assert conexion.execute("PRAGMA journal_mode").fetchone() == ('wal',)
+        assert conexion.execute("PRAGMA synchronous").fetchone() == (2,)
@@ -0,0 +1,115 @@
+"""
+Este archivo contiene pruebas unitarias para las respuestas JSON en streaming de `streaming.py`.
+Se simula un cursor sin buffer que entrega filas por lotes con `fetchmany` y se verifica el JSON
+producido, la paginación por cursor y la devolución de la conexión al cerrar la respuesta.
+"""
+
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from streaming import iterar_filas, transmitir_archivo, transmitir_json
+
+@pytest.fixture
+def app():
+    """
+    Fixture que crea una aplicación Flask mínima con contexto activo.
+    """
+    app = Flask(__name__)
+    with app.test_request_context():
+        yield app
+
+def _conexion_con_lotes(*lotes):
+    conexion = MagicMock()
+    cursor = conexion.cursor.return_value
+    cursor.fetchmany.side_effect = list(lotes) + [[]]
+    return conexion, cursor
+
+def _leer(respuesta):
+    cuerpo = respuesta.get_data()
+    respuesta.close()
+    return json.loads(cuerpo)
+
+def test_iterar_filas_por_lotes():
+    """
+    Prueba que `iterar_filas` recorre todos los lotes hasta que `fetchmany` devuelve vacío.
+    """
+    cursor = MagicMock()
+    cursor.fetchmany.side_effect = [[1, 2], [3], []]
+    assert list(iterar_filas(cursor, 2)) == [1, 2, 3]
+    cursor.fetchmany.assert_called_with(2)
+
+def test_transmitir_array_de_varias_consultas(app):
+    """
+    Prueba que las filas de varias consultas se concatenan en un solo array y que los TIME
+    (timedelta) se serializan como texto. La conexión se cierra al cerrar la respuesta.
+    """
+    conexion, cursor = _conexion_con_lotes([{'id': 1, 'hora': timedelta(hours=10)}], [], [{'id': 2}])
+    respuesta = transmitir_json(conexion, [("SELECT 1", ()), ("SELECT 2", ())])
+    assert _leer(respuesta) == [{'id': 1, 'hora': '10:00:00'}, {'id': 2}]
+    conexion.cursor.assert_called_once_with(dictionary=True, buffered=False)
+    assert cursor.execute.call_count == 2
+    conexion.close.assert_called_once()
+
+def test_transmitir_aplica_transformacion(app):
+    """
+    Prueba que `transformar` se aplica a cada fila antes de serializarla.
+    """
+    conexion, _ = _conexion_con_lotes([{'id': 1}, {'id': 2}])
+    respuesta = transmitir_json(conexion, [("SELECT", ())], transformar=lambda f: {**f, 'doble': f['id'] * 2})
+    assert _leer(respuesta) == [{'id': 1, 'doble': 2}, {'id': 2, 'doble': 4}]
+
+def test_transmitir_pagina_con_cursor(app):
+    """
+    Prueba que con `limite` se entregan como máximo `limite` filas y se genera el cursor siguiente.
+    """
+    filas = [{'id': i, 'fecha': datetime(2025, 6, 27, i)} for i in (3, 2, 1)]
+    conexion, _ = _conexion_con_lotes(filas)
+    respuesta = transmitir_json(conexion, [("SELECT", ())], clave='incidentes', limite=2,
+                                columnas_cursor=('fecha', 'id'))
+    datos = _leer(respuesta)
+    assert [f['id'] for f in datos['incidentes']] == [3, 2]
+    assert datos['siguiente']
+
+def test_transmitir_pagina_final_sin_cursor(app):
+    """
+    Prueba que una página incompleta devuelve `siguiente` nulo.
+    """
+    conexion, _ = _conexion_con_lotes([{'id': 1, 'fecha': datetime(2025, 6, 27)}])
+    respuesta = transmitir_json(conexion, [("SELECT", ())], clave='incidentes', limite=2,
+                                columnas_cursor=('fecha', 'id'))
+    assert _leer(respuesta)['siguiente'] is None
+
+def test_error_en_primera_consulta_se_propaga():
+    """
+    Prueba que un error al ejecutar la primera consulta se lanza antes de crear la respuesta.
+    """
+    conexion, cursor = _conexion_con_lotes()
+    cursor.execute.side_effect = Exception("tabla inexistente")
+    with pytest.raises(Exception):
+        transmitir_json(conexion, [("SELECT", ())])
+    cursor.close.assert_called_once()
+
+def test_transmitir_archivo_descargable(app):
+    """
+    Prueba que `transmitir_archivo` pasa las filas de todas las consultas al escritor de forma
+    perezosa, marca la respuesta como adjunto y devuelve la conexión al cerrarse.
+    """
+    conexion, cursor = _conexion_con_lotes([{'id': 1}, {'id': 2}], [], [{'id': 3}])
+
+    def escribir(filas):
+        yield b'ids:'
+        for fila in filas:
+            yield str(fila['id']).encode()
+
+    respuesta = transmitir_archivo(conexion, [("SELECT 1", ()), ("SELECT 2", ())], escribir,
+                                   'text/csv', 'datos.csv')
+    # La primera consulta ya se ejecutó; la segunda espera a que se lea el cuerpo
+    assert cursor.execute.call_count == 1
+    assert respuesta.headers['Content-Disposition'] == 'attachment; filename=datos.csv'
+    assert respuesta.get_data() == b'ids:123'
+    respuesta.close()
+    conexion.close.assert_called_once()
@@ -0,0 +1,71 @@
+"""
+Este archivo contiene pruebas unitarias para las notificaciones en tiempo real de `tiempo_real.py`.
+Se usa una aplicación Flask mínima con el cliente de prueba de Flask-SocketIO.
+"""
+
+import datetime
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+
+import tiempo_real
+from tiempo_real import SALA_ADMIN, emitir_incidente, sala_institucion
+
+@pytest.fixture
+def servidor():
+    """
+    Fixture que sustituye el `socketio` del módulo por uno ligado a una app de prueba; cada cliente
+    se une a las salas indicadas en `auth`.
+    """
+    app = Flask(__name__)
+    socketio = SocketIO(app)
+
+    @socketio.on('connect')
+    def conectar(auth=None):
+        for sala in (auth or {}).get('salas', []):
+            join_room(sala)
+
+    with patch.object(tiempo_real, 'socketio', socketio):
+        yield app, socketio
+
+def test_sala_institucion():
+    assert sala_institucion(7) == 'institucion:7'
+
+def test_emite_a_admin_e_instituciones(servidor):
+    """
+    Prueba que el evento llega a los administradores y a cada institución indicada una sola vez,
+    con las fechas convertidas a texto.
+    """
+    app, socketio = servidor
+    admin = socketio.test_client(app, auth={'salas': [SALA_ADMIN]})
+    siete = socketio.test_client(app, auth={'salas': [sala_institucion(7)]})
+    ocho = socketio.test_client(app, auth={'salas': [sala_institucion(8)]})
+    otra = socketio.test_client(app, auth={'salas': [sala_institucion(9)]})
+
+    emitir_incidente('actualizado', {'id': 1, 'fecha': datetime.date(2025, 3, 1)}, [7, 8, 7, None])
+
+    esperado = [{'name': 'incidente', 'args': [{'accion': 'actualizado', 'id': 1, 'fecha': '2025-03-01'}],
+                 'namespace': '/'}]
+    assert admin.get_received() == esperado
+    assert siete.get_received() == esperado
+    assert ocho.get_received() == esperado
+    assert otra.get_received() == []
+
+def test_sin_servidor_no_hace_nada():
+    """
+    Prueba que sin `init_app` (scripts, CLI) emitir no falla.
+    """
+    with patch.object(tiempo_real, 'socketio', SocketIO()):
+        emitir_incidente('nuevo', {'id': 1})
+
+def test_error_al_emitir_no_se_propaga(servidor):
+    """
+    Prueba que un fallo al emitir se informa sin afectar a la escritura ya confirmada.
+    """
+    _, socketio = servidor
+    with patch.object(socketio, 'emit', side_effect=RuntimeError('cola caída')), \
+            patch('builtins.print') as mock_print:
+        emitir_incidente('nuevo', {'id': 1})
+    mock_print.assert_called_once_with("Error al emitir evento de incidente: cola caída")
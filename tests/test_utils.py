@@ -10,8 +10,6 @@ from unittest.mock import patch, MagicMock, ANY
 from utils import (
     get_db_connection,
     insertar_usuario,
-    verificar_credenciales,
-    obtener_datos_usuario,
     guardar_registro_academico,
     obtener_registros_academicos,
     guardar_registro_infraestructura,
@@ -25,6 +23,10 @@ from utils import (
     actualizar_usuario_por_id,
     obtener_instituciones,
     obtener_registros_filtrados_por_institucion,
+    actualizar_incidencia_por_id,
+    actualizar_incidencia_por_nombre,
+    actualizar_estados_en_lote,
+    buscar_incidentes,
 )
 from mysql.connector import Error
 from datetime import datetime
@@ -68,10 +70,11 @@ def test_insertar_usuario_success(mock_db_connection):
     - Llama a `insertar_usuario` con datos válidos.
     - Verifica que:
       - La función devuelva True.
-      - El método `execute` del cursor se haya llamado una vez.
+      - Se resuelva la institución a su id y luego se inserte el usuario con ese id.
       - El método `commit` de la conexión se haya llamado.
     """
     mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.lastrowid = 5
     result = insertar_usuario(
         nombre='Juan',
         apellido='Perez',
@@ -82,7 +85,10 @@ def test_insertar_usuario_success(mock_db_connection):
         clave='123456'
     )
     assert result is True
-    mock_cursor.execute.assert_called_once()
+    assert mock_cursor.execute.call_count == 2
+    mock_cursor.execute.assert_called_with(ANY, (
+        'Juan', 'Perez', '12345678', '987654321', 'juan@example.com', 'Colegio XYZ', 5, '123456'
+    ))
     mock_connection.commit.assert_called_once()
 
 def test_insertar_usuario_failure_no_connection():
@@ -130,99 +136,6 @@ def test_insertar_usuario_db_error(mock_db_connection):
         assert result is False
         mocked_print.assert_called_with("Error al insertar usuario: Database error")
 
-def test_verificar_credenciales_success(mock_db_connection):
-    """
-    Prueba la verificación exitosa de credenciales.
-    - Configura el cursor para devolver un registro de usuario válido.
-    - Verifica que:
-      - La función devuelva True.
-      - El método `execute` se llame con la consulta correcta.
-    """
-    mock_connection, mock_cursor = mock_db_connection
-    mock_cursor.fetchone.return_value = (1, 'Juan', 'Perez', '12345678', '987654321', 'juan@example.com', 'Colegio XYZ', '123456')
-    result = verificar_credenciales('juan@example.com', '123456')
-    assert result is True
-    mock_cursor.execute.assert_called_once_with(
-        "SELECT * FROM usuarios WHERE correo_electronico = %s AND clave = %s",
-        ('juan@example.com', '123456')
-    )
-
-def test_verificar_credenciales_invalid(mock_db_connection):
-    """
-    Prueba la verificación de credenciales inválidas.
-    - Configura el cursor para devolver None.
-    - Verifica que:
-      - La función devuelva False.
-      - El método `execute` se llame con la consulta correcta.
-    """
-    mock_connection, mock_cursor = mock_db_connection
-    mock_cursor.fetchone.return_value = None
-    result = verificar_credenciales('juan@example.com', 'wrong_password')
-    assert result is False
-    mock_cursor.execute.assert_called_once_with(
-        "SELECT * FROM usuarios WHERE correo_electronico = %s AND clave = %s",
-        ('juan@example.com', 'wrong_password')
-    )
-
-def test_verificar_credenciales_db_error(mock_db_connection):
-    """
-    Prueba el manejo de errores de base de datos en `verificar_credenciales`.
-    - Configura el cursor para lanzar una excepción `Error`.
-    - Verifica que:
-      - La función devuelva False.
-      - Se imprime el mensaje de error esperado.
-    """
-    mock_connection, mock_cursor = mock_db_connection
-    mock_cursor.execute.side_effect = Error("Database error")
-    with patch('builtins.print') as mocked_print:
-        result = verificar_credenciales('juan@example.com', '123456')
-        assert result is False
-        mocked_print.assert_called_with("Error al verificar credenciales: Database error")
-
-def test_obtener_datos_usuario_success(mock_db_connection):
-    """
-    Prueba la obtención exitosa de datos de un usuario.
-    - Configura el cursor para devolver un diccionario con datos de usuario.
-    - Verifica que:
-      - La función devuelva los datos esperados.
-      - El método `execute` se llame con la consulta correcta.
-    """
-    mock_connection, mock_cursor = mock_db_connection
-    mock_cursor.fetchone.return_value = {
-        'id': 1,
-        'nombre': 'Juan',
-        'apellido': 'Perez',
-        'correo_electronico': 'juan@example.com'
-    }
-    result = obtener_datos_usuario('juan@example.com')
-    assert result == {
-        'id': 1,
-        'nombre': 'Juan',
-        'apellido': 'Perez',
-        'correo_electronico': 'juan@example.com'
-    }
-    mock_cursor.execute.assert_called_once_with(
-        "SELECT * FROM usuarios WHERE correo_electronico = %s",
-        ('juan@example.com',)
-    )
-
-def test_obtener_datos_usuario_not_found(mock_db_connection):
-    """
-    Prueba la obtención de datos de un usuario inexistente.
-    - Configura el cursor para devolver None.
-    - Verifica que:
-      - La función devuelva None.
-      - El método `execute` se llame con la consulta correcta.
-    """
-    mock_connection, mock_cursor = mock_db_connection
-    mock_cursor.fetchone.return_value = None
-    result = obtener_datos_usuario('noexist@example.com')
-    assert result is None
-    mock_cursor.execute.assert_called_once_with(
-        "SELECT * FROM usuarios WHERE correo_electronico = %s",
-        ('noexist@example.com',)
-    )
-
 def test_guardar_registro_academico_no_connection():
     """
     Prueba el fallo de `guardar_registro_academico` cuando no hay conexión.
@@ -324,7 +237,8 @@ def test_guardar_registro_infraestructura_success(mock_db_connection):
     - Simula una sesión activa y configura el cursor para ejecutar la consulta.
     - Verifica que:
       - La función devuelva True.
-      - El método `execute` y `commit` se llamen correctamente.
+      - Se ejecuten el INSERT y la actualización del contador en la misma transacción.
+      - El método `commit` se llame una sola vez.
     """
     mock_connection, mock_cursor = mock_db_connection
     with patch('utils.session', {'usuario': {'id': 1}}):
@@ -336,9 +250,30 @@ def test_guardar_registro_infraestructura_success(mock_db_connection):
             tipo='on'
         )
         assert result is True
-        mock_cursor.execute.assert_called_once()
+        assert mock_cursor.execute.call_count == 2
+        mock_cursor.execute.assert_called_with(ANY, (1, 'Infraestructura', 'Pendiente', 1, 1))
         mock_connection.commit.assert_called_once()
 
+def test_guardar_registro_infraestructura_emite_evento(mock_db_connection):
+    """
+    Prueba que, tras el commit, se notifica el incidente nuevo con los datos del autor
+    tomados del perfil de la petición.
+    """
+    from flask import Flask, g
+    mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.lastrowid = 42
+    perfil = {'id': 1, 'institucion_id': 7, 'institucion': 'Colegio XYZ',
+              'correo_electronico': 'juan@example.com', 'telefono': '999'}
+    with Flask(__name__).test_request_context(), \
+            patch('utils.session', {'usuario': {'id': 1}}), patch('utils.emitir_incidente') as mock_emitir:
+        g.usuario = perfil
+        assert guardar_registro_infraestructura('Fuga de agua', 'Fuga en aula', None, 'Pendiente', 'on') is True
+    mock_emitir.assert_called_once_with('nuevo', {
+        'tipo': 'Infraestructura', 'id': 42, 'usuario_id': 1, 'institucion_id': 7,
+        'institucion': 'Colegio XYZ', 'correo': 'juan@example.com', 'telefono': '999',
+        'problema': 'Fuga de agua', 'descripcion': 'Fuga en aula', 'estado': 'Pendiente', 'fecha': ANY
+    }, [7])
+
 def test_guardar_registro_infraestructura_no_connection():
     """
     Prueba el fallo de `guardar_registro_infraestructura` cuando no hay conexión.
@@ -383,6 +318,31 @@ def test_guardar_registro_infraestructura_db_error(mock_db_connection):
             assert result is False
             mocked_print.assert_called_with("Error al guardar registro de infraestructura: Database error")
 
+def test_guardar_registros_con_escritura_diferida_encolan(mock_db_connection):
+    """
+    Prueba que con la escritura diferida activa los registros se validan y se encolan con el
+    usuario en sesión y la fecha de registro, sin tocar la base de datos, y que un registro
+    inválido se rechaza sin encolarse.
+    """
+    mock_connection, mock_cursor = mock_db_connection
+    with patch('utils.ESCRITURA_DIFERIDA', True), patch('utils.obtener_cola') as mock_obtener, \
+            patch('utils.session', {'usuario': {'id': 4}}):
+        mock_cola = mock_obtener.return_value
+        mock_cola.encolar.return_value = 'clave'
+        assert guardar_registro_infraestructura('Fuga de agua', 'Fuga en aula', None, 'pendiente', 'on') is True
+        tipo, datos, autor = mock_cola.encolar.call_args.args
+        assert (tipo, datos['usuario_id'], datos['estado'], datos['imagen_problema']) == \
+            ('Infraestructura', 4, 'Pendiente', None)
+        assert datetime.strptime(datos['fecha_registro'], '%Y-%m-%d %H:%M:%S')
+        assert autor['institucion_id'] is None
+
+        mock_cola.reset_mock()
+        with patch('builtins.print') as mocked_print:
+            assert guardar_registro_academico('Ana', 'Motivo', '27/06/2025', '10:00', 'Pendiente', None) is False
+        mocked_print.assert_called_with("Incidente rechazado: fecha inválida: 27/06/2025")
+        mock_cola.encolar.assert_not_called()
+    mock_cursor.execute.assert_not_called()
+
 def test_obtener_registros_infraestructura_success(mock_db_connection):
     """
     Prueba la obtención exitosa de registros de infraestructura.
@@ -405,20 +365,22 @@ def test_obtener_registros_infraestructura_success(mock_db_connection):
 def test_obtener_metricas_dashboard_success(mock_db_connection):
     """
     Prueba el cálculo exitoso de métricas para el dashboard.
-    - Configura el cursor para devolver valores simulados para todas las consultas.
+    - Configura el cursor para devolver la fila de la consulta agregada.
     - Verifica que:
       - La función devuelva las métricas esperadas.
+      - Todas las métricas se obtengan en una sola consulta.
     """
     mock_connection, mock_cursor = mock_db_connection
-    mock_cursor.fetchone.side_effect = [
-        {'total': 50},  # total_infra
-        {'total': 30},  # total_acad
-        {'resueltos': 20},  # resueltos_infra
-        {'resueltos': 10},  # resueltos_acad
-        {'en_proceso': 15},  # en_proceso_infra
-        {'en_proceso': 5},   # en_proceso_acad
-        {'total_instituciones': 8}  # total_instituciones
-    ]
+    mock_cursor.fetchone.return_value = {
+        'total_incidentes': 80,
+        'resueltos': 30,
+        'en_proceso': 20,
+        'pendientes': 30,
+        'infraestructura': 50,
+        'academico': 30,
+        'instituciones': 6,
+        'total_instituciones': 8
+    }
     result = obtener_metricas_dashboard()
     assert result == {
         'total_incidentes': 80,
@@ -426,6 +388,7 @@ def test_obtener_metricas_dashboard_success(mock_db_connection):
         'total_en_proceso': 20,
         'total_instituciones': 8
     }
+    mock_cursor.execute.assert_called_once()
 
 def test_obtener_metricas_dashboard_no_connection():
     """
@@ -501,30 +464,30 @@ def test_obtener_ultima_incidencia_error(mock_db_connection):
 def test_obtener_incidencias_por_estado_success(mock_db_connection):
     """
     Prueba la obtención exitosa de incidencias por estado.
-    - Simula datos tanto para infraestructura como académico.
+    - Simula las filas ya combinadas por la consulta unificada de ambos tipos.
     - Verifica que:
-      - Se combinan ambas listas correctamente.
-      - Los campos 'institucion' o 'registrado_por' nulos se conservan como None.
+      - Se ejecuta una sola consulta UNION ALL filtrada por estado en cada rama.
+      - Los valores por defecto ('Desconocido') y el orden vienen resueltos desde SQL.
     """
     mock_connection, mock_cursor = mock_db_connection
 
-    # Simula respuestas distintas para cada cursor.fetchall()
-    mock_cursor.fetchall.side_effect = [
-        [{'institucion': 'Desconocido', 'registrado_por': 'Juan Perez', 'tipo': 'Infraestructura', 'id': 1, 'fecha': '2025-06-27'}],
-        [{'institucion': 'Colegio XYZ', 'registrado_por': 'Ana Lopez', 'tipo': 'Académico', 'id': 2, 'fecha': '2025-06-28'}]
+    mock_cursor.fetchall.return_value = [
+        {'institucion': 'Colegio XYZ', 'registrado_por': 'Ana Lopez', 'tipo': 'Académico', 'id': 2, 'fecha': '2025-06-28'},
+        {'institucion': 'Desconocido', 'registrado_por': 'Juan Perez', 'tipo': 'Infraestructura', 'id': 1, 'fecha': '2025-06-27'}
     ]
 
     result = obtener_incidencias_por_estado('Pendiente')
 
     # Validaciones
     assert len(result) == 2
-    assert result[0]['institucion'] is 'Desconocido'
-    assert result[0]['registrado_por'] == 'Juan Perez'
-    assert result[1]['institucion'] == 'Colegio XYZ'
-    assert result[1]['registrado_por'] == 'Ana Lopez'
+    assert result[1]['institucion'] == 'Desconocido'
+    assert result[0]['registrado_por'] == 'Ana Lopez'
 
-    mock_cursor.execute.assert_any_call(ANY, ('Pendiente',))
-    assert mock_cursor.execute.call_count == 2
+    mock_cursor.execute.assert_called_once()
+    sql, parametros = mock_cursor.execute.call_args.args
+    assert 'UNION ALL' in sql
+    assert "COALESCE(n.nombre, 'Desconocido')" in sql
+    assert parametros == ('Pendiente', 'Pendiente')
 
 def test_obtener_incidencias_por_estado_error(mock_db_connection):
     """
@@ -729,4 +692,153 @@ def test_obtener_instituciones_error(mock_db_connection):
     with patch('builtins.print') as mocked_print:
         result = obtener_instituciones()
         assert result == []
-        mocked_print.assert_called_with("Error al obtener instituciones: Database error")
\ No newline at end of file
+        mocked_print.assert_called_with("Error al obtener instituciones: Database error")
+
+def test_actualizar_incidencia_por_id_emite_a_ambas_instituciones(mock_db_connection):
+    """
+    Prueba que al reasignar un incidente se notifica a la institución anterior y a la nueva.
+    """
+    mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = (3, 2, 'Pendiente', 7, 5, 8)
+    with patch('utils.emitir_incidente') as mock_emitir:
+        assert actualizar_incidencia_por_id(3, 'infraestructura', 'Resuelto', 'Desc', None,
+                                            'otro@example.com', 'Listo', 'Agua') is True
+    mock_connection.commit.assert_called_once()
+    mock_emitir.assert_called_once_with('actualizado', {
+        'tipo': 'Infraestructura', 'id': 3, 'usuario_id': 5, 'institucion_id': 8, 'estado': 'Resuelto',
+        'estado_anterior': 'Pendiente', 'descripcion': 'Desc', 'comentarios': 'Listo', 'problema': 'Agua'
+    }, [8, 7])
+
+def test_actualizar_incidencia_por_id_una_lectura_y_un_update(mock_db_connection):
+    """
+    Prueba que el usuario se resuelve en la misma consulta que bloquea el incidente y que la
+    actualización usa una sentencia para el registro y otra para ambos contadores.
+    """
+    mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = (4, 2, 'Pendiente', 7, 2, 7)
+    with patch('utils.emitir_incidente'):
+        assert actualizar_incidencia_por_id(4, 'academico', 'Resuelto', None, 'Pelea',
+                                            'a@example.com', '', None) is True
+    assert mock_cursor.execute.call_count == 2
+    lectura, parametros = mock_cursor.execute.call_args_list[0].args
+    assert 'LEFT JOIN usuarios u ON u.correo_electronico = %s' in lectura
+    assert 'FROM registro_academico r' in lectura and 'FOR UPDATE OF r' in lectura
+    assert parametros == ('a@example.com', 4)
+    actualizacion, parametros = mock_cursor.execute.call_args_list[1].args
+    assert actualizacion == ('UPDATE registro_academico SET estado = %s, usuario_id = %s, comentarios = %s, '
+                             'institucion_id = %s, motivo = %s WHERE id = %s')
+    assert parametros == ('Resuelto', 2, '', 7, 'Pelea', 4)
+    mock_cursor.executemany.assert_called_once()
+
+def test_actualizar_incidencia_por_id_no_encontrado(mock_db_connection):
+    """
+    Prueba que sin incidente o sin usuario con ese correo no se escribe nada.
+    """
+    mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = None
+    assert actualizar_incidencia_por_id(9, 'infraestructura', 'Resuelto', 'D', None, 'a@example.com', '', 'Agua') is False
+    mock_cursor.fetchone.return_value = (9, 2, 'Pendiente', 7, None, None)
+    assert actualizar_incidencia_por_id(9, 'infraestructura', 'Resuelto', 'D', None, 'x@example.com', '', 'Agua') is False
+    assert mock_cursor.execute.call_count == 2
+    mock_connection.commit.assert_not_called()
+
+def test_actualizar_incidencia_por_nombre_mas_reciente(mock_db_connection):
+    """
+    Prueba que se bloquea el incidente más reciente de la institución y se actualiza por su id.
+    """
+    mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = (12, 2, 'En proceso', 7, 2, 7)
+    with patch('utils.emitir_incidente') as mock_emitir:
+        assert actualizar_incidencia_por_nombre('IE 1', 'infraestructura', 'Resuelto', 'Techo roto',
+                                                'a@example.com', 'Listo') is True
+    lectura, parametros = mock_cursor.execute.call_args_list[0].args
+    assert 'r.institucion_id = (SELECT id FROM instituciones WHERE nombre = %s)' in lectura
+    assert 'ORDER BY r.fecha_registro DESC' in lectura and 'LIMIT 1' in lectura
+    assert parametros == ('a@example.com', 'IE 1')
+    _, parametros = mock_cursor.execute.call_args_list[1].args
+    assert parametros == ('Resuelto', 'Techo roto', 2, 'Listo', 7, 12)
+    mock_connection.commit.assert_called_once()
+    assert mock_emitir.call_args.args[1]['estado_anterior'] == 'En proceso'
+
+def test_actualizar_estados_en_lote(mock_db_connection):
+    """
+    Prueba el cambio de estado en lote:
+      - Los cambios inválidos, repetidos o inexistentes se informan sin abortar el lote.
+      - Una sola consulta valida y bloquea los incidentes de ambas tablas.
+      - Se ejecuta un UPDATE por tabla y un único `executemany` para los contadores, con un commit.
+      - Se notifica cada incidente actualizado.
+    """
+    mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = [
+        ('Infraestructura', 1, 10, 'Pendiente', 7),
+        ('Infraestructura', 2, 11, 'Resuelto', 8),
+        ('Académico', 5, 10, 'En Proceso', 7),
+    ]
+    cambios = [
+        {'id': 1, 'tipo': 'infraestructura', 'estado': 'Resuelto', 'comentarios': 'Listo'},
+        {'id': 2, 'tipo': 'infraestructura', 'estado': 'resuelto'},
+        {'id': 5, 'tipo': 'academico', 'estado': 'Pendiente'},
+        {'id': 9, 'tipo': 'academico', 'estado': 'Pendiente'},
+        {'id': 1, 'tipo': 'infraestructura', 'estado': 'Pendiente'},
+        {'id': 'x', 'tipo': 'infraestructura', 'estado': 'Pendiente'},
+        {'id': 3, 'tipo': 'infraestructura', 'estado': 'Cerrado'},
+    ]
+    with patch('utils.emitir_incidente') as mock_emitir:
+        resultados = actualizar_estados_en_lote(cambios)
+
+    assert [r['ok'] for r in resultados] == [True, True, True, False, False, False, False]
+    assert resultados[0] == {'id': 1, 'tipo': 'Infraestructura', 'ok': True, 'estado': 'Resuelto',
+                             'estado_anterior': 'Pendiente'}
+    assert [r.get('error') for r in resultados[3:]] == [
+        'Incidente no encontrado', 'Incidente repetido en el lote', 'ID inválido', 'Estado inválido']
+
+    consulta, _ = mock_cursor.execute.call_args_list[0].args
+    assert 'UNION ALL' in consulta and consulta.count('FOR UPDATE') == 2
+    assert mock_cursor.execute.call_count == 3
+    sql_infra, parametros_infra = mock_cursor.execute.call_args_list[1].args
+    assert sql_infra.startswith('UPDATE registro_infraestructura')
+    assert parametros_infra == [1, 'Resuelto', 2, 'Resuelto', 1, 'Listo', 1, 2]
+    mock_cursor.executemany.assert_called_once()
+    assert sorted(mock_cursor.executemany.call_args.args[1]) == sorted([
+        (10, 'Infraestructura', 'Pendiente', -1), (10, 'Infraestructura', 'Resuelto', 1),
+        (10, 'Académico', 'En proceso', -1), (10, 'Académico', 'Pendiente', 1),
+    ])
+    mock_connection.commit.assert_called_once()
+    assert mock_emitir.call_count == 3
+
+def test_actualizar_estados_en_lote_error_revierte(mock_db_connection):
+    """
+    Prueba que un error de base de datos deshace la transacción completa y devuelve None.
+    """
+    mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.execute.side_effect = Error("Lock wait timeout")
+    with patch('utils.emitir_incidente') as mock_emitir:
+        assert actualizar_estados_en_lote([{'id': 1, 'tipo': 'academico', 'estado': 'Resuelto'}]) is None
+    mock_connection.rollback.assert_called_once()
+    mock_connection.commit.assert_not_called()
+    mock_emitir.assert_not_called()
+
+def test_buscar_incidentes_pagina_por_relevancia(mock_db_connection):
+    """
+    Prueba que la búsqueda pide una fila extra para saber si hay otra página, salta las filas de
+    las páginas anteriores y ordena por relevancia.
+    """
+    mock_connection, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = [{'id': 3, 'relevancia': 2.5}, {'id': 1, 'relevancia': 1.0},
+                                         {'id': 7, 'relevancia': 0.4}]
+    filas, hay_mas = buscar_incidentes('filtración techo', pagina=3, limite=2, estado='Pendiente')
+    assert [f['id'] for f in filas] == [3, 1]
+    assert hay_mas is True
+    sql, parametros = mock_cursor.execute.call_args.args
+    assert 'ORDER BY i.relevancia DESC' in sql
+    assert parametros[-2:] == (3, 4)
+    assert 'filtración* techo*' in parametros
+    mock_connection.close.assert_called_once()
+
+def test_buscar_incidentes_sin_terminos_no_consulta(mock_db_connection):
+    """
+    Prueba que un texto sin términos útiles devuelve una página vacía sin ir a la base de datos.
+    """
+    mock_connection, _ = mock_db_connection
+    assert buscar_incidentes(' +-* ') == ([], False)
+    mock_connection.cursor.assert_not_called()
@@ -0,0 +1,111 @@
+"""
+Este archivo contiene pruebas unitarias para la generación de variantes de imágenes de
+`variantes.py`. Las imágenes se crean con Pillow en un directorio temporal.
+"""
+
+import os
+from concurrent.futures import Future
+from unittest.mock import patch
+
+from PIL import Image
+
+from variantes import (
+    es_original, generar_variantes, procesar_carpeta, ruta_variante, urls_variantes
+)
+
+def _imagen(ruta, tamano=(2000, 1000), modo='RGB', color='red', **opciones):
+    Image.new(modo, tamano, color).save(ruta, **opciones)
+    return str(ruta)
+
+class _PoolEnLinea:
+    """
+    Pool que ejecuta las tareas en el mismo proceso, para no lanzar procesos en las pruebas.
+    """
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+def test_rutas_y_urls_de_variantes():
+    """
+    Prueba que la variante se nombra junto al original y que las URLs externas o vacías no tienen variantes.
+    """
+    assert ruta_variante('/static/uploads/ab/cd/abcd.jpg', 'miniatura') == '/static/uploads/ab/cd/abcd.miniatura.webp'
+    assert urls_variantes('/static/uploads/x.PNG', '/static/uploads')['media'] == '/static/uploads/x.media.webp'
+    assert urls_variantes('https://otro/x.jpg', '/static/uploads') == {'miniatura': None, 'media': None}
+    assert urls_variantes(None, '/static/uploads') == {'miniatura': None, 'media': None}
+
+def test_es_original():
+    """
+    Prueba que solo las imágenes subidas cuentan como originales, no sus variantes ni los temporales.
+    """
+    assert es_original('Captura.PNG')
+    assert es_original('abcd.jpg')
+    assert not es_original('abcd.miniatura.webp')
+    assert not es_original('abcd.media.jpg')
+    assert not es_original('.subida-123')
+
+def test_genera_variantes_acotadas_y_sin_exif(tmp_path):
+    """
+    Prueba que se generan miniatura y media en WebP, con el lado mayor acotado y sin EXIF.
+    """
+    exif = Image.Exif()
+    exif[0x010F] = 'Camara'
+    ruta = _imagen(tmp_path / 'foto.jpg', exif=exif.tobytes())
+    generadas = generar_variantes(ruta)
+    assert sorted(os.path.basename(r) for r in generadas) == ['foto.media.webp', 'foto.miniatura.webp']
+    with Image.open(tmp_path / 'foto.miniatura.webp') as miniatura:
+        assert miniatura.format == 'WEBP'
+        assert miniatura.size == (320, 160)
+        assert not miniatura.getexif()
+    with Image.open(tmp_path / 'foto.media.webp') as media:
+        assert media.size == (1280, 640)
+
+def test_respeta_orientacion_exif(tmp_path):
+    """
+    Prueba que la orientación EXIF se aplica antes de descartar los metadatos.
+    """
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotada 90°
+    ruta = _imagen(tmp_path / 'vertical.jpg', tamano=(400, 200), exif=exif.tobytes())
+    generar_variantes(ruta)
+    with Image.open(tmp_path / 'vertical.miniatura.webp') as miniatura:
+        assert miniatura.size == (160, 320)
+
+def test_png_con_transparencia(tmp_path):
+    """
+    Prueba que un PNG con transparencia conserva el canal alfa en WebP.
+    """
+    ruta = _imagen(tmp_path / 'logo.png', tamano=(100, 100), modo='RGBA', color=(255, 0, 0, 0))
+    generar_variantes(ruta)
+    with Image.open(tmp_path / 'logo.miniatura.webp') as miniatura:
+        assert miniatura.mode == 'RGBA'
+        assert miniatura.size == (100, 100)
+
+def test_no_regenera_variantes_existentes(tmp_path):
+    """
+    Prueba que las variantes existentes no se vuelven a generar salvo con `forzar`.
+    """
+    ruta = _imagen(tmp_path / 'foto.png')
+    generar_variantes(ruta)
+    assert generar_variantes(ruta) == []
+    assert len(generar_variantes(ruta, forzar=True)) == 2
+
+def test_procesar_carpeta_informa_errores(tmp_path):
+    """
+    Prueba el backfill: procesa las imágenes de subdirectorios, ignora las variantes y reporta
+    los archivos que no se pueden decodificar.
+    """
+    (tmp_path / 'ab').mkdir()
+    _imagen(tmp_path / 'ab' / 'uno.jpg')
+    _imagen(tmp_path / 'dos.png')
+    (tmp_path / 'roto.jpg').write_bytes(b'no es una imagen')
+    with patch('variantes.obtener_pool', return_value=_PoolEnLinea()):
+        imagenes, generadas, errores = procesar_carpeta(str(tmp_path))
+        assert (imagenes, generadas) == (3, 4)
+        assert [os.path.basename(ruta) for ruta, _ in errores] == ['roto.jpg']
+        assert procesar_carpeta(str(tmp_path))[:2] == (3, 0)
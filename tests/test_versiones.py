@@ -0,0 +1,142 @@
+"""
+Este archivo contiene pruebas unitarias para la secuencia de escrituras y las peticiones
+condicionales de `versiones.py`. Cada prueba usa un archivo SQLite temporal.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from flask import Flask, jsonify
+
+import versiones
+from cache import CacheTTL
+from versiones import SecuenciaEscrituras, respuesta_condicional
+
+@pytest.fixture
+def secuencia(tmp_path):
+    """
+    Fixture que crea una secuencia sobre un archivo temporal y la usa como secuencia compartida.
+    """
+    secuencia = SecuenciaEscrituras(str(tmp_path / 'secuencia.sqlite3'))
+    with patch.object(versiones, 'secuencia_escrituras', secuencia):
+        yield secuencia
+
+@pytest.fixture
+def cliente(secuencia):
+    """
+    Fixture con una app mínima cuya vista cuenta las veces que se ejecuta.
+    """
+    app = Flask(__name__)
+    app.llamadas = 0
+
+    @app.route('/datos', methods=['GET', 'POST'])
+    @respuesta_condicional('incidentes')
+    def datos():
+        app.llamadas += 1
+        return jsonify([1, 2, 3])
+
+    return app.test_client()
+
+def test_avanzar_cambia_solo_el_recurso_escrito(secuencia):
+    """
+    Prueba que cada escritura cambia el ETag de su recurso y de las combinaciones que lo incluyen.
+    """
+    incidentes, _ = secuencia.validador('incidentes')
+    usuarios, _ = secuencia.validador('usuarios')
+    ambos, _ = secuencia.validador('incidentes', 'usuarios')
+
+    secuencia.avanzar('incidentes')
+    assert secuencia.validador('incidentes')[0] != incidentes
+    assert secuencia.validador('usuarios')[0] == usuarios
+    assert secuencia.validador('incidentes', 'usuarios')[0] != ambos
+
+def test_secuencia_compartida_entre_instancias(tmp_path):
+    """
+    Prueba que dos instancias sobre el mismo archivo (dos workers) ven las mismas escrituras y
+    que un archivo nuevo no repite los ETags del anterior.
+    """
+    ruta = str(tmp_path / 'secuencia.sqlite3')
+    uno, otro = SecuenciaEscrituras(ruta), SecuenciaEscrituras(ruta)
+    uno.avanzar('usuarios')
+    assert otro.validador('usuarios') == uno.validador('usuarios')
+
+    nuevo = SecuenciaEscrituras(str(tmp_path / 'otro.sqlite3'))
+    nuevo.avanzar('usuarios')
+    assert nuevo.validador('usuarios')[0] != uno.validador('usuarios')[0]
+
+def test_get_condicional_responde_304_sin_ejecutar_la_vista(cliente, secuencia):
+    """
+    Prueba que con un ETag o una fecha vigentes se responde 304 sin ejecutar la vista, y que tras
+    una escritura se vuelve a responder 200.
+    """
+    respuesta = cliente.get('/datos')
+    assert respuesta.status_code == 200
+    assert respuesta.headers['Cache-Control'] == 'no-cache'
+    etag, fecha = respuesta.headers['ETag'], respuesta.headers['Last-Modified']
+
+    respuesta = cliente.get('/datos', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 304
+    assert respuesta.headers['ETag'] == etag
+    assert cliente.get('/datos', headers={'If-Modified-Since': fecha}).status_code == 304
+    assert cliente.application.llamadas == 1
+
+    secuencia.avanzar('incidentes')
+    respuesta = cliente.get('/datos', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+    assert cliente.application.llamadas == 2
+
+def test_post_no_es_condicional(cliente):
+    """
+    Prueba que los POST se ejecutan siempre y no llevan validadores.
+    """
+    etag = cliente.get('/datos').headers['ETag']
+    respuesta = cliente.post('/datos', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert 'ETag' not in respuesta.headers
+
+def test_sin_secuencia_se_ejecuta_la_vista(cliente, secuencia):
+    """
+    Prueba que si no se puede leer la secuencia la vista responde normalmente, sin validadores.
+    """
+    with patch.object(secuencia, 'validador', return_value=(None, None)):
+        respuesta = cliente.get('/datos')
+    assert respuesta.status_code == 200
+    assert 'ETag' not in respuesta.headers
+
+def test_cache_de_otro_worker_no_queda_fijada_bajo_el_etag_nuevo(secuencia):
+    """
+    Prueba que dos cachés de proceso (dos workers) que comparten la secuencia no sirven datos
+    anteriores a una escritura del otro: la entrada cuya versión ya no es la vigente cuenta como
+    fallo y la revalidación con el ETag nuevo recibe los datos nuevos antes del 304.
+    """
+    recursos = {'metricas:': ('incidentes',)}
+    worker_a = CacheTTL(secuencia=secuencia, recursos=recursos)
+    worker_b = CacheTTL(secuencia=secuencia, recursos=recursos)
+    datos = {'total': 1}
+    app = Flask(__name__)
+
+    @app.route('/metricas')
+    @respuesta_condicional('incidentes')
+    def metricas():
+        return jsonify(worker_a.obtener_o_calcular('metricas:global', lambda: dict(datos)))
+
+    cliente = app.test_client()
+    etag = cliente.get('/metricas').headers['ETag']
+    assert worker_b.obtener_o_calcular('metricas:global', lambda: dict(datos)) == {'total': 1}
+
+    # El worker B confirma una escritura
+    datos['total'] = 2
+    worker_b.invalidar_prefijo('metricas:')
+    secuencia.avanzar('incidentes')
+
+    respuesta = cliente.get('/metricas', headers={'If-None-Match': etag})
+    assert (respuesta.status_code, respuesta.json) == (200, {'total': 2})
+    assert cliente.get('/metricas', headers={'If-None-Match': respuesta.headers['ETag']}).status_code == 304
+    assert worker_a.estadisticas()['obsoletas'] == 1
+
+    # Un valor calculado antes de la escritura de otro worker se guarda con la versión anterior
+    marca = worker_a.marca('metricas:usuario:1')
+    secuencia.avanzar('incidentes')
+    worker_a.guardar('metricas:usuario:1', {'total': 1}, marca=marca)
+    assert worker_a.obtener('metricas:usuario:1') == (False, None)
@@ -0,0 +1,50 @@
+import datetime
+import os
+
+from flask_socketio import SocketIO
+
+# ---------------------- NOTIFICACIONES EN TIEMPO REAL ----------------------
+#
+# Cada vez que se confirma el alta o la modificación de un incidente se emite el evento
+# `incidente` por Socket.IO a la sala de administradores y a la sala de la institución dueña
+# (y a la anterior, si el incidente cambió de institución). Los dashboards actualizan la vista con
+# el evento en lugar de consultar periódicamente al servidor. Con varios workers hace falta una
+# cola de mensajes compartida (`SOCKETIO_MESSAGE_QUEUE`, p. ej. redis://) y sesiones persistentes
+# en el balanceador.
+
+EVENTO_INCIDENTE = 'incidente'
+SALA_ADMIN = 'admin'
+
+socketio = SocketIO()
+
+def sala_institucion(institucion_id):
+    """
+    Devuelve el nombre de la sala de una institución.
+    """
+    return f"institucion:{institucion_id}"
+
+def registrar_tiempo_real(app):
+    """
+    Inicializa Socket.IO sobre la app, con la cola de mensajes de `SOCKETIO_MESSAGE_QUEUE` si existe.
+    """
+    socketio.init_app(app, message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE') or None)
+
+def _serializable(valor):
+    if isinstance(valor, (datetime.date, datetime.time, datetime.timedelta)):
+        return str(valor)
+    return valor
+
+def emitir_incidente(accion, datos, instituciones=()):
+    """
+    Emite el evento `incidente` ({'accion': ..., **datos}) a los administradores y a las salas de
+    `instituciones`. Debe llamarse después del commit. Un fallo al emitir se informa y no afecta
+    a la escritura ya confirmada.
+    """
+    if socketio.server is None:
+        return
+    evento = {'accion': accion, **{clave: _serializable(valor) for clave, valor in datos.items()}}
+    salas = [SALA_ADMIN] + [sala_institucion(i) for i in dict.fromkeys(instituciones) if i is not None]
+    try:
+        socketio.emit(EVENTO_INCIDENTE, evento, to=salas)
+    except Exception as e:
+        print(f"Error al emitir evento de incidente: {e}")
@@ -1,26 +1,36 @@
 import datetime
-from flask import session
+from flask import g, has_request_context, session
 import mysql.connector
 from mysql.connector import Error
-import os
 from dotenv import load_dotenv
 
+from replicas import conexion_enrutada, escritura, lectura, lectura_primaria
+from metricas import calcular_metricas, normalizar_estado, ESTADOS, TIPOS_POR_NOMBRE, TIPO_ACADEMICO, TIPO_INFRAESTRUCTURA
+from contadores import sumar_contador, sumar_contadores, mover_contador, tipo_contador
+from cache import invalidar_incidentes, invalidar_usuarios
+from incidentes import TABLAS_INCIDENTE, consulta_incidentes, leer_incidentes, preparar_busqueda
+from instituciones import (
+    SQL_ID_DE_USUARIO, SQL_ID_POR_NOMBRE, listar_instituciones, obtener_o_crear_institucion,
+    propagar_institucion
+)
+from perfiles import autenticar, guardar_perfil, invalidar_perfil, leer_perfil, perfil_en_cache
+from paginacion import LIMITE_DEFECTO, condicion_keyset, cortar_pagina, decodificar_cursor
+from tiempo_real import emitir_incidente
+from cola_escritura import ESCRITURA_DIFERIDA, obtener_cola, validar_incidente
+
 load_dotenv()
 
 # ---------------------- CONEXIÓN A LA BASE DE DATOS ----------------------
 
 def get_db_connection():
     """
-    Establece y devuelve una conexión a la base de datos MySQL utilizando credenciales del entorno.
+    Devuelve la conexión de la petición en curso, prestada del pool compartido en su primer uso
+    (ver `db_pool`): la de una réplica dentro de las funciones `@lectura` y la de la primaria en el
+    resto (ver `replicas`). Al llamar a `close()` la conexión no se cierra: vuelve al pool al
+    terminar la petición.
     """
     try:
-        connection = mysql.connector.connect(
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            host=os.getenv('DB_HOST'),
-            database=os.getenv('DB_NAME'),
-            port=os.getenv('DB_PORT')
-        )
+        connection = conexion_enrutada()
         if connection.is_connected():
             return connection
     except Error as e:
@@ -29,6 +39,7 @@ def get_db_connection():
 
 # ------------------------- USUARIOS -------------------------
 
+@escritura
 def insertar_usuario(nombre, apellido, dni, telefono, correo, institucion, clave):
     """
     Inserta un nuevo usuario en la base de datos con los datos proporcionados.
@@ -37,13 +48,15 @@ def insertar_usuario(nombre, apellido, dni, telefono, correo, institucion, clave
     if conexion:
         try:
             cursor = conexion.cursor()
+            institucion_id = obtener_o_crear_institucion(cursor, institucion)
             sql = '''
                 INSERT INTO usuarios 
-                (nombre, apellido, dni, telefono, correo_electronico, institucion, clave)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                (nombre, apellido, dni, telefono, correo_electronico, institucion, institucion_id, clave)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             '''
-            cursor.execute(sql, (nombre, apellido, dni, telefono, correo, institucion, clave))
+            cursor.execute(sql, (nombre, apellido, dni, telefono, correo, institucion, institucion_id, clave))
             conexion.commit()
+            invalidar_usuarios()
             return True
         except Error as e:
             print(f"Error al insertar usuario: {e}")
@@ -55,44 +68,107 @@ def insertar_usuario(nombre, apellido, dni, telefono, correo, institucion, clave
         print("No se pudo conectar a la base de datos")
     return False
 
-def verificar_credenciales(correo, clave):
+@lectura_primaria
+def autenticar_usuario(correo, clave):
     """
-    Verifica si las credenciales proporcionadas coinciden con un usuario en la base de datos.
+    Verifica las credenciales y devuelve el perfil del usuario (sin la clave) en una sola consulta.
+    Devuelve None si las credenciales no son válidas o si hay un error.
     """
+    conexion = get_db_connection()
+    if not conexion:
+        return None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT * FROM usuarios WHERE correo_electronico = %s AND clave = %s", 
-            (correo, clave)
-        )
-        resultado = cursor.fetchone()
-        return resultado is not None
-    except mysql.connector.Error as e:
-        print(f"Error al verificar credenciales: {e}")
-        return False
+        cursor = conexion.cursor(dictionary=True)
+        perfil = autenticar(cursor, correo, clave)
+        if perfil:
+            guardar_perfil(perfil)
+        return perfil
+    except Error as e:
+        print(f"Error al autenticar usuario: {e}")
+        return None
     finally:
         cursor.close()
-        conn.close()
+        conexion.close()
 
-def obtener_datos_usuario(correo):
+@lectura_primaria
+def obtener_perfil_usuario(usuario_id):
     """
-    Obtiene los datos de un usuario específico basado en su correo electrónico.
+    Devuelve el perfil del usuario desde la caché de perfiles o, si no está, desde la base de datos.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM usuarios WHERE correo_electronico = %s", (correo,))
-    resultado = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return resultado
+    perfil = perfil_en_cache(usuario_id=usuario_id)
+    if perfil:
+        return perfil
+    conexion = get_db_connection()
+    if not conexion:
+        return None
+    try:
+        cursor = conexion.cursor(dictionary=True)
+        perfil = leer_perfil(cursor, usuario_id)
+        if perfil:
+            guardar_perfil(perfil)
+        return perfil
+    except Error as e:
+        print(f"Error al obtener perfil de usuario: {e}")
+        return None
+    finally:
+        cursor.close()
+        conexion.close()
+
+# --------------------- EVENTOS DE INCIDENTES ---------------------
+
+def datos_autor():
+    """
+    Devuelve los datos del autor (perfil de la petición) que acompañan al evento de un incidente nuevo.
+    """
+    perfil = (g.get('usuario') if has_request_context() else None) or {}
+    return {
+        'institucion_id': perfil.get('institucion_id'),
+        'institucion': perfil.get('institucion'),
+        'correo': perfil.get('correo_electronico'),
+        'telefono': perfil.get('telefono'),
+    }
+
+def emitir_incidente_nuevo(tipo, incidente_id, usuario_id, **campos):
+    """
+    Notifica un incidente recién confirmado con los datos de su autor (perfil de la petición).
+    """
+    autor = datos_autor()
+    emitir_incidente('nuevo', {
+        'tipo': tipo,
+        'id': incidente_id,
+        'usuario_id': usuario_id,
+        **autor,
+        **campos
+    }, [autor['institucion_id']])
+
+def encolar_incidente(tipo_incidente, **valores):
+    """
+    Valida el incidente del usuario en sesión y lo deja en la cola de escrituras diferidas (ver
+    `cola_escritura`), con la fecha de registro de la petición. Devuelve True si quedó encolado.
+    """
+    if 'usuario' not in session:
+        print("Error: sesión de usuario no iniciada.")
+        return False
+    valores['usuario_id'] = session['usuario'].get('id')
+    valores['fecha_registro'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        datos = validar_incidente(tipo_incidente, valores)
+    except ValueError as e:
+        print(f"Incidente rechazado: {e}")
+        return False
+    return obtener_cola().encolar(tipo_incidente, datos, datos_autor()) is not None
 
 # --------------------- REGISTRO ACADÉMICO ---------------------
 
+@escritura
 def guardar_registro_academico(nombre_estudiante, motivo, fecha, hora, estado, evidencia_url):
     """
-    Guarda un nuevo registro académico en la base de datos asociado al usuario en sesión.
+    Guarda un nuevo registro académico en la base de datos asociado al usuario en sesión. Con la
+    escritura diferida activa solo lo encola.
     """
+    if ESCRITURA_DIFERIDA:
+        return encolar_incidente(TIPO_ACADEMICO, nombre_estudiante=nombre_estudiante, motivo=motivo, fecha=fecha,
+                                 hora=hora, estado=estado, evidencia=evidencia_url)
     conexion = get_db_connection()
     if conexion and 'usuario' in session:
         try:
@@ -100,11 +176,15 @@ def guardar_registro_academico(nombre_estudiante, motivo, fecha, hora, estado, e
             usuario_id = session['usuario'].get('id')
             sql = '''
                 INSERT INTO registro_academico 
-                (nombre_estudiante, motivo, fecha, hora, estado, evidencia, usuario_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                (nombre_estudiante, motivo, fecha, hora, estado, evidencia, usuario_id, institucion_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, ''' + SQL_ID_DE_USUARIO + ''')
             '''
-            cursor.execute(sql, (nombre_estudiante, motivo, fecha, hora, estado, evidencia_url, usuario_id))
+            cursor.execute(sql, (nombre_estudiante, motivo, fecha, hora, estado, evidencia_url, usuario_id, usuario_id))
+            sumar_contador(cursor, usuario_id, TIPO_ACADEMICO, estado)
             conexion.commit()
+            invalidar_incidentes()
+            emitir_incidente_nuevo(TIPO_ACADEMICO, cursor.lastrowid, usuario_id, nombre_estudiante=nombre_estudiante,
+                                   descripcion=motivo, estado=estado, fecha=fecha, hora=hora)
             return True
         except Error as e:
             print(f"Error al guardar registro académico: {e}")
@@ -113,6 +193,7 @@ def guardar_registro_academico(nombre_estudiante, motivo, fecha, hora, estado, e
             conexion.close()
     return False
 
+@lectura
 def obtener_registros_academicos():
     """
     Recupera todos los registros académicos ordenados por fecha de registro en orden descendente.
@@ -133,10 +214,15 @@ def obtener_registros_academicos():
 
 # --------------------- REGISTRO INFRAESTRUCTURA ---------------------
 
+@escritura
 def guardar_registro_infraestructura(problema, descripcion_problema, imagen_url, estado, tipo):
     """
-    Registra un nuevo incidente de infraestructura en la base de datos con la fecha actual.
+    Registra un nuevo incidente de infraestructura en la base de datos con la fecha actual. Con la
+    escritura diferida activa solo lo encola.
     """
+    if ESCRITURA_DIFERIDA:
+        return encolar_incidente(TIPO_INFRAESTRUCTURA, problema=problema, descripcion_problema=descripcion_problema,
+                                 imagen_problema=imagen_url, estado=estado, tipo=tipo)
     conexion = get_db_connection()
     if conexion and 'usuario' in session:
         try:
@@ -145,12 +231,17 @@ def guardar_registro_infraestructura(problema, descripcion_problema, imagen_url,
             fecha_registro = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             sql = '''
                 INSERT INTO registro_infraestructura 
-                (problema, descripcion_problema, imagen_problema, estado, fecha_registro, usuario_id, tipo)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                (problema, descripcion_problema, imagen_problema, estado, fecha_registro, usuario_id, tipo,
+                 institucion_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, ''' + SQL_ID_DE_USUARIO + ''')
             '''
-            valores = (problema, descripcion_problema, imagen_url, estado, fecha_registro, usuario_id, tipo)
+            valores = (problema, descripcion_problema, imagen_url, estado, fecha_registro, usuario_id, tipo, usuario_id)
             cursor.execute(sql, valores)
+            sumar_contador(cursor, usuario_id, TIPO_INFRAESTRUCTURA, estado)
             conexion.commit()
+            invalidar_incidentes()
+            emitir_incidente_nuevo(TIPO_INFRAESTRUCTURA, cursor.lastrowid, usuario_id, problema=problema,
+                                   descripcion=descripcion_problema, estado=estado, fecha=fecha_registro)
             return True
         except Exception as e:
             print(f"Error al guardar registro de infraestructura: {e}")
@@ -162,6 +253,7 @@ def guardar_registro_infraestructura(problema, descripcion_problema, imagen_url,
         print("Error: No hay conexión a la base de datos o sesión de usuario no iniciada.")
         return False
 
+@lectura
 def obtener_registros_infraestructura():
     """
     Recupera todos los registros de infraestructura ordenados por fecha de registro en orden descendente.
@@ -180,8 +272,38 @@ def obtener_registros_infraestructura():
             conexion.close()
     return []
 
+def consulta_pagina_infraestructura(limite=LIMITE_DEFECTO, despues=None):
+    """
+    Construye la consulta (sql, parametros) de una página de registros de infraestructura ordenados
+    por (fecha_registro, id) descendente. Pide `limite + 1` filas para saber si hay otra página.
+    """
+    condicion, parametros = condicion_keyset('fecha_registro', 'id', decodificar_cursor(despues))
+    where = f"WHERE {condicion}" if condicion else ""
+    sql = f"""
+        SELECT id, fecha_registro AS fecha, problema, descripcion_problema AS descripcion,
+               seguimiento AS institucion, estado
+        FROM registro_infraestructura
+        {where}
+        ORDER BY fecha_registro DESC, id DESC
+        LIMIT %s
+    """
+    return sql, (*parametros, limite + 1)
+
+def obtener_pagina_infraestructura(conn, limite=LIMITE_DEFECTO, despues=None):
+    """
+    Devuelve una página de registros de infraestructura empezando después del cursor `despues`.
+    Retorna (registros, siguiente_cursor).
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(*consulta_pagina_infraestructura(limite, despues))
+        return cortar_pagina(cursor.fetchall(), limite)
+    finally:
+        cursor.close()
+
 # ------------------------ DASHBOARD ------------------------
 
+@lectura
 def obtener_metricas_dashboard():
     """
     Calcula y devuelve métricas generales para el dashboard, como incidentes totales y estados.
@@ -190,32 +312,12 @@ def obtener_metricas_dashboard():
     if conexion:
         try:
             cursor = conexion.cursor(dictionary=True)
-            cursor.execute("SELECT COUNT(*) AS total FROM registro_infraestructura")
-            total_infra = cursor.fetchone()['total']
-            cursor.execute("SELECT COUNT(*) AS total FROM registro_academico")
-            total_acad = cursor.fetchone()['total']
-            total_incidentes = total_infra + total_acad
-
-            cursor.execute("SELECT COUNT(*) AS resueltos FROM registro_infraestructura WHERE estado = 'Resuelto'")
-            resueltos_infra = cursor.fetchone()['resueltos']
-            cursor.execute("SELECT COUNT(*) AS resueltos FROM registro_academico WHERE estado = 'Resuelto'")
-            resueltos_acad = cursor.fetchone()['resueltos']
-            total_resueltos = resueltos_infra + resueltos_acad
-
-            cursor.execute("SELECT COUNT(*) AS en_proceso FROM registro_infraestructura WHERE estado = 'En proceso'")
-            en_proceso_infra = cursor.fetchone()['en_proceso']
-            cursor.execute("SELECT COUNT(*) AS en_proceso FROM registro_academico WHERE estado = 'En proceso'")
-            en_proceso_acad = cursor.fetchone()['en_proceso']
-            total_en_proceso = en_proceso_infra + en_proceso_acad
-
-            cursor.execute("SELECT COUNT(DISTINCT institucion) AS total_instituciones FROM usuarios")
-            total_instituciones = cursor.fetchone()['total_instituciones']
-
+            metricas = calcular_metricas(cursor)
             return {
-                'total_incidentes': total_incidentes,
-                'total_resueltos': total_resueltos,
-                'total_en_proceso': total_en_proceso,
-                'total_instituciones': total_instituciones
+                'total_incidentes': metricas['total_incidentes'],
+                'total_resueltos': metricas['resueltos'],
+                'total_en_proceso': metricas['en_proceso'],
+                'total_instituciones': metricas['total_instituciones']
             }
         except Error as e:
             print(f"Error al obtener métricas: {e}")
@@ -224,6 +326,7 @@ def obtener_metricas_dashboard():
             conexion.close()
     return {}
 
+@lectura
 def obtener_ultima_incidencia():
     """
     Obtiene la incidencia más reciente registrada, comparando registros académicos e infraestructurales.
@@ -250,6 +353,7 @@ def obtener_ultima_incidencia():
     return None
 
 
+@lectura
 def obtener_incidencias_por_estado(estado):
     """
     Recupera todas las incidencias (académicas e infraestructurales) filtradas por estado.
@@ -266,38 +370,12 @@ def obtener_incidencias_por_estado(estado):
     cursor = None
     try:
         cursor = conexion.cursor(dictionary=True)
-        resultados = []
-
-        # Consulta para incidentes de infraestructura
-        cursor.execute("""
-            SELECT u.institucion, CONCAT(u.nombre, ' ', u.apellido) AS registrado_por,
-                   'Infraestructura' AS tipo,
-                   ri.id, ri.fecha_registro AS fecha
-            FROM registro_infraestructura ri
-            LEFT JOIN usuarios u ON ri.usuario_id = u.id
-            WHERE ri.estado = %s
-        """, (estado,))
-        infra = cursor.fetchall()
-        for r in infra:
-            r['institucion'] = r['institucion'] or 'Desconocido'
-            r['registrado_por'] = r['registrado_por'] or 'Desconocido'
-        resultados += infra
-
-        # Consulta para incidentes académicos
-        cursor.execute("""
-            SELECT u.institucion, CONCAT(u.nombre, ' ', u.apellido) AS registrado_por,
-                   'Académico' AS tipo, ra.id, ra.fecha_registro AS fecha
-            FROM registro_academico ra
-            LEFT JOIN usuarios u ON ra.usuario_id = u.id
-            WHERE ra.estado = %s
-        """, (estado,))
-        acad = cursor.fetchall()
-        for r in acad:
-            r['institucion'] = r['institucion'] or 'Desconocido'
-            r['registrado_por'] = r['registrado_por'] or 'Desconocido'
-        resultados += acad
-
-        return resultados
+        # Una sola consulta sobre ambos tipos, con valores por defecto y orden resueltos en SQL
+        return leer_incidentes(
+            cursor,
+            columnas=('institucion', 'registrado_por', 'id', ('fecha_registro', 'fecha')),
+            estado=estado
+        )
     
     except Exception as e:
         # Propaga la excepción con un mensaje detallado
@@ -310,6 +388,7 @@ def obtener_incidencias_por_estado(estado):
         if conexion:
             conexion.close()
 
+@lectura
 def obtener_todos_los_usuarios():
     """
     Recupera la lista completa de usuarios registrados en la base de datos.
@@ -328,6 +407,7 @@ def obtener_todos_los_usuarios():
             conexion.close()
     return []
 
+@lectura
 def obtener_usuario_por_id(usuario_id):
     """
     Obtiene los datos de un usuario específico basado en su ID.
@@ -341,6 +421,7 @@ def obtener_usuario_por_id(usuario_id):
     conexion.close()
     return usuario
 
+@escritura
 def eliminar_usuario_por_id(usuario_id):
     """
     Elimina un usuario de la base de datos utilizando su ID.
@@ -349,8 +430,12 @@ def eliminar_usuario_por_id(usuario_id):
     if conexion:
         try:
             cursor = conexion.cursor()
+            # Sus incidentes y contadores se eliminan por ON DELETE CASCADE
             cursor.execute("DELETE FROM usuarios WHERE id = %s", (usuario_id,))
             conexion.commit()
+            invalidar_perfil(usuario_id)
+            invalidar_usuarios()
+            invalidar_incidentes()
             return True
         except Error as e:
             print(f"Error al eliminar usuario con ID {usuario_id}: {e}")
@@ -362,6 +447,7 @@ def eliminar_usuario_por_id(usuario_id):
         print("Error de conexión al intentar eliminar usuario")
         return False
 
+@lectura
 def obtener_instituciones():
     """
     Recupera una lista de instituciones únicas registradas por los usuarios.
@@ -369,9 +455,7 @@ def obtener_instituciones():
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT DISTINCT institucion FROM usuarios WHERE institucion IS NOT NULL AND institucion != ''")
-        resultados = cursor.fetchall()
-        return resultados
+        return listar_instituciones(cursor)
     except Exception as e:
         print(f"Error al obtener instituciones: {e}")
         return []
@@ -379,33 +463,22 @@ def obtener_instituciones():
         cursor.close()
         conn.close()
 
+COLUMNAS_REGISTROS_ACADEMICOS = ('nombre_estudiante', ('descripcion', 'motivo'), 'fecha', 'hora', 'estado',
+                                 'institucion', 'evidencia')
+
+@lectura
 def obtener_registros_filtrados_por_institucion(institucion):
     """
     Obtiene registros académicos filtrados por institución o todos si no se especifica institución.
     """
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
-    if institucion:
-        query = """
-        SELECT 
-            r.nombre_estudiante, r.motivo, r.fecha, r.hora, r.estado, u.institucion, r.evidencia
-        FROM registro_academico r
-        JOIN usuarios u ON r.usuario_id = u.id
-        WHERE u.institucion = %s
-        """
-        cursor.execute(query, (institucion,))
-    else:
-        query = """
-        SELECT 
-            r.nombre_estudiante, r.motivo, r.fecha, r.hora, r.estado, u.institucion, r.evidencia
-        FROM registro_academico r
-        JOIN usuarios u ON r.usuario_id = u.id
-        """
-        cursor.execute(query)
-    resultados = cursor.fetchall()
+    resultados = leer_incidentes(cursor, columnas=COLUMNAS_REGISTROS_ACADEMICOS,
+                                 institucion=institucion, tipos=(TIPO_ACADEMICO,))
     conn.close()
     return resultados
 
+@escritura
 def actualizar_usuario_por_id(usuario_id, nombre, apellido, dni, telefono, correo, institucion, clave):
     """
     Actualiza los datos de un usuario existente en la base de datos según su ID.
@@ -414,14 +487,20 @@ def actualizar_usuario_por_id(usuario_id, nombre, apellido, dni, telefono, corre
     if conexion:
         try:
             cursor = conexion.cursor()
+            institucion_id = obtener_o_crear_institucion(cursor, institucion)
             sql = '''
                 UPDATE usuarios 
                 SET nombre = %s, apellido = %s, dni = %s, telefono = %s, 
-                    correo_electronico = %s, institucion = %s, clave = %s
+                    correo_electronico = %s, institucion = %s, institucion_id = %s, clave = %s,
+                    version = version + 1
                 WHERE id = %s
             '''
-            cursor.execute(sql, (nombre, apellido, dni, telefono, correo, institucion, clave, usuario_id))
+            cursor.execute(sql, (nombre, apellido, dni, telefono, correo, institucion, institucion_id, clave, usuario_id))
+            propagar_institucion(cursor, usuario_id, institucion_id)
             conexion.commit()
+            invalidar_perfil(usuario_id)
+            invalidar_usuarios()
+            invalidar_incidentes()
             return True
         except Error as e:
             print(f"Error al actualizar usuario con ID {usuario_id}: {e}")
@@ -433,6 +512,7 @@ def actualizar_usuario_por_id(usuario_id, nombre, apellido, dni, telefono, corre
         print("Error de conexión al intentar actualizar usuario")
         return False
 
+@lectura
 def obtener_incidente_por_nombre(tipo, nombre_institucion):
     """
     Obtiene el incidente más reciente de una institución según el tipo especificado.
@@ -450,7 +530,7 @@ def obtener_incidente_por_nombre(tipo, nombre_institucion):
                     'Académico' AS tipo, ra.motivo AS descripcion, ra.comentarios AS comentarios
                 FROM registro_academico ra
                 LEFT JOIN usuarios u ON ra.usuario_id = u.id
-                WHERE u.institucion = %s
+                WHERE ra.institucion_id = """ + SQL_ID_POR_NOMBRE + """
                 ORDER BY ra.fecha_registro DESC
                 LIMIT 1
             """
@@ -462,7 +542,7 @@ def obtener_incidente_por_nombre(tipo, nombre_institucion):
                     'Infraestructura' AS tipo, ri.descripcion_problema AS descripcion, ri.comentarios AS comentarios
                 FROM registro_infraestructura ri
                 LEFT JOIN usuarios u ON ri.usuario_id = u.id
-                WHERE u.institucion = %s
+                WHERE ri.institucion_id = """ + SQL_ID_POR_NOMBRE + """
                 ORDER BY ri.fecha_registro DESC
                 LIMIT 1
             """
@@ -476,6 +556,17 @@ def obtener_incidente_por_nombre(tipo, nombre_institucion):
         cursor.close()
         conexion.close()
 
+COLUMNAS_EVIDENCIAS = ('nombre_estudiante', ('descripcion', 'motivo'), 'fecha', 'hora', 'estado',
+                       'institucion', 'evidencia')
+
+def consultas_evidencias_por_institucion(institucion=None, desde=None, hasta=None):
+    """
+    Construye la consulta (sql, parametros) de evidencias académicas e infraestructurales,
+    filtradas por institución y por fecha de registro (`desde` inclusive, `hasta` exclusivo) si se especifican.
+    """
+    return [consulta_incidentes(COLUMNAS_EVIDENCIAS, institucion=institucion, desde=desde, hasta=hasta)]
+
+@lectura
 def obtener_todas_las_evidencias_por_institucion(institucion=None):
     """
     Recupera todas las evidencias (académicas e infraestructurales) filtradas por institución si se especifica.
@@ -486,45 +577,9 @@ def obtener_todas_las_evidencias_por_institucion(institucion=None):
     try:
         cursor = conexion.cursor(dictionary=True)
         resultados = []
-        if institucion:
-            cursor.execute("""
-                SELECT 
-                    'Académico' AS tipo, r.nombre_estudiante, r.motivo, r.fecha, r.hora, r.estado, 
-                    u.institucion, r.evidencia
-                FROM registro_academico r
-                JOIN usuarios u ON r.usuario_id = u.id
-                WHERE u.institucion = %s
-            """, (institucion,))
-        else:
-            cursor.execute("""
-                SELECT 
-                    'Académico' AS tipo, r.nombre_estudiante, r.motivo, r.fecha, r.hora, r.estado, 
-                    u.institucion, r.evidencia
-                FROM registro_academico r
-                JOIN usuarios u ON r.usuario_id = u.id
-            """)
-        resultados += cursor.fetchall()
-
-        if institucion:
-            cursor.execute("""
-                SELECT 
-                    'Infraestructura' AS tipo, '' AS nombre_estudiante, r.descripcion_problema AS motivo, 
-                    DATE(r.fecha_registro) AS fecha, TIME(r.fecha_registro) AS hora, r.estado, 
-                    u.institucion, r.imagen_problema AS evidencia
-                FROM registro_infraestructura r
-                JOIN usuarios u ON r.usuario_id = u.id
-                WHERE u.institucion = %s
-            """, (institucion,))
-        else:
-            cursor.execute("""
-                SELECT 
-                    'Infraestructura' AS tipo, '' AS nombre_estudiante, r.descripcion_problema AS motivo, 
-                    DATE(r.fecha_registro) AS fecha, TIME(r.fecha_registro) AS hora, r.estado, 
-                    u.institucion, r.imagen_problema AS evidencia
-                FROM registro_infraestructura r
-                JOIN usuarios u ON r.usuario_id = u.id
-            """)
-        resultados += cursor.fetchall()
+        for sql, parametros in consultas_evidencias_por_institucion(institucion):
+            cursor.execute(sql, parametros)
+            resultados += cursor.fetchall()
         return resultados
     except Exception as e:
         print(f"Error al obtener todas las evidencias: {e}")
@@ -533,6 +588,39 @@ def obtener_todas_las_evidencias_por_institucion(institucion=None):
         cursor.close()
         conexion.close()
 
+# Bloquea el incidente a actualizar y resuelve en la misma consulta el usuario por su correo; los
+# valores anteriores hacen falta para mover los contadores y notificar a la institución anterior
+SQL_BLOQUEAR_INCIDENTE = """
+    SELECT r.id, r.usuario_id, r.estado, r.institucion_id, u.id, u.institucion_id
+    FROM {tabla} r
+    LEFT JOIN usuarios u ON u.correo_electronico = %s
+    WHERE {condicion}
+    ORDER BY r.fecha_registro DESC
+    LIMIT 1
+    FOR UPDATE OF r
+"""
+
+def bloquear_incidente(cursor, tipo, correo, condicion, parametros):
+    """
+    Bloquea el incidente de `tipo` que cumple `condicion` (el más reciente si hay varios) y devuelve
+    (id, usuario_anterior, estado_anterior, institucion_anterior, usuario_id, institucion_id), donde
+    los dos últimos corresponden al usuario de `correo` (None si no existe). Devuelve None si no hay
+    incidente. Solo se bloquea la fila del incidente; la del usuario se lee sin bloquearla, para no
+    frenar las actualizaciones de esa cuenta ni los cambios concurrentes de otros incidentes suyos.
+    """
+    tabla, _ = TABLAS_INCIDENTE[tipo]
+    cursor.execute(SQL_BLOQUEAR_INCIDENTE.format(tabla=tabla, condicion=condicion), (correo, *parametros))
+    return cursor.fetchone()
+
+def escribir_incidente(cursor, tipo, incidente_id, valores):
+    """
+    Actualiza las columnas {columna: valor} del incidente por su clave primaria.
+    """
+    tabla, _ = TABLAS_INCIDENTE[tipo]
+    asignaciones = ', '.join(f"{columna} = %s" for columna in valores)
+    cursor.execute(f"UPDATE {tabla} SET {asignaciones} WHERE id = %s", (*valores.values(), incidente_id))
+
+@escritura
 def actualizar_incidencia_por_nombre(institucion, tipo, estado, descripcion, correo, comentarios):
     """
     Actualiza el incidente más reciente de una institución según el tipo y datos proporcionados.
@@ -541,51 +629,32 @@ def actualizar_incidencia_por_nombre(institucion, tipo, estado, descripcion, cor
     if not conexion:
         print("Error: No se pudo conectar a la base de datos")
         return False
+    tipo_incidente = tipo_contador(tipo)
     try:
         cursor = conexion.cursor()
-        cursor.execute("SELECT id FROM usuarios WHERE correo_electronico = %s", (correo,))
-        resultado = cursor.fetchone()
-        if not resultado:
-            print("Error: No se encontró el usuario con ese correo")
-            return False
-        usuario_id = resultado[0]
-
-        if tipo.lower() == 'infraestructura':
-            cursor.execute("""
-                SELECT ri.id FROM registro_infraestructura ri
-                JOIN usuarios u ON ri.usuario_id = u.id
-                WHERE u.institucion = %s
-                ORDER BY ri.fecha_registro DESC
-                LIMIT 1
-            """, (institucion,))
-        else:
-            cursor.execute("""
-                SELECT ra.id FROM registro_academico ra
-                JOIN usuarios u ON ra.usuario_id = u.id
-                WHERE u.institucion = %s
-                ORDER BY ra.fecha_registro DESC
-                LIMIT 1
-            """, (institucion,))
-        incidente = cursor.fetchone()
-        if not incidente:
+        bloqueado = bloquear_incidente(cursor, tipo_incidente, correo,
+                                       "r.institucion_id = " + SQL_ID_POR_NOMBRE, (institucion,))
+        if not bloqueado:
             print("Error: No se encontró el incidente con esa institución")
             return False
-        incidente_id = incidente[0]
+        incidente_id, usuario_anterior, estado_anterior, institucion_anterior, usuario_id, institucion_id = bloqueado
+        if usuario_id is None:
+            print("Error: No se encontró el usuario con ese correo")
+            return False
 
-        if tipo.lower() == 'infraestructura':
-            sql = """
-                UPDATE registro_infraestructura
-                SET estado = %s, descripcion_problema = %s, usuario_id = %s, comentarios = %s
-                WHERE id = %s
-            """
-        else:
-            sql = """
-                UPDATE registro_academico
-                SET estado = %s, motivo = %s, usuario_id = %s, comentarios = %s
-                WHERE id = %s
-            """
-        cursor.execute(sql, (estado, descripcion, usuario_id, comentarios, incidente_id))
+        columna_descripcion = 'descripcion_problema' if tipo_incidente == TIPO_INFRAESTRUCTURA else 'motivo'
+        escribir_incidente(cursor, tipo_incidente, incidente_id, {
+            'estado': estado, columna_descripcion: descripcion, 'usuario_id': usuario_id,
+            'comentarios': comentarios, 'institucion_id': institucion_id,
+        })
+        mover_contador(cursor, tipo_incidente, usuario_anterior, estado_anterior, usuario_id, estado)
         conexion.commit()
+        invalidar_incidentes()
+        emitir_incidente('actualizado', {
+            'tipo': tipo_incidente, 'id': incidente_id, 'usuario_id': usuario_id,
+            'institucion_id': institucion_id, 'estado': estado, 'estado_anterior': estado_anterior,
+            'descripcion': descripcion, 'comentarios': comentarios
+        }, [institucion_id, institucion_anterior])
         return True
     except Error as e:
         print(f"Error al actualizar incidente: {e}")
@@ -594,6 +663,7 @@ def actualizar_incidencia_por_nombre(institucion, tipo, estado, descripcion, cor
         cursor.close()
         conexion.close()
 
+@escritura
 def actualizar_incidencia_por_id(incidente_id, tipo_incidente, estado, descripcion, motivo, correo, comentarios, tipo_problema): #    CAMBIAR TITULO OCLUMNA
     """
     Actualiza un incidente específico según su ID, tipo y datos proporcionados.
@@ -602,44 +672,37 @@ def actualizar_incidencia_por_id(incidente_id, tipo_incidente, estado, descripci
     if not conexion:
         print("Error: No se pudo conectar a la base de datos")
         return False
+    tipo = tipo_contador(tipo_incidente)
+    es_infraestructura = tipo == TIPO_INFRAESTRUCTURA
     try:
         cursor = conexion.cursor()
-
-        # Obtener usuario
-        cursor.execute("SELECT id FROM usuarios WHERE correo_electronico = %s", (correo,))
-        resultado = cursor.fetchone()
-        if not resultado:
-            print("Error: No se encontró el usuario con ese correo")
-            return False
-        usuario_id = resultado[0]
-
-        # Verificar existencia del incidente
-        if tipo_incidente.lower() == 'infraestructura':
-            cursor.execute("SELECT id FROM registro_infraestructura WHERE id = %s", (incidente_id,))
-        else:
-            cursor.execute("SELECT id FROM registro_academico WHERE id = %s", (incidente_id,))
-        incidente = cursor.fetchone()
-        if not incidente:
+        bloqueado = bloquear_incidente(cursor, tipo, correo, "r.id = %s", (incidente_id,))
+        if not bloqueado:
             print("Error: No se encontró el incidente con ese ID")
             return False
+        _, usuario_anterior, estado_anterior, institucion_anterior, usuario_id, institucion_id = bloqueado
+        if usuario_id is None:
+            print("Error: No se encontró el usuario con ese correo")
+            return False
 
         # Actualizar incidente según el tipo
-        if tipo_incidente.lower() == 'infraestructura':
-            sql = """
-                UPDATE registro_infraestructura
-                SET estado = %s, descripcion_problema = %s, usuario_id = %s, comentarios = %s, problema = %s
-                WHERE id = %s
-            """
-            cursor.execute(sql, (estado, descripcion, usuario_id, comentarios, tipo_problema, incidente_id))
+        valores = {'estado': estado, 'usuario_id': usuario_id, 'comentarios': comentarios,
+                   'institucion_id': institucion_id}
+        if es_infraestructura:
+            valores.update(descripcion_problema=descripcion, problema=tipo_problema)
         else:
-            sql = """
-                UPDATE registro_academico
-                SET estado = %s, motivo = %s, usuario_id = %s, comentarios = %s
-                WHERE id = %s
-            """
-            cursor.execute(sql, (estado, motivo, usuario_id, comentarios, incidente_id))
+            valores['motivo'] = motivo
+        escribir_incidente(cursor, tipo, incidente_id, valores)
 
+        mover_contador(cursor, tipo, usuario_anterior, estado_anterior, usuario_id, estado)
         conexion.commit()
+        invalidar_incidentes()
+        emitir_incidente('actualizado', {
+            'tipo': tipo, 'id': incidente_id, 'usuario_id': usuario_id,
+            'institucion_id': institucion_id, 'estado': estado, 'estado_anterior': estado_anterior,
+            'descripcion': descripcion if es_infraestructura else motivo, 'comentarios': comentarios,
+            'problema': tipo_problema if es_infraestructura else None
+        }, [institucion_id, institucion_anterior])
         return True
     except Error as e:
         print(f"Error al actualizar incidente: {e}")
@@ -648,6 +711,140 @@ def actualizar_incidencia_por_id(incidente_id, tipo_incidente, estado, descripci
         cursor.close()
         conexion.close()
 
+# --------------------- CAMBIO DE ESTADO EN LOTE ---------------------
+
+MAX_CAMBIOS_LOTE = 500
+
+def validar_cambio_estado(cambio):
+    """
+    Valida un cambio {id, tipo, estado, comentarios} del lote. Devuelve (tipo, id, estado,
+    comentarios) normalizados o lanza ValueError con el motivo.
+    """
+    if not isinstance(cambio, dict):
+        raise ValueError("Cambio inválido")
+    try:
+        incidente_id = int(cambio.get('id'))
+    except (TypeError, ValueError):
+        raise ValueError("ID inválido")
+    tipo = TIPOS_POR_NOMBRE.get(str(cambio.get('tipo') or '').strip().lower())
+    if not tipo:
+        raise ValueError("Tipo inválido")
+    estado = normalizar_estado(cambio.get('estado'))
+    if estado not in ESTADOS:
+        raise ValueError("Estado inválido")
+    comentarios = cambio.get('comentarios')
+    if comentarios is not None and not isinstance(comentarios, str):
+        raise ValueError("Comentarios inválidos")
+    return tipo, incidente_id, estado, comentarios
+
+def _sql_actualizar_lote(tabla, filas):
+    """
+    Construye un único UPDATE con CASE para las filas [(id, estado, comentarios), ...] de `tabla`.
+    Los comentarios en None conservan el valor actual.
+    """
+    parametros = []
+    casos_estado = []
+    for incidente_id, estado, _ in filas:
+        casos_estado.append("WHEN %s THEN %s")
+        parametros += [incidente_id, estado]
+    asignaciones = [f"estado = CASE id {' '.join(casos_estado)} END"]
+    con_comentarios = [(incidente_id, comentarios) for incidente_id, _, comentarios in filas if comentarios is not None]
+    if con_comentarios:
+        asignaciones.append(f"comentarios = CASE id {' '.join(['WHEN %s THEN %s'] * len(con_comentarios))} ELSE comentarios END")
+        for incidente_id, comentarios in con_comentarios:
+            parametros += [incidente_id, comentarios]
+    ids = [incidente_id for incidente_id, _, _ in filas]
+    parametros += ids
+    sql = f"UPDATE {tabla} SET {', '.join(asignaciones)} WHERE id IN ({', '.join(['%s'] * len(ids))})"
+    return sql, parametros
+
+@escritura
+def actualizar_estados_en_lote(cambios):
+    """
+    Aplica una lista de cambios de estado {id, tipo, estado, comentarios} en una sola transacción:
+    una consulta valida y bloquea todos los incidentes, un UPDATE con CASE por tabla aplica los
+    cambios y los contadores se ajustan con un único INSERT de varias filas. Devuelve un resultado
+    por cambio en el mismo orden ({'id', 'tipo', 'ok', ...}), o None si la transacción falló.
+    """
+    resultados = []
+    validos = {}
+    for cambio in cambios:
+        try:
+            tipo, incidente_id, estado, comentarios = validar_cambio_estado(cambio)
+        except ValueError as e:
+            resultados.append({'id': cambio.get('id') if isinstance(cambio, dict) else None,
+                               'tipo': cambio.get('tipo') if isinstance(cambio, dict) else None,
+                               'ok': False, 'error': str(e)})
+            continue
+        resultado = {'id': incidente_id, 'tipo': tipo}
+        if (tipo, incidente_id) in validos:
+            resultado.update(ok=False, error="Incidente repetido en el lote")
+        else:
+            validos[(tipo, incidente_id)] = (resultado, estado, comentarios)
+        resultados.append(resultado)
+    if not validos:
+        return resultados
+
+    conexion = get_db_connection()
+    if not conexion:
+        print("Error: No se pudo conectar a la base de datos")
+        return None
+    try:
+        cursor = conexion.cursor()
+
+        # Valida y bloquea todos los incidentes del lote en una sola consulta
+        por_tipo = {}
+        for tipo, incidente_id in validos:
+            por_tipo.setdefault(tipo, []).append(incidente_id)
+        partes, parametros = [], []
+        for tipo, ids in por_tipo.items():
+            tabla = TABLAS_INCIDENTE[tipo][0]
+            partes.append(f"(SELECT '{tipo}', id, usuario_id, estado, institucion_id FROM {tabla} "
+                          f"WHERE id IN ({', '.join(['%s'] * len(ids))}) FOR UPDATE)")
+            parametros += ids
+        cursor.execute(" UNION ALL ".join(partes), parametros)
+        actuales = {(tipo, incidente_id): datos for tipo, incidente_id, *datos in cursor.fetchall()}
+
+        filas_por_tipo = {}
+        deltas = {}
+        aplicados = []
+        for clave, (resultado, estado, comentarios) in validos.items():
+            if clave not in actuales:
+                resultado.update(ok=False, error="Incidente no encontrado")
+                continue
+            tipo, incidente_id = clave
+            usuario_id, estado_anterior, institucion_id = actuales[clave]
+            filas_por_tipo.setdefault(tipo, []).append((incidente_id, estado, comentarios))
+            anterior = normalizar_estado(estado_anterior)
+            if anterior != estado:
+                deltas[(usuario_id, tipo, anterior)] = deltas.get((usuario_id, tipo, anterior), 0) - 1
+                deltas[(usuario_id, tipo, estado)] = deltas.get((usuario_id, tipo, estado), 0) + 1
+            resultado.update(ok=True, estado=estado, estado_anterior=estado_anterior)
+            aplicados.append((resultado, usuario_id, institucion_id, comentarios))
+
+        for tipo, filas in filas_por_tipo.items():
+            cursor.execute(*_sql_actualizar_lote(TABLAS_INCIDENTE[tipo][0], filas))
+        sumar_contadores(cursor, deltas)
+        conexion.commit()
+        if aplicados:
+            invalidar_incidentes()
+        for resultado, usuario_id, institucion_id, comentarios in aplicados:
+            evento = {'tipo': resultado['tipo'], 'id': resultado['id'], 'usuario_id': usuario_id,
+                      'institucion_id': institucion_id, 'estado': resultado['estado'],
+                      'estado_anterior': resultado['estado_anterior']}
+            if comentarios is not None:
+                evento['comentarios'] = comentarios
+            emitir_incidente('actualizado', evento, [institucion_id])
+        return resultados
+    except Error as e:
+        conexion.rollback()
+        print(f"Error al actualizar incidentes en lote: {e}")
+        return None
+    finally:
+        cursor.close()
+        conexion.close()
+
+@lectura
 def obtener_registros_infraestructura():
     """
     Recupera todos los registros de infraestructura ordenados por fecha de registro en orden descendente.
@@ -660,6 +857,7 @@ def obtener_registros_infraestructura():
     conn.close()
     return resultados
 
+@lectura
 def obtener_registros_academico(usuario_id):
     """
     Obtiene los registros académicos asociados a un usuario específico, ordenados por fecha descendente.
@@ -681,37 +879,66 @@ def obtener_registros_academico(usuario_id):
         cursor.close()
         conn.close()
 
+COLUMNAS_INCIDENTES_USUARIO = ('id', 'institucion', 'descripcion', 'estado', 'problema', 'nombre_estudiante',
+                               ('fecha_registro', 'fecha'), 'correo', 'telefono', 'comentarios')
+
+def obtener_incidentes_usuario(usuario_id, conn):
+    """
+    Obtiene los incidentes académicos e infraestructurales de un usuario, con los datos de contacto
+    de su institución, ordenados por fecha de registro descendente en una sola consulta.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        return leer_incidentes(cursor, columnas=COLUMNAS_INCIDENTES_USUARIO, usuario_id=usuario_id)
+    finally:
+        cursor.close()
+
 def obtener_metricas_usuario(usuario_id, conn):
     """
     Calcula las métricas de incidentes (totales, resueltos, en proceso) para un usuario específico.
     """
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM registro_infraestructura WHERE usuario_id = %s", (usuario_id,))
-        infra_total = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM registro_academico WHERE usuario_id = %s", (usuario_id,))
-        academico_total = cursor.fetchone()[0]
-        total_incidentes = infra_total + academico_total
-
-        cursor.execute("SELECT COUNT(*) FROM registro_infraestructura WHERE estado = 'Resuelto' AND usuario_id = %s", (usuario_id,))
-        infra_resueltos = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM registro_academico WHERE estado = 'Resuelto' AND usuario_id = %s", (usuario_id,))
-        academico_resueltos = cursor.fetchone()[0]
-        resueltos = infra_resueltos + academico_resueltos
-
-        cursor.execute("SELECT COUNT(*) FROM registro_infraestructura WHERE estado = 'En Proceso' AND usuario_id = %s", (usuario_id,))
-        infra_en_proceso = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM registro_academico WHERE estado = 'En Proceso' AND usuario_id = %s", (usuario_id,))
-        academico_en_proceso = cursor.fetchone()[0]
-        en_proceso = infra_en_proceso + academico_en_proceso
-
+        metricas = calcular_metricas(cursor, usuario_id=usuario_id)
         return {
-            "total_incidentes": total_incidentes,
-            "resueltos": resueltos,
-            "en_proceso": en_proceso
+            "total_incidentes": metricas['total_incidentes'],
+            "resueltos": metricas['resueltos'],
+            "en_proceso": metricas['en_proceso']
         }
     except Error as err:
         print(f"Error al calcular métricas de usuario: {err}")
         return {"total_incidentes": 0, "resueltos": 0, "en_proceso": 0}
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+# --------------------- BÚSQUEDA DE INCIDENTES ---------------------
+
+COLUMNAS_BUSQUEDA = ('id', 'institucion', 'registrado_por', 'nombre_estudiante', 'problema', 'descripcion',
+                     'estado', 'comentarios', 'fecha')
+
+@lectura
+def buscar_incidentes(texto, pagina=1, limite=LIMITE_DEFECTO, **filtros):
+    """
+    Busca `texto` en los índices FULLTEXT de ambas tablas y devuelve (filas, hay_mas) con la página
+    pedida de los incidentes ordenados por relevancia (y por fecha de registro a igual relevancia).
+    `filtros` se pasan a la consulta unificada (estado, institucion, tipos...). Devuelve None si
+    falla la consulta.
+    """
+    busqueda = preparar_busqueda(texto)
+    if not busqueda:
+        return [], False
+    conexion = get_db_connection()
+    if not conexion:
+        return None
+    try:
+        cursor = conexion.cursor(dictionary=True)
+        # Una fila extra indica si existe una página siguiente
+        filas = leer_incidentes(cursor, columnas=COLUMNAS_BUSQUEDA, busqueda=busqueda, limite=limite + 1,
+                                desplazamiento=(pagina - 1) * limite, **filtros)
+        return filas[:limite], len(filas) > limite
+    except Error as e:
+        print(f"Error al buscar incidentes: {e}")
+        return None
+    finally:
+        cursor.close()
+        conexion.close()
\ No newline at end of file
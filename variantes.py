@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+# ---------------------- VARIANTES DE IMÁGENES ----------------------
+#
+# Cada evidencia subida se acompaña de versiones reducidas (miniatura y media) recomprimidas en
+# WebP (o JPEG), sin metadatos EXIF y con el lado mayor acotado. Se generan en un pool de procesos,
+# fuera del hilo de la petición: la subida responde en cuanto el original está guardado. Cada
+# variante vive junto a su original (`<hash>.jpg` -> `<hash>.miniatura.webp`), así su URL se deduce
+# de la del original sin consultar la base de datos.
+
+# Lado mayor (px) de cada variante
+VARIANTES = {
+    'miniatura': int(os.getenv('VARIANTE_MINIATURA', '320')),
+    'media': int(os.getenv('VARIANTE_MEDIA', '1280')),
+}
+
+FORMATO = os.getenv('VARIANTES_FORMATO', 'webp').lower()
+EXTENSION_FORMATO = {'webp': 'webp', 'jpeg': 'jpg'}[FORMATO]
+CALIDAD = int(os.getenv('VARIANTES_CALIDAD', '80'))
+PROCESOS = int(os.getenv('VARIANTES_PROCESOS', '2'))
+
+EXTENSIONES_ORIGINALES = {'png', 'jpg', 'jpeg'}
+
+# Rechaza imágenes desproporcionadas (bombas de descompresión) antes de decodificarlas
+Image.MAX_IMAGE_PIXELS = int(os.getenv('VARIANTES_MAX_PIXELES', str(50_000_000)))
+
+def ruta_variante(ruta, variante):
+    """
+    Devuelve la ruta (o URL) de la variante a partir de la del original.
+    """
+    base, _ = os.path.splitext(ruta)
+    return f"{base}.{variante}.{EXTENSION_FORMATO}"
+
+def urls_variantes(url, url_base):
+    """
+    Devuelve {variante: url} para una evidencia guardada bajo `url_base`, o {variante: None} si no
+    hay evidencia o es externa.
+    """
+    propia = bool(url) and url.startswith(url_base.rstrip('/') + '/')
+    return {variante: ruta_variante(url, variante) if propia else None for variante in VARIANTES}
+
+def es_original(nombre):
+    """
+    Indica si el archivo es una imagen subida (y no una variante ni un temporal).
+    """
+    partes = nombre.split('.')
+    return (len(partes) >= 2 and not nombre.startswith('.') and partes[-1].lower() in EXTENSIONES_ORIGINALES
+            and not (len(partes) >= 3 and partes[-2] in VARIANTES))
+
+def _preparar(imagen):
+    """
+    Convierte la imagen a un modo que admite el formato de salida.
+    """
+    transparente = imagen.mode in ('RGBA', 'LA', 'PA') or 'transparency' in imagen.info
+    if FORMATO == 'webp' and transparente:
+        return imagen.convert('RGBA')
+    return imagen.convert('RGB') if imagen.mode != 'RGB' else imagen
+
+def _guardar(imagen, destino):
+    """
+    Escribe la variante de forma atómica (temporal + rename), sin EXIF.
+    """
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), prefix='.variante-')
+    try:
+        with os.fdopen(descriptor, 'wb') as salida:
+            imagen.save(salida, format=FORMATO.upper(), quality=CALIDAD, exif=b'')
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, destino)
+    except Exception:
+        os.remove(temporal)
+        raise
+
+def generar_variantes(ruta, forzar=False):
+    """
+    Genera las variantes que falten (o todas, con `forzar`) para la imagen en `ruta` y devuelve
+    las rutas escritas. Se ejecuta en los procesos del pool.
+    """
+    pendientes = {variante: ruta_variante(ruta, variante) for variante in VARIANTES}
+    if not forzar:
+        pendientes = {v: destino for v, destino in pendientes.items() if not os.path.exists(destino)}
+    if not pendientes:
+        return []
+    with Image.open(ruta) as original:
+        # Aplica la orientación EXIF antes de descartar los metadatos
+        imagen = _preparar(ImageOps.exif_transpose(original))
+        for variante, destino in pendientes.items():
+            copia = imagen.copy()
+            copia.thumbnail((VARIANTES[variante], VARIANTES[variante]), Image.LANCZOS)
+            _guardar(copia, destino)
+    return list(pendientes.values())
+
+# ---------------------- POOL DE PROCESOS ----------------------
+
+_pool = None
+_pid = None
+_lock = threading.Lock()
+
+def obtener_pool():
+    """
+    Devuelve el pool de procesos del proceso actual, creándolo la primera vez. Tras un fork
+    (workers de gunicorn) cada proceso crea el suyo.
+    """
+    global _pool, _pid
+    with _lock:
+        if _pool is None or _pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=PROCESOS, mp_context=multiprocessing.get_context('spawn'))
+            _pid = os.getpid()
+        return _pool
+
+def _informar_error(futuro):
+    error = futuro.exception()
+    if error is not None:
+        print(f"Error al generar variantes: {error}")
+
+def encolar_variantes(ruta):
+    """
+    Programa la generación de variantes de `ruta` sin esperar el resultado. Devuelve el Future,
+    o None si no se pudo encolar.
+    """
+    try:
+        futuro = obtener_pool().submit(generar_variantes, ruta)
+    except Exception as e:
+        print(f"No se pudieron encolar las variantes de {ruta}: {e}")
+        return None
+    futuro.add_done_callback(_informar_error)
+    return futuro
+
+def procesar_carpeta(carpeta, forzar=False):
+    """
+    Genera las variantes de todas las imágenes de `carpeta` (recursivamente) en el pool de procesos.
+    Devuelve (imagenes, variantes_generadas, errores) donde `errores` es una lista de (ruta, mensaje).
+    """
+    rutas = [os.path.join(directorio, nombre)
+             for directorio, _, nombres in os.walk(carpeta)
+             for nombre in sorted(nombres) if es_original(nombre)]
+    futuros = [(ruta, obtener_pool().submit(generar_variantes, ruta, forzar)) for ruta in rutas]
+    generadas = 0
+    errores = []
+    for ruta, futuro in futuros:
+        try:
+            generadas += len(futuro.result())
+        except Exception as e:
+            errores.append((ruta, str(e)))
+    return len(rutas), generadas, errores
@@ -0,0 +1,134 @@
+import os
+import secrets
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import g, make_response, request
+from werkzeug.http import is_resource_modified
+
+from sqlite_local import conectar_sqlite
+
+# ---------------------- SECUENCIA DE ESCRITURAS ----------------------
+#
+# Cada recurso ('incidentes', 'usuarios') tiene un contador que avanza con cada escritura
+# confirmada (lo avanzan `invalidar_incidentes` / `invalidar_usuarios`, que ya llaman todas las
+# funciones de escritura) y el momento de esa escritura. Con ellos se construyen el ETag y el
+# Last-Modified de las APIs de lectura: si el cliente ya tiene la versión vigente se responde 304
+# sin abrir una conexión a MySQL. El estado vive en un archivo SQLite compartido por los workers,
+# igual que el limitador de login, para que una escritura en un worker invalide los validadores de
+# todos. La época aleatoria del archivo evita reutilizar ETags si el archivo se borra.
+
+RECURSOS = ('incidentes', 'usuarios')
+
+SQL_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS secuencia_escrituras (
+        recurso TEXT PRIMARY KEY,
+        secuencia INTEGER NOT NULL DEFAULT 0,
+        momento REAL NOT NULL
+    );
+"""
+
+# Fila especial que guarda la época del archivo en lugar de un contador
+EPOCA = '__epoca__'
+
+class SecuenciaEscrituras:
+    """
+    Contadores de escrituras por recurso, compartidos entre procesos en el archivo SQLite `ruta`.
+    """
+
+    def __init__(self, ruta, recursos=RECURSOS):
+        self.ruta = ruta
+        self.recursos = tuple(recursos)
+        ahora = time.time()
+        with self._conectar() as conexion:
+            conexion.executescript(SQL_ESQUEMA)
+            conexion.execute(
+                "INSERT OR IGNORE INTO secuencia_escrituras (recurso, secuencia, momento) VALUES (?, ?, ?)",
+                (EPOCA, int.from_bytes(secrets.token_bytes(4), 'big'), ahora)
+            )
+            conexion.executemany(
+                "INSERT OR IGNORE INTO secuencia_escrituras (recurso, secuencia, momento) VALUES (?, 0, ?)",
+                [(recurso, ahora) for recurso in self.recursos]
+            )
+
+    def avanzar(self, *recursos):
+        """
+        Registra una escritura confirmada en los recursos indicados.
+        """
+        ahora = time.time()
+        try:
+            with self._conectar() as conexion:
+                conexion.executemany("""
+                    INSERT INTO secuencia_escrituras (recurso, secuencia, momento) VALUES (?, 1, ?)
+                    ON CONFLICT(recurso) DO UPDATE SET secuencia = secuencia + 1, momento = excluded.momento
+                """, [(recurso, ahora) for recurso in recursos])
+        except sqlite3.Error as e:
+            print(f"Error al avanzar la secuencia de escrituras: {e}")
+
+    def validador(self, *recursos):
+        """
+        Devuelve (etag, ultima_modificacion) para la combinación de recursos, o (None, None) si no
+        se pudo leer la secuencia.
+        """
+        try:
+            with self._conectar() as conexion:
+                marcadores = ', '.join('?' * (len(recursos) + 1))
+                filas = {recurso: (secuencia, momento) for recurso, secuencia, momento in conexion.execute(
+                    f"SELECT recurso, secuencia, momento FROM secuencia_escrituras WHERE recurso IN ({marcadores})",
+                    (EPOCA,) + recursos
+                )}
+        except sqlite3.Error as e:
+            print(f"Error al leer la secuencia de escrituras: {e}")
+            return None, None
+        epoca, creada = filas.get(EPOCA, (0, 0.0))
+        secuencias = [filas.get(recurso, (0, creada)) for recurso in recursos]
+        etag = '-'.join([f"{epoca:x}"] + [str(secuencia) for secuencia, _ in secuencias])
+        momento = max([creada] + [momento for _, momento in secuencias])
+        return etag, datetime.fromtimestamp(int(momento), tz=timezone.utc)
+
+    def _conectar(self):
+        return conectar_sqlite(self.ruta)
+
+# ---------------------- SECUENCIA COMPARTIDA ----------------------
+
+secuencia_escrituras = SecuenciaEscrituras(
+    ruta=os.getenv('SECUENCIA_DB', os.path.join(tempfile.gettempdir(), 'ugel_secuencia_escrituras.sqlite3')),
+)
+
+# ---------------------- GET CONDICIONAL ----------------------
+
+def respuesta_condicional(*recursos):
+    """
+    Decorador para las vistas GET de solo lectura que dependen de `recursos`. Responde 304 (sin
+    ejecutar la vista) si `If-None-Match` / `If-Modified-Since` coinciden con la versión vigente y
+    si no agrega ETag y Last-Modified a la respuesta 200. El validador se lee antes de consultar la
+    base de datos: una escritura concurrente deja un ETag anterior y el siguiente pedido se repite.
+    Las cachés de proceso que usen estas vistas deben versionarse con la misma secuencia
+    (`CacheTTL(recursos=...)`) para no servir bajo el ETag nuevo datos anteriores a la escritura.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(*args, **kwargs)
+            etag, modificado = secuencia_escrituras.validador(*recursos)
+            if etag is None:
+                return vista(*args, **kwargs)
+            # Tras una escritura reciente la vista lee de la primaria (ver `replicas.usa_primaria`)
+            g.version_modificada = modificado
+            if not is_resource_modified(request.environ, etag=etag, last_modified=modificado):
+                respuesta = make_response('', 304)
+            else:
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+            respuesta.set_etag(etag)
+            respuesta.last_modified = modificado
+            # El navegador guarda la respuesta pero la revalida en cada uso
+            respuesta.cache_control.no_cache = True
+            return respuesta
+        return envoltura
+    return decorador